@@ -3,7 +3,7 @@ from dataclasses import field
 from typing import Any, ClassVar, Optional, Type
 import marshmallow
 import marshmallow_dataclass
-from marshmallow import fields
+from marshmallow import fields, validate
 from rdfm.schema.v1.updates import META_SOFT_VER, META_DEVICE_TYPE, META_MAC_ADDRESS
 from rdfm.schema.validators import Contains
 
@@ -47,6 +47,68 @@ class Device():
     Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
 
 
+""" Maximum amount of devices returned in a single page of the device list
+"""
+DEVICE_PAGE_MAX_LIMIT = 1000
+
+
+@marshmallow_dataclass.dataclass
+class DeviceListParameters():
+    """ Represents GET parameters passed to the device list route
+    """
+    limit: Optional[int] = field(metadata={
+        "required": False,
+        "validate": validate.Range(min=1, max=DEVICE_PAGE_MAX_LIMIT)
+    })
+    cursor: Optional[int] = field(metadata={
+        "required": False
+    })
+    devtype: Optional[str] = field(metadata={
+        "required": False
+    })
+    software_version: Optional[str] = field(metadata={
+        "required": False
+    })
+    metadata_key: Optional[str] = field(metadata={
+        "required": False
+    })
+    metadata_value: Optional[str] = field(metadata={
+        "required": False
+    })
+    group: Optional[int] = field(metadata={
+        "required": False
+    })
+    tag: Optional[str] = field(metadata={
+        "required": False
+    })
+    connected: Optional[bool] = field(metadata={
+        "required": False
+    })
+    last_access_since: Optional[datetime.datetime] = field(metadata={
+        "required": False,
+        "format": "rfc"
+    })
+    last_access_to: Optional[datetime.datetime] = field(metadata={
+        "required": False,
+        "format": "rfc"
+    })
+    name_prefix: Optional[str] = field(metadata={
+        "required": False
+    })
+    mac_prefix: Optional[str] = field(metadata={
+        "required": False
+    })
+    Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
+
+    @marshmallow.validates_schema
+    def validate_metadata(self, data, **kwargs):
+        if (data.get("metadata_key") is None) != \
+                (data.get("metadata_value") is None):
+            raise marshmallow.ValidationError(
+                "metadata_key and metadata_value must be passed together"
+            )
+
+
 @marshmallow_dataclass.dataclass
 class Registration():
     """ Represents a registration request
@@ -121,3 +183,111 @@ class ActionRemoveRequest():
         "required": True,
     })
     Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
+
+
+""" Maximum amount of executions returned in a single page of broadcast results
+"""
+ACTION_BROADCAST_PAGE_MAX_LIMIT = 1000
+
+
+@marshmallow_dataclass.dataclass
+class ActionBroadcastRequest():
+    """ Represents a request to execute an action on all devices
+        of a group, or all devices with a given tag
+    """
+    action_id: str = field(metadata={
+        "required": True
+    })
+    group: Optional[int] = field(metadata={
+        "required": False
+    })
+    tag: Optional[str] = field(metadata={
+        "required": False
+    })
+    priority: int = field(default=0, metadata={
+        "required": False
+    })
+    Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
+
+    @marshmallow.validates_schema
+    def validate_target(self, data, **kwargs):
+        if (data.get("group") is None) == (data.get("tag") is None):
+            raise marshmallow.ValidationError(
+                "exactly one of group and tag must be passed"
+            )
+
+
+@marshmallow_dataclass.dataclass
+class ActionBroadcast():
+    """ Represents the progress of an action broadcast.
+    """
+    id: str = field(metadata={
+        "required": True
+    })
+    action: str = field(metadata={
+        "required": True
+    })
+    created: Optional[datetime.datetime] = field(metadata={
+        "required": True,
+        "allow_none": True,
+        "format": "rfc",
+    })
+    group: Optional[int] = field(metadata={
+        "required": True,
+        "allow_none": True
+    })
+    tag: Optional[str] = field(metadata={
+        "required": True,
+        "allow_none": True
+    })
+    devices: int = field(metadata={
+        "required": True
+    })
+    statuses: dict[str, int] = field(metadata={
+        "required": True
+    })
+    Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
+
+
+@marshmallow_dataclass.dataclass
+class ActionBroadcastResult():
+    """ Represents an action execution of a single device within a broadcast.
+    """
+    id: str = field(metadata={
+        "required": True
+    })
+    mac_address: str = field(metadata={
+        "required": True
+    })
+    status: str = field(metadata={
+        "required": True
+    })
+    download_url: Optional[str] = field(metadata={
+        "required": True,
+        "allow_none": True
+    })
+    Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
+
+
+@marshmallow_dataclass.dataclass
+class ActionSubmitParameters():
+    """ Represents GET parameters passed to the action submission route
+    """
+    priority: int = field(default=0, metadata={
+        "required": False
+    })
+    Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
+
+
+@marshmallow_dataclass.dataclass
+class ActionBroadcastResultParameters():
+    """ Represents GET parameters passed to the broadcast results route
+    """
+    limit: Optional[int] = field(metadata={
+        "required": False,
+        "validate": validate.Range(min=1, max=ACTION_BROADCAST_PAGE_MAX_LIMIT)
+    })
+    cursor: Optional[str] = field(metadata={
+        "required": False
+    })
+    Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
@@ -51,6 +51,19 @@ class AssignDeviceRequest():
     Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
 
 
+@marshmallow_dataclass.dataclass
+class MoveDeviceRequest():
+    """ Represents a request to move devices between groups
+
+    If `devices` is not provided, all devices of the group are moved.
+    """
+    devices: Optional[list[int]] = field(default=None, metadata={
+        "required": False,
+        "allow_none": True,
+    })
+    Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
+
+
 @marshmallow_dataclass.dataclass
 class AssignPackageRequest():
     """ Represents a group package assignment request
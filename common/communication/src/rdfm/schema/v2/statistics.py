@@ -0,0 +1,99 @@
+from dataclasses import field
+from typing import ClassVar, Type
+import marshmallow
+import marshmallow_dataclass
+
+
+@marshmallow_dataclass.dataclass
+class FleetSummary():
+    """ Represents the summary of the device fleet shown on the dashboard
+    """
+    devices: int = field(metadata={
+        "required": True
+    })
+    connected: int = field(metadata={
+        "required": True
+    })
+    offline: int = field(metadata={
+        "required": True
+    })
+    pending_registrations: int = field(metadata={
+        "required": True
+    })
+    updates_pending: int = field(metadata={
+        "required": True
+    })
+    updates_in_progress: int = field(metadata={
+        "required": True
+    })
+    versions: dict[str, int] = field(metadata={
+        "required": True
+    })
+    devtypes: dict[str, int] = field(metadata={
+        "required": True
+    })
+    groups: dict[int, int] = field(metadata={
+        "required": True
+    })
+    Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
+
+
+@marshmallow_dataclass.dataclass
+class OutboundLaneStatistics():
+    """ Represents the metrics of a priority lane of the device send queues
+    """
+    queued: int = field(metadata={
+        "required": True
+    })
+    sent: int = field(metadata={
+        "required": True
+    })
+    dropped: int = field(metadata={
+        "required": True
+    })
+    latency_avg: float = field(metadata={
+        "required": True
+    })
+    latency_max: float = field(metadata={
+        "required": True
+    })
+    Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
+
+
+@marshmallow_dataclass.dataclass
+class OutboundStatistics():
+    """ Represents the metrics of the device send queues of a server process
+    """
+    control: OutboundLaneStatistics = field(metadata={
+        "required": True
+    })
+    bulk: OutboundLaneStatistics = field(metadata={
+        "required": True
+    })
+    Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
+
+
+@marshmallow_dataclass.dataclass
+class OperationCounts():
+    """ Represents the amount of in-flight and expired device operations
+    """
+    in_flight: int = field(metadata={
+        "required": True
+    })
+    expired: int = field(metadata={
+        "required": True
+    })
+    Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
+
+
+@marshmallow_dataclass.dataclass
+class OperationStatistics():
+    """ Represents the device operations awaiting a reply in a server process
+    """
+    actions: OperationCounts = field(metadata={
+        "required": True
+    })
+    filesystem: OperationCounts = field(metadata={
+        "required": True
+    })
+    Schema: ClassVar[Type[marshmallow.Schema]] = marshmallow.Schema
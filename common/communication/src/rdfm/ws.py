@@ -1,5 +1,6 @@
 from typing import Optional
 import typing
+import zlib
 from rdfm_mgmt_communication import decode_json
 from request_models import Request
 from simple_websocket.errors import ConnectionClosed, ConnectionError
@@ -19,6 +20,95 @@ RDFM_WS_UNAUTHORIZED: int = 4000
 RDFM_WS_INVALID_REQUEST: int = 4001
 RDFM_WS_DUPLICATE_CONNECTION: int = 4002
 RDFM_WS_MISSING_CAPABILITIES: int = 4003
+RDFM_WS_TRY_AGAIN_LATER: int = 4004
+
+
+""" Prefix of the close message of connections closed with
+    `RDFM_WS_TRY_AGAIN_LATER`, followed by the delay (in seconds)
+    after which the device should reconnect, e.g. `retry after 12.5`
+"""
+RETRY_AFTER_PREFIX: str = "retry after "
+
+
+""" Capability indicating support for compressed messages
+
+Devices reporting this capability receive all messages from the server as
+binary WebSocket messages containing the JSON message compressed with zlib,
+using `COMPRESSION_DICTIONARY` as the preset dictionary. Such devices may
+also send compressed messages to the server. Text-mode JSON messages are
+always accepted, and are used until the capability was reported.
+"""
+COMPRESSION_CAPABILITY: str = "compression"
+
+
+""" Capability indicating support for multiplexed shell sessions
+
+Devices reporting this capability (along with `shell`) carry the data of
+shell sessions over the management WebSocket, instead of connecting to
+the session with a separate WebSocket. The server opens a session with
+`shell_open`, after which both sides exchange `shell_data` messages, until
+either side sends `shell_close`.
+
+Each direction of a session is flow controlled separately: a side may only
+send up to `SHELL_WINDOW_SIZE` bytes of data that were not yet acknowledged
+by the receiving side with `shell_window`.
+"""
+SHELL_MUX_CAPABILITY: str = "shell_mux"
+
+
+""" Initial flow control window of each direction of a multiplexed shell session
+"""
+SHELL_WINDOW_SIZE: int = 64 * 1024
+
+
+""" Capability indicating support for streaming small files
+
+Devices reporting this capability (along with `filesystem`) send the
+contents of files no larger than requested in `fs_file_read` over the
+management WebSocket, which the server forwards directly to the user.
+Larger files are uploaded to the storage using `fs_file_download`.
+"""
+FILESYSTEM_STREAM_CAPABILITY: str = "filesystem_stream"
+
+
+""" Capability indicating support for sending logs over the management WebSocket
+
+Devices reporting this capability may send batches of log entries using
+`log_batch` messages, instead of `POST /api/v1/logs` requests. Each batch
+is acknowledged with `log_batch_ack` once it was stored, or rejected when
+the server is overloaded, in which case it should be sent again later.
+"""
+LOGS_CAPABILITY: str = "logs"
+
+
+""" Preset dictionary used for compressing messages
+
+Contains fragments common to all messages, which allows compressing small
+messages efficiently without keeping any compression state between the
+messages. The dictionary must never be modified, as it is shared with
+the devices.
+"""
+COMPRESSION_DICTIONARY: bytes = (
+    b'"upload_urls":["https://","part_size":"file":"/'
+    b'"actions":[{"action_id":"action_name":"description":"command":["timeout":'
+    b'"mac_addr":"uuid":"alert":{"message":"connected"}'
+    b'"capabilities":{"shell":true,"action":true,"filesystem":true,'
+    b'"update_progress":true,"compression":true},'
+    b'"size":"error":"id":"status":"ok","progress":"version":'
+    b'{"method":"alert","method":"shell_attach","method":"update_version",'
+    b'{"method":"update_progress","method":"fs_file_probe","method":"fs_file_probe_reply",'
+    b'{"method":"fs_file_download","method":"fs_file_download_reply",'
+    b'{"method":"action_list_query"}{"method":"action_list_update",'
+    b'{"method":"capability_report",'
+    b'{"method":"action_exec_control","execution_id":"'
+    b'{"method":"action_exec","execution_id":"'
+    b'{"method":"action_exec_result","execution_id":"","status_code":0,"output":"'
+)
+
+
+""" Maximum size of a decompressed message
+"""
+MAX_DECOMPRESSED_SIZE: int = 16 * 1024 * 1024
 
 
 """ Capabilities required to perform a certain management request
@@ -26,11 +116,17 @@ RDFM_WS_MISSING_CAPABILITIES: int = 4003
 __required_capabilities_by_method_name: dict[str, list[str]] = {
     'device_hello': [],
     'shell_attach': ['shell'],
+    'shell_open': ['shell', SHELL_MUX_CAPABILITY],
+    'shell_data': ['shell', SHELL_MUX_CAPABILITY],
+    'shell_window': ['shell', SHELL_MUX_CAPABILITY],
+    'shell_close': ['shell', SHELL_MUX_CAPABILITY],
     'alert': [],
     'action_exec': ['action'],
     'action_list_query': ['action'],
     'fs_file_download': ['filesystem'],
-    'fs_file_probe': ['filesystem']
+    'fs_file_probe': ['filesystem'],
+    'fs_file_read': ['filesystem', FILESYSTEM_STREAM_CAPABILITY],
+    'log_batch_ack': [LOGS_CAPABILITY],
 }
 
 
@@ -74,16 +170,18 @@ class WebSocketException(Exception):
         self.status_code = status_code
 
 
-def receive_message(ws: simple_websocket.Client, timeout: Optional[float] = None) -> Request:
+def receive_message(ws: simple_websocket.Client, timeout: Optional[float] = None,
+                    compression: bool = False) -> Request:
     """ Receive an RDFM message from a WebSocket and decode it
 
     A message is a simple JSON struct defining the method to call.
-    We use text-mode encoding for this, and the protocol does not
-    currently use any binary-mode messages.
+    We use text-mode encoding for this, unless the compressed encoding
+    was negotiated (see: `COMPRESSION_CAPABILITY`).
 
     Args:
         ws: a connected WebSocket to receive a message from
         timeout: optional message receive timeout (in seconds)
+        compression: accept compressed messages
 
     Throws:
         WebSocketException: an invalid message was received or
@@ -91,9 +189,6 @@ def receive_message(ws: simple_websocket.Client, timeout: Optional[float] = None
     """
     try:
         data = ws.receive(timeout=timeout)
-        if isinstance(data, bytes):
-            raise WebSocketException("device socket requires text-mode encoding",
-                                     WS_UNSUPPORTED_DATA)
         if data is None:
             raise WebSocketException("websocket read timed out", RDFM_WS_INVALID_REQUEST)
     except ConnectionClosed as e:
@@ -102,14 +197,65 @@ def receive_message(ws: simple_websocket.Client, timeout: Optional[float] = None
             message += f": {e.message}"
         raise WebSocketException(message, e.reason)
 
+    return decode_message(data, compression)
+
+
+def decode_message(data: str | bytes, compression: bool = False) -> Request:
+    """ Decode an RDFM message received from a WebSocket
+
+    Args:
+        data: contents of the received WebSocket message
+        compression: accept compressed (binary) messages
+
+    Throws:
+        WebSocketException: the message is not a valid RDFM message
+    """
+    if isinstance(data, bytes):
+        if not compression:
+            raise WebSocketException("device socket requires text-mode encoding",
+                                     WS_UNSUPPORTED_DATA)
+        encoded = decompress(data)
+    else:
+        encoded = data
+
     try:
-        return decode_json(data.encode())
+        return decode_json(encoded)
     except Exception as e:
         print("Device WS: Malformed message received, exception during decoding:", e, flush=True)
         raise WebSocketException("invalid request", RDFM_WS_INVALID_REQUEST)
 
 
-def send_message(ws: simple_websocket.Client, request: Request):
+def encode_message(request: Request, compression: bool = False) -> str | bytes:
+    """ Encode an RDFM message to be sent over a WebSocket
+
+    Args:
+        request: RDFM message to encode
+        compression: use the compressed (binary) encoding
+    """
+    if not compression:
+        return request.json()
+    compressor = zlib.compressobj(zdict=COMPRESSION_DICTIONARY)
+    return compressor.compress(request.json().encode()) + compressor.flush()
+
+
+def decompress(data: bytes) -> bytes:
+    """ Decompress a compressed RDFM message
+
+    Throws:
+        WebSocketException: the message could not be decompressed
+    """
+    decompressor = zlib.decompressobj(zdict=COMPRESSION_DICTIONARY)
+    try:
+        decompressed = decompressor.decompress(data, MAX_DECOMPRESSED_SIZE)
+    except zlib.error as e:
+        print("Device WS: Malformed compressed message received:", e, flush=True)
+        raise WebSocketException("invalid request", RDFM_WS_INVALID_REQUEST)
+    if decompressor.unconsumed_tail or not decompressor.eof:
+        raise WebSocketException("invalid compressed message", RDFM_WS_INVALID_REQUEST)
+    return decompressed
+
+
+def send_message(ws: simple_websocket.Client, request: Request, compression: bool = False):
     """ Send an RDFM message to a WebSocket
 
     Sends the specified RDFM message over the connected WebSocket.
@@ -117,12 +263,13 @@ def send_message(ws: simple_websocket.Client, request: Request):
     Args:
         ws: a connected WebSocket to send the message to
         request: RDFM message to send
+        compression: use the compressed (binary) encoding
 
     Throws:
         WebSocketException: a connection error has occured
     """
     try:
-        ws.send(request.json())
+        ws.send(encode_message(request, compression))
     except (ConnectionClosed, ConnectionError):
         raise WebSocketException("device disconnected", RDFM_WS_INVALID_REQUEST)
     except Exception as e:
@@ -6,23 +6,25 @@ import time
 from request_models import *
 
 from typing import Optional, cast
+from pydantic import TypeAdapter
 
 
-def decode_json(to_decode: bytes) -> Request | int:
+# Precompiled validator of the management protocol messages
+MESSAGE_ADAPTER: TypeAdapter[Request] = TypeAdapter(Message)
+
+
+def decode_json(to_decode: str | bytes) -> Request | int:
     """Decodes json received from the tcp socket, without header
 
+    The message is parsed and validated in a single pass, using the
+    model selected by the `method` field of the message.
+
     Args:
         to_decode: Encoded json
 
     Returns:
         Decoded json to request or int (header with msg length)
     """
-    decoded = to_decode.decode('utf-8').strip()
-    if decoded.isnumeric():
-        return int(decoded)
-    else:
-        decoded = Container.model_validate({
-            'data': json.loads(to_decode)
-        }).data
-
-        return decoded
+    if to_decode.strip().isdigit():
+        return int(to_decode)
+    return MESSAGE_ADAPTER.validate_json(to_decode)
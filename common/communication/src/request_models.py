@@ -1,7 +1,9 @@
 # type: ignore
 
+import datetime
 from enum import Enum
 from typing import (
+    Annotated,
     Literal,
     Union,
     Optional,
@@ -9,6 +11,7 @@ from typing import (
 )
 from pydantic import (
     BaseModel,
+    Field,
     PositiveInt,
     conint
 )
@@ -34,6 +37,8 @@ class Alert(Request):
 class CapabilityReport(Request):
     method: Literal['capability_report'] = 'capability_report'
     capabilities: dict[str, bool]
+    # Identifies the current actions of the device, see: `action` capability
+    actions_version: Optional[str] = None
 
 
 class DeviceAttachToManager(Request):
@@ -42,6 +47,30 @@ class DeviceAttachToManager(Request):
     uuid: str
 
 
+class ShellOpen(Request):
+    method: Literal['shell_open'] = 'shell_open'
+    uuid: str
+
+
+class ShellData(Request):
+    method: Literal['shell_data'] = 'shell_data'
+    uuid: str
+    # Base64-encoded contents of binary messages, text messages are sent as-is
+    data: str
+    binary: bool = True
+
+
+class ShellWindow(Request):
+    method: Literal['shell_window'] = 'shell_window'
+    uuid: str
+    size: PositiveInt
+
+
+class ShellClose(Request):
+    method: Literal['shell_close'] = 'shell_close'
+    uuid: str
+
+
 class ActionExec(Request):
     method: Literal['action_exec'] = 'action_exec'
     execution_id: str
@@ -98,6 +127,46 @@ class FsFileProbeReply(Request):
     size: int
 
 
+class FsFileRead(Request):
+    method: Literal['fs_file_read'] = 'fs_file_read'
+    id: str
+    file: str
+    max_size: int
+
+
+class FsFileReadReply(Request):
+    method: Literal['fs_file_read_reply'] = 'fs_file_read_reply'
+    id: str
+    status: int
+    size: int
+
+
+class FsFileReadData(Request):
+    method: Literal['fs_file_read_data'] = 'fs_file_read_data'
+    id: str
+    # Base64-encoded part of the file contents
+    data: str
+
+
+class LogEntry(BaseModel):
+    device_timestamp: datetime.datetime
+    name: str
+    entry: str
+
+
+class LogBatch(Request):
+    method: Literal['log_batch'] = 'log_batch'
+    id: str
+    batch: list[LogEntry]
+
+
+class LogBatchAck(Request):
+    method: Literal['log_batch_ack'] = 'log_batch_ack'
+    id: str
+    # Zero if the batch was stored, otherwise it should be sent again later
+    status: int
+
+
 class UpdateProgress(Request):
     method: Literal['update_progress'] = 'update_progress'
     progress: int
@@ -114,6 +183,10 @@ class Container(BaseModel):
         Alert,
         CapabilityReport,
         DeviceAttachToManager,
+        ShellOpen,
+        ShellData,
+        ShellWindow,
+        ShellClose,
         ActionExecResult,
         ActionListUpdate,
         ActionExecControl,
@@ -122,6 +195,44 @@ class Container(BaseModel):
         FsFileDownloadReply,
         FsFileProbe,
         FsFileProbeReply,
+        FsFileRead,
+        FsFileReadReply,
+        FsFileReadData,
+        LogBatch,
+        LogBatchAck,
         UpdateProgress,
         UpdateVersion,
     ]
+
+
+# All messages of the management protocol, discriminated by their method.
+# Validating against this type dispatches the message directly to
+# the model matching the method, instead of trying each of the models.
+Message = Annotated[
+    Union[
+        Alert,
+        CapabilityReport,
+        DeviceAttachToManager,
+        ShellOpen,
+        ShellData,
+        ShellWindow,
+        ShellClose,
+        ActionExec,
+        ActionExecResult,
+        ActionExecControl,
+        ActionListQuery,
+        ActionListUpdate,
+        FsFileDownload,
+        FsFileDownloadReply,
+        FsFileProbe,
+        FsFileProbeReply,
+        FsFileRead,
+        FsFileReadReply,
+        FsFileReadData,
+        LogBatch,
+        LogBatchAck,
+        UpdateProgress,
+        UpdateVersion,
+    ],
+    Field(discriminator='method'),
+]
@@ -10,6 +10,7 @@ import (
 	"crypto/tls"
 	"crypto/x509"
 	"encoding/base64"
+	"encoding/hex"
 	"encoding/json"
 	"encoding/pem"
 	"errors"
@@ -18,6 +19,7 @@ import (
 	"net/http"
 	"os"
 	"path/filepath"
+	"sort"
 	"strings"
 	"sync"
 	"time"
@@ -111,29 +113,9 @@ func (d *Device) handleRequest(msg []byte) (serverws.Request, error) {
 
 		return response, nil
 	case serverws.ActionListQuery:
-		action_list := d.actionRunner.List()
-		var reqActions []serverws.Action
-		for _, action := range action_list {
-			reqAction := serverws.Action{
-				ActionId:    action.GetId(),
-				ActionName:  action.GetName(),
-				Description: action.GetDescription(),
-			}
-
-			switch v := action.(type) {
-			case actions.CommandAction:
-				reqAction.Command = v.Command
-				reqAction.Timeout = v.Timeout
-			default:
-				reqAction.Command = []string{}
-				reqAction.Timeout = 0.0
-			}
-
-			reqActions = append(reqActions, reqAction)
-		}
 		response := serverws.ActionListUpdate{
 			Method:  "action_list_update",
-			Actions: reqActions,
+			Actions: d.actionList(),
 		}
 		return response, nil
 	case serverws.DeviceAttachToManager:
@@ -341,9 +323,49 @@ func (d *Device) setupActionRunner() error {
 		return err
 	}
 	d.actionRunner = actionRunner
+	d.conn.SetActionsVersion(d.actionsVersion)
 	return nil
 }
 
+// Actions available on the device, as reported to the server
+func (d *Device) actionList() []serverws.Action {
+	action_list := d.actionRunner.List()
+	var reqActions []serverws.Action
+	for _, action := range action_list {
+		reqAction := serverws.Action{
+			ActionId:    action.GetId(),
+			ActionName:  action.GetName(),
+			Description: action.GetDescription(),
+		}
+
+		switch v := action.(type) {
+		case actions.CommandAction:
+			reqAction.Command = v.Command
+			reqAction.Timeout = v.Timeout
+		default:
+			reqAction.Command = []string{}
+			reqAction.Timeout = 0.0
+		}
+
+		reqActions = append(reqActions, reqAction)
+	}
+	return reqActions
+}
+
+// Digest of the available actions, which changes whenever any of them does
+func (d *Device) actionsVersion() (string, error) {
+	reqActions := d.actionList()
+	sort.Slice(reqActions, func(i, j int) bool {
+		return reqActions[i].ActionId < reqActions[j].ActionId
+	})
+	encoded, err := json.Marshal(reqActions)
+	if err != nil {
+		return "", err
+	}
+	digest := sha256.Sum256(encoded)
+	return hex.EncodeToString(digest[:]), nil
+}
+
 func (d *Device) setupShellRunner() error {
 	sr, err := shell.NewShellRunner(d.rdfmCtx.RdfmConfig.ShellConcurrentMaxCount)
 	if err != nil {
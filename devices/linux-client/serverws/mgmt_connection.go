@@ -29,6 +29,9 @@ type DeviceManagementConnection struct {
 	stateCnd     *sync.Cond
 	state        deviceConnectionState
 	capabilities map[string]bool
+	// Computes the version of the actions reported along with the
+	// capabilities, allowing the server to reuse the actions it already knows
+	actionsVersion func() (string, error)
 }
 
 type ConnClosedError struct {
@@ -97,6 +100,15 @@ func (d *DeviceManagementConnection) announceCapabilities() error {
 		"method":       "capability_report",
 		"capabilities": d.capabilities,
 	}
+	if d.actionsVersion != nil {
+		// Computed on every announcement, so that it covers all actions
+		// registered by the time the device connects
+		version, err := d.actionsVersion()
+		if err != nil {
+			return err
+		}
+		res["actions_version"] = version
+	}
 
 	msg, err := json.Marshal(res)
 	if err != nil {
@@ -232,3 +244,7 @@ func (d *DeviceManagementConnection) EnsureReady() {
 func (d *DeviceManagementConnection) SetCapability(cap string, value bool) {
 	d.capabilities[cap] = value
 }
+
+func (d *DeviceManagementConnection) SetActionsVersion(version func() (string, error)) {
+	d.actionsVersion = version
+}
@@ -27,8 +27,9 @@ func (r Alert) method() string {
 }
 
 type CapabilityReport struct {
-	Method       string          `json:"method"`
-	Capabilities map[string]bool `json:"capabilities"`
+	Method         string          `json:"method"`
+	Capabilities   map[string]bool `json:"capabilities"`
+	ActionsVersion string          `json:"actions_version,omitempty"`
 }
 
 func (r CapabilityReport) method() string {
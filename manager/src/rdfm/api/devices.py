@@ -1,23 +1,51 @@
+import urllib.parse
 import requests
 import rdfm.config
 from rdfm.api import wrap_api_error
-from typing import List
+from typing import Any, List, Optional
 from rdfm.schema.v2.devices import Device, Registration
 
-
-def fetch_all(config: rdfm.config.Config) -> List[Device]:
-    response = requests.get(
-        rdfm.api.escape(config, "/api/v2/devices"),
-        verify=config.ca_cert,
-        auth=config.authorizer,
-    )
-    if response.status_code != 200:
-        raise RuntimeError(
-            f"Server returned unexpected status code {response.status_code}"
+""" Amount of devices fetched in a single request when listing devices
+"""
+DEVICE_PAGE_SIZE = 1000
+
+
+def fetch_all(config: rdfm.config.Config,
+              filters: Optional[dict[str, Any]] = None) -> List[Device]:
+    """Fetch all devices matching the given filters
+
+    Devices are fetched page by page, following the next page links
+    returned by the server.
+
+    Args:
+        filters: filter query parameters supported by `GET /api/v2/devices`
+    """
+    params = {k: v for k, v in (filters or {}).items() if v is not None}
+    params["limit"] = DEVICE_PAGE_SIZE
+    url: Optional[str] = rdfm.api.escape(config, "/api/v2/devices")
+    devices: List[Device] = []
+    while url is not None:
+        response = requests.get(
+            url,
+            params=params,
+            verify=config.ca_cert,
+            auth=config.authorizer,
         )
-
-    groups: List[Device] = Device.Schema(many=True).load(response.json())
-    return groups
+        if response.status_code != 200:
+            raise RuntimeError(
+                "Server returned unexpected status code "
+                f"{response.status_code}"
+            )
+        devices.extend(Device.Schema(many=True).load(response.json()))
+
+        # The next page link already contains all query parameters
+        params = None
+        url = None
+        if "next" in response.links:
+            url = urllib.parse.urljoin(
+                config.server_url, response.links["next"]["url"]
+            )
+    return devices
 
 
 def fetch_registrations(config: rdfm.config.Config) -> List[Registration]:
@@ -14,7 +14,18 @@ MAC_ADDR_REGEX = "^([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})$"
 
 def list_devices(config: rdfm.config.Config, args):
     """CLI entrypoint - listing devices"""
-    devices: List[rdfm.api.devices.Device] = rdfm.api.devices.fetch_all(config)
+    filters = {
+        "devtype": args.devtype,
+        "software_version": args.software_version,
+        "group": args.group,
+        "tag": args.tag,
+        "connected": args.connected,
+        "name_prefix": args.name_prefix,
+        "mac_prefix": args.mac_prefix,
+    }
+    devices: List[rdfm.api.devices.Device] = rdfm.api.devices.fetch_all(
+        config, filters
+    )
     print("Registered devices:")
     for device in devices:
         print(f"Device #{device.id}")
@@ -208,6 +219,38 @@ def add_devices_parser(parser: argparse._SubParsersAction):
 
     list = sub.add_parser("list", help="list all registered devices")
     list.set_defaults(func=list_devices)
+    list.add_argument(
+        "--devtype", type=str, help="only list devices of the given type"
+    )
+    list.add_argument(
+        "--software-version", type=str,
+        help="only list devices running the given software version"
+    )
+    list.add_argument(
+        "--group", type=int,
+        help="only list devices assigned to the given group"
+    )
+    list.add_argument(
+        "--tag", type=str, help="only list devices with the given tag"
+    )
+    connected = list.add_mutually_exclusive_group()
+    connected.add_argument(
+        "--connected", action="store_true", default=None,
+        help="only list devices connected to the server"
+    )
+    connected.add_argument(
+        "--disconnected", action="store_false", dest="connected",
+        help="only list devices not connected to the server"
+    )
+    list.add_argument(
+        "--name-prefix", type=str,
+        help="only list devices with names starting with the given prefix"
+    )
+    list.add_argument(
+        "--mac-prefix", type=str,
+        help="only list devices with MAC addresses starting with "
+             "the given prefix"
+    )
 
     list_pending = sub.add_parser(
         "pending", help="list all pending devices (awaiting approval)"
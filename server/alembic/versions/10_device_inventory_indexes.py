@@ -0,0 +1,34 @@
+"""Add indexes for filtering the device inventory
+
+Revision ID: 10
+Revises: 9
+Create Date: 2026-10-19 10:12:31.118205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '10'
+down_revision: Union[str, None] = '9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_devices_last_access'), 'devices', ['last_access'], unique=False)
+    op.create_index(op.f('ix_devices_name'), 'devices', ['name'], unique=False)
+    op.create_index(op.f('ix_devices_mac_address'), 'devices', ['mac_address'], unique=False)
+    op.create_index(op.f('ix_devices_groups_group_id'), 'devices_groups', ['group_id'], unique=False)
+    op.create_index(op.f('ix_devices_tags_tag'), 'devices_tags', ['tag'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_devices_tags_tag'), table_name='devices_tags')
+    op.drop_index(op.f('ix_devices_groups_group_id'), table_name='devices_groups')
+    op.drop_index(op.f('ix_devices_mac_address'), table_name='devices')
+    op.drop_index(op.f('ix_devices_name'), table_name='devices')
+    op.drop_index(op.f('ix_devices_last_access'), table_name='devices')
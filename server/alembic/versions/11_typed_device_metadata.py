@@ -0,0 +1,52 @@
+"""Store device metadata as JSON and add indexed metadata columns
+
+Revision ID: 11
+Revises: 10
+Create Date: 2026-10-19 14:03:52.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '11'
+down_revision: Union[str, None] = '10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('devices') as batch_op:
+        batch_op.alter_column('capabilities', existing_type=sa.Text(), type_=sa.JSON(),
+                              postgresql_using='capabilities::json')
+        batch_op.alter_column('device_metadata', existing_type=sa.Text(), type_=sa.JSON(),
+                              postgresql_using='device_metadata::json')
+        batch_op.add_column(sa.Column('devtype', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('software_version', sa.Text(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_devices_devtype'), ['devtype'], unique=False)
+        batch_op.create_index(batch_op.f('ix_devices_software_version'), ['software_version'], unique=False)
+
+    # Fill in the indexed columns from the existing device metadata
+    if op.get_bind().engine.name == 'postgresql':
+        op.execute('''UPDATE devices SET
+                   devtype = device_metadata ->> 'rdfm.hardware.devtype',
+                   software_version = device_metadata ->> 'rdfm.software.version' ''')
+    else:
+        op.execute('''UPDATE devices SET
+                   devtype = json_extract(device_metadata, '$."rdfm.hardware.devtype"'),
+                   software_version = json_extract(device_metadata, '$."rdfm.software.version"')''')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('devices') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_devices_software_version'))
+        batch_op.drop_index(batch_op.f('ix_devices_devtype'))
+        batch_op.drop_column('software_version')
+        batch_op.drop_column('devtype')
+        batch_op.alter_column('device_metadata', existing_type=sa.JSON(), type_=sa.Text(),
+                              postgresql_using='device_metadata::text')
+        batch_op.alter_column('capabilities', existing_type=sa.JSON(), type_=sa.Text(),
+                              postgresql_using='capabilities::text')
@@ -0,0 +1,38 @@
+"""Add action broadcasts
+
+Revision ID: 12
+Revises: 11
+Create Date: 2026-10-19 16:41:07.392215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '12'
+down_revision: Union[str, None] = '11'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('action_broadcasts',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('action_id', sa.Text(), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=False),
+    sa.Column('group', sa.Integer(), nullable=True),
+    sa.Column('tag', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    )
+    op.add_column('action_logs', sa.Column('broadcast_id', sa.Text(), nullable=True))
+    op.create_index(op.f('ix_action_logs_broadcast_id'), 'action_logs', ['broadcast_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_action_logs_broadcast_id'), table_name='action_logs')
+    with op.batch_alter_table('action_logs') as batch_op:
+        batch_op.drop_column('broadcast_id')
+    op.drop_table('action_broadcasts')
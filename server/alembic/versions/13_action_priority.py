@@ -0,0 +1,27 @@
+"""Add action execution priority
+
+Revision ID: 13
+Revises: 12
+Create Date: 2026-10-19 18:02:31.518340
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '13'
+down_revision: Union[str, None] = '12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('action_logs', sa.Column('priority', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('action_logs') as batch_op:
+        batch_op.drop_column('priority')
@@ -0,0 +1,32 @@
+"""Add device action catalogs
+
+Revision ID: 14
+Revises: 13
+Create Date: 2026-10-19 19:12:45.204718
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '14'
+down_revision: Union[str, None] = '13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('action_catalogs',
+    sa.Column('mac_address', sa.Text(), nullable=False),
+    sa.Column('version', sa.Text(), nullable=True),
+    sa.Column('actions', sa.JSON(), nullable=False),
+    sa.Column('updated', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('mac_address'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('action_catalogs')
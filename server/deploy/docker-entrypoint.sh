@@ -76,6 +76,14 @@ wsgi_server="${RDFM_WSGI_SERVER:-gunicorn}"
 if [ "${wsgi_server}" == "werkzeug" ]; then
 	exec poetry run python -m rdfm_mgmt_server ${server_args}
 elif [ "${wsgi_server}" == "gunicorn" ]; then
+	if [ -n "${RDFM_DEVICE_GATEWAY_PORT}" ]; then
+		if [ "${RDFM_CONNECTION_REGISTRY}" != "redis" ]; then
+			echo "ERROR: The device gateway requires RDFM_CONNECTION_REGISTRY=redis"
+			exit 1
+		fi
+		echo "Starting RDFM device gateway.."
+		poetry run python -m device_gateway &
+	fi
 	exec poetry run gunicorn ${gunicorn_args} 'rdfm_mgmt_server:setup_with_config_from_env()'
 else
 	echo "ERROR: Unsupported WSGI server: ${wsgi_server}"
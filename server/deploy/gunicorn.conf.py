@@ -9,6 +9,10 @@ if 'RDFM_DISABLE_ENCRYPTION' not in os.environ:
 worker_connections = os.getenv('RDFM_WSGI_MAX_CONNECTIONS', 4000)
 
 bind = f"{hostname}:{port}"
-# MUST use exactly one worker!
-# The server does not currently support being run in multiple workers
-workers = 1
\ No newline at end of file
+# Running multiple workers requires the Redis connection registry
+# (RDFM_CONNECTION_REGISTRY=redis), so that requests handled by any worker
+# can reach devices connected to other workers.
+workers = int(os.getenv('RDFM_WSGI_WORKERS', 1))
+if workers > 1 and os.getenv('RDFM_CONNECTION_REGISTRY', 'memory') != 'redis':
+    raise SystemExit("Running more than one worker (RDFM_WSGI_WORKERS) "
+                     "requires RDFM_CONNECTION_REGISTRY=redis")
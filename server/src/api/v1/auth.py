@@ -1,4 +1,3 @@
-import json
 import traceback
 from api.v1.middleware import (
     deserialize_schema,
@@ -277,8 +276,8 @@ def set_registration():
             device.name = registration.mac_address
             device.mac_address = registration.mac_address
             device.public_key = registration.public_key
-            device.device_metadata = json.dumps(registration.info)
-            device.capabilities = json.dumps({"shell": False})
+            device.device_metadata = registration.info
+            device.capabilities = {"shell": False}
             device.last_access = registration.last_appeared
             server.instance._devices_db.insert(device)
 
@@ -3,7 +3,6 @@ from typing import Optional, List
 import server
 import traceback
 import models.device
-import json
 from api.v1.common import api_error
 from api.v1.middleware import management_read_only_api, management_read_write_api
 from rdfm.schema.v1.devices import Device
@@ -19,8 +18,8 @@ def model_to_schema(device: models.device.Device) -> Device:
         last_access=device.last_access,
         name=device.name,
         mac_address=device.mac_address,
-        capabilities=json.loads(device.capabilities),
-        metadata=json.loads(device.device_metadata),
+        capabilities=device.capabilities,
+        metadata=device.device_metadata,
         public_key=device.public_key,
         group=server.instance._devices_db.fetch_active_group(device.id)
     )
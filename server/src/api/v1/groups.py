@@ -25,25 +25,49 @@ groups_blueprint: Blueprint = Blueprint("rdfm-server-groups", __name__)
 GROUP_DEFAULT_PRIORITY = 25
 
 
-def model_to_schema(group: models.group.Group) -> Group:
+def model_to_schema(
+    group: models.group.Group,
+    packages: Optional[List[int]] = None,
+    devices: Optional[List[int]] = None,
+) -> Group:
     """Convert a database group model to a schema model.
 
     As we have to fetch the device list, this can't be done using just a simple
-    mapping between the fields.
+    mapping between the fields. When serializing many groups, pass the
+    assignments from a batched lookup in `packages` and `devices`.
     """
+    if packages is None:
+        packages = server.instance._groups_db.fetch_assigned_packages(group.id)
+    if devices is None:
+        devices = server.instance._groups_db.fetch_assigned_ids(group.id)
     return Group(
         id=group.id,
         created=group.created,
-        packages=server.instance._groups_db.fetch_assigned_packages(group.id),
-        devices=[
-            device.id
-            for device in server.instance._groups_db.fetch_assigned(group.id)
-        ],
+        packages=packages,
+        devices=devices,
         metadata=group.info,
         policy=group.policy,
     )
 
 
+def models_to_schema(groups: List[models.group.Group]) -> List[Group]:
+    """Convert a list of database group models to schema models.
+
+    Package and device assignments of all groups are fetched using
+    a constant amount of queries, regardless of the amount of groups.
+    """
+    if len(groups) == 0:
+        return []
+    packages = server.instance._groups_db.fetch_assigned_packages_by_group()
+    devices = server.instance._groups_db.fetch_assigned_ids_by_group()
+    return [
+        model_to_schema(
+            group, packages.get(group.id, []), devices.get(group.id, [])
+        )
+        for group in groups
+    ]
+
+
 @groups_blueprint.route("/api/v1/groups")
 @management_read_only_api
 def fetch_all():
@@ -92,7 +116,7 @@ def fetch_all():
             models.group.Group
         ] = server.instance._groups_db.fetch_all()
         return Group.Schema().dump(
-            [model_to_schema(group) for group in groups], many=True
+            models_to_schema(groups), many=True
         )
     except Exception as e:
         traceback.print_exc()
@@ -178,13 +178,11 @@ def fetch_by_group_id(identifier: int, params: LogRouteParameters):
             )
 
         # get the associated devices
-        devices: List[
-            models.device.Device
-        ] = server.instance._groups_db.fetch_assigned(identifier)
-        if not devices:
+        identifiers: List[int] = \
+            server.instance._groups_db.fetch_assigned_ids(identifier)
+        if not identifiers:
             return {}, 200
 
-        identifiers = [device.id for device in devices]
         # since fetch supports fetching by multiple IDs and names,
         # encapsulate them in a list if necessary
         logs = server.instance._logs_db.fetch(identifiers,
@@ -316,13 +314,11 @@ def delete_by_group_id(identifier: int, params: LogRouteParameters):
                 404
             )
 
-        devices: List[
-            models.device.Device
-        ] = server.instance._groups_db.fetch_assigned(identifier)
-        if not devices:
+        identifiers: List[int] = \
+            server.instance._groups_db.fetch_assigned_ids(identifier)
+        if not identifiers:
             return {}, 200
 
-        identifiers = [device.id for device in devices]
         # since delete supports deletion by multiple
         # IDs and names, encapsulate them in a list if necessary
         success = server.instance._logs_db.delete(identifiers,
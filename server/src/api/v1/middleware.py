@@ -2,18 +2,18 @@ import datetime
 import inspect
 import functools
 from marshmallow import ValidationError
-from flask import request, current_app, Response
+from flask import request, current_app, g, Request, Response
 from api.v1.common import api_error
 from auth.device import decode_and_verify_token
 import configuration
 import requests
-from typing import Callable, Optional
+from typing import IO, Callable, Optional
 from authlib.integrations.requests_client import OAuth2Session
 from authlib.oauth2.rfc6749.util import scope_to_list
 import server
 from simple_websocket import Server, ConnectionClosed
-from rdfm.ws import WebSocketException
-from device_mgmt.helpers import WS_PING_INTERVAL
+from rdfm.ws import WebSocketException, RDFM_WS_TRY_AGAIN_LATER
+from device_mgmt.helpers import NotifyingEvent, WS_PING_INTERVAL
 from typing import List
 
 from rdfm.permissions import (
@@ -504,7 +504,8 @@ def upgrade_to_websocket(f):
                 "simple_websocket.Client)"
             )
 
-        ws = Server.accept(request.environ, ping_interval=WS_PING_INTERVAL)
+        ws = Server.accept(request.environ, ping_interval=WS_PING_INTERVAL,
+                           event_class=NotifyingEvent)
 
         kwargs["ws"] = ws
         try:
@@ -534,6 +535,84 @@ def upgrade_to_websocket(f):
     return __upgrade
 
 
+def admit_device_connection(f):
+    """Decorator for rate limiting device WebSocket connections
+
+    Connections exceeding the rate admitted by the server (see:
+    `AdmissionControl`) are rejected before the device is authenticated.
+    Rejected connections are upgraded to a WebSocket and closed right away
+    with the `RDFM_WS_TRY_AGAIN_LATER` status code, with a message telling
+    the device when to reconnect.
+
+    The decorator must appear before the decorators authenticating the
+    device, for example:
+
+        @example_blueprint.route('/my/websocket/route', websocket=True)
+        @admit_device_connection
+        @device_api
+        @upgrade_to_websocket
+        def my_route():
+            pass
+    """
+
+    @functools.wraps(f)
+    def __admit(*args, **kwargs):
+        admission = server.instance.admission
+        if admission.admit():
+            return f(*args, **kwargs)
+        return __reject_connection(message=admission.retry_message())
+
+    return __admit
+
+
+@upgrade_to_websocket
+def __reject_connection(ws: Server, message: str):
+    raise WebSocketException(message, RDFM_WS_TRY_AGAIN_LATER)
+
+
+def stream_file_uploads(factory: Callable[[], IO[bytes]]):
+    """Decorator for routes receiving large file uploads
+
+    Files uploaded to the route in a multipart form are written to streams
+    created by `factory` while the request body is being parsed, instead
+    of being spooled to temporary files (see: `RdfmRequest`). The uploaded
+    files are then available in `request.files` as usual, with the created
+    streams as their `stream`.
+
+    The registration decorator must appear right before this one:
+
+        @example_blueprint.route('/my/upload/route', methods=["POST"])
+        @stream_file_uploads(create_my_stream)
+        @<other decorators>
+        def my_route():
+            pass
+    """
+    def _stream_file_uploads(f):
+        f.__rdfm_file_stream__ = factory
+        return f
+
+    return _stream_file_uploads
+
+
+class RdfmRequest(Request):
+    """Request class of the RDFM server app"""
+
+    def _get_file_stream(
+        self,
+        total_content_length: Optional[int],
+        content_type: Optional[str],
+        filename: Optional[str] = None,
+        content_length: Optional[int] = None,
+    ) -> IO[bytes]:
+        view = current_app.view_functions.get(self.endpoint)
+        factory = getattr(view, "__rdfm_file_stream__", None)
+        if factory is None:
+            return super()._get_file_stream(
+                total_content_length, content_type, filename, content_length
+            )
+        return factory()
+
+
 def management_read_only_api(f):
     """Decorator to be used on read-only management API routes
 
@@ -609,7 +688,23 @@ def check_admin_rights(user_roles: List[str], check_ro: bool):
             SCOPE_READ_WRITE in user_roles)
 
 
-def check_permission(resource_name: str, permission: str):
+def permission_filter() -> Optional[Callable[[int], bool]]:
+    """Take over filtering the resources listed by the current route
+
+    By default, routes protected with `check_permission` that list
+    resources have the resources the user may not access removed from
+    their response. Routes that paginate the listed resources must filter
+    them before paginating instead, using the returned predicate.
+
+    Returns:
+        A predicate checking whether the user may access the resource with
+        the given identifier, or None if the user may access all resources
+    """
+    return g.pop("rdfm_permission_filter", None)
+
+
+def check_permission(resource_name: str, permission: str,
+                     identifier_key: str = "identifier"):
     def _check_permissions(f):
         f.__rdfm_api_privileges__ = "management_permissions"
 
@@ -627,29 +722,37 @@ def check_permission(resource_name: str, permission: str):
 
             if write_permission:
                 if check_user_permissions(resource_name, user_id,
-                                          kwargs['identifier'], permission):
+                                          kwargs[identifier_key], permission):
                     return f(*args, **kwargs)
                 return api_error(f"insufficient permission to a resource", 403)
 
-            result, status_code = f(*args, **kwargs)
+            g.rdfm_permission_filter = lambda identifier: \
+                check_user_permissions(resource_name, user_id,
+                                       identifier, permission)
+            # Routes may additionally return response headers
+            result, status_code, *headers = f(*args, **kwargs)
+            # Unless the route has filtered the resources itself
+            filtered = permission_filter() is None
 
             if status_code != 200:
-                return result, status_code
+                return result, status_code, *headers
 
             if permission == READ_PERMISSION:
                 many = type(result) is list
+                if many and filtered:
+                    return result, status_code, *headers
                 if many:
                     lol = list(filter(
                         lambda resource: check_user_permissions(
                             resource_name, user_id,
                             resource["id"], permission), result))
-                    return lol, status_code
+                    return lol, status_code, *headers
                 if check_user_permissions(resource_name, user_id,
                                           result["id"], permission):
-                    return result, status_code
+                    return result, status_code, *headers
                 return {}, 404
 
-            return result, status_code
+            return result, status_code, *headers
         return __check_permissions
     return _check_permissions
 
@@ -1,11 +1,9 @@
-import tarfile
-import json
-
 from api.v1.middleware import (
     management_upload_package_api,
     get_scopes_for_upload_package,
     check_permission,
     add_permissions_for_new_resource,
+    stream_file_uploads,
 )
 from rdfm.permissions import (
     READ_PERMISSION,
@@ -15,11 +13,10 @@ from rdfm.permissions import (
 from flask import request, abort, send_from_directory, Blueprint, current_app
 from pathlib import Path
 import storage
-import hashlib
+from storage.ingest import PackageIngest
 import traceback
 import datetime
 import models.package
-import tempfile
 import server
 import configuration
 from api.v1.common import api_error
@@ -106,7 +103,19 @@ def fetch_packages():
         return {}, 500
 
 
+def create_package_stream() -> PackageIngest:
+    """Create the stream receiving an uploaded package
+
+    The package is spooled where the configured storage driver
+    can take it over from.
+    """
+    conf: configuration.ServerConfig = current_app.config["RDFM_CONFIG"]
+    driver = storage.driver_by_name(conf.storage_driver, conf)
+    return PackageIngest(driver.spool_directory() if driver is not None else None)
+
+
 @packages_blueprint.route("/api/v1/packages", methods=["POST"])
+@stream_file_uploads(create_package_stream)
 @management_upload_package_api
 @add_permissions_for_new_resource(PACKAGE_RESOURCE)
 def upload_package(scopes: list[str] = []):
@@ -185,33 +194,33 @@ def upload_package(scopes: list[str] = []):
         if driver is None:
             return api_error("invalid storage driver", 500)
 
-        sha256 = ""
-        with tempfile.NamedTemporaryFile("wb+") as f:
-            request.files["file"].save(f.name)
-
-            # Verification of the artifact type
-            # The artifact is a .tar file containing a 'header.tar' file,
-            # which is also a .tar file that contains a 'header-info' JSON.
-            # In case the artifact is not a standard RDFM artifact
-            # we're checking permissions for non-standard packages
-            authorized, req_scopes = is_authorized_to_upload(f, scopes, conf)
-            if not authorized:
-                return api_error(
-                    "user does not have permission to upload this " +
-                    "package type. One of the scopes is required: " +
-                    ", ".join([str(i) for i in req_scopes]),
-                    403
-                )
-            success = driver.upsert(meta, f.name, storage_directory)
-            if not success:
-                return api_error("could not store artifact", 500)
-            sha256 = hashlib.file_digest(f, "sha256").hexdigest()
+        # The package was already written to the spool file, hashed and its
+        # artifact header extracted while the request body was parsed
+        upload: PackageIngest = request.files["file"].stream
+        upload.flush()
+
+        # Verification of the artifact type
+        # In case the artifact is not a standard RDFM artifact
+        # we're checking permissions for non-standard packages
+        authorized, req_scopes = is_authorized_to_upload(
+            upload.artifact_types(), scopes, conf
+        )
+        if not authorized:
+            return api_error(
+                "user does not have permission to upload this " +
+                "package type. One of the scopes is required: " +
+                ", ".join([str(i) for i in req_scopes]),
+                403
+            )
+        success = driver.upsert(meta, upload.name, storage_directory, move=True)
+        if not success:
+            return api_error("could not store artifact", 500)
 
         package = models.package.Package()
         package.created = datetime.datetime.utcnow()
         package.info = meta
         package.driver = driver_name
-        package.sha256 = sha256
+        package.sha256 = upload.sha256()
         success = server.instance._packages_db.create(package)
         if not success:
             return api_error("could not create package", 500)
@@ -224,21 +233,10 @@ def upload_package(scopes: list[str] = []):
         return {}, 500
 
 
-def is_authorized_to_upload(file, scopes: list[str],
+def is_authorized_to_upload(artifact_types: list[str], scopes: list[str],
                             conf: configuration.ServerConfig) -> bool:
     if conf.disable_api_auth:
         return (True, [])
-    artifact_types = []
-    try:
-        package_tar = tarfile.open(file.name)
-        header_io = package_tar.extractfile('header.tar')
-        header_tar = tarfile.open(fileobj=header_io)
-        header_info_io = header_tar.extractfile('header-info')
-        header_info_json = json.load(header_info_io)
-        for payload in header_info_json['payloads']:
-            artifact_types.append(payload['type'])
-    except (tarfile.ReadError, KeyError):
-        artifact_types.append('nonstandard')
     # Checking if the user any of the required scopes
     # for every payload
     required_scopes = list(map(get_scopes_for_upload_package, artifact_types))
@@ -6,6 +6,7 @@ import device_mgmt.loop
 import device_mgmt.shell
 from auth.device import DeviceToken
 from api.v1.middleware import (
+    admit_device_connection,
     upgrade_to_websocket,
     device_api,
     check_device_permission,
@@ -20,6 +21,7 @@ device_ws_blueprint: Blueprint = Blueprint("rdfm-server-device-ws", __name__)
 
 
 @device_ws_blueprint.route("/api/v1/devices/ws", websocket=True)
+@admit_device_connection
 @device_api
 @upgrade_to_websocket
 def device_management_ws(
@@ -29,6 +31,10 @@ def device_management_ws(
 
     This is the device management WebSocket endpoint. All devices are expected
     to establish a connection to this WebSocket.
+
+    New connections are admitted at a limited rate. Connections exceeding
+    the rate are closed with the `4004` status code, and a message telling
+    the device after how many seconds to reconnect (`retry after <seconds>`).
     """
     try:
         device_mgmt.loop.start_device_event_loop(ws, device_token)
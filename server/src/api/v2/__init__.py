@@ -1,11 +1,15 @@
 from flask import Blueprint
 
+import api.v2.actions
 import api.v2.devices
 import api.v2.groups
+import api.v2.statistics
 
 
 def create_routes() -> Blueprint:
     api_routes: Blueprint = Blueprint("rdfm-server-api-v2", __name__)
     api_routes.register_blueprint(api.v2.devices.devices_blueprint)
     api_routes.register_blueprint(api.v2.groups.groups_blueprint)
+    api_routes.register_blueprint(api.v2.statistics.statistics_blueprint)
+    api_routes.register_blueprint(api.v2.actions.actions_blueprint)
     return api_routes
@@ -0,0 +1,279 @@
+import traceback
+from typing import Optional
+from flask import Blueprint, request, url_for
+import server
+import models.action_log
+from api.v1.common import api_error
+from api.v1.middleware import (
+    management_read_only_api,
+    management_read_write_api,
+    deserialize_schema,
+    deserialize_schema_from_params,
+)
+from rdfm.schema.v2.devices import (
+    ActionBroadcast,
+    ActionBroadcastRequest,
+    ActionBroadcastResult,
+    ActionBroadcastResultParameters,
+)
+
+
+actions_blueprint: Blueprint = Blueprint("rdfm-server-actions", __name__)
+
+
+def broadcast_model_to_schema(
+    broadcast: models.action_log.ActionBroadcast,
+) -> ActionBroadcast:
+    """Convert a database model to the schema model
+
+    The progress of the broadcast is aggregated from the action log.
+    """
+    statuses = server.instance._action_logs_db.count_broadcast_statuses(broadcast.id)
+    return ActionBroadcast(
+        id=broadcast.id,
+        action=broadcast.action_id,
+        created=broadcast.created,
+        group=broadcast.group,
+        tag=broadcast.tag,
+        devices=sum(statuses.values()),
+        statuses=statuses,
+    )
+
+
+@actions_blueprint.route("/api/v2/actions/broadcast", methods=["POST"])
+@management_read_write_api
+@deserialize_schema(schema_dataclass=ActionBroadcastRequest, key="broadcast")
+def start_broadcast(broadcast: ActionBroadcastRequest):
+    """Execute an action on all devices of a group, or with a given tag
+
+    The request returns immediately, the action is executed in the background
+    on a bounded amount of connected devices at once. Devices that are not
+    connected receive the action once they reconnect, ordered by priority
+    among their other pending actions. The progress can be
+    monitored using the broadcast status and results routes, or by listening
+    to the `action_broadcast` server-side events.
+
+    :status 202: broadcast was started
+    :status 400: invalid request schema
+    :status 401: user did not provide authorization data,
+                 or the authorization has expired
+    :status 403: user was authorized, but did not have permission
+                 to execute actions
+    :status 404: the specified group does not exist
+
+    :<json string action_id: identifier of the action to execute
+    :<json integer group: (optional) identifier of the targeted group
+    :<json string tag: (optional) tag of the targeted devices
+    :<json integer priority: (optional) priority of the executions, default: 0
+
+    :>json string id: broadcast identifier
+    :>json string action: action identifier
+    :>json string created: UTC creation date (RFC822)
+    :>json integer group: targeted group, or null
+    :>json string tag: targeted tag, or null
+    :>json integer devices: amount of targeted devices
+    :>json dict[str, int] statuses: amount of devices per execution status
+                                    (pending, sent, error or action exit code)
+
+
+    **Example Request**
+
+    .. sourcecode:: http
+
+        POST /api/v2/actions/broadcast HTTP/1.1
+        Accept: application/json, text/javascript
+        Content-Type: application/json
+
+        {
+            "action_id": "echo",
+            "group": 1
+        }
+
+
+    **Example Response**
+
+    .. sourcecode:: http
+
+        HTTP/1.1 202 ACCEPTED
+        Content-Type: application/json
+        Location: /api/v2/actions/broadcast/6d6e9f33-23b0-4e06-9b0c-1f2c8e2bd7ad
+
+        {
+            "action": "echo",
+            "created": "Mon, 19 Oct 2026 16:45:10 GMT",
+            "devices": 2,
+            "group": 1,
+            "id": "6d6e9f33-23b0-4e06-9b0c-1f2c8e2bd7ad",
+            "statuses": {
+                "pending": 2
+            },
+            "tag": null
+        }
+    """
+    try:
+        if broadcast.group is not None and \
+                server.instance._groups_db.fetch_one(broadcast.group) is None:
+            return api_error("group does not exist", 404)
+
+        started = server.instance.action_broadcasts.start(
+            broadcast.action_id, broadcast.group, broadcast.tag, broadcast.priority
+        )
+        headers = {
+            "Location": url_for(".fetch_broadcast", identifier=started.id)
+        }
+        return ActionBroadcast.Schema().dump(
+            broadcast_model_to_schema(started)
+        ), 202, headers
+    except Exception as e:
+        traceback.print_exc()
+        print("Exception during action broadcast:", repr(e))
+        return api_error("action broadcast failed", 500)
+
+
+@actions_blueprint.route("/api/v2/actions/broadcast/<string:identifier>")
+@management_read_only_api
+def fetch_broadcast(identifier: str):
+    """Fetch the progress of an action broadcast
+
+    :param identifier: broadcast identifier
+    :status 200: no error
+    :status 401: user did not provide authorization data,
+                 or the authorization has expired
+    :status 404: broadcast does not exist
+
+    :>json string id: broadcast identifier
+    :>json string action: action identifier
+    :>json string created: UTC creation date (RFC822)
+    :>json integer group: targeted group, or null
+    :>json string tag: targeted tag, or null
+    :>json integer devices: amount of targeted devices
+    :>json dict[str, int] statuses: amount of devices per execution status
+                                    (pending, sent, error or action exit code)
+
+
+    **Example Request**
+
+    .. sourcecode:: http
+
+        GET /api/v2/actions/broadcast/6d6e9f33-23b0-4e06-9b0c-1f2c8e2bd7ad HTTP/1.1
+        Accept: application/json, text/javascript
+
+
+    **Example Response**
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+        Content-Type: application/json
+
+        {
+            "action": "echo",
+            "created": "Mon, 19 Oct 2026 16:45:10 GMT",
+            "devices": 2,
+            "group": 1,
+            "id": "6d6e9f33-23b0-4e06-9b0c-1f2c8e2bd7ad",
+            "statuses": {
+                "0": 1,
+                "pending": 1
+            },
+            "tag": null
+        }
+    """
+    try:
+        broadcast: Optional[
+            models.action_log.ActionBroadcast
+        ] = server.instance._action_logs_db.fetch_broadcast(identifier)
+        if broadcast is None:
+            return api_error("broadcast does not exist", 404)
+        return ActionBroadcast.Schema().dump(
+            broadcast_model_to_schema(broadcast)
+        ), 200
+    except Exception as e:
+        traceback.print_exc()
+        print("Exception during broadcast fetch:", repr(e))
+        return api_error("broadcast fetching failed", 500)
+
+
+@actions_blueprint.route("/api/v2/actions/broadcast/<string:identifier>/results")
+@management_read_only_api
+@deserialize_schema_from_params(schema_dataclass=ActionBroadcastResultParameters,
+                                key="params")
+def fetch_broadcast_results(identifier: str, params: ActionBroadcastResultParameters):
+    """Fetch the action executions of the devices targeted by a broadcast
+
+    When no `limit` is given, all executions are returned at once. Otherwise,
+    at most `limit` executions are returned. If more executions are available,
+    the response contains a `Link` header with the URL of the next page
+    (`rel="next"`).
+
+    :param identifier: broadcast identifier
+    :query integer limit: maximum amount of executions in a page (1-1000)
+    :query string cursor: identifier of the last execution of the previous
+                          page, as returned in the `Link` header
+    :status 200: no error
+    :status 400: invalid query parameters
+    :status 401: user did not provide authorization data,
+                 or the authorization has expired
+    :status 404: broadcast does not exist
+
+    :>jsonarr string id: execution identifier
+    :>jsonarr string mac_address: MAC address of the device
+    :>jsonarr string status: pending, sent, error or action exit code
+    :>jsonarr string download_url: URL of the action output, or null
+
+
+    **Example Request**
+
+    .. sourcecode:: http
+
+        GET /api/v2/actions/broadcast/6d6e9f33-23b0-4e06-9b0c-1f2c8e2bd7ad/results?limit=1 HTTP/1.1
+        Accept: application/json, text/javascript
+
+
+    **Example Response**
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+        Content-Type: application/json
+        Link: </api/v2/actions/broadcast/6d6e9f33-23b0-4e06-9b0c-1f2c8e2bd7ad/results?limit=1&cursor=0c4d6a3e-3d84-4f5b-8d3c-5d1f0f7c0b9e>; rel="next"
+
+        [
+            {
+                "download_url": null,
+                "id": "0c4d6a3e-3d84-4f5b-8d3c-5d1f0f7c0b9e",
+                "mac_address": "00:00:00:00:00:00",
+                "status": "0"
+            }
+        ]
+    """  # noqa: E501
+    try:
+        if server.instance._action_logs_db.fetch_broadcast(identifier) is None:
+            return api_error("broadcast does not exist", 404)
+
+        # Fetch one additional execution to find out whether a next page exists
+        executions = server.instance._action_logs_db.fetch_broadcast_log(
+            identifier,
+            after=params.cursor,
+            limit=params.limit + 1 if params.limit is not None else None,
+        )
+        headers = {}
+        if params.limit is not None and len(executions) > params.limit:
+            executions = executions[:params.limit]
+            args = request.args.to_dict()
+            args["cursor"] = executions[-1].id
+            next_url = url_for(request.endpoint, identifier=identifier, **args)
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return ActionBroadcastResult.Schema().dump([
+            ActionBroadcastResult(
+                id=execution.id,
+                mac_address=execution.mac_address,
+                status=str(execution.status),
+                download_url=execution.download_url,
+            )
+            for execution in executions
+        ], many=True), 200, headers
+    except Exception as e:
+        traceback.print_exc()
+        print("Exception during broadcast results fetch:", repr(e))
+        return api_error("broadcast results fetching failed", 500)
@@ -1,16 +1,27 @@
 import device_mgmt.fs
-from flask import Blueprint, current_app, send_from_directory, abort, request, make_response
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    send_from_directory,
+    abort,
+    request,
+    make_response,
+    redirect,
+    url_for,
+)
 from typing import Optional, List
 import server
 import traceback
 import models.device
 import models.action_log
-import json
 from api.v1.common import api_error
 from api.v1.middleware import (
     check_permission,
     check_device_permission,
     deserialize_schema,
+    deserialize_schema_from_params,
+    permission_filter,
     public_api
 )
 from rdfm.permissions import (
@@ -20,7 +31,13 @@ from rdfm.permissions import (
     DEVICE_RESOURCE,
     DELETE_PERMISSION
 )
-from rdfm.schema.v2.devices import Device, ActionLog, ActionRemoveRequest
+from rdfm.schema.v2.devices import (
+    Device,
+    DeviceListParameters,
+    ActionLog,
+    ActionRemoveRequest,
+    ActionSubmitParameters,
+)
 from rdfm.schema.v2.fs import FsFile
 from rdfm.ws import WebSocketException
 import device_mgmt.action
@@ -31,21 +48,62 @@ from pathlib import Path
 devices_blueprint: Blueprint = Blueprint("rdfm-server-devices", __name__)
 
 
-def model_to_schema(device: models.device.Device) -> Device:
-    """Convert a database model to the schema model"""
+def model_to_schema(
+    device: models.device.Device,
+    groups: Optional[List[int]] = None,
+    connected: Optional[bool] = None,
+) -> Device:
+    """Convert a database model to the schema model
+
+    When serializing many devices, pass the assigned group identifiers
+    from a batched `fetch_groups_by_device` lookup in `groups`, and the
+    connection state from a batched `RemoteDevices.connected` lookup in
+    `connected`. Otherwise, both are looked up separately for every device.
+    """
+    if groups is None:
+        groups = server.instance._devices_db.fetch_groups(device.id)
+    if connected is None:
+        connected = server.instance.remote_devices.is_connected(device.mac_address)
     return Device(
         id=device.id,
         last_access=device.last_access,
         name=device.name,
         mac_address=device.mac_address,
-        capabilities=json.loads(device.capabilities),
-        metadata=json.loads(device.device_metadata),
+        capabilities=device.capabilities,
+        metadata=device.device_metadata,
         public_key=device.public_key,
-        groups=server.instance._devices_db.fetch_groups(device.id),
-        connected=True if server.instance.remote_devices.get(device.mac_address) else False
+        groups=groups,
+        connected=connected
     )
 
 
+def models_to_schema(
+    devices: List[models.device.Device],
+    groups: Optional[dict[int, List[int]]] = None,
+) -> List[Device]:
+    """Convert a list of database models to schema models
+
+    Group assignments of all devices are fetched in a single query, unless
+    they were already provided in `groups` (keyed by device identifier).
+    Connection states of all devices are looked up at once as well.
+    """
+    if len(devices) == 0:
+        return []
+    if groups is None:
+        groups = server.instance._devices_db.fetch_groups_by_device(
+            [device.id for device in devices]
+        )
+    connected = server.instance.remote_devices.connected(
+        device.mac_address for device in devices
+    )
+    return [
+        model_to_schema(device,
+                        groups.get(device.id, []),
+                        device.mac_address in connected)
+        for device in devices
+    ]
+
+
 def action_model_to_schema(task: models.action_log.ActionLog) -> Device:
     """Convert a database model to the schema model"""
     return ActionLog(
@@ -59,10 +117,35 @@ def action_model_to_schema(task: models.action_log.ActionLog) -> Device:
 
 @devices_blueprint.route('/api/v2/devices')
 @check_permission(DEVICE_RESOURCE, READ_PERMISSION)
-def fetch_all():
+@deserialize_schema_from_params(schema_dataclass=DeviceListParameters,
+                                key="params")
+def fetch_all(params: DeviceListParameters):
     """Fetch a list of devices registered on the server
 
+    All filters are optional and can be combined. When no `limit` is given,
+    all devices matching the filters are returned at once. Otherwise,
+    at most `limit` devices are returned, ordered by the device identifier.
+    If more devices are available, the response contains a `Link` header
+    with the URL of the next page (`rel="next"`).
+
+    :query integer limit: maximum amount of devices in a page (1-1000)
+    :query integer cursor: identifier of the last device of the previous
+                           page, as returned in the `Link` header
+    :query string devtype: device type reported in the device metadata
+    :query string software_version: software version reported in the
+                                    device metadata
+    :query string metadata_key: arbitrary device metadata key, must be
+                                passed together with `metadata_value`
+    :query string metadata_value: value of the `metadata_key` metadata key
+    :query integer group: identifier of a group the device is assigned to
+    :query string tag: tag assigned to the device
+    :query boolean connected: device connection status
+    :query string last_access_since: earliest last access time (RFC822)
+    :query string last_access_to: latest last access time (RFC822)
+    :query string name_prefix: prefix of the device name
+    :query string mac_prefix: prefix of the device MAC address
     :status 200: no error
+    :status 400: GET parameters malformed
     :status 401: user did not provide authorization data,
                  or the authorization has expired
 
@@ -80,7 +163,7 @@ def fetch_all():
 
     .. sourcecode:: http
 
-        GET /api/v1/devices HTTP/1.1
+        GET /api/v2/devices?limit=1&tag=linux-client HTTP/1.1
         Accept: application/json, text/javascript
 
 
@@ -90,6 +173,7 @@ def fetch_all():
 
         HTTP/1.1 200 OK
         Content-Type: application/json
+        Link: </api/v2/devices?limit=1&tag=linux-client&cursor=1>; rel="next"
 
         [
           {
@@ -108,12 +192,50 @@ def fetch_all():
         ]
     """  # noqa: E501
     try:
-        devices: List[
-            models.device.Device
-        ] = server.instance._devices_db.fetch_all()
+        filters = {
+            "devtype": params.devtype,
+            "software_version": params.software_version,
+            "metadata": {params.metadata_key: params.metadata_value}
+            if params.metadata_key is not None else None,
+            "group": params.group,
+            "tag": params.tag,
+            "connected": params.connected,
+            "last_access_since": params.last_access_since,
+            "last_access_to": params.last_access_to,
+            "name_prefix": params.name_prefix,
+            "mac_prefix": params.mac_prefix,
+        }
+        if all(value is None for value in filters.values()) and \
+                params.limit is None and params.cursor is None:
+            devices: List[
+                models.device.Device
+            ] = server.instance._devices_db.fetch_all()
+            # All devices are listed, so skip filtering the assignments by ID
+            groups = server.instance._devices_db.fetch_groups_by_device()
+            return Device.Schema().dump(
+                models_to_schema(devices, groups), many=True
+            ), 200
+
+        # Fetch one additional device to find out whether a next page exists.
+        # Devices the user may not access are skipped before paginating,
+        # so that pages are not cut short.
+        devices = server.instance._devices_db.fetch_filtered(
+            **filters,
+            connected_devices=server.instance.remote_devices.connected,
+            permitted=permission_filter(),
+            after=params.cursor,
+            limit=params.limit + 1 if params.limit is not None else None,
+        )
+        headers = {}
+        if params.limit is not None and len(devices) > params.limit:
+            devices = devices[:params.limit]
+            args = request.args.to_dict()
+            args["cursor"] = devices[-1].id
+            next_url = url_for(request.endpoint, **args)
+            headers["Link"] = f'<{next_url}>; rel="next"'
         return Device.Schema().dump(
-            [model_to_schema(device) for device in devices], many=True
-        ), 200
+            models_to_schema(devices), many=True
+        ), 200, headers
     except Exception as e:
         traceback.print_exc()
         print("Exception during device fetch:", repr(e))
@@ -192,6 +314,9 @@ def list_actions(
 ):
     """ Fetch the list of actions executable on the device.
 
+    If the device is not connected, the actions it has reported last
+    are returned.
+
     :status 200: no error
 
     :>json string action_id: action identifier
@@ -250,7 +375,7 @@ def list_actions(
 
     """
 
-    return [x.model_dump() for x in device_mgmt.action.ensure_actions(mac_address)], 200
+    return device_mgmt.action.list_actions(mac_address), 200
 
 
 @devices_blueprint.route(
@@ -301,6 +426,119 @@ def exec_action(
             raise
 
 
+@devices_blueprint.route(
+    "/api/v2/devices/<string:mac_address>/action/exec/<string:action_id>",
+    methods=["POST"]
+)
+@check_device_permission(UPDATE_PERMISSION)
+@deserialize_schema_from_params(schema_dataclass=ActionSubmitParameters, key="params")
+def submit_action(
+    mac_address: str,
+    action_id: str,
+    params: ActionSubmitParameters
+):
+    """ Submit action execution on the device, without waiting for the result.
+
+    The execution is started in the background, or queued until the device
+    connects. Executions are sent to the device one at a time, those with
+    a higher priority first. The state of the execution can be polled using
+    the execution identifier, or monitored by listening to the `action`
+    server-side events, which are published when the execution finishes.
+
+    :query integer priority: (optional) priority of the execution, default: 0
+    :status 202: action execution was submitted
+    :status 400: invalid query parameters
+    :status 404: action doesn't exist
+
+    :>json string execution_id: identifier of the execution in the action log
+
+    **Example Request**
+
+    .. sourcecode:: http
+
+        POST /api/v2/devices/d8:5e:d3:86:02:f2/action/exec/echo HTTP/1.1
+        Accept: application/json, text/javascript
+
+
+    **Example Response**
+
+    .. sourcecode:: http
+
+        HTTP/1.1 202 ACCEPTED
+        Content-Type: application/json
+        Location: /api/v2/devices/d8:5e:d3:86:02:f2/action/log/c5f9d50a-1949-4937-b80d-3c07c3474750
+
+        {
+          "execution_id": "c5f9d50a-1949-4937-b80d-3c07c3474750"
+        }
+    """  # noqa: E501
+    try:
+        execution_id = device_mgmt.action.submit_action(
+            mac_address, action_id, params.priority
+        )
+    except WebSocketException as e:
+        if "doesn't exist" in e.message:
+            return api_error(e.message, 404)
+        raise
+    headers = {
+        "Location": url_for(".get_action_execution", mac_address=mac_address,
+                            execution_id=execution_id)
+    }
+    return {"execution_id": execution_id}, 202, headers
+
+
+@devices_blueprint.route(
+    "/api/v2/devices/<string:mac_address>/action/log/<string:execution_id>"
+)
+@check_device_permission(READ_PERMISSION)
+def get_action_execution(mac_address: str, execution_id: str):
+    """ Fetch a single action execution of the device.
+
+    :status 200: no error
+    :status 404: execution doesn't exist
+
+    :>json string id: execution identifier
+    :>json string action: action name
+    :>json string created: date in ISO format
+    :>json string status: pending, sent, error or action exit code
+    :>json string download_url: URL of the action output, or null
+
+    **Example Request**
+
+    .. sourcecode:: http
+
+        GET /api/v2/devices/d8:5e:d3:86:02:f2/action/log/c5f9d50a-1949-4937-b80d-3c07c3474750 HTTP/1.1
+        Accept: application/json, text/javascript
+
+
+    **Example Response**
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+        Content-Type: application/json
+
+        {
+            "id": "c5f9d50a-1949-4937-b80d-3c07c3474750",
+            "action": "echo",
+            "created": "2025-09-26T12:25:44.638747",
+            "status": "0",
+            "download_url": "https://s3.example.com/rdfm.actions/a2f1c1e4"
+        }
+    """  # noqa: E501
+    try:
+        action: Optional[
+            models.action_log.ActionLog
+        ] = server.instance._action_logs_db.fetch_one(execution_id)
+        if action is None or action.mac_address != mac_address:
+            return api_error("execution doesn't exist", 404)
+        return ActionLog.Schema().dump(action_model_to_schema(action)), 200
+    except Exception as e:
+        traceback.print_exc()
+        print("Exception during action execution fetch:", repr(e))
+        return api_error("action execution fetching failed", 500)
+
+
 @devices_blueprint.route(
     "/api/v2/devices/<string:mac_address>/action/log"
 )
@@ -503,6 +741,7 @@ def remove(identifier: int):
             return api_error("device does not exist", 404)
 
         server.instance._devices_db.delete(identifier)
+        server.instance._action_catalogs_db.delete(dev.mac_address)
         return {}, 200
     except Exception as e:
         traceback.print_exc()
@@ -557,6 +796,77 @@ def download_file(identifier: int, fs_file: FsFile):
         return api_error("download failed", 500)
 
 
+@devices_blueprint.route("/api/v2/devices/<int:identifier>/fs/file/content", methods=['POST'])
+@check_permission(DEVICE_RESOURCE, READ_PERMISSION)
+@deserialize_schema(schema_dataclass=FsFile, key="fs_file")
+def download_file_content(identifier: int, fs_file: FsFile):
+    """ Download the contents of a file from the device
+
+    Small files are streamed from the device directly in the response,
+    without uploading them to the storage first. Devices must report the
+    `filesystem_stream` capability for this, and the file must not be larger
+    than the configured threshold (``RDFM_FS_STREAM_THRESHOLD``). Otherwise,
+    the file is uploaded to the storage, and the response redirects to
+    the download link.
+
+    :status 200: no error, the response contains the contents of the file
+    :status 303: the file can be downloaded from the URL in the `Location` header
+    :status 404: device or file does not exist
+    :status 500: failure during download
+
+    :>json string file: name of file to download
+
+    **Example Request**
+
+    .. sourcecode:: http
+
+        POST /api/v2/devices/1/fs/file/content HTTP/1.1
+        Accept: application/octet-stream
+
+        {
+          "file": "/etc/hostname"
+        }
+
+
+    **Example Response**
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+        Content-Type: application/octet-stream
+        Content-Length: 7
+        Content-Disposition: attachment; filename=hostname
+
+        device
+    """
+    try:
+        dev: Optional[models.device.Device] = server.instance._devices_db.fetch_one(identifier)
+        if dev is None:
+            return api_error("device does not exist", 404)
+
+        status, size, content = device_mgmt.fs.read_file(dev.mac_address, fs_file.file)
+        if status != 0:
+            return api_error("file does not exist", 404)
+        if content is not None:
+            return Response(content, mimetype="application/octet-stream", headers={
+                "Content-Length": str(size),
+                "Content-Disposition": f"attachment; filename={Path(fs_file.file).name}",
+            })
+
+        status, download_url = device_mgmt.fs.prepare_download(dev.mac_address,
+                                                               fs_file.file, size)
+        if status != 0 and size is None:
+            # The file was probed by `prepare_download`
+            return api_error("file does not exist", 404)
+        if status != 0:
+            return api_error("download failed", 500)
+        return redirect(download_url, 303)
+    except Exception as e:
+        traceback.print_exc()
+        print("Exception during downloading:", repr(e))
+        return api_error("download failed", 500)
+
+
 @devices_blueprint.route("/local_storage_multipart/multipart/<path:key>", methods=["GET"])
 @public_api
 def fetch_local_file(key: str):
@@ -724,9 +1034,7 @@ def fetch_by_tag(tag: str):
         devices: List[
             models.device.Device
         ] = server.instance._devices_db.fetch_by_tag(tag)
-        return Device.Schema().dump(
-            [model_to_schema(device) for device in devices], many=True
-        ), 200
+        return Device.Schema().dump(models_to_schema(devices), many=True), 200
     except Exception as e:
         traceback.print_exc()
         print("Exception during device fetch:", repr(e))
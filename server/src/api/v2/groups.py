@@ -20,6 +20,7 @@ import models.device
 from rdfm.schema.v2.groups import (
     Group,
     AssignDeviceRequest,
+    MoveDeviceRequest,
     AssignPackageRequest,
     AssignPolicyRequest,
     AssignPriorityRequest,
@@ -32,26 +33,50 @@ groups_blueprint: Blueprint = Blueprint("rdfm-server-groups", __name__)
 GROUP_DEFAULT_PRIORITY = 25
 
 
-def model_to_schema(group: models.group.Group) -> Group:
+def model_to_schema(
+    group: models.group.Group,
+    packages: Optional[List[int]] = None,
+    devices: Optional[List[int]] = None,
+) -> Group:
     """Convert a database group model to a schema model.
 
     As we have to fetch the device list, this can't be done using just a simple
-    mapping between the fields.
+    mapping between the fields. When serializing many groups, pass the
+    assignments from a batched lookup in `packages` and `devices`.
     """
+    if packages is None:
+        packages = server.instance._groups_db.fetch_assigned_packages(group.id)
+    if devices is None:
+        devices = server.instance._groups_db.fetch_assigned_ids(group.id)
     return Group(
         id=group.id,
         created=group.created,
-        packages=server.instance._groups_db.fetch_assigned_packages(group.id),
-        devices=[
-            device.id
-            for device in server.instance._groups_db.fetch_assigned(group.id)
-        ],
+        packages=packages,
+        devices=devices,
         metadata=group.info,
         policy=group.policy,
         priority=group.priority,
     )
 
 
+def models_to_schema(groups: List[models.group.Group]) -> List[Group]:
+    """Convert a list of database group models to schema models.
+
+    Package and device assignments of all groups are fetched using
+    a constant amount of queries, regardless of the amount of groups.
+    """
+    if len(groups) == 0:
+        return []
+    packages = server.instance._groups_db.fetch_assigned_packages_by_group()
+    devices = server.instance._groups_db.fetch_assigned_ids_by_group()
+    return [
+        model_to_schema(
+            group, packages.get(group.id, []), devices.get(group.id, [])
+        )
+        for group in groups
+    ]
+
+
 @groups_blueprint.route("/api/v2/groups")
 @check_permission(GROUP_RESOURCE, READ_PERMISSION)
 def fetch_all():
@@ -102,7 +127,7 @@ def fetch_all():
             models.group.Group
         ] = server.instance._groups_db.fetch_all()
         return Group.Schema().dump(
-            [model_to_schema(group) for group in groups], many=True), 200
+            models_to_schema(groups), many=True), 200
     except Exception as e:
         traceback.print_exc()
         print("Exception during group fetch:", repr(e))
@@ -298,6 +323,87 @@ def change_assigned(identifier: int, instructions: AssignDeviceRequest):
         return api_error("group assignment modification failed", 500)
 
 
+@groups_blueprint.route(
+    "/api/v2/groups/<int:identifier>/devices/move/<int:destination>",
+    methods=["POST"]
+)
+@check_permission(GROUP_RESOURCE, UPDATE_PERMISSION)
+@check_permission(GROUP_RESOURCE, UPDATE_PERMISSION,
+                  identifier_key="destination")
+@deserialize_schema(schema_dataclass=MoveDeviceRequest, key="instructions")
+def move_assigned(identifier: int, destination: int,
+                  instructions: MoveDeviceRequest):
+    """Move devices from a group to another group
+
+    This endpoint allows bulk reassignment of devices between groups.
+    The specified devices are removed from the group given by `identifier`
+    and assigned to the `destination` group in a single transaction.
+    If no device list is provided, all devices assigned to the group
+    are moved.
+
+    This operation is atomic - if any of the devices cannot be moved,
+    the entire operation is aborted. This covers:
+
+        - Any device identifier which is not currently assigned
+          to the group specified by `identifier`
+        - Any device which already has an assigned group (other than the
+          group specified by `identifier`) which has the same priority as
+          the `destination` group
+          (even if the group is the same as specified by `destination`)
+
+    :param identifier: identifier of the group to move the devices from
+    :param destination: identifier of the group to move the devices to
+    :status 200: no error
+    :status 401: user did not provide authorization data,
+                 or the authorization has expired
+    :status 403: user was authorized, but did not have permission
+                 to modify both groups
+    :status 404: one of the groups does not exist
+    :status 409: one of the conflict situations described above has occurred
+
+    :<json optional[array[integer]] devices: identifiers of devices that
+                                             should be moved
+
+
+    **Example request**
+
+    .. sourcecode:: http
+
+        POST /api/v2/groups/1/devices/move/2 HTTP/1.1
+        Accept: application/json, text/javascript
+
+        {
+            "devices": [
+                1,
+                2,
+                5,
+            ]
+        }
+
+
+    **Example Response**
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+    """
+    try:
+        for group_id in [identifier, destination]:
+            if server.instance._groups_db.fetch_one(group_id) is None:
+                return api_error("group does not exist", 404)
+
+        err = server.instance._groups_db.move_assignment(
+            identifier, destination, instructions.devices
+        )
+        if err is not None:
+            return api_error(err, 409)
+        return {}, 200
+    except Exception as e:
+        traceback.print_exc()
+        print("Exception during group assignment modification:", repr(e))
+        return api_error("group assignment modification failed", 500)
+
+
 @groups_blueprint.route("/api/v2/groups", methods=["POST"])
 @management_create_group_api
 @add_permissions_for_new_resource(GROUP_RESOURCE)
@@ -0,0 +1,223 @@
+import traceback
+from flask import Blueprint
+import server
+from api.v1.common import api_error
+from api.v1.middleware import management_read_only_api
+from rdfm.schema.v2.statistics import (
+    FleetSummary,
+    OperationCounts,
+    OperationStatistics,
+    OutboundLaneStatistics,
+    OutboundStatistics,
+)
+
+
+statistics_blueprint: Blueprint = Blueprint("rdfm-server-statistics", __name__)
+
+
+@statistics_blueprint.route("/api/v2/statistics/summary")
+@management_read_only_api
+def fetch_summary():
+    """Fetch the summary of the device fleet
+
+    The summary is served from counters maintained by the server, and does
+    not require querying the database. The counters are periodically
+    recomputed from the database to correct any drift.
+
+    :status 200: no error
+    :status 401: user did not provide authorization data,
+                 or the authorization has expired
+
+    :>json integer devices: amount of registered devices
+    :>json integer connected: amount of devices connected to the server
+    :>json integer offline: amount of devices not connected to the server
+    :>json integer pending_registrations: amount of registration requests
+                                          awaiting approval
+    :>json integer updates_pending: amount of devices that were offered an
+                                    update, but did not report any progress
+    :>json integer updates_in_progress: amount of devices currently
+                                        installing an update
+    :>json dict[str, int] versions: amount of devices per software version
+    :>json dict[str, int] devtypes: amount of devices per device type
+    :>json dict[int, int] groups: amount of devices assigned to each group
+
+
+    **Example Request**
+
+    .. sourcecode:: http
+
+        GET /api/v2/statistics/summary HTTP/1.1
+        Accept: application/json, text/javascript
+
+
+    **Example Response**
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+        Content-Type: application/json
+
+        {
+          "connected": 1,
+          "devices": 3,
+          "devtypes": {
+            "x86_64": 3
+          },
+          "groups": {
+            "1": 2
+          },
+          "offline": 2,
+          "pending_registrations": 1,
+          "updates_in_progress": 1,
+          "updates_pending": 0,
+          "versions": {
+            "v1": 2,
+            "v2": 1
+          }
+        }
+    """
+    try:
+        summary = server.instance.statistics.summary()
+        return FleetSummary.Schema().dump(FleetSummary(**summary)), 200
+    except Exception as e:
+        traceback.print_exc()
+        print("Exception during statistics fetch:", repr(e))
+        return api_error("statistics fetching failed", 500)
+
+
+@statistics_blueprint.route("/api/v2/statistics/outbound")
+@management_read_only_api
+def fetch_outbound():
+    """Fetch the metrics of the device send queues
+
+    Messages sent to devices are queued in per-device send queues, with
+    separate lanes for control messages (actions, shell sessions) and bulk
+    messages (file transfers, action list queries). The metrics are
+    collected since the start of the server process handling the request,
+    for the devices connected to it.
+
+    :status 200: no error
+    :status 401: user did not provide authorization data,
+                 or the authorization has expired
+
+    :>json dict control: metrics of the control lane
+    :>json dict bulk: metrics of the bulk lane
+
+    Each lane contains the following metrics:
+
+    :>json integer queued: amount of messages currently queued
+    :>json integer sent: amount of sent messages
+    :>json integer dropped: amount of messages rejected because the queue
+                            was full, or dropped because they were not
+                            sent in time or the device disconnected
+    :>json float latency_avg: average time in seconds between queueing and
+                              sending a message
+    :>json float latency_max: maximum time in seconds between queueing and
+                              sending a message
+
+
+    **Example Request**
+
+    .. sourcecode:: http
+
+        GET /api/v2/statistics/outbound HTTP/1.1
+        Accept: application/json, text/javascript
+
+
+    **Example Response**
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+        Content-Type: application/json
+
+        {
+          "bulk": {
+            "dropped": 0,
+            "latency_avg": 0.0021,
+            "latency_max": 0.0154,
+            "queued": 0,
+            "sent": 12
+          },
+          "control": {
+            "dropped": 1,
+            "latency_avg": 0.0004,
+            "latency_max": 0.0032,
+            "queued": 2,
+            "sent": 48
+          }
+        }
+    """
+    try:
+        lanes = server.instance.outbound.metrics.snapshot()
+        return OutboundStatistics.Schema().dump(OutboundStatistics(**{
+            lane: OutboundLaneStatistics(**metrics)
+            for lane, metrics in lanes.items()
+        })), 200
+    except Exception as e:
+        traceback.print_exc()
+        print("Exception during outbound statistics fetch:", repr(e))
+        return api_error("statistics fetching failed", 500)
+
+
+@statistics_blueprint.route("/api/v2/statistics/operations")
+@management_read_only_api
+def fetch_operations():
+    """Fetch the amount of device operations awaiting a reply
+
+    Action executions and filesystem operations wait for the reply of the
+    device up to their timeout, after which they are failed. The counts
+    apply to the server process handling the request, and to the devices
+    connected to it. Expired operations are counted since the start of
+    the process.
+
+    :status 200: no error
+    :status 401: user did not provide authorization data,
+                 or the authorization has expired
+
+    :>json dict actions: counts of action executions
+    :>json dict filesystem: counts of filesystem operations
+
+    Each of them contains the following counts:
+
+    :>json integer in_flight: amount of operations awaiting a reply
+    :>json integer expired: amount of operations that have timed out
+
+
+    **Example Request**
+
+    .. sourcecode:: http
+
+        GET /api/v2/statistics/operations HTTP/1.1
+        Accept: application/json, text/javascript
+
+
+    **Example Response**
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+        Content-Type: application/json
+
+        {
+          "actions": {
+            "expired": 2,
+            "in_flight": 14
+          },
+          "filesystem": {
+            "expired": 0,
+            "in_flight": 1
+          }
+        }
+    """
+    try:
+        return OperationStatistics.Schema().dump(OperationStatistics(
+            actions=OperationCounts(**server.instance.action_executions.counts()),
+            filesystem=OperationCounts(
+                **server.instance.filesystem_operations.counts()
+            ),
+        )), 200
+    except Exception as e:
+        traceback.print_exc()
+        print("Exception during operation statistics fetch:", repr(e))
+        return api_error("statistics fetching failed", 500)
@@ -40,6 +40,26 @@ ENV_MGMT_OAUTH_CLIENT_ID = "RDFM_PUBSUB_MGMT_OAUTH_CLIENT_ID"
 ENV_MGMT_OAUTH_CLIENT_SECRET = "RDFM_PUBSUB_MGMT_OAUTH_CLIENT_SEC"
 ENV_MGMT_OAUTH_AUDIENCE = "RDFM_PUBSUB_MGMT_OAUTH_AUDIENCE"
 ENV_CA_CERT = "RDFM_CA_CERT"
+ENV_STATISTICS_RECONCILE_INTERVAL = "RDFM_STATISTICS_RECONCILE_INTERVAL"
+ENV_CONNECTION_REGISTRY = "RDFM_CONNECTION_REGISTRY"
+ENV_DEVICE_GATEWAY_PORT = "RDFM_DEVICE_GATEWAY_PORT"
+ENV_DEVICE_GATEWAY_WORKERS = "RDFM_DEVICE_GATEWAY_WORKERS"
+ENV_ACTION_BROADCAST_CONCURRENCY = "RDFM_ACTION_BROADCAST_CONCURRENCY"
+ENV_UPDATE_PROGRESS_FLUSH_INTERVAL = "RDFM_UPDATE_PROGRESS_FLUSH_INTERVAL"
+ENV_DEVICE_SEND_QUEUE_SIZE = "RDFM_DEVICE_SEND_QUEUE_SIZE"
+ENV_DEVICE_SEND_TIMEOUT = "RDFM_DEVICE_SEND_TIMEOUT"
+ENV_DEVICE_SEND_WORKERS = "RDFM_DEVICE_SEND_WORKERS"
+ENV_DEVICE_WRITE_TIMEOUT = "RDFM_DEVICE_WRITE_TIMEOUT"
+ENV_FS_STREAM_THRESHOLD = "RDFM_FS_STREAM_THRESHOLD"
+ENV_LOG_QUEUE_SIZE = "RDFM_LOG_QUEUE_SIZE"
+ENV_DEVICE_CONNECT_RATE = "RDFM_DEVICE_CONNECT_RATE"
+ENV_DEVICE_CONNECT_BURST = "RDFM_DEVICE_CONNECT_BURST"
+ENV_DEVICE_POST_CONNECT_WORKERS = "RDFM_DEVICE_POST_CONNECT_WORKERS"
+
+""" Available connection registry backends
+"""
+CONNECTION_REGISTRY_MEMORY = "memory"
+CONNECTION_REGISTRY_REDIS = "redis"
 
 
 class ServerConfig:
@@ -232,6 +252,89 @@ class ServerConfig:
     """
     disable_cors: bool = False
 
+    """ Interval (in seconds) between recomputations of the fleet statistics
+        from the database. The statistics are maintained incrementally,
+        the recomputation corrects any drift of the counters and applies
+        modifications made by other server processes.
+    """
+    statistics_reconcile_interval: int = 30
+
+    """ Backend of the registry tracking which server process holds each
+        device connection. The in-memory registry only supports a single
+        server process. The Redis registry allows running multiple server
+        processes (workers or nodes) sharing the same Redis instance.
+    """
+    connection_registry: str = CONNECTION_REGISTRY_MEMORY
+
+    """ Port of the asyncio-based device gateway, serving the device
+        management WebSocket without occupying a thread per connection.
+        If not set, the gateway is disabled.
+    """
+    device_gateway_port: Optional[int] = None
+
+    """ Maximum amount of threads used by the device gateway for handling
+        device requests
+    """
+    device_gateway_workers: int = 16
+
+    """ Maximum amount of devices executing a broadcast action at once,
+        shared by all broadcasts started on this server process
+    """
+    action_broadcast_concurrency: int = 16
+
+    """ Interval (in seconds) between flushes of the update progress reported
+        by devices to the database and server-side events. Only the latest
+        progress of each device is flushed. When zero, every report is
+        flushed immediately.
+    """
+    update_progress_flush_interval: float = 1.0
+
+    """ Maximum amount of messages queued for sending to a single device,
+        in each of the priority lanes
+    """
+    device_send_queue_size: int = 64
+
+    """ Time (in seconds) a message may wait for free space in the outbound
+        queue of a device, and then in the queue for being sent
+    """
+    device_send_timeout: float = 10.0
+
+    """ Maximum amount of devices that messages are written to at once
+    """
+    device_send_workers: int = 32
+
+    """ Time (in seconds) a single message may take to be written to the
+        socket of a device, after which the device is disconnected
+    """
+    device_write_timeout: float = 30.0
+
+    """ Maximum size (in bytes) of files downloaded from devices that are
+        streamed directly to the user, instead of being uploaded to the
+        storage first. When zero, all files are uploaded to the storage.
+    """
+    fs_stream_threshold: int = 1024 * 1024
+
+    """ Maximum amount of log entries sent over the management WebSocket
+        that are queued for storing, batches exceeding it are rejected
+    """
+    log_queue_size: int = 10000
+
+    """ Amount of new device management WebSocket connections admitted per
+        second, connections exceeding it are asked to reconnect later.
+        When zero, all connections are admitted.
+    """
+    device_connect_rate: float = 100.0
+
+    """ Maximum amount of device management WebSocket connections admitted
+        at once, before limiting them to `device_connect_rate`
+    """
+    device_connect_burst: int = 200
+
+    """ Amount of threads running the work done after a device has connected,
+        such as sending its action queue
+    """
+    device_post_connect_workers: int = 8
+
 
 def try_get_env(key: str, help_text: str) -> Optional[str]:
     """Wraps an environment variable read
@@ -363,6 +466,165 @@ def parse_from_environment(config: ServerConfig) -> bool:
     if redis_host and redis_port:
         config.redis_url = f"redis://{redis_host}:{redis_port}"
 
+    if ENV_STATISTICS_RECONCILE_INTERVAL in os.environ:
+        interval = os.environ[ENV_STATISTICS_RECONCILE_INTERVAL]
+        try:
+            config.statistics_reconcile_interval = int(interval)
+        except ValueError:
+            print(f"Invalid statistics reconciliation interval: {interval}")
+            return False
+
+    if ENV_CONNECTION_REGISTRY in os.environ:
+        config.connection_registry = os.environ[ENV_CONNECTION_REGISTRY]
+    if config.connection_registry not in [CONNECTION_REGISTRY_MEMORY,
+                                          CONNECTION_REGISTRY_REDIS]:
+        print(f"Invalid connection registry: {config.connection_registry}")
+        return False
+    if (config.connection_registry == CONNECTION_REGISTRY_REDIS
+            and not hasattr(config, "redis_url")):
+        print("The Redis connection registry requires Redis to be configured")
+        return False
+
+    if ENV_DEVICE_GATEWAY_PORT in os.environ:
+        port = os.environ[ENV_DEVICE_GATEWAY_PORT]
+        try:
+            config.device_gateway_port = int(port)
+        except ValueError:
+            print(f"Invalid device gateway port: {port}")
+            return False
+
+    if ENV_DEVICE_GATEWAY_WORKERS in os.environ:
+        workers = os.environ[ENV_DEVICE_GATEWAY_WORKERS]
+        try:
+            config.device_gateway_workers = int(workers)
+        except ValueError:
+            print(f"Invalid device gateway worker count: {workers}")
+            return False
+        if config.device_gateway_workers < 1:
+            print("Device gateway requires at least one worker")
+            return False
+
+    if ENV_ACTION_BROADCAST_CONCURRENCY in os.environ:
+        concurrency = os.environ[ENV_ACTION_BROADCAST_CONCURRENCY]
+        try:
+            config.action_broadcast_concurrency = int(concurrency)
+        except ValueError:
+            print(f"Invalid action broadcast concurrency: {concurrency}")
+            return False
+        if config.action_broadcast_concurrency < 1:
+            print("Action broadcasts require a concurrency of at least one")
+            return False
+
+    if ENV_UPDATE_PROGRESS_FLUSH_INTERVAL in os.environ:
+        interval = os.environ[ENV_UPDATE_PROGRESS_FLUSH_INTERVAL]
+        try:
+            config.update_progress_flush_interval = float(interval)
+        except ValueError:
+            print(f"Invalid update progress flush interval: {interval}")
+            return False
+        if config.update_progress_flush_interval < 0:
+            print("Update progress flush interval must not be negative")
+            return False
+
+    if ENV_DEVICE_SEND_QUEUE_SIZE in os.environ:
+        size = os.environ[ENV_DEVICE_SEND_QUEUE_SIZE]
+        try:
+            config.device_send_queue_size = int(size)
+        except ValueError:
+            print(f"Invalid device send queue size: {size}")
+            return False
+        if config.device_send_queue_size < 1:
+            print("Device send queue size must be at least one")
+            return False
+
+    if ENV_DEVICE_SEND_TIMEOUT in os.environ:
+        timeout = os.environ[ENV_DEVICE_SEND_TIMEOUT]
+        try:
+            config.device_send_timeout = float(timeout)
+        except ValueError:
+            print(f"Invalid device send timeout: {timeout}")
+            return False
+        if config.device_send_timeout <= 0:
+            print("Device send timeout must be positive")
+            return False
+
+    if ENV_DEVICE_SEND_WORKERS in os.environ:
+        workers = os.environ[ENV_DEVICE_SEND_WORKERS]
+        try:
+            config.device_send_workers = int(workers)
+        except ValueError:
+            print(f"Invalid amount of device send workers: {workers}")
+            return False
+        if config.device_send_workers < 1:
+            print("At least one device send worker is required")
+            return False
+
+    if ENV_DEVICE_WRITE_TIMEOUT in os.environ:
+        timeout = os.environ[ENV_DEVICE_WRITE_TIMEOUT]
+        try:
+            config.device_write_timeout = float(timeout)
+        except ValueError:
+            print(f"Invalid device write timeout: {timeout}")
+            return False
+        if config.device_write_timeout <= 0:
+            print("Device write timeout must be positive")
+            return False
+
+    if ENV_FS_STREAM_THRESHOLD in os.environ:
+        threshold = os.environ[ENV_FS_STREAM_THRESHOLD]
+        try:
+            config.fs_stream_threshold = int(threshold)
+        except ValueError:
+            print(f"Invalid file stream threshold: {threshold}")
+            return False
+        if config.fs_stream_threshold < 0:
+            print("File stream threshold must not be negative")
+            return False
+
+    if ENV_LOG_QUEUE_SIZE in os.environ:
+        size = os.environ[ENV_LOG_QUEUE_SIZE]
+        try:
+            config.log_queue_size = int(size)
+        except ValueError:
+            print(f"Invalid log queue size: {size}")
+            return False
+        if config.log_queue_size < 1:
+            print("Log queue size must be at least one")
+            return False
+
+    if ENV_DEVICE_CONNECT_RATE in os.environ:
+        rate = os.environ[ENV_DEVICE_CONNECT_RATE]
+        try:
+            config.device_connect_rate = float(rate)
+        except ValueError:
+            print(f"Invalid device connection rate: {rate}")
+            return False
+        if config.device_connect_rate < 0:
+            print("Device connection rate must not be negative")
+            return False
+
+    if ENV_DEVICE_CONNECT_BURST in os.environ:
+        burst = os.environ[ENV_DEVICE_CONNECT_BURST]
+        try:
+            config.device_connect_burst = int(burst)
+        except ValueError:
+            print(f"Invalid device connection burst: {burst}")
+            return False
+        if config.device_connect_burst < 1:
+            print("Device connection burst must be at least one")
+            return False
+
+    if ENV_DEVICE_POST_CONNECT_WORKERS in os.environ:
+        workers = os.environ[ENV_DEVICE_POST_CONNECT_WORKERS]
+        try:
+            config.device_post_connect_workers = int(workers)
+        except ValueError:
+            print(f"Invalid amount of device post-connect workers: {workers}")
+            return False
+        if config.device_post_connect_workers < 1:
+            print("At least one device post-connect worker is required")
+            return False
+
     if ENV_ENABLE_KAFKA_INTEGRATION in os.environ:
         config.enable_pubsub = True
 
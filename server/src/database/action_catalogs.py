@@ -0,0 +1,44 @@
+import datetime
+from typing import Any, List, Optional
+import models.action_catalog
+from sqlalchemy import delete, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+
+class ActionCatalogsDB:
+    """Wrapper class for managing the actions reported by devices"""
+
+    engine: Engine
+
+    def __init__(self, db: Engine):
+        self.engine = db
+
+    def fetch(self, mac_address: str) -> Optional[models.action_catalog.ActionCatalog]:
+        """Fetch the actions last reported by a device"""
+        with Session(self.engine) as session:
+            return session.scalar(
+                select(models.action_catalog.ActionCatalog)
+                .where(models.action_catalog.ActionCatalog.mac_address == mac_address)
+            )
+
+    def update(self, mac_address: str, actions: List[dict[str, Any]],
+               version: Optional[str]):
+        """Replace the actions reported by a device"""
+        with Session(self.engine) as session:
+            session.merge(models.action_catalog.ActionCatalog(
+                mac_address=mac_address,
+                version=version,
+                actions=actions,
+                updated=datetime.datetime.utcnow(),
+            ))
+            session.commit()
+
+    def delete(self, mac_address: str):
+        """Remove the actions reported by a device"""
+        with Session(self.engine) as session:
+            session.execute(
+                delete(models.action_catalog.ActionCatalog)
+                .where(models.action_catalog.ActionCatalog.mac_address == mac_address)
+            )
+            session.commit()
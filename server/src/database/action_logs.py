@@ -1,6 +1,7 @@
+import uuid
 from typing import List, Optional
 import models.action_log
-from sqlalchemy import select, update, delete, desc
+from sqlalchemy import select, update, delete, desc, func
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 from rdfm.schema.v2.devices import ActionRemoveRequest
@@ -16,7 +17,8 @@ class ActionLogsDB:
 
     def fetch_device_queue(self, mac_address: str) -> List[models.action_log.ActionLog]:
         """Fetches a list of pending actions assigned to a device,
-        sorted by their creation date (oldest first).
+        sorted by their priority (highest first), then by their creation
+        date (oldest first).
         """
         try:
             with Session(self.engine) as session:
@@ -24,7 +26,8 @@ class ActionLogsDB:
                     select(models.action_log.ActionLog)
                     .where(models.action_log.ActionLog.mac_address == mac_address)
                     .where(models.action_log.ActionLog.status == "pending")
-                    .order_by(models.action_log.ActionLog.created)
+                    .order_by(models.action_log.ActionLog.priority.desc(),
+                              models.action_log.ActionLog.created)
                 )
                 actions = session.scalars(stmt)
                 if actions is None:
@@ -34,6 +37,11 @@ class ActionLogsDB:
             print("Action queue fetch failed:", repr(e))
             return []
 
+    def fetch_one(self, id: str) -> Optional[models.action_log.ActionLog]:
+        """Fetches a single action execution"""
+        with Session(self.engine) as session:
+            return session.get(models.action_log.ActionLog, id)
+
     def fetch_device_log(self, mac_address: str) -> List[models.action_log.ActionLog]:
         """Fetches a list of all actions assigned to a device,
         sorted by their creation date (newest first).
@@ -61,6 +69,76 @@ class ActionLogsDB:
             session.refresh(action)
             return action.id
 
+    def insert_broadcast(
+        self,
+        broadcast: models.action_log.ActionBroadcast,
+        mac_addresses: List[str],
+        priority: int = 0,
+    ) -> List[models.action_log.ActionLog]:
+        """Add an action broadcast, together with the pending action
+        executions of all targeted devices, in a single transaction
+
+        Returns:
+            action executions of the targeted devices
+        """
+        with Session(self.engine, expire_on_commit=False) as session:
+            actions = [
+                models.action_log.ActionLog(
+                    id=str(uuid.uuid4()),
+                    action_id=broadcast.action_id,
+                    mac_address=mac_address,
+                    created=broadcast.created,
+                    status="pending",
+                    broadcast_id=broadcast.id,
+                    priority=priority,
+                )
+                for mac_address in mac_addresses
+            ]
+            session.add(broadcast)
+            session.add_all(actions)
+            session.commit()
+            return actions
+
+    def fetch_broadcast(self, id: str) -> Optional[models.action_log.ActionBroadcast]:
+        """Fetches an action broadcast"""
+        with Session(self.engine) as session:
+            return session.get(models.action_log.ActionBroadcast, id)
+
+    def fetch_broadcast_log(
+        self,
+        broadcast_id: str,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[models.action_log.ActionLog]:
+        """Fetches action executions of a broadcast, ordered by identifier
+
+        Args:
+            broadcast_id: identifier of the broadcast
+            after: only executions with an identifier greater than this one
+                   are returned (cursor of the previous page)
+            limit: maximum amount of executions to return
+        """
+        ActionLog = models.action_log.ActionLog
+        stmt = select(ActionLog).where(ActionLog.broadcast_id == broadcast_id)
+        if after is not None:
+            stmt = stmt.where(ActionLog.id > after)
+        stmt = stmt.order_by(ActionLog.id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        with Session(self.engine) as session:
+            return session.scalars(stmt).all()
+
+    def count_broadcast_statuses(self, broadcast_id: str) -> dict[str, int]:
+        """Counts action executions of a broadcast by their status"""
+        ActionLog = models.action_log.ActionLog
+        stmt = (
+            select(ActionLog.status, func.count())
+            .where(ActionLog.broadcast_id == broadcast_id)
+            .group_by(ActionLog.status)
+        )
+        with Session(self.engine) as session:
+            return {str(status): count for status, count in session.execute(stmt)}
+
     def update_status(self, id: str, status: str, download_url: Optional[str] = None):
         """Update the status of a specified action.
         """
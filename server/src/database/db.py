@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, List, Iterator, TypeVar
 from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.engine import Engine
 from sqlalchemy_utils.functions import database_exists
@@ -14,6 +14,23 @@ CURRENT_PATH = os.path.dirname(os.path.abspath(__file__))
 ROOT_PATH = pathlib.Path(os.path.join(CURRENT_PATH, '../../')).resolve()
 
 
+""" Maximum amount of values bound to a single IN clause
+
+Batched queries operating on an explicit list of identifiers are split into
+chunks of this size, to stay below the bound parameter limits of the
+supported database engines (SQLite, PostgreSQL).
+"""
+IN_CLAUSE_CHUNK_SIZE = 10000
+
+T = TypeVar("T")
+
+
+def chunked(values: List[T], size: int = IN_CLAUSE_CHUNK_SIZE) -> Iterator[List[T]]:
+    """Split a list of values into chunks that can be used in an IN clause"""
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
 def check_current_head(alembic_cfg, connectable):
     # type: (config.Config, engine.Engine) -> bool
     directory = script.ScriptDirectory.from_config(alembic_cfg)
@@ -1,17 +1,20 @@
 from typing import List, Optional
 import models.device_update
-from sqlalchemy import select, update, delete
+from sqlalchemy import bindparam, select, update, delete, func
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
+from database.statistics import FleetStatistics
 
 
 class DeviceUpdatesDB:
     """Wrapper class for storing device update progress"""
 
     engine: Engine
+    statistics: FleetStatistics
 
-    def __init__(self, db: Engine):
+    def __init__(self, db: Engine, statistics: FleetStatistics):
         self.engine = db
+        self.statistics = statistics
 
     def fetch_all(self) -> List[models.device_update.DeviceUpdate]:
         """Fetches all device updates from the database"""
@@ -25,10 +28,15 @@ class DeviceUpdatesDB:
     def insert(self, update: models.device_update.DeviceUpdate):
         """Add a device update to the database"""
         with Session(self.engine) as session:
+            previous = self.__progress(session, update.mac_address)
             session.add(update)
             session.commit()
             session.refresh(update)
-            return update.id
+        current = update.progress
+        if previous is not None:
+            current = max(previous, current)
+        self.statistics.update_state_changed(previous, current)
+        return update.id
 
     def get_version(self, mac_address: str) -> str:
         """Fetch the software version that a specified device is being updated to.
@@ -42,22 +50,55 @@ class DeviceUpdatesDB:
     def update_progress(self, mac_address: str, progress: int):
         """Update the progress of a specified device.
         """
+        self.update_progress_many({mac_address: progress})
+
+    def update_progress_many(self, progress: dict[str, int]):
+        """Update the progress of many devices in a single transaction.
+
+        Args:
+            progress: current update progress, keyed by device MAC address
+        """
+        DeviceUpdate = models.device_update.DeviceUpdate
         with Session(self.engine) as session:
-            stmt = (
-                update(models.device_update.DeviceUpdate)
-                .values(progress=progress)
-                .where(models.device_update.DeviceUpdate.mac_address == mac_address)
+            previous = dict(session.execute(
+                select(DeviceUpdate.mac_address, func.max(DeviceUpdate.progress))
+                .where(DeviceUpdate.mac_address.in_(list(progress.keys())))
+                .group_by(DeviceUpdate.mac_address)
+            ).all())
+            # Core statement, so that the rows are matched by MAC address
+            # instead of the primary key in an executemany
+            table = DeviceUpdate.__table__
+            session.execute(
+                update(table)
+                .where(table.c.mac_address == bindparam("mac"))
+                .values(progress=bindparam("progress")),
+                [{"mac": mac, "progress": value} for mac, value in progress.items()],
             )
-            session.execute(stmt)
             session.commit()
+        for mac_address, value in progress.items():
+            if previous.get(mac_address) is not None:
+                self.statistics.update_state_changed(previous[mac_address], value)
 
     def delete(self, mac_address: str):
         """Removes a completed device update.
         """
         with Session(self.engine) as session:
+            previous = self.__progress(session, mac_address)
             stmt = (
                 delete(models.device_update.DeviceUpdate)
                 .where(models.device_update.DeviceUpdate.mac_address == mac_address)
             )
             session.execute(stmt)
             session.commit()
+        self.statistics.update_state_changed(previous, None)
+
+    def __progress(self, session: Session, mac_address: str) -> Optional[int]:
+        """Get the progress of the update of a device within an open session
+
+        Returns:
+            None, if no update of the device is tracked
+        """
+        return session.scalar(
+            select(func.max(models.device_update.DeviceUpdate.progress))
+            .where(models.device_update.DeviceUpdate.mac_address == mac_address)
+        )
@@ -1,20 +1,118 @@
-import json
 import datetime
-from typing import Optional, List
+import threading
+import time
+from typing import Any, Callable, Optional, List, Set
 import models.device
+import models.group
 import models.permission
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, func
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
-import server
 from rdfm.permissions import DEVICE_RESOURCE
+from rdfm.schema.v1.updates import META_DEVICE_TYPE, META_SOFT_VER
+from database.db import chunked, IN_CLAUSE_CHUNK_SIZE
+from database.statistics import FleetStatistics
+
+
+""" Metadata keys stored in dedicated, indexed columns of the devices table
+"""
+INDEXED_METADATA_COLUMNS = {
+    META_DEVICE_TYPE: models.device.Device.devtype,
+    META_SOFT_VER: models.device.Device.software_version,
+}
+
+
+def metadata_columns(metadata: dict[str, Any]) -> dict[str, Any]:
+    """Get the values of all device columns derived from the given metadata
+
+    This should be used whenever the device metadata is modified, to keep
+    the indexed metadata columns in sync.
+    """
+    values = {"device_metadata": metadata}
+    for key, column in INDEXED_METADATA_COLUMNS.items():
+        value = metadata.get(key)
+        values[column.key] = value if isinstance(value, str) else None
+    return values
+
+
+def metadata_value(key: str):
+    """Expression evaluating to the value of a device metadata key
+
+    Indexed columns are used for keys that have one.
+    """
+    if key in INDEXED_METADATA_COLUMNS:
+        return INDEXED_METADATA_COLUMNS[key]
+    return models.device.Device.device_metadata[key].as_string()
+
+
+ACTIVE_GROUP_TTL = 5.0
+"""Time (in seconds) for which the active group of a device is cached"""
+
+
+class ActiveGroupCache:
+    """In-process cache of the groups that are active for each device
+
+    The active group is looked up on every update check, but changes only
+    when the group assignment or group priorities are modified.
+    Invalidation bumps a generation counter, so that a lookup that raced
+    with an invalidation does not store a stale value in the cache.
+
+    Note: the cache is local to the server process, modifications must
+    go through `GroupsDB`/`DevicesDB` for the cache to be invalidated.
+    Modifications made by other server processes are not invalidated,
+    so each entry also expires after a short time.
+    """
+
+    def __init__(self, ttl: float = ACTIVE_GROUP_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            ttl: time in seconds after which a cached entry expires
+            clock: source of monotonic time, in seconds
+        """
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._groups: dict[int, tuple[Optional[int], float]] = {}
+        self._generation = 0
+
+    def get(
+        self, identifier: int, loader: Callable[[int], Optional[int]]
+    ) -> Optional[int]:
+        """Get the active group of a device, calling the loader on a miss"""
+        with self._lock:
+            entry = self._groups.get(identifier)
+            if entry is not None and entry[1] > self._clock():
+                return entry[0]
+            generation = self._generation
+
+        group = loader(identifier)
+
+        with self._lock:
+            if generation == self._generation:
+                self._groups[identifier] = (group, self._clock() + self.ttl)
+        return group
+
+    def invalidate(self, identifiers: Optional[List[int]] = None):
+        """Invalidate the given devices, or the entire cache if None"""
+        with self._lock:
+            self._generation += 1
+            if identifiers is None:
+                self._groups.clear()
+                return
+            for identifier in identifiers:
+                self._groups.pop(identifier, None)
 
 
 class DevicesDB:
     engine: Engine
+    active_groups: ActiveGroupCache
+    statistics: FleetStatistics
 
-    def __init__(self, db: Engine):
+    def __init__(self, db: Engine, statistics: FleetStatistics):
         self.engine = db
+        self.active_groups = ActiveGroupCache()
+        self.statistics = statistics
 
     def get_device_data(
         self, mac_address: str
@@ -41,6 +139,137 @@ class DevicesDB:
         with Session(self.engine) as session:
             return session.scalars(select(models.device.Device)).all()
 
+    def fetch_filtered(
+        self,
+        devtype: Optional[str] = None,
+        software_version: Optional[str] = None,
+        metadata: Optional[dict[str, str]] = None,
+        group: Optional[int] = None,
+        tag: Optional[str] = None,
+        connected: Optional[bool] = None,
+        connected_devices: Optional[Callable[[List[str]], Set[str]]] = None,
+        permitted: Optional[Callable[[int], bool]] = None,
+        last_access_since: Optional[datetime.datetime] = None,
+        last_access_to: Optional[datetime.datetime] = None,
+        name_prefix: Optional[str] = None,
+        mac_prefix: Optional[str] = None,
+        after: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[models.device.Device]:
+        """Fetch devices matching the given filters, ordered by identifier
+
+        All filters other than `connected` and `permitted` are evaluated by
+        the database, passing None skips the given filter. These two are not
+        stored in the database, so devices are fetched in chunks, which are
+        then filtered by their connection state and permissions until enough
+        devices were found.
+
+        Args:
+            devtype: value of the device type metadata key
+            software_version: value of the software version metadata key
+            metadata: metadata key/value pairs the device must have
+            group: identifier of a group the device is assigned to
+            tag: tag assigned to the device
+            connected: whether the device is connected to the management WS
+            connected_devices: returns which of the given MAC addresses
+                               belong to connected devices, required when
+                               `connected` is not None
+            permitted: returns whether the device with the given identifier
+                       may be listed
+            last_access_since: earliest last access time
+            last_access_to: latest last access time
+            name_prefix: prefix of the device name
+            mac_prefix: prefix of the device MAC address
+            after: only devices with an identifier greater than this one
+                   are returned (cursor of the previous page)
+            limit: maximum amount of devices to return
+
+        Returns:
+            A list of devices adhering to the given filters
+        """
+        Device = models.device.Device
+        stmt = select(Device)
+        if devtype is not None:
+            stmt = stmt.where(Device.devtype == devtype)
+        if software_version is not None:
+            stmt = stmt.where(Device.software_version == software_version)
+        for key, value in (metadata or {}).items():
+            stmt = stmt.where(metadata_value(key) == value)
+        if group is not None:
+            stmt = stmt.where(Device.id.in_(
+                select(models.device.DeviceGroupAssignment.device_id)
+                .where(models.device.DeviceGroupAssignment.group_id == group)
+            ))
+        if tag is not None:
+            stmt = stmt.where(Device.id.in_(
+                select(models.device.DeviceTag.device_id)
+                .where(models.device.DeviceTag.tag == tag)
+            ))
+        if last_access_since is not None:
+            stmt = stmt.where(Device.last_access >= last_access_since)
+        if last_access_to is not None:
+            stmt = stmt.where(Device.last_access <= last_access_to)
+        if name_prefix is not None:
+            stmt = stmt.where(
+                Device.name.startswith(name_prefix, autoescape=True)
+            )
+        if mac_prefix is not None:
+            stmt = stmt.where(
+                Device.mac_address.startswith(mac_prefix, autoescape=True)
+            )
+        stmt = stmt.order_by(Device.id)
+        if connected is None and permitted is None:
+            if after is not None:
+                stmt = stmt.where(Device.id > after)
+            if limit is not None:
+                stmt = stmt.limit(limit)
+            with Session(self.engine) as session:
+                return session.scalars(stmt).all()
+
+        devices = []
+        with Session(self.engine) as session:
+            while limit is None or len(devices) < limit:
+                chunk_stmt = stmt.limit(IN_CLAUSE_CHUNK_SIZE)
+                if after is not None:
+                    chunk_stmt = chunk_stmt.where(Device.id > after)
+                chunk = session.scalars(chunk_stmt).all()
+                if len(chunk) == 0:
+                    break
+                matching = chunk
+                if connected is not None:
+                    online = connected_devices(
+                        [device.mac_address for device in chunk]
+                    )
+                    matching = [device for device in matching
+                                if (device.mac_address in online) == connected]
+                # Permissions are checked only until enough devices were found
+                for device in matching:
+                    if limit is not None and len(devices) >= limit:
+                        break
+                    if permitted is None or permitted(device.id):
+                        devices.append(device)
+                if len(chunk) < IN_CLAUSE_CHUNK_SIZE:
+                    break
+                after = chunk[-1].id
+        return devices[:limit] if limit is not None else devices
+
+    def count_by_metadata(self, key: str) -> dict[Optional[str], int]:
+        """Count the devices for each value of the given metadata key
+
+        This can be used for querying e.g. the distribution of software
+        versions across the fleet.
+
+        Returns:
+            Mapping of the metadata value to the amount of devices.
+            Devices without the given key are counted under None.
+        """
+        value = metadata_value(key)
+        with Session(self.engine) as session:
+            rows = session.execute(
+                select(value, func.count()).group_by(value)
+            ).all()
+        return {value: count for value, count in rows}
+
     def fetch_one(self, identifier: int) -> models.device.Device:
         """Fetch data of the device with a given identifier"""
         with Session(self.engine) as session:
@@ -62,30 +291,86 @@ class DevicesDB:
                 )
             ).all()
 
+    def fetch_groups_by_device(
+        self, identifiers: Optional[List[int]] = None
+    ) -> dict[int, List[int]]:
+        """Fetch IDs of groups assigned to each of the given devices
+
+        Unlike `fetch_groups`, the assignments of all requested devices are
+        loaded at once, instead of issuing a query per device. This should
+        be used when serializing lists of devices.
+
+        Args:
+            identifiers: device identifiers to fetch the assignments for.
+                         If None, assignments of all devices are returned.
+
+        Returns:
+            Mapping of device identifier to the list of assigned group IDs.
+            Devices without any assigned groups are not present in the map.
+        """
+        Assignment = models.device.DeviceGroupAssignment
+        stmt = select(Assignment.device_id, Assignment.group_id)
+        groups: dict[int, List[int]] = {}
+        with Session(self.engine) as session:
+            if identifiers is None:
+                rows = session.execute(stmt).all()
+            else:
+                rows = []
+                for chunk in chunked(list(identifiers)):
+                    rows.extend(session.execute(
+                        stmt.where(Assignment.device_id.in_(chunk))
+                    ).all())
+        for device_id, group_id in rows:
+            groups.setdefault(device_id, []).append(group_id)
+        return groups
+
     def fetch_active_group(self, identifier: int) -> Optional[int]:
         """ Fetch ID of the group that is active for the device with a given
         identifier
+
+        The active group is the assigned group with the lowest priority value.
+        Results are cached in-process, the cache is invalidated whenever the
+        group assignment or priorities change.
         """
-        groups = self.fetch_groups(identifier)
-        if not groups:
-            return None
+        return self.active_groups.get(identifier, self.__query_active_group)
 
-        prios = []
-        for group_id in groups:
-            g = server.instance._groups_db.fetch_one(group_id)
-            prios.append(g.priority)
+    def __query_active_group(self, identifier: int) -> Optional[int]:
+        with Session(self.engine) as session:
+            return session.scalar(
+                select(models.device.DeviceGroupAssignment.group_id)
+                .join(
+                    models.group.Group,
+                    models.group.Group.id ==
+                    models.device.DeviceGroupAssignment.group_id
+                )
+                .where(
+                    models.device.DeviceGroupAssignment.device_id == identifier
+                )
+                .order_by(models.group.Group.priority)
+                .limit(1)
+            )
 
-        return groups[prios.index(min(prios))]
+    def invalidate_active_groups(self, identifiers: Optional[List[int]] = None):
+        """ Invalidate cached active groups of the given devices
+
+        Args:
+            identifiers: device identifiers to invalidate the cached active
+                         groups of. If None, the entire cache is cleared.
+        """
+        self.active_groups.invalidate(identifiers)
 
     def insert(self, device: models.device.Device):
         """Add a device to the database
 
         The passed device model is updated with the new device identifier
         """
+        for column, value in metadata_columns(device.device_metadata).items():
+            setattr(device, column, value)
         with Session(self.engine) as session:
             session.add(device)
             session.commit()
             session.refresh(device)
+        self.statistics.device_added(device.devtype, device.software_version)
 
     def update_key(self, mac: str, public_key: str):
         """Update the public key of the device specified by
@@ -102,18 +387,38 @@ class DevicesDB:
 
     def update_metadata(self, mac_address: str, metadata: dict[str, str]):
         """Update the metadata of the given device."""
+        values = metadata_columns(metadata)
         with Session(self.engine) as session:
+            previous = session.execute(
+                select(
+                    models.device.Device.devtype,
+                    models.device.Device.software_version,
+                )
+                .where(models.device.Device.mac_address == mac_address)
+            ).first()
             stmt = (
                 update(models.device.Device)
-                .values(device_metadata=json.dumps(metadata))
+                .values(**values)
                 .where(models.device.Device.mac_address == mac_address)
             )
             session.execute(stmt)
             session.commit()
+        if previous is not None:
+            self.statistics.metadata_changed(
+                previous.devtype, previous.software_version,
+                values["devtype"], values["software_version"]
+            )
 
     def delete(self, identifier: int):
         """Delete the given device."""
         with Session(self.engine) as session:
+            device = session.get(models.device.Device, identifier)
+            groups = session.scalars(
+                select(models.device.DeviceGroupAssignment.group_id)
+                .where(
+                    models.device.DeviceGroupAssignment.device_id == identifier
+                )
+            ).all()
             stmt = (
                 delete(models.device.DeviceGroupAssignment)
                 .where(models.device.DeviceGroupAssignment.device_id == identifier)
@@ -136,13 +441,18 @@ class DevicesDB:
             )
             session.execute(stmt)
             session.commit()
+        self.invalidate_active_groups([identifier])
+        if device is not None:
+            self.statistics.device_removed(
+                device.devtype, device.software_version, groups
+            )
 
     def update_capabilities(self, mac_address: str, capabilities: dict[str, str]):
         """Update the capabilities of the given device."""
         with Session(self.engine) as session:
             stmt = (
                 update(models.device.Device)
-                .values(capabilities=json.dumps(capabilities))
+                .values(capabilities=capabilities)
                 .where(models.device.Device.mac_address == mac_address)
             )
             session.execute(stmt)
@@ -169,12 +479,12 @@ class DevicesDB:
     def fetch_by_tag(self, tag: str) -> List[models.device.Device]:
         """Fetch a list of devices with the given tag"""
         with Session(self.engine) as session:
-            device_ids = session.scalars(
-                select(models.device.DeviceTag.device_id)
-                .where(models.device.DeviceTag.tag == tag)
-            ).all()
-
             return session.scalars(
                 select(models.device.Device)
-                .where(models.device.Device.id.in_(device_ids))
+                .join(
+                    models.device.DeviceTag,
+                    models.device.DeviceTag.device_id ==
+                    models.device.Device.id
+                )
+                .where(models.device.DeviceTag.tag == tag)
             ).all()
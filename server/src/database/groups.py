@@ -1,5 +1,5 @@
-from typing import Optional, List
-from sqlalchemy import select, update, delete
+from typing import Optional, List, Tuple, Union
+from sqlalchemy import select, update, delete, insert, func, literal, Select
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
@@ -9,15 +9,27 @@ import models.package
 import models.permission
 import server
 from rdfm.permissions import GROUP_RESOURCE
+from database.db import chunked
+from database.statistics import FleetStatistics
+
+
+def _group_pairs(rows) -> dict[int, List[int]]:
+    """Groups (key, value) rows into a map of key to the list of values"""
+    result: dict[int, List[int]] = {}
+    for key, value in rows:
+        result.setdefault(key, []).append(value)
+    return result
 
 
 class GroupsDB:
     """Wrapper class for managing group data and device-group assignment"""
 
     engine: Engine
+    statistics: FleetStatistics
 
-    def __init__(self, db: Engine):
+    def __init__(self, db: Engine, statistics: FleetStatistics):
         self.engine = db
+        self.statistics = statistics
 
     def fetch_all(self) -> List[models.group.Group]:
         """Fetches all groups from the database"""
@@ -68,6 +80,55 @@ class GroupsDB:
                 .join(models.device.Device)
             ).all()
 
+    def fetch_assigned_ids(self, identifier: int) -> List[int]:
+        """Fetches identifiers of all devices assigned to the specified group
+
+        Args:
+            identifier: group identifier
+        """
+        with Session(self.engine) as session:
+            return session.scalars(
+                select(models.device.DeviceGroupAssignment.device_id).where(
+                    models.device.DeviceGroupAssignment.group_id == identifier
+                )
+            ).all()
+
+    def fetch_assigned_ids_by_group(self) -> dict[int, List[int]]:
+        """Fetches identifiers of devices assigned to each of the groups
+
+        All device-group assignments are fetched in a single query.
+
+        Returns:
+            Mapping of group identifier to the list of assigned device IDs.
+            Groups without any assigned devices are not present in the map.
+        """
+        with Session(self.engine) as session:
+            rows = session.execute(
+                select(
+                    models.device.DeviceGroupAssignment.group_id,
+                    models.device.DeviceGroupAssignment.device_id,
+                )
+            ).all()
+        return _group_pairs(rows)
+
+    def fetch_assigned_packages_by_group(self) -> dict[int, List[int]]:
+        """Fetches identifiers of packages assigned to each of the groups
+
+        All group-package assignments are fetched in a single query.
+
+        Returns:
+            Mapping of group identifier to the list of assigned package IDs.
+            Groups without any assigned packages are not present in the map.
+        """
+        with Session(self.engine) as session:
+            rows = session.execute(
+                select(
+                    models.group.GroupPackageAssignment.group_id,
+                    models.group.GroupPackageAssignment.package_id,
+                )
+            ).all()
+        return _group_pairs(rows)
+
     def delete(self, identifier: int) -> bool:
         """Deletes a group
 
@@ -92,7 +153,8 @@ class GroupsDB:
                 )
                 session.execute(stmt)
                 session.commit()
-                return True
+            self.__invalidate_active_groups()
+            return True
         except IntegrityError:
             # Constraint failed, the group is still used by some devices
             return False
@@ -128,60 +190,206 @@ class GroupsDB:
         """
         try:
             with Session(self.engine) as session:
-                def make_assignment(group, device):
-                    assignment = models.device.DeviceGroupAssignment()
-                    assignment.group_id = group
-                    assignment.device_id = device
-                    return assignment
+                current_group = session.get(models.group.Group, identifier)
 
                 # Additions
-                current_group = self.fetch_one(identifier)
+                if len(additions) > 0:
+                    conflicts = self.__find_priority_conflicts(
+                        session, current_group.priority, additions
+                    )
+                    if len(conflicts) > 0:
+                        return ("A group with the same priority "
+                                "is already assigned to one of the devices "
+                                "requested to be added")
+
+                    self.__insert_assignments(session, identifier, additions)
 
-                for addition in additions:
-                    if (
-                        session.query(models.group.Group)
-                        .select_from(models.device.DeviceGroupAssignment)
+                # Removals
+                removed = 0
+                for chunk in chunked(list(removals)):
+                    stmt = (
+                        delete(models.device.DeviceGroupAssignment)
                         .where(
-                            models.device.DeviceGroupAssignment.device_id ==
-                            addition
+                            models.device.DeviceGroupAssignment.group_id ==
+                            identifier
                         )
-                        .join(models.group.Group)
                         .where(
-                            models.group.Group.priority ==
-                            current_group.priority
+                            models.device.DeviceGroupAssignment.device_id.in_(
+                                chunk
+                            )
                         )
-                        .first() is not None
-                    ):
-
-                        return ("A group with the same priority "
-                                "is already assigned to one of the devices "
-                                "requested to be added")
+                    )
+                    removed += session.execute(stmt).rowcount
 
-                session.add_all(
-                        [make_assignment(identifier, a) for a in additions]
-                )
                 session.commit()
+            self.__invalidate_active_groups(list(additions) + list(removals))
+            self.statistics.assignments_changed(
+                identifier, len(additions) - removed
+            )
+            return None
 
-                # Removals
-                stmt = (
-                    delete(models.device.DeviceGroupAssignment)
-                    .where(
-                        models.device.DeviceGroupAssignment.group_id ==
-                        identifier
+        except IntegrityError as e:
+            return "conflict while assigning device, the device may not exist"
+
+    def move_assignment(
+        self, source: int, destination: int, devices: Optional[List[int]]
+    ) -> Optional[str]:
+        """Move devices from one group to another
+
+        The devices are removed from the `source` group and assigned to the
+        `destination` group in a single transaction. If `devices` is None,
+        all devices assigned to the source group are moved.
+
+        This operation is atomic - the transaction is aborted if:
+            - Any of the devices is not currently assigned to the source group
+            - Any of the devices is already assigned to a group (other than
+              the source group) with the same priority as the destination
+              group. This includes the destination group itself.
+
+        Args:
+            source: identifier of the group to move the devices from
+            destination: identifier of the group to move the devices to
+            devices: identifiers of the devices to move, or None to move all
+                     devices of the source group
+
+        Returns:
+            None: on success
+            str: user-friendly error string explaining the failure
+        """
+        if source == destination:
+            return "the source and destination groups must be different"
+
+        DGA = models.device.DeviceGroupAssignment
+        try:
+            with Session(self.engine) as session:
+                target = session.get(models.group.Group, destination)
+
+                if devices is None:
+                    moved = select(DGA.device_id).where(DGA.group_id == source)
+                    conflicts = self.__find_priority_conflicts(
+                        session, target.priority, moved, exclude=source
                     )
-                    .where(
-                        models.device.DeviceGroupAssignment.device_id.in_(
-                            removals
+                    if len(conflicts) > 0:
+                        return ("A group with the same priority as the "
+                                "destination group is already assigned to "
+                                "one of the devices requested to be moved")
+
+                    session.execute(
+                        insert(DGA).from_select(
+                            [DGA.device_id, DGA.group_id],
+                            select(DGA.device_id, literal(destination))
+                            .where(DGA.group_id == source)
                         )
                     )
+                    moved = session.execute(
+                        delete(DGA).where(DGA.group_id == source)
+                    ).rowcount
+                    session.commit()
+                    self.__invalidate_active_groups()
+                    self.statistics.assignments_changed(source, -moved)
+                    self.statistics.assignments_changed(destination, moved)
+                    return None
+
+                devices = list(set(devices))
+                if len(devices) == 0:
+                    return None
+
+                assigned = 0
+                for chunk in chunked(devices):
+                    assigned += session.scalar(
+                        select(func.count())
+                        .select_from(DGA)
+                        .where(DGA.group_id == source)
+                        .where(DGA.device_id.in_(chunk))
+                    )
+                if assigned != len(devices):
+                    return ("One of the devices requested to be moved is not "
+                            "assigned to the source group")
+
+                conflicts = self.__find_priority_conflicts(
+                    session, target.priority, devices, exclude=source
                 )
-                session.execute(stmt)
+                if len(conflicts) > 0:
+                    return ("A group with the same priority as the "
+                            "destination group is already assigned to "
+                            "one of the devices requested to be moved")
+
+                self.__insert_assignments(session, destination, devices)
+                for chunk in chunked(devices):
+                    session.execute(
+                        delete(DGA)
+                        .where(DGA.group_id == source)
+                        .where(DGA.device_id.in_(chunk))
+                    )
                 session.commit()
+            self.__invalidate_active_groups(devices)
+            self.statistics.assignments_changed(source, -len(devices))
+            self.statistics.assignments_changed(destination, len(devices))
+            return None
+        except IntegrityError:
+            return "conflict while moving devices, the group may not exist"
 
-                return None
+    def __invalidate_active_groups(self, devices: Optional[List[int]] = None):
+        """Invalidate the cached active groups of the given devices
 
-        except IntegrityError as e:
-            return "conflict while assigning device, the device may not exist"
+        If `devices` is None, active groups of all devices are invalidated.
+        """
+        server.instance._devices_db.invalidate_active_groups(devices)
+
+    def __insert_assignments(
+        self, session: Session, group: int, devices: List[int]
+    ):
+        """Assign the given devices to a group within an open session"""
+        if len(devices) == 0:
+            return
+        session.execute(
+            insert(models.device.DeviceGroupAssignment),
+            [{"group_id": group, "device_id": device} for device in devices],
+        )
+
+    def __find_priority_conflicts(
+        self,
+        session: Session,
+        priority: int,
+        devices: Union[List[int], Select],
+        exclude: Optional[int] = None,
+    ) -> List[Tuple[int, int]]:
+        """Find devices assigned to a group with the given priority
+
+        Args:
+            session: open database session
+            priority: group priority to check against
+            devices: identifiers of the devices to check, either as a list or
+                     a select statement returning the device identifiers.
+                     Lists are checked in chunks of `IN_CLAUSE_CHUNK_SIZE`
+                     devices, a statement is checked in a single query.
+            exclude: identifier of a group which is ignored during the check
+
+        Returns:
+            List of conflicting (device identifier, group identifier) pairs
+        """
+        DGA = models.device.DeviceGroupAssignment
+        stmt = (
+            select(DGA.device_id, DGA.group_id)
+            .join(models.group.Group, models.group.Group.id == DGA.group_id)
+            .where(models.group.Group.priority == priority)
+        )
+        if exclude is not None:
+            stmt = stmt.where(models.group.Group.id != exclude)
+
+        if isinstance(devices, Select):
+            return [
+                (device, group) for device, group in
+                session.execute(stmt.where(DGA.device_id.in_(devices)))
+            ]
+
+        conflicts = []
+        for chunk in chunked(list(devices)):
+            conflicts.extend(
+                (device, group) for device, group in
+                session.execute(stmt.where(DGA.device_id.in_(chunk)))
+            )
+        return conflicts
 
     def modify_package(self, group: int, packages: List[int]) -> Optional[str]:
         """Modify package assignment of the specified group
@@ -258,27 +466,16 @@ class GroupsDB:
         """
 
         with Session(self.engine) as session:
-            devices = self.fetch_assigned(group)
-            for device in devices:
-                device_group_ids = server.instance._devices_db.fetch_groups(
-                        device.id
-                )
-                for group_id in device_group_ids:
-                    if (
-                            session.query(models.group.Group)
-                            .select_from(models.device.DeviceGroupAssignment)
-                            .where(
-                                models.device.DeviceGroupAssignment.device_id
-                                == device.id
-                            )
-                            .join(models.group.Group)
-                            .where(models.group.Group.priority == priority)
-                            .where(models.group.Group.id != group)
-                            .first() is not None
-                    ):
-                        return ("A group with the same priority "
-                                "is already assigned to one of the devices "
-                                "in this group")
+            devices = select(
+                models.device.DeviceGroupAssignment.device_id
+            ).where(models.device.DeviceGroupAssignment.group_id == group)
+            conflicts = self.__find_priority_conflicts(
+                session, priority, devices, exclude=group
+            )
+            if len(conflicts) > 0:
+                return ("A group with the same priority "
+                        "is already assigned to one of the devices "
+                        "in this group")
 
             stmt = (
                 update(models.group.Group)
@@ -287,6 +484,7 @@ class GroupsDB:
             )
             session.execute(stmt)
             session.commit()
+        self.__invalidate_active_groups()
 
     def update_policy(self, group: int, policy: str):
         """Updates the group update policy
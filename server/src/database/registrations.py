@@ -4,15 +4,18 @@ import models.registration
 from sqlalchemy import delete, select
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
+from database.statistics import FleetStatistics
 
 
 class RegistrationsDB:
     """Wrapper class for managing device registrations"""
 
     engine: Engine
+    statistics: FleetStatistics
 
-    def __init__(self, db: Engine):
+    def __init__(self, db: Engine, statistics: FleetStatistics):
         self.engine = db
+        self.statistics = statistics
 
     def fetch_all(self) -> List[models.registration.Registration]:
         """Fetches all device registration requests"""
@@ -33,6 +36,9 @@ class RegistrationsDB:
         the previous registration's metadata is overwritten.
         """
         with Session(self.engine) as session:
+            existing = session.get(
+                models.registration.Registration, (mac, public_key)
+            )
             reg = models.registration.Registration()
             reg.mac_address = mac
             reg.public_key = public_key
@@ -40,6 +46,8 @@ class RegistrationsDB:
             reg.last_appeared = datetime.datetime.utcnow()
             session.merge(reg)
             session.commit()
+        if existing is None:
+            self.statistics.registrations_changed(1)
 
     def fetch_one(
         self, mac: str, public_key: str
@@ -69,5 +77,6 @@ class RegistrationsDB:
                     models.registration.Registration.public_key == public_key
                 )
             )
-            session.execute(stmt)
+            removed = session.execute(stmt).rowcount
             session.commit()
+        self.statistics.registrations_changed(-removed)
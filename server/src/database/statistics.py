@@ -0,0 +1,191 @@
+import collections
+import threading
+import time
+from typing import Any, Callable, Optional
+import models.device
+import models.device_update
+import models.registration
+from sqlalchemy import select, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+
+""" Device update states tracked by the statistics
+
+An update is pending when the device was offered a package, but did not
+report any progress yet.
+"""
+UPDATE_PENDING = "pending"
+UPDATE_IN_PROGRESS = "in_progress"
+
+
+def update_state(progress: Optional[int]) -> Optional[str]:
+    """Get the update state of a device from its update progress"""
+    if progress is None:
+        return None
+    return UPDATE_PENDING if progress == 0 else UPDATE_IN_PROGRESS
+
+
+class FleetStatistics:
+    """Fleet-wide counters, served by the dashboard summary endpoint
+
+    The counters are updated incrementally by the database wrappers whenever
+    the tracked data changes, so that the summary can be served without
+    querying the database. As modifications made outside of the server
+    process (or racing with a reconciliation) could make the counters drift,
+    they are periodically recomputed from the database (see: `reconcile`).
+    This also applies modifications made by other server processes.
+
+    As devices may be connected to any server process, the amount of
+    connected devices is summed up on every read from the counters of
+    connections held by each process, which the connection registry
+    maintains as devices (dis)connect.
+    """
+
+    def __init__(self, engine: Engine, connected: Callable[[], int]):
+        """
+        Args:
+            engine: database engine the counters are recomputed from
+            connected: returns the amount of devices connected to any
+                       server process
+        """
+        self.engine = engine
+        self._connected = connected
+        self._lock = threading.Lock()
+        self._devices = 0
+        self._versions: collections.Counter = collections.Counter()
+        self._devtypes: collections.Counter = collections.Counter()
+        self._groups: collections.Counter = collections.Counter()
+        self._registrations = 0
+        self._updates: collections.Counter = collections.Counter()
+
+    def device_added(self, devtype: Optional[str], version: Optional[str]):
+        with self._lock:
+            self._devices += 1
+            self._devtypes[devtype] += 1
+            self._versions[version] += 1
+
+    def device_removed(self, devtype: Optional[str], version: Optional[str],
+                       groups: list[int]):
+        with self._lock:
+            self._devices -= 1
+            self.__decrement(self._devtypes, devtype)
+            self.__decrement(self._versions, version)
+            for group in groups:
+                self.__decrement(self._groups, group)
+
+    def metadata_changed(self,
+                         old_devtype: Optional[str], old_version: Optional[str],
+                         devtype: Optional[str], version: Optional[str]):
+        with self._lock:
+            self.__decrement(self._devtypes, old_devtype)
+            self._devtypes[devtype] += 1
+            self.__decrement(self._versions, old_version)
+            self._versions[version] += 1
+
+    def assignments_changed(self, group: int, delta: int):
+        """Add `delta` devices to the count of devices assigned to a group"""
+        with self._lock:
+            self._groups[group] += delta
+            if self._groups[group] <= 0:
+                del self._groups[group]
+
+    def registrations_changed(self, delta: int):
+        with self._lock:
+            self._registrations += delta
+
+    def update_state_changed(self, old: Optional[int], new: Optional[int]):
+        """Move a device between update states based on its update progress
+
+        Args:
+            old: previous update progress, or None if no update was tracked
+            new: current update progress, or None if the update was removed
+        """
+        old_state, new_state = update_state(old), update_state(new)
+        if old_state == new_state:
+            return
+        with self._lock:
+            if old_state is not None:
+                self.__decrement(self._updates, old_state)
+            if new_state is not None:
+                self._updates[new_state] += 1
+
+    def summary(self) -> dict[str, Any]:
+        """Get a snapshot of all counters
+
+        Devices without the device type or software version metadata
+        are not included in the per-devtype and per-version counts.
+        """
+        connected = self._connected()
+        with self._lock:
+            return {
+                "devices": self._devices,
+                "connected": connected,
+                "offline": max(self._devices - connected, 0),
+                "pending_registrations": self._registrations,
+                "updates_pending": self._updates[UPDATE_PENDING],
+                "updates_in_progress": self._updates[UPDATE_IN_PROGRESS],
+                "versions": self.__known(self._versions),
+                "devtypes": self.__known(self._devtypes),
+                "groups": dict(self._groups),
+            }
+
+    def reconcile(self):
+        """Recompute all counters from the database"""
+        Device = models.device.Device
+        DGA = models.device.DeviceGroupAssignment
+        DeviceUpdate = models.device_update.DeviceUpdate
+        Registration = models.registration.Registration
+        with Session(self.engine) as session:
+            devtypes = session.execute(
+                select(Device.devtype, func.count()).group_by(Device.devtype)
+            ).all()
+            versions = session.execute(
+                select(Device.software_version, func.count())
+                .group_by(Device.software_version)
+            ).all()
+            groups = session.execute(
+                select(DGA.group_id, func.count()).group_by(DGA.group_id)
+            ).all()
+            registrations = session.scalar(
+                select(func.count()).select_from(Registration)
+            )
+            progress = session.scalars(
+                select(func.max(DeviceUpdate.progress))
+                .group_by(DeviceUpdate.mac_address)
+            ).all()
+
+        with self._lock:
+            self._devtypes = collections.Counter(dict(devtypes))
+            self._versions = collections.Counter(dict(versions))
+            self._devices = sum(self._devtypes.values())
+            self._groups = collections.Counter(dict(groups))
+            self._registrations = registrations
+            self._updates = collections.Counter(
+                update_state(p) for p in progress
+            )
+
+    def start_reconciliation(self, interval: float):
+        """Start reconciling the counters periodically in the background
+
+        Args:
+            interval: time between reconciliations, in seconds
+        """
+        def _reconcile_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reconcile()
+                except Exception as e:
+                    print("Statistics reconciliation failed:", repr(e),
+                          flush=True)
+
+        threading.Thread(target=_reconcile_loop, daemon=True).start()
+
+    def __known(self, counter: collections.Counter) -> dict:
+        return {k: v for k, v in counter.items() if k is not None}
+
+    def __decrement(self, counter: collections.Counter, key):
+        counter[key] -= 1
+        if counter[key] <= 0:
+            del counter[key]
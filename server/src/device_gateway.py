@@ -0,0 +1,26 @@
+import configuration
+import rdfm_mgmt_server
+import device_mgmt.gateway
+
+
+""" Standalone device gateway process
+
+Serves only the device management WebSocket, configured from the environment
+in the same way as the WSGI app (see: `setup_with_config_from_env`). This is
+meant to be run alongside the Gunicorn workers, which handle the remaining
+API. Both must share the Redis connection registry, so that requests handled
+by the workers reach the devices connected to the gateway.
+"""
+
+
+if __name__ == "__main__":
+    app = rdfm_mgmt_server.setup_with_config_from_env()
+    config = app.config["RDFM_CONFIG"]
+    if config.device_gateway_port is None:
+        print("RDFM_DEVICE_GATEWAY_PORT must be set to run the device gateway")
+        exit(1)
+    if config.connection_registry != configuration.CONNECTION_REGISTRY_REDIS:
+        print("RDFM_CONNECTION_REGISTRY must be set to redis to run the "
+              "device gateway alongside the server")
+        exit(1)
+    device_mgmt.gateway.DeviceGateway(config, app).run()
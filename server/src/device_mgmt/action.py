@@ -3,6 +3,7 @@ import datetime
 import base64
 from typing import Optional
 from device_mgmt.models.action_execution import ActionExecution
+import device_mgmt.router
 from rdfm.ws import RDFM_WS_INVALID_REQUEST, WebSocketException
 from request_models import Action, ActionExec, ActionListQuery
 import server
@@ -42,6 +43,93 @@ def execute_action(mac_address: str, action_id: str) -> Optional[tuple[int, str]
     action_log.status = "pending"
     server.instance._action_logs_db.insert(action_log)
 
+    status_code, output = server.instance.router.call_device(
+        mac_address, "execute_action", mac_address, action_id, action_log.id
+    )
+    return status_code, output
+
+
+def submit_action(mac_address: str, action_id: str, priority: int = 0) -> str:
+    """Submit an action execution without waiting for its result
+
+    The execution is driven by the action scheduler of the server process
+    the device is connected to. If the device is not connected, the
+    execution stays pending until the device reconnects.
+    Executions with a higher priority are sent to the device first.
+    The action is validated against the actions reported by the device
+    (see: `is_known_action`), the device is not queried.
+
+    Returns:
+        identifier of the execution in the action log
+    """
+    if not is_known_action(mac_address, action_id):
+        msg = f"Action '{action_id}' doesn't exist for device '{mac_address}'."
+        raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
+
+    action_log = models.action_log.ActionLog()
+    action_log.id = str(uuid.uuid4())
+    action_log.action_id = action_id
+    action_log.mac_address = mac_address
+    action_log.created = datetime.datetime.utcnow()
+    action_log.status = "pending"
+    action_log.priority = priority
+    server.instance._action_logs_db.insert(action_log)
+
+    try:
+        server.instance.router.call_device(
+            mac_address, "submit_action", mac_address, action_id, action_log.id,
+            priority
+        )
+    except WebSocketException as e:
+        if "not connected to the management WS" not in e.message:
+            raise
+        print(e.message, flush=True)
+    return action_log.id
+
+
+@device_mgmt.router.handler("submit_action")
+def schedule_logged_action(mac_address: str, action_id: str, action_log_id: str,
+                           priority: int = 0):
+    """Schedule an action execution on a device connected to this server process"""
+    if not (remote_device := server.instance.remote_devices.get(mac_address)):
+        msg = f"Device '{mac_address}' not connected to the management WS."
+        raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
+
+    if remote_device.actions_updated.is_set():
+        schedule_action(mac_address, action_id, action_log_id, priority)
+    else:
+        # The submitting request does not wait until the device reports
+        # its actions, they are resolved in the background instead
+        server.instance.admission.stage(
+            schedule_action, mac_address, action_id, action_log_id, priority
+        )
+
+
+def schedule_action(mac_address: str, action_id: str, action_log_id: str,
+                    priority: int):
+    """Hand an action execution over to the action scheduler
+
+    Executions of actions that the device does not support fail,
+    which is recorded in the action log.
+    """
+    actions = {x.action_id: x for x in ensure_actions(mac_address)}
+    if not (action := actions.get(action_id)):
+        print(f"Action '{action_id}' doesn't exist for device '{mac_address}'.",
+              flush=True)
+        server.instance._action_logs_db.update_status(action_log_id, "error")
+        return
+
+    execution = ActionExecution(action, action_log_id)
+    server.instance.action_executions.add(execution)
+    server.instance.action_scheduler.submit(
+        current_app._get_current_object(), mac_address, execution, priority
+    )
+
+
+@device_mgmt.router.handler("execute_action")
+def execute_logged_action(mac_address: str, action_id: str,
+                          action_log_id: str) -> tuple[int, str]:
+    """Execute an action on a device connected to this server process"""
     if not (remote_device := server.instance.remote_devices.get(mac_address)):
         msg = f"Device '{mac_address}' not connected to the management WS."
         raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
@@ -50,10 +138,10 @@ def execute_action(mac_address: str, action_id: str) -> Optional[tuple[int, str]
 
     if not (action := remote_device.actions.get(action_id)):
         msg = f"Action '{action_id}' doesn't exist for device '{mac_address}'."
-        server.instance._action_logs_db.update_status(action_log.id, "error")
+        server.instance._action_logs_db.update_status(action_log_id, "error")
         raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
 
-    execution = ActionExecution(action, action_log.id)
+    execution = ActionExecution(action, action_log_id)
     server.instance.action_executions.add(execution)
 
     try:
@@ -63,6 +151,7 @@ def execute_action(mac_address: str, action_id: str) -> Optional[tuple[int, str]
             flush=True,
         )
         while True:
+            server.instance.action_executions.refresh(execution)
             remote_device.send_message(
                 ActionExec(action_id=action.action_id, execution_id=execution.execution_id)
             )
@@ -127,6 +216,9 @@ def execute_action_result(execution_id: str, status_code: int, output: str):
         download_url = add_output_to_storage(execution_id, output)
     server.instance._action_logs_db.update_status(execution_id, status_code, download_url)
 
+    if execution.notify is not None:
+        execution.notify()
+
 
 def execute_action_control(execution_id: str, status: str):
     if not (execution := server.instance.action_executions.get(execution_id)):
@@ -134,16 +226,66 @@ def execute_action_control(execution_id: str, status: str):
         raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
 
     execution.execution_control.put(status)
+    if execution.notify is not None:
+        execution.notify()
+
+
+def list_actions(mac_address: str) -> list[dict]:
+    """List actions of a device
+
+    The actions of a device connected to any server process are listed by
+    the process the device is connected to. For a device that is not
+    connected, the actions it reported last are returned.
+
+    Returns:
+        serialized actions
+    """
+    if not server.instance.remote_devices.is_connected(mac_address):
+        if (catalog := server.instance._action_catalogs_db.fetch(mac_address)):
+            return catalog.actions
+    return server.instance.router.call_device(
+        mac_address, "list_actions", mac_address
+    )
+
+
+@device_mgmt.router.handler("list_actions")
+def dump_actions(mac_address: str) -> list[dict]:
+    return [x.model_dump() for x in ensure_actions(mac_address)]
+
+
+def is_known_action(mac_address: str, action_id: str) -> bool:
+    """Check whether the device supports the given action, without querying it
+
+    The actions of a device connected to this server process are used once
+    they were received, otherwise the actions the device reported last.
+    Actions of devices that have never reported their actions are accepted.
+    """
+    remote_device = server.instance.remote_devices.get(mac_address)
+    if remote_device is not None and remote_device.actions_updated.is_set():
+        return action_id in remote_device.actions
+    catalog = server.instance._action_catalogs_db.fetch(mac_address)
+    return catalog is None or any(x["action_id"] == action_id for x in catalog.actions)
 
 
 def ensure_actions(mac_address: str) -> list[Action]:
+    """Get the actions of a device connected to this server process
+
+    The actions are queried from the device, unless they were already
+    received, or stored by a previous connection of the device with the
+    same actions version. Concurrent callers share a single query.
+    """
     if not (remote_device := server.instance.remote_devices.get(mac_address)):
         msg = f"Device '{mac_address}' not connected to the management WS."
         raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
 
-    if not remote_device.actions_updated.is_set():
-        try:
-            remote_device.actions_updated.clear()
+    # The version of the actions is reported along with the capabilities,
+    # so this only waits for devices that have just connected
+    if not remote_device.capabilities_updated.wait(ACTION_UPDATE_TIMEOUT):
+        msg = f"Capability list for '{mac_address} timed-out in {ACTION_UPDATE_TIMEOUT}s.'"
+        raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
+
+    with remote_device.actions_query_lock:
+        if not remote_device.actions_updated.is_set():
             remote_device.send_message(
                 ActionListQuery()
             )
@@ -151,25 +293,37 @@ def ensure_actions(mac_address: str) -> list[Action]:
             if not remote_device.actions_updated.wait(ACTION_UPDATE_TIMEOUT):
                 msg = f"Action list for '{mac_address} timed-out in {ACTION_UPDATE_TIMEOUT}s.'"
                 raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
-        finally:
-            pass
 
     return list(remote_device.actions.values())
 
 
 def send_action_queue(mac_address: str):
+    """Schedule the pending actions of a newly connected device
+
+    Called once the device has reported its capabilities.
+
+    The executions are handed over to the action scheduler, which sends
+    them to the device one at a time in the order of their priority,
+    so that a device that was offline for a long time is not flooded
+    with all of its pending actions at once.
+    """
     if not (remote_device := server.instance.remote_devices.get(mac_address)):
         msg = f"Device '{mac_address}' not connected to the management WS."
         raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
 
-    if not remote_device.capabilities_updated.wait(ACTION_UPDATE_TIMEOUT):
-        msg = f"Capability list for '{mac_address} timed-out in {ACTION_UPDATE_TIMEOUT}s.'"
-        raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
+    actions = server.instance._action_logs_db.fetch_device_queue(mac_address)
+    if len(actions) == 0:
+        return
 
+    # The actions of the device are only needed to schedule the queue
     ensure_actions(mac_address)
-    actions = server.instance._action_logs_db.fetch_device_queue(mac_address)
 
+    app = current_app._get_current_object()
     for action in actions:
+        if server.instance.action_executions.get(action.id) is not None:
+            # Already scheduled during a previous connection of the device
+            continue
+
         if not (action_type := remote_device.actions.get(action.action_id)):
             server.instance._action_logs_db.update_status(action.id, "error")
             msg = f"Skipping invalid action '{action.action_id}' for device '{mac_address}'."
@@ -178,10 +332,7 @@ def send_action_queue(mac_address: str):
 
         execution = ActionExecution(action_type, action.id)
         server.instance.action_executions.add(execution)
-
-        remote_device.send_message(
-            ActionExec(action_id=action.action_id, execution_id=action.id)
-        )
+        server.instance.action_scheduler.submit(app, mac_address, execution, action.priority)
 
 
 def add_output_to_storage(execution_id: str, output: str) -> Optional[str]:
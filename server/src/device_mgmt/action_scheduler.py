@@ -0,0 +1,270 @@
+import heapq
+import itertools
+import json
+import queue
+import threading
+import time
+from typing import Optional
+from flask import Flask
+from simple_websocket.errors import ConnectionClosed
+from request_models import ActionExec
+from rdfm.ws import WebSocketException
+from device_mgmt.models.action_execution import ActionExecution
+from device_mgmt.action import (
+    QUEUE_RETRY_DELAY,
+    QUEUE_RESPONSE_TIMEOUT,
+    EXECUTION_TOTAL_TIMEOUT,
+)
+import server
+
+
+class _ScheduledExecution:
+    """State of an action execution driven by the scheduler
+
+    The execution goes through the following states:
+        - waiting: awaiting its turn in the dispatch queue of the device
+        - queueing: `ActionExec` was sent, awaiting `ActionExecControl`
+        - retrying: the device queue was full, awaiting the next attempt
+        - running: the device has queued the action, awaiting the result
+    The deadline of the current state is stored together with the state,
+    timers that do not match the current deadline are ignored.
+    """
+
+    def __init__(self, app: Flask, mac_address: str, execution: ActionExecution,
+                 priority: int):
+        self.app = app
+        self.mac_address = mac_address
+        self.execution = execution
+        self.priority = priority
+        self.state = "waiting"
+        self.deadline = 0.0
+
+
+class ActionScheduler:
+    """Drives asynchronous action executions from a single thread
+
+    Instead of occupying a thread for each execution until the device
+    reports the result, the scheduler sends the `ActionExec` requests,
+    retries them while the action queue of the device is full, and
+    handles the `ActionExecControl`/`ActionExecResult` responses as
+    they arrive. Finished executions are recorded in the action log,
+    and published as `action` server-side events.
+
+    Executions are dispatched to each device one at a time, highest
+    priority first: the next execution is sent only once the device has
+    queued the previous one. While the action queue of the device is full,
+    no further executions are sent, so that the executions are fed to
+    the device at the rate it is able to accept them.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._events: queue.SimpleQueue = queue.SimpleQueue()
+        self._timers: list[tuple[float, int, str]] = []
+        self._counter = itertools.count()
+        self._executions: dict[str, _ScheduledExecution] = {}
+        self._waiting: dict[str, list[tuple[int, int, str]]] = {}
+        self._dispatched: dict[str, str] = {}
+        self._ready: set[str] = set()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, app: Flask, mac_address: str, execution: ActionExecution,
+               priority: int = 0):
+        """Start an action execution on a device connected to this process
+
+        The execution must already be tracked in `action_executions`,
+        it is removed once the execution has finished. Executions with
+        a higher priority are sent to the device first.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._schedule_loop,
+                                                daemon=True)
+                self._thread.start()
+        execution.notify = lambda: self._events.put(execution.execution_id)
+        self._events.put(_ScheduledExecution(app, mac_address, execution, priority))
+
+    def _schedule_loop(self):
+        while True:
+            timeout = None
+            if self._timers:
+                timeout = max(0.0, self._timers[0][0] - time.monotonic())
+            try:
+                event = self._events.get(timeout=timeout)
+            except queue.Empty:
+                event = None
+
+            if isinstance(event, _ScheduledExecution):
+                self._enqueue(event)
+            elif event is not None and event in self._executions:
+                self._process(self._executions[event], expired=False)
+
+            now = time.monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                deadline, _, execution_id = heapq.heappop(self._timers)
+                scheduled = self._executions.get(execution_id)
+                if scheduled is not None and scheduled.deadline == deadline:
+                    self._process(scheduled, expired=True)
+
+            self._dispatch()
+
+    def _enqueue(self, scheduled: _ScheduledExecution):
+        execution_id = scheduled.execution.execution_id
+        self._executions[execution_id] = scheduled
+        waiting = self._waiting.setdefault(scheduled.mac_address, [])
+        heapq.heappush(waiting, (-scheduled.priority, next(self._counter), execution_id))
+        self._ready.add(scheduled.mac_address)
+
+    def _dispatch(self):
+        """Send the next waiting execution to each device that is ready for it"""
+        while self._ready:
+            mac_address = self._ready.pop()
+            if mac_address in self._dispatched:
+                continue
+            waiting = self._waiting.get(mac_address)
+            if not waiting:
+                self._waiting.pop(mac_address, None)
+                continue
+            _, _, execution_id = heapq.heappop(waiting)
+            if (scheduled := self._executions.get(execution_id)) is None:
+                # Expired while waiting
+                self._ready.add(mac_address)
+                continue
+            self._dispatched[mac_address] = execution_id
+            scheduled.state = "queueing"
+            # If the execution finishes right away, the device is ready again
+            self._process(scheduled, expired=False)
+
+    def _process(self, scheduled: _ScheduledExecution, expired: bool):
+        with scheduled.app.app_context():
+            try:
+                self._advance(scheduled, expired)
+            except Exception as e:
+                print(f"Action scheduler: execution '{scheduled.execution.execution_id}' "
+                      "failed:", repr(e), flush=True)
+                self._finish(scheduled, "error")
+
+    def _advance(self, scheduled: _ScheduledExecution, expired: bool):
+        execution = scheduled.execution
+        if execution.execution_completed.is_set():
+            # Expired executions are completed without a status code, those
+            # that were never sent stay pending until the device reconnects
+            status = execution.status_code
+            if status is not None:
+                self._finish(scheduled, str(status))
+            else:
+                self._finish(scheduled, "pending" if scheduled.state == "waiting" else "error")
+            return
+
+        if scheduled.state == "waiting":
+            return
+
+        if scheduled.state == "retrying":
+            if expired:
+                self._send(scheduled)
+            return
+
+        if scheduled.state == "queueing":
+            if scheduled.deadline == 0.0:
+                action_log = server.instance._action_logs_db.fetch_one(execution.execution_id)
+                if action_log is None or action_log.status != "pending":
+                    print(f"Execution '{execution.execution_id}' was removed from "
+                          "the action queue.", flush=True)
+                    self._finish(scheduled, None)
+                    return
+                self._send(scheduled)
+                return
+            try:
+                control_msg = execution.execution_control.get_nowait()
+            except queue.Empty:
+                if expired:
+                    print(f"Client failed to respond to execution '{execution.execution_id}' "
+                          f"in {QUEUE_RESPONSE_TIMEOUT}s.", flush=True)
+                    self._finish(scheduled, "error")
+                return
+
+            if control_msg == "ok":
+                print(f"Queued execution '{execution.execution_id}'.", flush=True)
+                server.instance._action_logs_db.update_status(execution.execution_id, "sent")
+                execution.execution_queued.set()
+                self._set_state(scheduled, "running", EXECUTION_TOTAL_TIMEOUT)
+            elif control_msg == "full":
+                print(f"Failed to queue execution '{execution.execution_id}'. "
+                      f"Retrying in {QUEUE_RETRY_DELAY}s seconds...", flush=True)
+                self._set_state(scheduled, "retrying", QUEUE_RETRY_DELAY)
+            else:
+                print(f"Unknown control message: '{control_msg}'.", flush=True)
+                self._finish(scheduled, "error")
+            return
+
+        if scheduled.state == "running" and expired:
+            print(f"Execution '{execution.execution_id}' "
+                  f"timed-out after {EXECUTION_TOTAL_TIMEOUT}s.", flush=True)
+            self._finish(scheduled, "error")
+
+    def _send(self, scheduled: _ScheduledExecution):
+        execution = scheduled.execution
+        remote_device = server.instance.remote_devices.get(scheduled.mac_address)
+        server.instance.action_executions.refresh(execution)
+        try:
+            if remote_device is not None:
+                remote_device.send_message(
+                    ActionExec(action_id=execution.action.action_id,
+                               execution_id=execution.execution_id)
+                )
+        except (ConnectionClosed, OSError):
+            remote_device = None
+        except WebSocketException as e:
+            print(f"Failed to send execution '{execution.execution_id}':", e.message,
+                  flush=True)
+            self._finish(scheduled, "error")
+            return
+
+        if remote_device is None:
+            # The execution stays pending until the device reconnects
+            print(f"Device '{scheduled.mac_address}' disconnected, execution "
+                  f"'{execution.execution_id}' stays pending.", flush=True)
+            self._finish(scheduled, "pending")
+            return
+        self._set_state(scheduled, "queueing", QUEUE_RESPONSE_TIMEOUT)
+
+    def _set_state(self, scheduled: _ScheduledExecution, state: str, timeout: float):
+        scheduled.state = state
+        scheduled.deadline = time.monotonic() + timeout
+        heapq.heappush(self._timers, (scheduled.deadline, next(self._counter),
+                                      scheduled.execution.execution_id))
+        if state == "running":
+            self._release(scheduled)
+
+    def _release(self, scheduled: _ScheduledExecution):
+        """Allow the next waiting execution to be sent to the device"""
+        mac_address = scheduled.mac_address
+        if self._dispatched.get(mac_address) == scheduled.execution.execution_id:
+            del self._dispatched[mac_address]
+            self._ready.add(mac_address)
+
+    def _finish(self, scheduled: _ScheduledExecution, status: Optional[str]):
+        """Stop tracking the execution, and publish its status
+
+        Executions that were removed from the action log are finished
+        without a status, and are not published.
+        """
+        execution = scheduled.execution
+        if self._executions.pop(execution.execution_id, None) is None:
+            return
+        self._release(scheduled)
+        server.instance.action_executions.remove(execution)
+        if status is None:
+            return
+        if status == "error":
+            server.instance._action_logs_db.update_status(execution.execution_id, "error")
+
+        message = {
+            "device": scheduled.mac_address,
+            "execution": execution.execution_id,
+            "status": status,
+        }
+        try:
+            server.instance.sse.publish(json.dumps(message), type='action')
+        except KeyError:
+            print("Redis is not configured. Unable to send action updates.")
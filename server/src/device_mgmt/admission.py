@@ -0,0 +1,125 @@
+import concurrent.futures
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+from flask import Flask, current_app, has_app_context
+from rdfm.ws import RETRY_AFTER_PREFIX
+
+
+MIN_RETRY_AFTER = 1.0
+"""Minimum delay (in seconds) after which a rejected device may reconnect"""
+
+MAX_DEFER_INTERVAL = 1.0
+"""Maximum interval (in seconds) between checks whether deferred
+post-connect work can run"""
+
+
+class AdmissionControl:
+    """Admission control of the device management WebSocket
+
+    After a server restart or a network outage, the whole fleet reconnects
+    at once. New connections are admitted at a limited rate using a token
+    bucket: up to `burst` connections are admitted at once, and the bucket
+    is refilled with `rate` connections per second. Connections exceeding
+    the rate are rejected before the device is authenticated, and the
+    device is told after how long to reconnect. The delays are spread at
+    random over the time needed to admit all recently rejected devices, so
+    that they do not reconnect at once again.
+
+    Work done after a device has connected that is not required for
+    handling its requests, such as sending its action queue, is staged and
+    run by a limited amount of workers. While connections are being
+    rejected, the staged work is deferred until the backlog of rejected
+    devices has been admitted.
+    """
+
+    def __init__(self, rate: float, burst: int, workers: int,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        Args:
+            rate: amount of connections admitted per second, or zero to
+                  admit all connections
+            burst: maximum amount of connections admitted at once
+            workers: amount of threads running the staged work
+            clock: source of monotonic time, in seconds
+        """
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        # Amount of rejected connections that were not admitted yet
+        self._backlog = 0.0
+        self._updated = clock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="post-connect",
+        )
+
+    def admit(self) -> bool:
+        """Take a token for a new connection
+
+        Returns:
+            False, if the connection should be rejected
+        """
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self.__refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self._backlog += 1
+            return False
+
+    def retry_after(self) -> float:
+        """Delay (in seconds) after which a rejected device should reconnect"""
+        with self._lock:
+            self.__refill()
+            window = self._backlog / self.rate if self.rate > 0 else 0.0
+        return MIN_RETRY_AFTER + random.uniform(0, window)
+
+    def retry_message(self) -> str:
+        """Close message of a rejected connection, see: `RDFM_WS_TRY_AGAIN_LATER`"""
+        return f"{RETRY_AFTER_PREFIX}{self.retry_after():.1f}"
+
+    def under_load(self) -> bool:
+        """Whether connections were rejected recently"""
+        with self._lock:
+            self.__refill()
+            return self._backlog > 0
+
+    def stage(self, f: Callable[..., Any], *args):
+        """Run post-connect work of a device in the background
+
+        The function is run within the current app context, once the server
+        is no longer under load.
+        """
+        app = current_app._get_current_object() if has_app_context() else None
+        self._executor.submit(self.__run_staged, app, f, *args)
+
+    def __run_staged(self, app: Optional[Flask], f: Callable[..., Any], *args):
+        while (delay := self.__backlog_drain_time()) > 0:
+            time.sleep(min(delay, MAX_DEFER_INTERVAL))
+        try:
+            if app is None:
+                f(*args)
+            else:
+                with app.app_context():
+                    f(*args)
+        except Exception as e:
+            print("Post-connect work failed:", repr(e), flush=True)
+
+    def __backlog_drain_time(self) -> float:
+        with self._lock:
+            self.__refill()
+            return self._backlog / self.rate if self.rate > 0 else 0.0
+
+    def __refill(self):
+        now = self._clock()
+        elapsed = max(0.0, now - self._updated)
+        self._updated = now
+        self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+        # Rejected devices are expected to be admitted back at the same rate
+        self._backlog = max(0.0, self._backlog - elapsed * self.rate)
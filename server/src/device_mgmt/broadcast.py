@@ -0,0 +1,107 @@
+import datetime
+import json
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from flask import Flask, current_app
+from rdfm.ws import WebSocketException
+import models.action_log
+import server
+
+
+class ActionBroadcasts:
+    """Executes actions on all devices of a group or with a given tag
+
+    Actions are executed on the connected devices with bounded concurrency,
+    shared by all broadcasts started on this server process. Devices that
+    are not connected keep their execution pending in the action log,
+    and receive the action once they reconnect (see: `send_action_queue`).
+
+    Results are stored in the action log, and each finished execution is
+    published as an `action_broadcast` server-side event.
+    """
+
+    def __init__(self, concurrency: int) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="action-broadcast"
+        )
+
+    def start(
+        self,
+        action_id: str,
+        group: Optional[int] = None,
+        tag: Optional[str] = None,
+        priority: int = 0,
+    ) -> models.action_log.ActionBroadcast:
+        """Start executing an action on the targeted devices
+
+        Must be called within the application context.
+
+        Args:
+            action_id: identifier of the action to execute
+            group: identifier of the group whose devices are targeted
+            tag: tag of the targeted devices
+            priority: priority of the executions pending until
+                      the devices reconnect
+        """
+        devices = server.instance._devices_db.fetch_filtered(group=group, tag=tag)
+        broadcast = models.action_log.ActionBroadcast(
+            id=str(uuid.uuid4()),
+            action_id=action_id,
+            created=datetime.datetime.utcnow(),
+            group=group,
+            tag=tag,
+        )
+        executions = server.instance._action_logs_db.insert_broadcast(
+            broadcast, [device.mac_address for device in devices], priority
+        )
+
+        app = current_app._get_current_object()
+        connected = server.instance.remote_devices.connected(
+            execution.mac_address for execution in executions
+        )
+        for execution in executions:
+            if execution.mac_address in connected:
+                self.executor.submit(self.__execute, app, execution)
+        print(
+            f"Broadcasting action '{action_id}' to {len(executions)} devices, "
+            f"{len(connected)} "
+            "of them connected",
+            flush=True,
+        )
+        return broadcast
+
+    def __execute(self, app: Flask, execution: models.action_log.ActionLog):
+        with app.app_context():
+            event = {
+                "broadcast": execution.broadcast_id,
+                "device": execution.mac_address,
+                "execution": execution.id,
+            }
+            try:
+                event["status_code"], _ = server.instance.router.call_device(
+                    execution.mac_address, "execute_action",
+                    execution.mac_address, execution.action_id, execution.id
+                )
+                event["status"] = "finished"
+            except WebSocketException as e:
+                if "not connected to the management WS" in e.message:
+                    # The execution stays pending until the device reconnects
+                    event["status"] = "pending"
+                else:
+                    print(f"Broadcast execution '{execution.id}' failed:",
+                          e.message, flush=True)
+                    server.instance._action_logs_db.update_status(execution.id, "error")
+                    event["status"] = "error"
+            except Exception as e:
+                traceback.print_exc()
+                print(f"Broadcast execution '{execution.id}' failed:", repr(e),
+                      flush=True)
+                server.instance._action_logs_db.update_status(execution.id, "error")
+                event["status"] = "error"
+
+            try:
+                server.instance.sse.publish(json.dumps(event), type='action_broadcast')
+            except KeyError:
+                print("Redis is not configured. Unable to send broadcast updates.")
@@ -1,27 +1,67 @@
-from typing import Optional
+from typing import Iterable, List, Optional, Set
 from device_mgmt.models.remote_device import RemoteDevice
 from device_mgmt.models.reverse_shell import ReverseShell
 from device_mgmt.models.action_execution import ActionExecution
 from device_mgmt.models.filesystem_operation import FilesystemOperation
+from device_mgmt.router import MessageRouter, DEVICES, SHELLS
+from device_mgmt.expiry import ExpiringRegistry, TimerWheel
+from device_mgmt.registry import StripedRegistry
 from uuid import UUID
 
 
 class RemoteDevices:
-    """Container for tracking devices connected to the management WebSocket"""
+    """Container for tracking devices connected to the management WebSocket
 
-    _remote_devices: dict[str, RemoteDevice] = {}
+    Connections are also registered in the router, so that devices connected
+    to other server processes are visible as well. Only connections held by
+    this process can be accessed directly (see: `get`).
+    """
 
-    def add(self, device: RemoteDevice):
-        """Add a new device to the tracked devices"""
-        self._remote_devices[device.token.device_id] = device
+    _remote_devices: StripedRegistry[RemoteDevice]
+
+    def __init__(self, router: MessageRouter):
+        self._router = router
+        self._remote_devices = StripedRegistry()
+
+    def add(self, device: RemoteDevice) -> bool:
+        """Add a new device to the tracked devices
+
+        Returns:
+            False, if the device is already connected to any server process
+        """
+        if not self._router.register(DEVICES, device.token.device_id):
+            return False
+        self._remote_devices.add(device.token.device_id, device)
+        return True
 
     def remove(self, device: RemoteDevice):
         """Remove a device from tracked devices"""
-        self._remote_devices.pop(device.token.device_id)
+        self._remote_devices.remove(device.token.device_id, device)
+        self._router.unregister(DEVICES, device.token.device_id)
 
     def get(self, mac_address: str) -> Optional[RemoteDevice]:
-        """Get a device connection by MAC address"""
-        return self._remote_devices.get(mac_address, None)
+        """Get a device connection held by this process by MAC address"""
+        return self._remote_devices.get(mac_address)
+
+    def is_connected(self, mac_address: str) -> bool:
+        """Check if the device is connected to any server process"""
+        return self._router.owner(DEVICES, mac_address) is not None
+
+    def connected(self, mac_addresses: Iterable[str]) -> Set[str]:
+        """Get the given devices which are connected to any server process
+
+        The devices are looked up together, in time proportional to
+        their amount rather than to the amount of all connected devices.
+        """
+        return set(self._router.owners(DEVICES, list(mac_addresses)))
+
+    def mac_addresses(self) -> List[str]:
+        """Get the MAC addresses of devices connected to any server process"""
+        return list(self._router.entries(DEVICES).keys())
+
+    def count(self) -> int:
+        """Get the amount of devices connected to any server process"""
+        return self._router.count(DEVICES)
 
 
 def _format_shell_key(mac_address: str, uuid: UUID) -> str:
@@ -29,62 +69,104 @@ def _format_shell_key(mac_address: str, uuid: UUID) -> str:
 
 
 class ShellSessions:
-    """Container for tracking active shell sessions"""
+    """Container for tracking active shell sessions
+
+    Sessions are registered in the router, as the device may attach to
+    the session through a different server process than the manager.
+    """
 
-    _shell_sessions: dict[str, ReverseShell] = {}
+    _shell_sessions: StripedRegistry[ReverseShell]
+
+    def __init__(self, router: MessageRouter):
+        self._router = router
+        self._shell_sessions = StripedRegistry()
 
     def add(self, shell: ReverseShell):
         """Add a new shell session to the active shell session list"""
-        self._shell_sessions[
-            _format_shell_key(shell.mac_addr, shell.uuid)
-        ] = shell
+        key = _format_shell_key(shell.mac_addr, shell.uuid)
+        self._shell_sessions.add(key, shell)
+        self._router.register(SHELLS, key)
 
     def remove(self, shell: ReverseShell):
         """Remove the specified shell session"""
-        self._shell_sessions.pop(_format_shell_key(shell.mac_addr, shell.uuid))
+        key = _format_shell_key(shell.mac_addr, shell.uuid)
+        self._shell_sessions.remove(key, shell)
+        self._router.unregister(SHELLS, key)
 
     def get(self, mac_address: str, uuid: UUID) -> Optional[ReverseShell]:
-        """Get a shell session specified by the device MAC and UUID"""
-        return self._shell_sessions.get(
-            _format_shell_key(mac_address, uuid), None
+        """Get a shell session held by this process by device MAC and UUID"""
+        return self._shell_sessions.get(_format_shell_key(mac_address, uuid))
+
+    def owner(self, mac_address: str, uuid: UUID) -> Optional[str]:
+        """Get the server node holding the shell session"""
+        return self._router.owner(
+            SHELLS, _format_shell_key(mac_address, uuid)
         )
 
 
-class ActionExecutions:
-    """Container for tracking action executions"""
+def _fail_execution(execution: ActionExecution):
+    print(f"Execution '{execution.execution_id}' expired.", flush=True)
+    execution.status_code = None
+    execution.execution_completed.set()
+    if execution.notify is not None:
+        execution.notify()
 
-    _action_executions: dict[str, ActionExecution] = {}
+
+def _fail_operation(operation: FilesystemOperation):
+    print(f"Filesystem operation '{operation.id}' expired.", flush=True)
+    operation.response = None
+    operation.completed.set()
+
+
+class ActionExecutions(ExpiringRegistry[ActionExecution]):
+    """Container for tracking action executions
+
+    Executions that were not removed within their timeout are completed
+    without a status code.
+    """
+
+    def __init__(self, wheel: TimerWheel, timeout: float):
+        super().__init__(wheel, timeout, _fail_execution)
 
     def add(self, execution: ActionExecution):
         """Add a new action execution."""
-        self._action_executions[execution.execution_id] = execution
+        self._add(execution.execution_id, execution)
 
     def remove(self, execution: ActionExecution):
         """Remove the specified action execution."""
-        self._action_executions.pop(execution.execution_id)
+        self._remove(execution.execution_id)
 
     def get(self, execution_id: str) -> Optional[ActionExecution]:
         """Get action execution by its identifier."""
-        return self._action_executions.get(
-            execution_id, None
-        )
+        return self._get(execution_id)
+
+    def refresh(self, execution: ActionExecution):
+        """Restart the timeout of the execution, when it is sent to the device"""
+        self._refresh(execution.execution_id)
+
 
+class FilesystemOperations(ExpiringRegistry[FilesystemOperation]):
+    """Container for tracking filesystem operations
 
-class FilesystemOperations:
-    """Container for tracking filesystem operations"""
+    Operations that were not removed within their timeout are completed
+    without a response.
+    """
 
-    _filesystem_operations: dict[str, FilesystemOperation] = {}
+    def __init__(self, wheel: TimerWheel, timeout: float):
+        super().__init__(wheel, timeout, _fail_operation)
 
-    def add(self, operation: FilesystemOperation):
-        """Add a new operation."""
-        self._filesystem_operations[operation.id] = operation
+    def add(self, operation: FilesystemOperation, timeout: Optional[float] = None):
+        """Add a new operation, optionally with a non-default timeout."""
+        self._add(operation.id, operation, timeout)
 
     def remove(self, operation: FilesystemOperation):
         """Remove the specified operation."""
-        self._filesystem_operations.pop(operation.id)
+        self._remove(operation.id)
 
     def get(self, operation_id: str) -> Optional[FilesystemOperation]:
         """Get operation by its identifier."""
-        return self._filesystem_operations.get(
-            operation_id, None
-        )
+        return self._get(operation_id)
+
+    def refresh(self, operation: FilesystemOperation):
+        """Restart the timeout of the operation, when the device makes progress"""
+        self._refresh(operation.id)
@@ -0,0 +1,160 @@
+import math
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+class TimerHandle:
+    """Timer scheduled on a `TimerWheel`, used for cancelling it"""
+
+    __slots__ = ("slot", "rounds", "callback")
+
+    def __init__(self, slot: int, rounds: int, callback: Callable[[], None]):
+        self.slot = slot
+        self.rounds = rounds
+        self.callback = callback
+
+
+class TimerWheel:
+    """Hashed timing wheel
+
+    Timers are placed in one of the slots of the wheel, which is advanced
+    by one slot every tick. Timers that are further away than a full turn
+    of the wheel wait for the remaining amount of turns in their slot.
+    Scheduling and cancelling a timer are O(1), regardless of the amount
+    of scheduled timers, at the cost of firing timers with the precision
+    of a single tick.
+
+    Callbacks are called from the thread driving the wheel, and must not
+    block.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512) -> None:
+        """
+        Args:
+            tick: duration of a single slot, in seconds
+            slots: amount of slots in the wheel
+        """
+        self.tick = tick
+        self._lock = threading.Lock()
+        self._slots: list[set[TimerHandle]] = [set() for _ in range(slots)]
+        self._cursor = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, timeout: float, callback: Callable[[], None]) -> TimerHandle:
+        """Call the callback once the timeout (in seconds) has elapsed"""
+        # The current slot is being fired, a timer always waits at least
+        # until the next one
+        ticks = max(1, math.ceil(timeout / self.tick))
+        with self._lock:
+            slot = (self._cursor + ticks) % len(self._slots)
+            handle = TimerHandle(slot, (ticks - 1) // len(self._slots), callback)
+            self._slots[slot].add(handle)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return handle
+
+    def cancel(self, handle: TimerHandle):
+        """Cancel a timer, if it has not fired yet"""
+        with self._lock:
+            self._slots[handle.slot].discard(handle)
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.tick
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+
+            expired = []
+            with self._lock:
+                self._cursor = (self._cursor + 1) % len(self._slots)
+                slot = self._slots[self._cursor]
+                for handle in list(slot):
+                    if handle.rounds > 0:
+                        handle.rounds -= 1
+                    else:
+                        slot.remove(handle)
+                        expired.append(handle)
+
+            for handle in expired:
+                try:
+                    handle.callback()
+                except Exception as e:
+                    print("Timer callback failed:", repr(e), flush=True)
+
+
+class ExpiringRegistry(Generic[T]):
+    """Registry of in-flight operations awaiting a reply from a device
+
+    Each operation is expired once its timeout elapses without it being
+    removed. Expired operations are removed from the registry and failed
+    using the `expire` callback, so that threads waiting for the reply
+    are woken up.
+    """
+
+    def __init__(self, wheel: TimerWheel, timeout: float,
+                 expire: Callable[[T], None]) -> None:
+        """
+        Args:
+            wheel: timer wheel used for expiring operations
+            timeout: default timeout of an operation, in seconds
+            expire: called with each expired operation
+        """
+        self.timeout = timeout
+        self._wheel = wheel
+        self._expire = expire
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[T, TimerHandle]] = {}
+        self._expired = 0
+
+    def _add(self, key: str, item: T, timeout: Optional[float] = None):
+        with self._lock:
+            self.__schedule(key, item, timeout)
+
+    def _remove(self, key: str) -> Optional[T]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self._wheel.cancel(entry[1])
+            return entry[0]
+
+    def _get(self, key: str) -> Optional[T]:
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def _refresh(self, key: str, timeout: Optional[float] = None):
+        """Restart the timeout of an operation, if it is still in-flight"""
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None:
+                self.__schedule(key, entry[0], timeout)
+
+    def __schedule(self, key: str, item: T, timeout: Optional[float]):
+        # The wheel never calls back into the registry while holding its lock
+        if (previous := self._entries.get(key)) is not None:
+            self._wheel.cancel(previous[1])
+        handle = self._wheel.schedule(
+            timeout if timeout is not None else self.timeout,
+            lambda: self.__expire(key, handle),
+        )
+        self._entries[key] = (item, handle)
+
+    def counts(self) -> dict[str, int]:
+        """Get the amount of in-flight and expired operations"""
+        with self._lock:
+            return {"in_flight": len(self._entries), "expired": self._expired}
+
+    def __expire(self, key: str, handle: TimerHandle):
+        with self._lock:
+            entry = self._entries.get(key)
+            # The operation might have been removed, or refreshed in the meantime
+            if entry is None or entry[1] is not handle:
+                return
+            del self._entries[key]
+            self._expired += 1
+        self._expire(entry[0])
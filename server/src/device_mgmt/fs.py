@@ -1,9 +1,16 @@
+import queue
+import threading
+from typing import Iterator, Optional
+import rdfm.ws
 from rdfm.ws import RDFM_WS_INVALID_REQUEST, WebSocketException
-from device_mgmt.models.filesystem_operation import FilesystemOperation
-from request_models import FsFileDownload, FsFileProbe
+from device_mgmt.models.filesystem_operation import FileRead, FilesystemOperation
+from request_models import FsFileDownload, FsFileProbe, FsFileRead
 from device_mgmt.models.remote_device import RemoteDevice
+import device_mgmt.router
+from device_mgmt.router import DEVICES, RoutedSocket
 import server
 from flask import current_app
+from simple_websocket.errors import ConnectionClosed
 import storage
 import configuration
 import uuid
@@ -12,6 +19,12 @@ from pathlib import Path
 LINK_EXPIRY = 3600
 DOWNLOAD_BUCKET_SUBDIR = "rdfm.downloads"
 
+PROBE_TIMEOUT = 30
+"""Timeout for the file probe request."""
+
+DOWNLOAD_TIMEOUT = LINK_EXPIRY
+"""Timeout for the file download request, the upload links expire afterwards."""
+
 
 def get_file_size(remote_device: RemoteDevice, file: str) -> int | None:
     """Return size of given file or None if does not exist"""
@@ -23,11 +36,32 @@ def get_file_size(remote_device: RemoteDevice, file: str) -> int | None:
     operation.completed.wait()
     server.instance.filesystem_operations.remove(operation)
 
+    if operation.response is None:
+        msg = f"Probing file '{file}' timed-out in {PROBE_TIMEOUT}s."
+        raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
     return operation.response.size if operation.response.status == 0 else None
 
 
-def prepare_download(mac_address: str, file: str) -> tuple[int, str]:
-    """Upload file to the bucket and return status along with the download link"""
+def prepare_download(mac_address: str, file: str,
+                     file_size: Optional[int] = None) -> tuple[int, str]:
+    """Upload file to the bucket and return status along with the download link
+
+    The device may be connected to any server process.
+
+    Args:
+        file_size: size of the file, if it is already known, which saves
+                   probing the file on the device
+    """
+    status, download_url = server.instance.router.call_device(
+        mac_address, "prepare_download", mac_address, file, file_size
+    )
+    return status, download_url
+
+
+@device_mgmt.router.handler("prepare_download")
+def upload_to_storage(mac_address: str, file: str,
+                      file_size: Optional[int] = None) -> tuple[int, str]:
+    """Upload file from a device connected to this server process to the bucket"""
     if not (remote_device := server.instance.remote_devices.get(mac_address)):
         msg = f"Device '{mac_address}' not connected to the management WS."
         raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
@@ -35,7 +69,8 @@ def prepare_download(mac_address: str, file: str) -> tuple[int, str]:
     # First we need to determine file size in order to determine amount of needed
     # upload urls. This check also allows us to terminate early if the file does
     # not exist
-    file_size = get_file_size(remote_device, file)
+    if file_size is None:
+        file_size = get_file_size(remote_device, file)
     if not file_size:
         return 1, ""
 
@@ -51,7 +86,7 @@ def prepare_download(mac_address: str, file: str) -> tuple[int, str]:
         upload_urls, part_size = mpu.generate_urls(file_size, LINK_EXPIRY)
 
         operation = FilesystemOperation()
-        server.instance.filesystem_operations.add(operation)
+        server.instance.filesystem_operations.add(operation, DOWNLOAD_TIMEOUT)
 
         # We send upload urls to the remote device along with the file path and
         # upload part size
@@ -61,6 +96,9 @@ def prepare_download(mac_address: str, file: str) -> tuple[int, str]:
 
         operation.completed.wait()
         server.instance.filesystem_operations.remove(operation)
+        if operation.response is None:
+            msg = f"Downloading file '{file}' timed-out in {DOWNLOAD_TIMEOUT}s."
+            raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
 
         # After receiving answer from the device we can complete the upload and
         # generate download url if the upload succeeded or terminate the upload
@@ -82,3 +120,138 @@ def prepare_download(mac_address: str, file: str) -> tuple[int, str]:
         # In case of failure we have to terminate the upload
         mpu.abort_upload()
         raise e
+
+
+def read_file(
+    mac_address: str, file: str
+) -> tuple[int, Optional[int], Optional[Iterator[bytes]]]:
+    """Read a file from a device, streaming it if it is small enough
+
+    Files no larger than the configured threshold are sent by the device over
+    the management WebSocket, and their contents can be forwarded directly to
+    the user. Other files must be downloaded through the storage instead
+    (see: `prepare_download`). The device may be connected to any server
+    process.
+
+    Returns:
+        status reported by the device, where non-zero means that the file
+        could not be read, the size of the file (None if it is not known yet),
+        and an iterator over the contents of the file (None if the file is
+        not streamed)
+    """
+    node = server.instance.router.owner(DEVICES, mac_address)
+    if node is None:
+        msg = f"Device '{mac_address}' not connected to the management WS."
+        raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
+    if server.instance.router.is_local(node):
+        return start_read(mac_address, file)
+
+    # The contents are relayed from the process the device is connected to
+    # through a stream, which has to be opened before they are sent
+    stream = server.instance.router.open_stream(f"fs_{uuid.uuid4()}", node)
+    try:
+        status, size, streamed = server.instance.router.call(
+            node, "read_file", mac_address, file,
+            stream.stream_id, server.instance.router.node_id
+        )
+    except Exception:
+        stream.close()
+        raise
+    if not streamed:
+        stream.close()
+        return status, size, None
+    return status, size, _receive_stream(stream, size)
+
+
+@device_mgmt.router.handler("read_file")
+def relay_read(mac_address: str, file: str, stream_id: str,
+               node: str) -> tuple[int, Optional[int], bool]:
+    """Stream a file from a device connected to this server process to another node"""
+    status, size, chunks = start_read(mac_address, file)
+    if chunks is None:
+        return status, size, False
+
+    stream = server.instance.router.open_stream(stream_id, node)
+
+    def _forward():
+        try:
+            for chunk in chunks:
+                stream.send(chunk)
+        finally:
+            stream.close()
+
+    threading.Thread(target=_forward, daemon=True).start()
+    return status, size, True
+
+
+def start_read(mac_address: str, file: str) -> tuple[int, Optional[int],
+                                                     Optional[Iterator[bytes]]]:
+    """Read a file from a device connected to this server process
+
+    See: `read_file`
+    """
+    if not (remote_device := server.instance.remote_devices.get(mac_address)):
+        msg = f"Device '{mac_address}' not connected to the management WS."
+        raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
+
+    conf: configuration.ServerConfig = current_app.config["RDFM_CONFIG"]
+    if (conf.fs_stream_threshold == 0
+            or not rdfm.ws.can_handle_request(remote_device.capabilities, "fs_file_read")):
+        return 0, None, None
+
+    operation = FileRead()
+    server.instance.filesystem_operations.add(operation)
+    try:
+        remote_device.send_message(FsFileRead(
+            id=operation.id, file=file, max_size=conf.fs_stream_threshold
+        ))
+        operation.completed.wait()
+    except Exception:
+        server.instance.filesystem_operations.remove(operation)
+        raise
+
+    reply = operation.response
+    if reply is None:
+        msg = f"Reading file '{file}' timed-out in {PROBE_TIMEOUT}s."
+        raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
+    if reply.status != 0 or reply.size > conf.fs_stream_threshold:
+        # The device does not send the contents of files that are too large
+        server.instance.filesystem_operations.remove(operation)
+        return reply.status, reply.size, None
+    return reply.status, reply.size, _read_chunks(operation, reply.size)
+
+
+def _read_chunks(operation: FileRead, size: int) -> Iterator[bytes]:
+    received = 0
+    try:
+        while received < size:
+            try:
+                chunk = operation.chunks.get(timeout=PROBE_TIMEOUT)
+            except queue.Empty:
+                # The response was already started, it must not end as if
+                # the whole file was sent
+                msg = (f"Reading file for operation '{operation.id}' "
+                       f"timed-out in {PROBE_TIMEOUT}s.")
+                raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
+            received += len(chunk)
+            yield chunk
+    finally:
+        server.instance.filesystem_operations.remove(operation)
+
+
+def _receive_stream(stream: RoutedSocket, size: int) -> Iterator[bytes]:
+    received = 0
+    try:
+        while received < size:
+            try:
+                data = stream.receive(PROBE_TIMEOUT)
+            except ConnectionClosed:
+                data = None
+            if data is None:
+                msg = (f"Relaying file from stream '{stream.stream_id}' "
+                       f"ended after {received} of {size} bytes.")
+                raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
+            received += len(data)
+            yield data
+    finally:
+        stream.close()
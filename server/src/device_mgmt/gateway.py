@@ -0,0 +1,397 @@
+import asyncio
+import concurrent.futures
+import datetime
+import json
+import socket
+import ssl
+import threading
+from typing import Any, Callable, Optional
+from flask import Flask
+from simple_websocket.errors import ConnectionClosed
+from werkzeug.datastructures import Authorization
+from wsproto import ConnectionType, WSConnection
+from wsproto.events import (
+    AcceptConnection,
+    BytesMessage,
+    CloseConnection,
+    Ping,
+    RejectConnection,
+    RejectData,
+    Request,
+    TextMessage,
+)
+from wsproto.frame_protocol import CloseReason
+from wsproto.utilities import LocalProtocolError
+from auth.device import DeviceToken, decode_and_verify_token
+from device_mgmt.helpers import WS_PING_INTERVAL
+from device_mgmt.models.remote_device import RemoteDevice
+import configuration
+import rdfm.ws
+from rdfm.ws import (
+    RDFM_WS_DUPLICATE_CONNECTION,
+    RDFM_WS_TRY_AGAIN_LATER,
+    WebSocketException,
+)
+import server
+
+
+""" Path of the device management WebSocket served by the gateway
+"""
+DEVICE_WS_PATH = "/api/v1/devices/ws"
+
+""" Size of the socket reads
+"""
+READ_SIZE = 4096
+
+""" Maximum size of a single message received from a device
+"""
+MAX_MESSAGE_SIZE = 1024 * 1024
+
+
+class GatewaySocket:
+    """WebSocket of a device connected to the gateway
+
+    Implements the part of the `simple_websocket` client interface used by
+    `RemoteDevice`. Sending is thread-safe, and is meant to be used from
+    the writer of the device outbound queue.
+    """
+
+    def __init__(self, connection: "GatewayConnection"):
+        self._connection = connection
+
+    @property
+    def connected(self) -> bool:
+        return not self._connection.closed
+
+    def send(self, data: str | bytes):
+        """Send a message, blocking until it was written to the socket"""
+        asyncio.run_coroutine_threadsafe(
+            self._connection.send(data), self._connection.loop
+        ).result()
+
+    def abort(self):
+        """Abort the connection, failing any pending writes to the socket"""
+        self._connection.loop.call_soon_threadsafe(
+            self._connection.writer.transport.abort
+        )
+
+    def close(self, reason: Optional[int] = None, message: Optional[str] = None):
+        asyncio.run_coroutine_threadsafe(
+            self._connection.close(reason or CloseReason.NORMAL_CLOSURE, message),
+            self._connection.loop,
+        ).result()
+
+
+class GatewayConnection:
+    """A single device connection handled by the gateway"""
+
+    closed: bool
+
+    def __init__(self,
+                 gateway: "DeviceGateway",
+                 reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter):
+        self.gateway = gateway
+        self.loop = asyncio.get_running_loop()
+        self.reader = reader
+        self.writer = writer
+        self.ws = WSConnection(ConnectionType.SERVER)
+        self.closed = False
+        self.device: Optional[RemoteDevice] = None
+        self.awaiting_pong = False
+        self._message: list = []
+        self._message_size = 0
+
+    async def send(self, data: str | bytes):
+        if self.closed:
+            raise ConnectionClosed(CloseReason.NORMAL_CLOSURE, "connection closed")
+        try:
+            self.writer.write(self.ws.send(
+                TextMessage(data=data) if isinstance(data, str)
+                else BytesMessage(data=data)
+            ))
+            await self.writer.drain()
+        except (OSError, LocalProtocolError):
+            self.closed = True
+            raise ConnectionClosed(CloseReason.ABNORMAL_CLOSURE, "connection lost")
+
+    async def close(self, code: int, reason: Optional[str] = None):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.writer.write(self.ws.send(CloseConnection(code=code, reason=reason)))
+            await self.writer.drain()
+        except (OSError, LocalProtocolError):
+            pass
+
+    async def serve(self):
+        """Perform the handshake and process the device messages"""
+        try:
+            token = await self.handshake()
+            if token is None:
+                return
+            ws = GatewaySocket(self)
+            outbox = server.instance.outbound.open(ws, ws.abort)
+            self.device = RemoteDevice(ws, token, outbox)
+            await self.run(self.device)
+        except WebSocketException as e:
+            print("Terminating device WS connection:", e.message, flush=True)
+            await self.close(e.status_code, e.message)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        except Exception as e:
+            print("Device gateway: connection failed:", repr(e), flush=True)
+            await self.close(CloseReason.INTERNAL_ERROR)
+        finally:
+            self.closed = True
+            self.writer.close()
+            if self.device is not None:
+                try:
+                    await self.gateway.execute(disconnected, self.device)
+                except Exception as e:
+                    print("Device gateway: cleanup failed:", repr(e), flush=True)
+
+    async def handshake(self) -> Optional[DeviceToken]:
+        """Accept the WebSocket upgrade of an authenticated device
+
+        Returns:
+            token of the connected device, or None if the connection was rejected
+        """
+        request = None
+        while request is None:
+            data = await asyncio.wait_for(self.reader.read(READ_SIZE),
+                                          WS_PING_INTERVAL)
+            if not data:
+                return None
+            self.ws.receive_data(data)
+            for event in self.ws.events():
+                if isinstance(event, Request):
+                    request = event
+                    break
+
+        if request.target.split("?")[0] != DEVICE_WS_PATH:
+            await self.reject(404, "not found")
+            return None
+
+        headers = {k.decode().lower(): v.decode() for k, v in request.extra_headers}
+        auth = Authorization.from_header(headers.get("authorization"))
+        if auth is None or auth.type != "bearer" or "token" not in auth:
+            await self.reject(401, "invalid authorization")
+            return None
+
+        admission = server.instance.admission
+        if not admission.admit():
+            self.writer.write(self.ws.send(AcceptConnection()))
+            await self.writer.drain()
+            raise WebSocketException(admission.retry_message(),
+                                     RDFM_WS_TRY_AGAIN_LATER)
+
+        token = await self.gateway.execute(authenticate, auth["token"])
+        if token is None:
+            await self.reject(401, "invalid token was provided")
+            return None
+
+        self.writer.write(self.ws.send(AcceptConnection()))
+        await self.writer.drain()
+        return token
+
+    async def reject(self, status_code: int, message: str):
+        body = json.dumps({"error": message}).encode()
+        self.writer.write(self.ws.send(RejectConnection(
+            status_code=status_code,
+            headers=[(b"content-type", b"application/json"),
+                     (b"content-length", str(len(body)).encode())],
+            has_body=True,
+        )))
+        self.writer.write(self.ws.send(RejectData(data=body)))
+        await self.writer.drain()
+        self.closed = True
+
+    async def run(self, device: RemoteDevice):
+        """Main device event loop
+
+        Equivalent of `RemoteDevice.event_loop`, except no thread is occupied
+        while the device is idle. Requests are handled sequentially in the
+        gateway executor, in the order they were received.
+        """
+        if not await self.gateway.execute(connected, device):
+            self.device = None
+            raise WebSocketException("duplicate connections not allowed",
+                                     RDFM_WS_DUPLICATE_CONNECTION)
+
+        self.gateway.connections.add(self)
+        try:
+            await self.receive_loop(device)
+        finally:
+            self.gateway.connections.discard(self)
+
+    async def receive_loop(self, device: RemoteDevice):
+        while not self.closed:
+            data = await self.reader.read(READ_SIZE)
+            if not data:
+                raise WebSocketException("device disconnected",
+                                         CloseReason.ABNORMAL_CLOSURE)
+            self.awaiting_pong = False
+            self.ws.receive_data(data)
+            for event in self.ws.events():
+                if isinstance(event, (TextMessage, BytesMessage)):
+                    await self.receive_message(device, event)
+                elif isinstance(event, Ping):
+                    self.writer.write(self.ws.send(event.response()))
+                elif isinstance(event, CloseConnection):
+                    self.writer.write(self.ws.send(event.response()))
+                    await self.writer.drain()
+                    self.closed = True
+                    return
+
+    def ping(self):
+        """Ping the device, closing the connection if the previous ping
+        was not responded to"""
+        if self.awaiting_pong:
+            print("Terminating device WS connection: ping timeout", flush=True)
+            self.closed = True
+            self.writer.transport.abort()
+            return
+        self.awaiting_pong = True
+        try:
+            self.writer.write(self.ws.send(Ping()))
+        except LocalProtocolError:
+            pass
+
+    async def receive_message(self, device: RemoteDevice,
+                              event: TextMessage | BytesMessage):
+        self._message.append(event.data)
+        self._message_size += len(event.data)
+        if self._message_size > MAX_MESSAGE_SIZE:
+            raise WebSocketException("message too big", CloseReason.MESSAGE_TOO_BIG)
+        if not event.message_finished:
+            return
+
+        data = ("" if isinstance(event, TextMessage) else b"").join(self._message)
+        self._message, self._message_size = [], 0
+        request = rdfm.ws.decode_message(data, device.compression)
+        await self.gateway.execute(device.handle_message, request)
+
+
+def authenticate(token: str) -> Optional[DeviceToken]:
+    """Verify a device token and update the device's last access timestamp"""
+    device_token = decode_and_verify_token(token)
+    if device_token is None:
+        return None
+    try:
+        server.instance._devices_db.update_timestamp(
+            device_token.device_id, datetime.datetime.utcnow()
+        )
+    except Exception as e:
+        print(
+            f"Failed to update timestamp for device {device_token.device_id}, "
+            f"exception: {e}",
+            flush=True,
+        )
+    return device_token
+
+
+def connected(device: RemoteDevice) -> bool:
+    """Track a newly connected device
+
+    Returns:
+        False, if the device is already connected
+    """
+    if not server.instance.remote_devices.add(device):
+        return False
+    device.announce()
+    return True
+
+
+def disconnected(device: RemoteDevice):
+    """Stop tracking a disconnected device"""
+    device.outbox.close()
+    device.close_shell_channels()
+    server.instance.update_progress.flush(device.token.device_id)
+    server.instance.remote_devices.remove(device)
+    message = {"device": device.token.device_id}
+    try:
+        server.instance.sse.publish(json.dumps(message), type='disconnect')
+    except KeyError:
+        print("Redis is not configured. Unable to send device updates.")
+
+
+class DeviceGateway:
+    """asyncio-based server for the device management WebSocket
+
+    Serves the same endpoint and protocol as `/api/v1/devices/ws` of the
+    WSGI app, but idle device connections are handled by a single event
+    loop instead of occupying a thread each. Device requests, which may
+    access the database, are handed over to a bounded pool of worker
+    threads running within the app context.
+    """
+
+    def __init__(self, config: configuration.ServerConfig, app: Flask):
+        self.config = config
+        self.app = app
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=config.device_gateway_workers,
+            thread_name_prefix="device-gateway",
+        )
+        self.connections: set[GatewayConnection] = set()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def execute(self, f: Callable[..., Any], *args) -> Any:
+        """Run a blocking function in the gateway executor"""
+        def _run():
+            with self.app.app_context():
+                return f(*args)
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, _run)
+
+    def background(self, coroutine):
+        """Run a coroutine without waiting for its result"""
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def keepalive(self):
+        """Periodically ping all connected devices
+
+        Any data received from a device counts as a response to the ping.
+        A single timer is used for all connections, instead of a read
+        timeout for each of them.
+        """
+        while True:
+            await asyncio.sleep(WS_PING_INTERVAL)
+            for connection in list(self.connections):
+                connection.ping()
+
+    async def serve(self):
+        self.background(self.keepalive())
+        ssl_context = None
+        if self.config.encrypted:
+            ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ssl_context.load_cert_chain(self.config.cert, self.config.key)
+
+        async def _on_connection(reader, writer):
+            sock = writer.get_extra_info("socket")
+            if sock is not None:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            await GatewayConnection(self, reader, writer).serve()
+
+        tcp_server = await asyncio.start_server(
+            _on_connection,
+            host=self.config.hostname,
+            port=self.config.device_gateway_port,
+            ssl=ssl_context,
+            backlog=4096,
+        )
+        print("Device gateway listening on port",
+              self.config.device_gateway_port, flush=True)
+        async with tcp_server:
+            await tcp_server.serve_forever()
+
+    def run(self):
+        """Run the gateway, blocking the calling thread"""
+        asyncio.run(self.serve())
+
+    def start(self):
+        """Run the gateway in a background thread"""
+        threading.Thread(target=self.run, daemon=True).start()
@@ -1,73 +1,211 @@
-import simple_websocket
+import queue
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from simple_websocket.errors import ConnectionClosed
 
 
-# Timeout for reading from the WebSocket
-# Lowering this value will decrease the time it takes
-# for a closed WS connection to be cleaned up, but it
-# may increase the server load when a lot of shell
-# sessions are open.
-WS_READ_TIMEOUT = 5.0
-
 # WebSocket ping interval, in seconds
 # This is the time between the WebSocket pings
 # used to detect device disconnections
 WS_PING_INTERVAL = 25.0
 
 
-class CopierThread:
-    """Used for threaded copying of data from one WebSocket to another
+MAX_BUFFERED_MESSAGES = 64
+"""Maximum amount of messages buffered for sending to a relayed socket,
+after which reading from its peer is paused until they were sent"""
+
+SEND_WORKERS = 8
+"""Amount of threads sending the data relayed between sockets"""
+
+
+class NotifyingEvent(threading.Event):
+    """Event that additionally notifies a listener when it is set
+
+    WebSockets set their event whenever a message was received or the
+    connection was closed, which is used as the readiness notification.
+    Sockets relayed by `ShellRelay` must be created with this event class.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._listener: Optional[Callable[[], None]] = None
+
+    def listen(self, listener: Optional[Callable[[], None]]):
+        """Set the function called whenever the event is set"""
+        self._listener = listener
+
+    def set(self):
+        super().set()
+        if (listener := self._listener) is not None:
+            listener()
+
+
+class _Session:
+    """Relaying state of a pair of WebSockets"""
+
+    def __init__(self, first: Any, second: Any,
+                 on_finished: Optional[Callable[[], None]]) -> None:
+        self.peers = {first: second, second: first}
+        self.finished = threading.Event()
+        self.on_finished = on_finished
+        # Messages waiting to be sent to each of the sockets
+        self.outgoing: dict[Any, deque] = {first: deque(), second: deque()}
+        # Sockets that messages are being sent to
+        self.sending: set = set()
+        # Set once either socket was closed, no more data is read then
+        self.closing = False
+
+
+class ShellRelay:
+    """Relays data between pairs of WebSockets
 
     This allows us to implement bidirectional transfer of data between
-    two WebSockets.
-    Synchronization between the RX/TX is achieved using the `conn_died`
-    Event variable.
+    two WebSockets, for all shell sessions at once. Instead of polling
+    the sockets, the relay is notified whenever a socket has received
+    a message or was closed. The received data is read by a single thread,
+    and buffered for each socket it is sent to. The buffered data is sent
+    by a pool of threads, so that a slow socket only holds back its own
+    session; reading from its peer is paused while too much data is
+    buffered for it.
+
+    Supports the `simple_websocket` sockets, as well as any socket that
+    implements `receive`, `send` and signals new data by setting its
+    `event`, which must be a `NotifyingEvent` (for example:
+    `device_mgmt.router.RoutedSocket`).
     """
 
-    source: simple_websocket.Client
-    destination: simple_websocket.Client
-    connection_died: threading.Event
+    def __init__(self, workers: int = SEND_WORKERS) -> None:
+        """
+        Args:
+            workers: amount of threads sending the relayed data
+        """
+        self._lock = threading.Lock()
+        self._ready: queue.SimpleQueue = queue.SimpleQueue()
+        self._sessions: dict[Any, _Session] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="shell-send")
 
-    def __init__(
+    def relay(
         self,
-        source: simple_websocket.Client,
-        destination: simple_websocket.Client,
-        conn_died: threading.Event,
-    ) -> None:
-        self.source = source
-        self.destination = destination
-        self.connection_died = conn_died
-
-    def _do_copy(self):
+        first: Any,
+        second: Any,
+        on_finished: Optional[Callable[[], None]] = None,
+    ) -> threading.Event:
+        """Start relaying data between two WebSockets
+
+        All data read from `first` is sent into `second` and vice versa,
+        until one of the involved parties is disconnected.
+
+        Args:
+            first, second: WebSockets to relay the data between
+            on_finished: optional callback, called once the relaying
+                         has finished
+
+        Returns:
+            event, which is set when the relaying has finished
+        """
+        session = _Session(first, second, on_finished)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._relay_loop,
+                                                daemon=True)
+                self._thread.start()
+            self._sessions[first] = session
+            self._sessions[second] = session
+
+        for ws in (first, second):
+            ws.event.listen(lambda ws=ws: self._ready.put(ws))
+            # Messages might have been received before listening to the event
+            self._ready.put(ws)
+        return session.finished
+
+    def _relay_loop(self):
         while True:
-            try:
-                if self.connection_died.is_set():
+            self._receive(self._ready.get())
+
+    def _receive(self, ws: Any):
+        """Read the data received by a socket, buffering it for its peer"""
+        with self._lock:
+            session = self._sessions.get(ws)
+        if session is None:
+            # Relaying of the session has already finished
+            return
+
+        peer = session.peers[ws]
+        try:
+            while True:
+                with self._lock:
+                    if session.closing or \
+                            len(session.outgoing[peer]) >= MAX_BUFFERED_MESSAGES:
+                        # Reading resumes once the buffered data was sent
+                        return
+                if (data := ws.receive(0)) is None:
                     return
+                with self._lock:
+                    session.outgoing[peer].append(data)
+                    if peer in session.sending:
+                        continue
+                    session.sending.add(peer)
+                self._executor.submit(self._send, session, peer)
+        except Exception as e:
+            if not isinstance(e, (ConnectionClosed, OSError)):
+                print("Shell relay: receiving data failed:", repr(e), flush=True)
+            self._finish(session)
 
-                data = self.source.receive(WS_READ_TIMEOUT)
-                if data is not None:
-                    self.destination.send(data)
-            except simple_websocket.errors.ConnectionClosed:
-                self.connection_died.set()
-                return
+    def _send(self, session: _Session, ws: Any):
+        """Send the data buffered for a socket"""
+        source = session.peers[ws]
+        while True:
+            with self._lock:
+                buffered = session.outgoing[ws]
+                if not buffered:
+                    session.sending.discard(ws)
+                    completed = session.closing and not session.sending
+                    break
+                resume = len(buffered) == MAX_BUFFERED_MESSAGES
+                data = buffered.popleft()
+            if resume:
+                self._ready.put(source)
+            try:
+                ws.send(data)
+            except Exception as e:
+                if not isinstance(e, (ConnectionClosed, OSError)):
+                    print("Shell relay: sending data failed:", repr(e),
+                          flush=True)
+                with self._lock:
+                    for buffered in session.outgoing.values():
+                        buffered.clear()
+                self._finish(session)
 
-    def start(self):
-        """Start the copier thread"""
-        threading.Thread(target=self._do_copy).start()
+        if completed:
+            self._complete(session)
 
+    def _finish(self, session: _Session):
+        """Stop relaying the session
 
-def bidirectional_copy(
-    first: simple_websocket.Client, second: simple_websocket.Client
-):
-    """Bidirectionally copies data between two websockets
+        Data that was already read is still sent, after which the session
+        is completed.
+        """
+        with self._lock:
+            if session.closing:
+                return
+            session.closing = True
+            for ws in session.peers:
+                self._sessions.pop(ws, None)
+            completed = not session.sending
+        if completed:
+            self._complete(session)
 
-    All data read from `first` is sent into `second` and vice versa.
-    This function will block until one of the involved parties is disconnected,
-    or an exception occurs.
-    """
-    on_connection_dead = threading.Event()
-    A = CopierThread(first, second, on_connection_dead)
-    B = CopierThread(second, first, on_connection_dead)
-    A.start()
-    B.start()
-    on_connection_dead.wait()
+    def _complete(self, session: _Session):
+        for ws in session.peers:
+            ws.event.listen(None)
+        session.finished.set()
+        if session.on_finished is not None:
+            try:
+                session.on_finished()
+            except Exception as e:
+                print("Shell relay: finishing the session failed:", repr(e),
+                      flush=True)
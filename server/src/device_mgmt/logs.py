@@ -0,0 +1,120 @@
+import datetime
+import threading
+from typing import Callable, Optional
+from request_models import LogEntry
+import models.log
+import server
+
+
+LOG_BATCH_STORED = 0
+"""Status of a log batch that was stored"""
+
+LOG_BATCH_REJECTED = 1
+"""Status of a log batch that was rejected, as the ingestion queue is full"""
+
+LOG_BATCH_FAILED = 2
+"""Status of a log batch that could not be stored"""
+
+
+class LogIngestion:
+    """Stores log batches sent by devices over the management WebSocket
+
+    Instead of writing every batch to the database separately, batches are
+    queued and written by a single thread, all batches queued in the
+    meantime within a single transaction. Each batch is acknowledged once
+    it was written, so a device that waits for acknowledgements before
+    sending more batches is slowed down to the rate at which the logs are
+    stored.
+
+    The amount of queued log entries is limited; batches that do not fit
+    into the queue are rejected right away. Acknowledgements are never
+    waited for: an acknowledgement that does not fit into the send queue
+    of the device is dropped.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """
+        Args:
+            capacity: maximum amount of queued log entries
+        """
+        self.capacity = capacity
+        self._cond = threading.Condition()
+        self._queued: list[tuple[int, datetime.datetime, list[LogEntry],
+                                 Callable[[int], None]]] = []
+        self._size = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, device_id: int, entries: list[LogEntry],
+               ack: Callable[[int], None]) -> bool:
+        """Queue a batch of log entries to be stored
+
+        Args:
+            device_id: identifier of the device in the database
+            entries: log entries of the batch
+            ack: called with the status of the batch once it was written
+
+        Returns:
+            False, if the batch was rejected as the queue is full
+        """
+        with self._cond:
+            # A batch larger than the capacity is only accepted into an empty queue
+            if self._size > 0 and self._size + len(entries) > self.capacity:
+                return False
+            self._queued.append((device_id, datetime.datetime.utcnow(),
+                                 entries, ack))
+            self._size += len(entries)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop,
+                                                daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return True
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queued)
+                queued, self._queued = self._queued, []
+                self._size = 0
+
+            statuses = _store(queued)
+            for (_, _, _, ack), status in zip(queued, statuses):
+                try:
+                    ack(status)
+                except Exception as e:
+                    print("Acknowledging log batch failed:", repr(e), flush=True)
+
+
+def _store(queued) -> list[int]:
+    """Store the queued batches, returning the status of each batch
+
+    All batches are written within a single transaction. If it fails, the
+    batches are written one at a time, so that a single batch that cannot
+    be stored does not fail the others.
+    """
+    if _create(queued):
+        return [LOG_BATCH_STORED] * len(queued)
+    if len(queued) == 1:
+        return [LOG_BATCH_FAILED]
+    return [LOG_BATCH_STORED if _create([batch]) else LOG_BATCH_FAILED
+            for batch in queued]
+
+
+def _create(queued) -> bool:
+    try:
+        return server.instance._logs_db.create(_log_models(queued))
+    except Exception as e:
+        print("Storing log batches failed:", repr(e), flush=True)
+        return False
+
+
+def _log_models(queued):
+    for device_id, created, entries, _ in queued:
+        for entry in entries:
+            log = models.log.Log()
+            log.created = created
+            log.device_timestamp = entry.device_timestamp
+            log.name = entry.name
+            log.entry = entry.entry
+            log.device_id = device_id
+            yield log
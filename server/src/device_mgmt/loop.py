@@ -1,3 +1,5 @@
+import contextlib
+import socket
 import time
 from device_mgmt.models.remote_device import RemoteDevice
 import simple_websocket
@@ -6,22 +8,29 @@ from rdfm.ws import RDFM_WS_DUPLICATE_CONNECTION, WebSocketException
 import server
 
 
+def abort_connection(ws: simple_websocket.Client):
+    """Abort the connection, failing any pending writes to the socket"""
+    with contextlib.suppress(OSError):
+        ws.sock.shutdown(socket.SHUT_RDWR)
+
+
 def start_device_event_loop(
     ws: simple_websocket.Client, device_token: DeviceToken
 ):
     """Start the main event loop for a device websocket"""
-    device = RemoteDevice(ws, device_token)
+    outbox = server.instance.outbound.open(ws, lambda: abort_connection(ws))
+    device = RemoteDevice(ws, device_token, outbox)
 
     # Save the WS connection
-    previous = server.instance.remote_devices.get(device.token.device_id)
-    if previous is not None:
+    if not server.instance.remote_devices.add(device):
         raise WebSocketException("duplicate connections not allowed", RDFM_WS_DUPLICATE_CONNECTION)
 
-    server.instance.remote_devices.add(device)
-
     # Enter the event loop
     # On exit, remove the device from tracked ones
     try:
         device.event_loop()
     finally:
+        device.outbox.close()
+        device.close_shell_channels()
+        server.instance.update_progress.flush(device_token.device_id)
         server.instance.remote_devices.remove(device)
@@ -1,6 +1,6 @@
 import threading
 import queue
-from typing import Union, Optional
+from typing import Callable, Union, Optional
 import uuid
 
 from request_models import Action
@@ -18,6 +18,10 @@ class ActionExecution:
     execution_queued: threading.Event
     execution_completed: threading.Event
 
+    # Called after a control message or the result was received,
+    # used by executions driven by the `ActionScheduler`
+    notify: Optional[Callable[[], None]]
+
     def __init__(self, action: Action, id: Optional[str] = None):
         self.action = action
         self.status_code = None
@@ -27,6 +31,7 @@ class ActionExecution:
 
         self.execution_queued = threading.Event()
         self.execution_completed = threading.Event()
+        self.notify = None
 
     def set_status(self, status: int):
         self.status_code = status
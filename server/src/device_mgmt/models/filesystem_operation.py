@@ -1,3 +1,4 @@
+import queue
 import threading
 import uuid
 
@@ -7,3 +8,15 @@ class FilesystemOperation:
         self.id = str(uuid.uuid4())
         self.response = None
         self.completed = threading.Event()
+
+
+class FileRead(FilesystemOperation):
+    """Filesystem operation streaming the contents of a file from the device
+
+    The reply is stored in `response` as with other operations, while the
+    received parts of the file are queued in `chunks`.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.chunks: queue.SimpleQueue[bytes] = queue.SimpleQueue()
@@ -1,3 +1,4 @@
+import base64
 import threading
 import sys
 import json
@@ -13,6 +14,14 @@ from request_models import (
     ActionListUpdate,
     FsFileDownloadReply,
     FsFileProbeReply,
+    FsFileReadData,
+    FsFileReadReply,
+    LogBatch,
+    LogBatchAck,
+    ShellClose,
+    ShellData,
+    ShellOpen,
+    ShellWindow,
     UpdateProgress,
     UpdateVersion,
 )
@@ -23,10 +32,16 @@ import rdfm.ws
 from rdfm.ws import (
     RDFM_WS_INVALID_REQUEST,
     RDFM_WS_MISSING_CAPABILITIES,
+    SHELL_WINDOW_SIZE,
     WebSocketException,
 )
 from rdfm.schema.v1.updates import META_SOFT_VER
 import device_mgmt.action
+from device_mgmt.logs import LOG_BATCH_REJECTED
+from device_mgmt.models.filesystem_operation import FileRead
+from device_mgmt.models.shell_channel import ShellChannel
+from device_mgmt.outbound import DeviceOutbox, lane_of
+from device_mgmt.progress import UPDATE_COMPLETE
 import server
 
 
@@ -35,40 +50,52 @@ class RemoteDevice:
 
     This can be used to send and receive messages from a device registered
     on the RDFM server that has connected to the device WebSocket.
+    Messages are sent through the outbound queue of the device
+    (see: `DeviceOutbox`).
     """
 
     ws: simple_websocket.Client
+    outbox: DeviceOutbox
     token: DeviceToken
     capabilities: dict[str, bool]
     actions: dict[str, Action]
     actions_updated: threading.Event
+    shell_channels: dict[str, ShellChannel]
 
     def __init__(
-        self, ws: simple_websocket.Client, token: DeviceToken
+        self, ws: simple_websocket.Client, token: DeviceToken, outbox: DeviceOutbox
     ) -> None:
         self.ws = ws
+        self.outbox = outbox
         self.token = token
         self.capabilities = {}
         self.actions = {}
         self.capabilities_updated = threading.Event()
         self.actions_updated = threading.Event()
+        self.actions_query_lock = threading.Lock()
+        self.actions_version = None
         self.update_version = None
+        self.shell_channels = {}
+        self.database_id = None
 
     def receive_message(self, timeout: Optional[float] = None) -> Request:
         """Receive a message from the device and decode it
 
         A message is a simple JSON struct defining the method to call.
-        We use text-mode encoding for this, and the protocol does not
-        currently use any binary-mode messages.
+        We use text-mode encoding for this, unless the device supports
+        compressed messages (see: `compression`).
         """
-        return rdfm.ws.receive_message(self.ws, timeout)
+        return rdfm.ws.receive_message(self.ws, timeout, self.compression)
 
-    def send_message(self, request: Request):
+    def send_message(self, request: Request, block: bool = True):
         """Send a message to the device
 
-        Sends the specified message to the device over the connected WebSocket.
-        If the device does not support given request method, raises
-        `WebSocketException`.
+        Queues the specified message to be sent to the device over the
+        connected WebSocket. The message is encoded by the calling thread,
+        and the call returns once it was queued. If the device does not
+        support given request method, or the message could not be queued,
+        raises `WebSocketException`. Unless `block` is set, a message
+        that does not fit into the send queue is rejected right away.
         """
         if not rdfm.ws.can_handle_request(self.capabilities, request.method):
             raise WebSocketException(
@@ -77,9 +104,59 @@ class RemoteDevice:
                 RDFM_WS_MISSING_CAPABILITIES,
             )
 
-        rdfm.ws.send_message(self.ws, request)
+        self.outbox.put(
+            rdfm.ws.encode_message(request, self.compression),
+            lane_of(request.method),
+            block,
+        )
+
+    def load_actions(self, version: Optional[str]):
+        """Reuse the actions stored by a previous connection of the device
+
+        The stored actions are only reused when the device reports the same
+        version of its actions, otherwise they are queried from the device
+        when needed (see: `ensure_actions`).
+        """
+        if version is None:
+            return
+        self.actions_version = version
+        catalog = server.instance._action_catalogs_db.fetch(self.token.device_id)
+        if catalog is not None and catalog.version == version:
+            self.actions = {x["action_id"]: Action(**x) for x in catalog.actions}
+            self.actions_updated.set()
+        else:
+            self.actions_updated.clear()
+
+    def open_shell_channel(self, uuid: str) -> ShellChannel:
+        """Open a shell session multiplexed over the management WebSocket
+
+        Throws:
+            WebSocketException: the device does not support multiplexed
+                                shell sessions, or has disconnected
+        """
+        channel = ShellChannel(uuid,
+                               lambda x: self.send_message(x, block=False),
+                               SHELL_WINDOW_SIZE,
+                               lambda x: self.shell_channels.pop(x.uuid, None))
+        self.shell_channels[uuid] = channel
+        try:
+            self.send_message(ShellOpen(uuid=uuid))
+        except WebSocketException:
+            self.shell_channels.pop(uuid, None)
+            raise
+        return channel
+
+    def close_shell_channels(self):
+        """Close all shell sessions of the device, once it has disconnected"""
+        for channel in list(self.shell_channels.values()):
+            channel._closed_by_device()
+
+    @property
+    def compression(self) -> bool:
+        """Whether messages exchanged with the device are compressed"""
+        return self.capabilities.get(rdfm.ws.COMPRESSION_CAPABILITY, False)
 
-    def __handle_device_message(self, request: Request):
+    def handle_message(self, request: Request):
         """Handle an incoming device request"""
         if isinstance(request, CapabilityReport):
             print(
@@ -93,7 +170,14 @@ class RemoteDevice:
             server.instance._devices_db.update_capabilities(
                 self.token.device_id, request.capabilities
             )
-            self.capabilities_updated.set()
+            self.load_actions(request.actions_version)
+            if not self.capabilities_updated.is_set():
+                self.capabilities_updated.set()
+                # Actions queued while the device was disconnected are
+                # scheduled once it reported its capabilities
+                server.instance.admission.stage(
+                    device_mgmt.action.send_action_queue, self.token.device_id
+                )
         elif isinstance(request, ActionExecResult):
             print(
                 "Action execution result for",
@@ -126,6 +210,11 @@ class RemoteDevice:
                 flush=True,
             )
             self.actions = {x.action_id: x for x in request.actions}
+            server.instance._action_catalogs_db.update(
+                self.token.device_id,
+                [x.model_dump() for x in request.actions],
+                self.actions_version,
+            )
             self.actions_updated.set()
         elif isinstance(request, FsFileDownloadReply):
             print(
@@ -139,10 +228,10 @@ class RemoteDevice:
                 operation.response = request
                 operation.completed.set()
             else:
-                raise WebSocketException(
-                    "invalid filesystem response", RDFM_WS_INVALID_REQUEST
-                )
-        elif isinstance(request, FsFileProbeReply):
+                # The operation has expired, or never existed
+                print("Ignoring reply to unknown filesystem operation", request.id,
+                      flush=True)
+        elif isinstance(request, (FsFileProbeReply, FsFileReadReply)):
             print(
                 "Filesystem probe reply for ",
                 self.token.device_id,
@@ -154,42 +243,43 @@ class RemoteDevice:
                 operation.response = request
                 operation.completed.set()
             else:
-                raise WebSocketException(
-                    "invalid filesystem response", RDFM_WS_INVALID_REQUEST
-                )
+                # The operation has expired, or never existed
+                print("Ignoring reply to unknown filesystem operation", request.id,
+                      flush=True)
+        elif isinstance(request, (ShellData, ShellWindow, ShellClose)):
+            channel = self.shell_channels.get(request.uuid)
+            if channel is None:
+                # The session was already closed by the server
+                return
+            if isinstance(request, ShellData):
+                channel._deliver(request)
+            elif isinstance(request, ShellWindow):
+                channel._grant(request.size)
+            else:
+                channel._closed_by_device()
+        elif isinstance(request, FsFileReadData):
+            operation = server.instance.filesystem_operations.get(request.id)
+            if isinstance(operation, FileRead):
+                operation.chunks.put(base64.b64decode(request.data))
+                server.instance.filesystem_operations.refresh(operation)
+            else:
+                print("Ignoring data of unknown filesystem operation", request.id,
+                      flush=True)
+        elif isinstance(request, LogBatch):
+            self.submit_logs(request)
         elif isinstance(request, UpdateProgress):
             if not self.update_version:
                 self.update_version = server.instance._device_updates_db.get_version(
                     self.token.device_id
                 )
-            message = {
-                "device": self.token.device_id,
-                "progress": request.progress,
-                "version": self.update_version,
-            }
-            try:
-                server.instance.sse.publish(json.dumps(message), type='update')
-            except KeyError:
-                print("Redis is not configured. Unable to send device updates.")
-            if request.progress == 100:
+            server.instance.update_progress.report(
+                self.token.device_id, request.progress, self.update_version
+            )
+            if request.progress == UPDATE_COMPLETE:
                 self.update_version = None
-                server.instance._device_updates_db.delete(self.token.device_id)
-                print(
-                    f"Device {self.token.device_id} update complete",
-                    flush=True,
-                )
-            else:
-                server.instance._device_updates_db.update_progress(
-                    self.token.device_id,
-                    request.progress
-                )
-                print(
-                    f"Device {self.token.device_id} update in progress: {request.progress}%",
-                    flush=True,
-                )
         elif isinstance(request, UpdateVersion):
             device = server.instance._devices_db.get_device_data(self.token.device_id)
-            metadata = json.loads(device.device_metadata)
+            metadata = dict(device.device_metadata)
             metadata[META_SOFT_VER] = request.version
             server.instance._devices_db.update_metadata(self.token.device_id, metadata)
 
@@ -199,10 +289,39 @@ class RemoteDevice:
                 "invalid request", RDFM_WS_INVALID_REQUEST
             )
 
-    def event_loop(self):
-        """Main device event loop
+    def submit_logs(self, request: LogBatch):
+        """Queue a log batch sent by the device for storing
 
-        This reads incoming messages from the device
+        The batch is acknowledged once it was stored, or right away if it
+        was rejected.
+        """
+        if not rdfm.ws.can_handle_request(self.capabilities, "log_batch_ack"):
+            raise WebSocketException(
+                "sending logs requires the logs capability",
+                RDFM_WS_MISSING_CAPABILITIES,
+            )
+        if self.database_id is None:
+            self.database_id = server.instance._devices_db.get_device_data(
+                self.token.device_id
+            ).id
+
+        def _ack(status: int):
+            try:
+                # Acknowledgements are sent from the log writer thread,
+                # which must not wait for a slow device
+                self.send_message(LogBatchAck(id=request.id, status=status),
+                                  block=False)
+            except WebSocketException as e:
+                print("Acknowledging log batch", request.id, "failed:", e.message,
+                      flush=True)
+
+        if not server.instance.log_ingestion.submit(self.database_id,
+                                                    request.batch, _ack):
+            _ack(LOG_BATCH_REJECTED)
+
+    def announce(self):
+        """Notify the device and the server-side event listeners
+        about the established connection
         """
         print(
             "Device WS: Device",
@@ -217,17 +336,24 @@ class RemoteDevice:
                 }
             )
         )
+        if server.instance.admission.under_load():
+            server.instance.admission.stage(self.__publish_connected)
+        else:
+            self.__publish_connected()
+
+    def __publish_connected(self):
         message = {"device": self.token.device_id}
         try:
             server.instance.sse.publish(json.dumps(message), type='connect')
         except KeyError:
             print("Redis is not configured. Unable to send device updates.")
 
-        thread = threading.Thread(
-            target=device_mgmt.action.send_action_queue,
-            args=(self.token.device_id, )
-        )
-        thread.start()
+    def event_loop(self):
+        """Main device event loop
+
+        This reads incoming messages from the device
+        """
+        self.announce()
 
         while True:
-            self.__handle_device_message(self.receive_message())
+            self.handle_message(self.receive_message())
@@ -0,0 +1,190 @@
+import base64
+import threading
+from collections import deque
+from typing import Callable, Optional
+from request_models import Request, ShellClose, ShellData, ShellWindow
+from rdfm.ws import WebSocketException
+from simple_websocket.errors import ConnectionClosed
+from device_mgmt.helpers import NotifyingEvent
+
+
+class ShellChannel:
+    """Shell session multiplexed over the management WebSocket of a device
+
+    Implements the subset of the `simple_websocket.Client` interface that
+    is required for relaying data with `device_mgmt.helpers.ShellRelay`,
+    so that the channel can be used in place of a device shell WebSocket.
+
+    Both directions are flow controlled. Data received from the device is
+    acknowledged once it was read from the channel, which allows the device
+    to send more. Data sent to the device is held back while the window
+    granted by the device is exhausted, up to the size of the window, after
+    which the channel is closed.
+
+    Messages to the device are queued while holding the lock of the channel,
+    and sent after it was released, by a single thread at a time so that
+    they are sent in order. Sending must not block: a message that cannot
+    be sent right away closes the channel.
+    """
+
+    def __init__(
+        self,
+        uuid: str,
+        send_message: Callable[[Request], None],
+        window: int,
+        on_closed: Optional[Callable[["ShellChannel"], None]] = None,
+    ) -> None:
+        """
+        Args:
+            uuid: identifier of the shell session
+            send_message: sends a message to the device without blocking
+            window: initial flow control window of each direction, in bytes
+            on_closed: called once the channel was closed by either side
+        """
+        self.uuid = uuid
+        self.window = window
+        self.connected = True
+        self.event = NotifyingEvent()
+        self._send_message = send_message
+        self._on_closed = on_closed
+        self._lock = threading.Lock()
+        self._received: deque[str | bytes] = deque()
+        # Amount of bytes the device may still send
+        self._receive_window = window
+        # Amount of received bytes that were read, but not acknowledged yet
+        self._consumed = 0
+        # Amount of bytes that may still be sent to the device
+        self._send_window = window
+        self._pending: deque[str | bytes] = deque()
+        self._pending_size = 0
+        # Messages waiting to be sent, and whether a thread is sending them
+        self._outgoing: deque[Request] = deque()
+        self._sending = False
+
+    def send(self, data: str | bytes):
+        """Send data to the device shell"""
+        with self._lock:
+            if not self.connected:
+                raise ConnectionClosed()
+            self._pending.append(data)
+            self._pending_size += len(data)
+            self.__flush()
+            if self._pending_size > self.window:
+                print("Shell channel", self.uuid, "closed: device is not",
+                      "receiving data", flush=True)
+                self.__close(notify_device=True)
+        self.__send_outgoing()
+        if not self.connected:
+            raise ConnectionClosed()
+
+    def receive(self, timeout: Optional[float] = None) -> Optional[str | bytes]:
+        """Receive data sent by the device shell"""
+        while True:
+            with self._lock:
+                data = None
+                if self._received:
+                    data = self._received.popleft()
+                    self.__acknowledge(len(data))
+                elif not self.connected:
+                    raise ConnectionClosed()
+                else:
+                    self.event.clear()
+            if data is not None:
+                self.__send_outgoing()
+                return data
+            if not self.event.wait(timeout=timeout):
+                return None
+
+    def close(self):
+        """Close the channel, notifying the device"""
+        with self._lock:
+            self.__close(notify_device=True)
+        self.__send_outgoing()
+
+    def _deliver(self, message: ShellData):
+        """Queue data sent by the device"""
+        data = base64.b64decode(message.data) if message.binary else message.data
+        with self._lock:
+            if not self.connected:
+                return
+            if len(data) > self._receive_window:
+                print("Shell channel", self.uuid, "closed: device exceeded",
+                      "the flow control window", flush=True)
+                self.__close(notify_device=True)
+            else:
+                self._receive_window -= len(data)
+                self._received.append(data)
+        self.__send_outgoing()
+        self.event.set()
+
+    def _grant(self, size: int):
+        """Extend the window granted by the device"""
+        with self._lock:
+            self._send_window += size
+            if self.connected:
+                self.__flush()
+        self.__send_outgoing()
+
+    def _closed_by_device(self):
+        """Close the channel, once the device has closed the session"""
+        with self._lock:
+            self.__close(notify_device=False)
+
+    def __flush(self):
+        # Messages are sent whole, the device may be sent at most a single
+        # message past its window
+        while self._pending and self._send_window > 0:
+            data = self._pending.popleft()
+            self._pending_size -= len(data)
+            self._send_window -= len(data)
+            if isinstance(data, bytes):
+                message = ShellData(uuid=self.uuid,
+                                    data=base64.b64encode(data).decode())
+            else:
+                message = ShellData(uuid=self.uuid, data=data, binary=False)
+            self._outgoing.append(message)
+
+    def __acknowledge(self, size: int):
+        self._consumed += size
+        # Acknowledge in batches, so that not every read results in a message
+        if self.connected and self._consumed >= self.window // 2:
+            self._receive_window += self._consumed
+            self._outgoing.append(ShellWindow(uuid=self.uuid, size=self._consumed))
+            self._consumed = 0
+
+    def __send_outgoing(self):
+        """Send the queued messages, must be called without holding the lock"""
+        with self._lock:
+            if self._sending:
+                # The thread that is already sending also sends these messages
+                return
+            self._sending = True
+        while True:
+            with self._lock:
+                if not self._outgoing:
+                    self._sending = False
+                    return
+                message = self._outgoing.popleft()
+            try:
+                self._send_message(message)
+            except WebSocketException as e:
+                print("Shell channel", self.uuid, "closed:", e.message, flush=True)
+                with self._lock:
+                    self._sending = False
+                    self.__close(notify_device=False)
+                    self._outgoing.clear()
+                return
+
+    def __close(self, notify_device: bool):
+        if not self.connected:
+            return
+        self.connected = False
+        self._pending.clear()
+        self._pending_size = 0
+        if notify_device:
+            self._outgoing.append(ShellClose(uuid=self.uuid))
+        else:
+            self._outgoing.clear()
+        self.event.set()
+        if self._on_closed is not None:
+            self._on_closed(self)
@@ -0,0 +1,313 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from rdfm.ws import RDFM_WS_INVALID_REQUEST, WebSocketException
+
+
+""" Lane of messages that drive interactive operations on the device,
+    such as actions and shell sessions
+"""
+LANE_CONTROL = "control"
+
+""" Lane of messages that start long-running or bulk transfers,
+    sent only when the control lane is empty
+"""
+LANE_BULK = "bulk"
+
+""" Lanes in the order they are drained
+"""
+LANES = (LANE_CONTROL, LANE_BULK)
+
+""" Maximum interval (in seconds) between checks for stalled socket writes
+"""
+MAX_WATCHDOG_INTERVAL = 1.0
+
+""" Methods of the messages sent over the bulk lane, other messages
+    are sent over the control lane
+"""
+BULK_METHODS = frozenset({
+    "action_list_query",
+    "fs_file_download",
+    "fs_file_probe",
+    "fs_file_read",
+})
+
+
+def lane_of(method: str) -> str:
+    """Get the lane a message with the given method is sent over"""
+    return LANE_BULK if method in BULK_METHODS else LANE_CONTROL
+
+
+class OutboundMetrics:
+    """Metrics of the outbound queues of all devices connected to this process
+
+    For each lane, tracks the amount of queued messages, the amount of sent
+    and dropped messages, and the time messages spent waiting in the queue
+    until they were written to the socket.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._lanes = {
+            lane: {
+                "queued": 0,
+                "sent": 0,
+                "dropped": 0,
+                "latency_total": 0.0,
+                "latency_max": 0.0,
+            }
+            for lane in LANES
+        }
+
+    def queued(self, lane: str, change: int = 1):
+        with self._lock:
+            self._lanes[lane]["queued"] += change
+
+    def sent(self, lane: str, latency: float):
+        with self._lock:
+            stats = self._lanes[lane]
+            stats["queued"] -= 1
+            stats["sent"] += 1
+            stats["latency_total"] += latency
+            stats["latency_max"] = max(stats["latency_max"], latency)
+
+    def dropped(self, lane: str, queued: bool, amount: int = 1):
+        """Record dropped messages
+
+        Args:
+            lane: lane of the messages
+            queued: whether the messages were dropped from the queue,
+                    or rejected before being queued
+            amount: amount of dropped messages
+        """
+        with self._lock:
+            if queued:
+                self._lanes[lane]["queued"] -= amount
+            self._lanes[lane]["dropped"] += amount
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Get the current metrics of each lane
+
+        The latencies are given in seconds.
+        """
+        with self._lock:
+            return {
+                lane: {
+                    "queued": stats["queued"],
+                    "sent": stats["sent"],
+                    "dropped": stats["dropped"],
+                    "latency_avg": (stats["latency_total"] / stats["sent"]
+                                    if stats["sent"] else 0.0),
+                    "latency_max": stats["latency_max"],
+                }
+                for lane, stats in self._lanes.items()
+            }
+
+
+class WriteWatchdog:
+    """Aborts connections of devices whose socket writes stall
+
+    Socket writes block when a device stops reading, and they run on the
+    executor shared by all devices. A write that does not complete within
+    the timeout aborts the connection, which fails the write and frees
+    the worker for other devices.
+    """
+
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._writes: dict["DeviceOutbox", float] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def started(self, outbox: "DeviceOutbox"):
+        with self._lock:
+            self._writes[outbox] = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.__watch,
+                                                name="device-send-watchdog",
+                                                daemon=True)
+                self._thread.start()
+
+    def finished(self, outbox: "DeviceOutbox"):
+        with self._lock:
+            self._writes.pop(outbox, None)
+
+    def __watch(self):
+        while True:
+            time.sleep(min(self.timeout / 2, MAX_WATCHDOG_INTERVAL))
+            deadline = time.monotonic() - self.timeout
+            with self._lock:
+                stalled = [outbox for outbox, started in self._writes.items()
+                           if started < deadline]
+                for outbox in stalled:
+                    del self._writes[outbox]
+            for outbox in stalled:
+                outbox.abort()
+
+
+class DeviceOutbox:
+    """Bounded outbound message queue of a single device
+
+    Messages are written to the socket by a single writer at a time, in the
+    order they were queued within each lane. The control lane is always
+    drained before the bulk lane. The writer runs on the executor shared
+    by all devices, and is started whenever messages are queued while the
+    outbox is idle, so that a slow device does not block the threads
+    sending messages to it. A device whose socket write does not complete
+    within the write timeout is disconnected (see: `WriteWatchdog`).
+
+    Backpressure is applied when a lane is full: the sender waits for free
+    space up to the send timeout, after which the message is rejected.
+    Messages that were not written within the send timeout of being queued
+    are dropped, as the operations they were part of have already timed out.
+    """
+
+    def __init__(
+        self,
+        ws: Any,
+        abort: Callable[[], None],
+        executor: ThreadPoolExecutor,
+        watchdog: WriteWatchdog,
+        metrics: OutboundMetrics,
+        capacity: int,
+        timeout: float,
+    ) -> None:
+        self.ws = ws
+        self.capacity = capacity
+        self.timeout = timeout
+        self._abort = abort
+        self._executor = executor
+        self._watchdog = watchdog
+        self._metrics = metrics
+        self._cond = threading.Condition()
+        self._lanes: dict[str, deque[tuple[str | bytes, float]]] = {
+            lane: deque() for lane in LANES
+        }
+        self._writing = False
+        self._closed = False
+
+    def put(self, data: str | bytes, lane: str, block: bool = True):
+        """Queue an encoded message to be sent to the device
+
+        Args:
+            data: encoded message
+            lane: lane to send the message over
+            block: whether to wait for free space in a full lane,
+                   otherwise the message is rejected right away
+
+        Throws:
+            WebSocketException: the lane remained full for the send timeout,
+                                or the device has disconnected
+        """
+        deadline = time.monotonic() + (self.timeout if block else 0)
+        with self._cond:
+            queue = self._lanes[lane]
+            while len(queue) >= self.capacity and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._metrics.dropped(lane, queued=False)
+                    raise WebSocketException(
+                        "device send queue is full", RDFM_WS_INVALID_REQUEST
+                    )
+                self._cond.wait(remaining)
+            if self._closed:
+                raise WebSocketException("device disconnected", RDFM_WS_INVALID_REQUEST)
+
+            queue.append((data, time.monotonic()))
+            self._metrics.queued(lane)
+            if not self._writing:
+                self._writing = True
+                self._executor.submit(self._write)
+
+    def close(self):
+        """Drop all queued messages, and reject further messages"""
+        with self._cond:
+            self._closed = True
+            for lane, queue in self._lanes.items():
+                if queue:
+                    self._metrics.dropped(lane, queued=True, amount=len(queue))
+                    queue.clear()
+            self._cond.notify_all()
+
+    def abort(self):
+        """Disconnect the device, as writing to its socket stalled"""
+        print("Device WS: Writing to the device stalled, disconnecting",
+              flush=True)
+        self.close()
+        try:
+            self._abort()
+        except Exception as e:
+            print("Device WS: Aborting the connection failed:", repr(e),
+                  flush=True)
+
+    def depth(self) -> dict[str, int]:
+        """Get the amount of queued messages in each lane"""
+        with self._cond:
+            return {lane: len(queue) for lane, queue in self._lanes.items()}
+
+    def _next(self) -> Optional[tuple[str, str | bytes, float]]:
+        with self._cond:
+            for lane, queue in self._lanes.items():
+                if queue:
+                    data, queued_at = queue.popleft()
+                    self._cond.notify_all()
+                    return lane, data, queued_at
+            self._writing = False
+            return None
+
+    def _write(self):
+        while (message := self._next()) is not None:
+            lane, data, queued_at = message
+            if time.monotonic() - queued_at > self.timeout:
+                self._metrics.dropped(lane, queued=True)
+                continue
+            self._watchdog.started(self)
+            try:
+                self.ws.send(data)
+            except Exception as e:
+                print("Device WS: Sending message failed:", repr(e), flush=True)
+                self._metrics.dropped(lane, queued=True)
+                self.close()
+                with self._cond:
+                    self._writing = False
+                return
+            finally:
+                self._watchdog.finished(self)
+            self._metrics.sent(lane, time.monotonic() - queued_at)
+
+
+class OutboundQueues:
+    """Outbound queues of the devices connected to this process"""
+
+    def __init__(self, workers: int, capacity: int, timeout: float,
+                 write_timeout: float) -> None:
+        """
+        Args:
+            workers: maximum amount of devices written to at once
+            capacity: maximum amount of queued messages in each lane of a device
+            timeout: time in seconds a message may wait for free space in
+                     the queue, and then in the queue for being sent
+            write_timeout: time in seconds a single message may take to be
+                           written to the socket, after which the device
+                           is disconnected
+        """
+        self.capacity = capacity
+        self.timeout = timeout
+        self.metrics = OutboundMetrics()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="device-send"
+        )
+        self._watchdog = WriteWatchdog(write_timeout)
+
+    def open(self, ws: Any, abort: Callable[[], None]) -> DeviceOutbox:
+        """Create the outbound queue of a newly connected device
+
+        Args:
+            ws: socket of the device
+            abort: aborts the connection of the device, failing any
+                   pending writes to the socket
+        """
+        return DeviceOutbox(ws, abort, self._executor, self._watchdog,
+                            self.metrics, self.capacity, self.timeout)
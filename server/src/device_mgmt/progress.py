@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+from typing import Optional
+from flask import Flask, current_app
+import server
+
+
+UPDATE_COMPLETE = 100
+"""Update progress reported by a device once the update was installed"""
+
+
+class UpdateProgressAggregator:
+    """Coalesces update progress reported by devices
+
+    Devices may report the progress of an update as often as every percent.
+    Instead of writing each report to the database and publishing it as
+    a server-side event right away, only the latest progress of each device
+    is kept in memory. All pending reports are flushed periodically, the
+    database is updated in a single transaction.
+
+    Completed updates, and the pending progress of a device that has
+    disconnected, are flushed immediately.
+    """
+
+    def __init__(self, interval: float) -> None:
+        """
+        Args:
+            interval: time between flushes, in seconds; when zero,
+                      every report is flushed immediately
+        """
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: dict[str, tuple[int, Optional[str]]] = {}
+        self._app: Optional[Flask] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def report(self, mac_address: str, progress: int, version: Optional[str]):
+        """Record the update progress reported by a device
+
+        Must be called within the application context.
+        """
+        if progress == UPDATE_COMPLETE or self.interval <= 0:
+            with self._flush_lock:
+                with self._lock:
+                    self._pending.pop(mac_address, None)
+                self.__flush({mac_address: (progress, version)})
+            return
+
+        with self._lock:
+            self._pending[mac_address] = (progress, version)
+            if self._thread is None:
+                self._app = current_app._get_current_object()
+                self._thread = threading.Thread(target=self._flush_loop,
+                                                daemon=True)
+                self._thread.start()
+
+    def flush(self, mac_address: str):
+        """Immediately flush the pending progress of a device
+
+        Must be called within the application context.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending = self._pending.pop(mac_address, None)
+            if pending is not None:
+                self.__flush({mac_address: pending})
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.interval)
+            # Flushes are serialized, so that a report flushed immediately
+            # is never overwritten by an older report of the same device
+            with self._flush_lock, self._app.app_context():
+                with self._lock:
+                    pending, self._pending = self._pending, {}
+                if not pending:
+                    continue
+                try:
+                    self.__flush(pending)
+                except Exception as e:
+                    print("Flushing update progress failed:", repr(e), flush=True)
+
+    def __flush(self, pending: dict[str, tuple[int, Optional[str]]]):
+        for mac_address, (progress, version) in pending.items():
+            message = {
+                "device": mac_address,
+                "progress": progress,
+                "version": version,
+            }
+            try:
+                server.instance.sse.publish(json.dumps(message), type='update')
+            except KeyError:
+                print("Redis is not configured. Unable to send device updates.")
+
+        completed = [mac for mac, (progress, _) in pending.items()
+                     if progress == UPDATE_COMPLETE]
+        for mac_address in completed:
+            server.instance._device_updates_db.delete(mac_address)
+            print(f"Device {mac_address} update complete", flush=True)
+        in_progress = {mac: progress for mac, (progress, _) in pending.items()
+                       if progress != UPDATE_COMPLETE}
+        if in_progress:
+            server.instance._device_updates_db.update_progress_many(in_progress)
@@ -0,0 +1,81 @@
+import threading
+from typing import Generic, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+STRIPES = 16
+"""Default amount of stripes of a registry"""
+
+
+class _Stripe(Generic[T]):
+    __slots__ = ("lock", "items")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.items: dict[str, T] = {}
+
+
+class StripedRegistry(Generic[T]):
+    """Thread-safe registry of connections held by this process
+
+    Keys are spread over a fixed amount of stripes, each guarded by its own
+    lock, so that threads (un)registering different connections do not
+    contend on a single lock.
+    """
+
+    def __init__(self, stripes: int = STRIPES) -> None:
+        """
+        Args:
+            stripes: amount of independently locked parts of the registry
+        """
+        self._stripes: list[_Stripe[T]] = [_Stripe() for _ in range(stripes)]
+
+    def add(self, key: str, item: T) -> bool:
+        """Register an item
+
+        Returns:
+            False, if an item is already registered under the key
+        """
+        stripe = self.__stripe(key)
+        with stripe.lock:
+            if key in stripe.items:
+                return False
+            stripe.items[key] = item
+            return True
+
+    def remove(self, key: str, item: Optional[T] = None) -> Optional[T]:
+        """Remove the item registered under the key
+
+        Args:
+            key: key of the item
+            item: if given, the item is only removed if it is the one
+                  registered under the key
+
+        Returns:
+            the removed item, or None if it was not registered
+        """
+        stripe = self.__stripe(key)
+        with stripe.lock:
+            current = stripe.items.get(key)
+            if current is None or (item is not None and current is not item):
+                return None
+            del stripe.items[key]
+            return current
+
+    def get(self, key: str) -> Optional[T]:
+        stripe = self.__stripe(key)
+        with stripe.lock:
+            return stripe.items.get(key)
+
+    def values(self) -> list[T]:
+        """Get a snapshot of all registered items"""
+        items = []
+        for stripe in self._stripes:
+            with stripe.lock:
+                items.extend(stripe.items.values())
+        return items
+
+    def __stripe(self, key: str) -> _Stripe[T]:
+        return self._stripes[hash(key) % len(self._stripes)]
@@ -0,0 +1,636 @@
+import base64
+import collections
+import contextlib
+import json
+import queue
+import threading
+import time
+import traceback
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Optional
+from flask import Flask
+from simple_websocket.errors import ConnectionClosed
+from rdfm.ws import RDFM_WS_INVALID_REQUEST, WebSocketException
+import configuration
+from device_mgmt.helpers import NotifyingEvent
+
+
+HEARTBEAT_INTERVAL = 5.0
+"""Interval between liveness heartbeats of a server node, in seconds"""
+
+NODE_TTL = 15
+"""Time after which a node that stopped sending heartbeats is considered dead"""
+
+""" Registry namespaces
+
+Each registry entry is identified by a key within a namespace, and is owned
+by the node that holds the corresponding connection.
+"""
+DEVICES = "devices"
+SHELLS = "shells"
+
+
+class Subscription(ABC):
+    """Incoming message queue of a single node"""
+
+    @abstractmethod
+    def get(self, timeout: float) -> Optional[str]:
+        """Wait for the next message, returns None on timeout"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def close(self):
+        raise NotImplementedError()
+
+
+class RouterBackend(ABC):
+    """Shared state of all server nodes
+
+    The backend stores the connection registry (which node holds which
+    connection), tracks node liveness and delivers messages between nodes.
+    """
+
+    @abstractmethod
+    def register(self, namespace: str, key: str, node: str) -> bool:
+        """Register a connection as held by the node
+
+        Returns:
+            False, if the connection is already held by a live node
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def unregister(self, namespace: str, key: str, node: str):
+        """Remove the registration, only if the connection is held by the node"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def owner(self, namespace: str, key: str) -> Optional[str]:
+        """Get the live node holding the connection"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def entries(self, namespace: str) -> dict[str, str]:
+        """Get all connections held by live nodes, keyed by connection"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def owners(self, namespace: str, keys: list[str]) -> dict[str, str]:
+        """Get the live nodes holding the given connections
+
+        Returns:
+            owners of the connections that are held by live nodes, keyed
+            by connection
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def count(self, namespace: str) -> int:
+        """Get the amount of connections held by live nodes
+
+        The connections held by each node are counted as they are
+        (un)registered, so this does not scan the registry.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def heartbeat(self, node: str):
+        """Mark the node as alive"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def alive(self, node: str) -> bool:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def remove_node(self, node: str):
+        """Mark the node as dead"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def publish(self, node: str, message: str):
+        """Send a message to the node"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def subscribe(self, node: str) -> Subscription:
+        """Start receiving messages sent to the node"""
+        raise NotImplementedError()
+
+
+class _QueueSubscription(Subscription):
+    def __init__(self, messages: queue.Queue, on_close: Callable[[], None]):
+        self._messages = messages
+        self._on_close = on_close
+
+    def get(self, timeout: float) -> Optional[str]:
+        try:
+            return self._messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._on_close()
+
+
+class InMemoryBackend(RouterBackend):
+    """Backend for nodes running within a single process
+
+    This is the default backend, used when the server runs in a single
+    process, in which case all connections are local.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, str]] = collections.defaultdict(dict)
+        # Amount of connections held by each node, per namespace
+        self._counts: dict[str, collections.Counter] = \
+            collections.defaultdict(collections.Counter)
+        self._nodes: dict[str, queue.Queue] = {}
+
+    def register(self, namespace: str, key: str, node: str) -> bool:
+        with self._lock:
+            current = self._entries[namespace].get(key)
+            if current is not None:
+                if current in self._nodes:
+                    return False
+                self.__uncount(namespace, current)
+            self._entries[namespace][key] = node
+            self._counts[namespace][node] += 1
+            return True
+
+    def unregister(self, namespace: str, key: str, node: str):
+        with self._lock:
+            if self._entries[namespace].get(key) == node:
+                del self._entries[namespace][key]
+                self.__uncount(namespace, node)
+
+    def owner(self, namespace: str, key: str) -> Optional[str]:
+        with self._lock:
+            node = self._entries[namespace].get(key)
+            return node if node in self._nodes else None
+
+    def entries(self, namespace: str) -> dict[str, str]:
+        with self._lock:
+            return {
+                key: node for key, node in self._entries[namespace].items()
+                if node in self._nodes
+            }
+
+    def owners(self, namespace: str, keys: list[str]) -> dict[str, str]:
+        with self._lock:
+            entries = self._entries[namespace]
+            return {
+                key: node for key in keys
+                if (node := entries.get(key)) is not None and node in self._nodes
+            }
+
+    def count(self, namespace: str) -> int:
+        with self._lock:
+            return sum(count for node, count in self._counts[namespace].items()
+                       if node in self._nodes)
+
+    def heartbeat(self, node: str):
+        with self._lock:
+            self._nodes.setdefault(node, queue.Queue())
+
+    def alive(self, node: str) -> bool:
+        with self._lock:
+            return node in self._nodes
+
+    def remove_node(self, node: str):
+        with self._lock:
+            self._nodes.pop(node, None)
+
+    def publish(self, node: str, message: str):
+        with self._lock:
+            messages = self._nodes.get(node)
+        if messages is not None:
+            messages.put(message)
+
+    def subscribe(self, node: str) -> Subscription:
+        self.heartbeat(node)
+        with self._lock:
+            messages = self._nodes[node]
+        return _QueueSubscription(messages, lambda: self.remove_node(node))
+
+    def __uncount(self, namespace: str, node: str):
+        counts = self._counts[namespace]
+        counts[node] -= 1
+        if counts[node] <= 0:
+            del counts[node]
+
+
+class _RedisSubscription(Subscription):
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    def get(self, timeout: float) -> Optional[str]:
+        message = self._pubsub.get_message(ignore_subscribe_messages=True,
+                                           timeout=timeout)
+        if message is None:
+            return None
+        return message["data"].decode()
+
+    def close(self):
+        self._pubsub.close()
+
+
+class RedisBackend(RouterBackend):
+    """Backend shared by nodes connected to the same Redis instance
+
+    Connections are stored in a hash per namespace, along with a hash of
+    the amount of connections held by each node. Node liveness is tracked
+    using expiring keys, and messages are delivered using Pub/Sub channels.
+    """
+
+    PREFIX = "rdfm:router"
+
+    def __init__(self, client):
+        """
+        Args:
+            client: `redis.Redis` (or a compatible) client
+        """
+        self.client = client
+
+    def register(self, namespace: str, key: str, node: str) -> bool:
+        import redis
+
+        name = self.__entries_key(namespace)
+        counts = self.__counts_key(namespace)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(name)
+                    current = pipe.hget(name, key)
+                    if current is not None and self.alive(current.decode()):
+                        pipe.unwatch()
+                        return False
+                    # The connection is not held, or its previous owner is
+                    # dead, take it over unless another node has done so
+                    # in the meantime
+                    pipe.multi()
+                    pipe.hset(name, key, node)
+                    pipe.hincrby(counts, node, 1)
+                    if current is not None:
+                        pipe.hincrby(counts, current.decode(), -1)
+                    pipe.execute()
+                    return True
+                except redis.WatchError:
+                    continue
+
+    def unregister(self, namespace: str, key: str, node: str):
+        import redis
+
+        name = self.__entries_key(namespace)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(name)
+                    current = pipe.hget(name, key)
+                    if current is None or current.decode() != node:
+                        pipe.unwatch()
+                        return
+                    pipe.multi()
+                    pipe.hdel(name, key)
+                    pipe.hincrby(self.__counts_key(namespace), node, -1)
+                    pipe.execute()
+                    return
+                except redis.WatchError:
+                    continue
+
+    def owner(self, namespace: str, key: str) -> Optional[str]:
+        node = self.client.hget(self.__entries_key(namespace), key)
+        if node is None or not self.alive(node.decode()):
+            return None
+        return node.decode()
+
+    def entries(self, namespace: str) -> dict[str, str]:
+        entries = {
+            key.decode(): node.decode() for key, node in
+            self.client.hgetall(self.__entries_key(namespace)).items()
+        }
+        live = {node for node in set(entries.values()) if self.alive(node)}
+        return {key: node for key, node in entries.items() if node in live}
+
+    def owners(self, namespace: str, keys: list[str]) -> dict[str, str]:
+        if not keys:
+            return {}
+        nodes = self.client.hmget(self.__entries_key(namespace), keys)
+        entries = {key: node.decode() for key, node in zip(keys, nodes)
+                   if node is not None}
+        live = {node for node in set(entries.values()) if self.alive(node)}
+        return {key: node for key, node in entries.items() if node in live}
+
+    def count(self, namespace: str) -> int:
+        counts = self.client.hgetall(self.__counts_key(namespace))
+        return sum(int(count) for node, count in counts.items()
+                   if self.alive(node.decode()))
+
+    def heartbeat(self, node: str):
+        self.client.set(self.__node_key(node), 1, ex=NODE_TTL)
+
+    def alive(self, node: str) -> bool:
+        return self.client.exists(self.__node_key(node)) > 0
+
+    def remove_node(self, node: str):
+        self.client.delete(self.__node_key(node))
+
+    def publish(self, node: str, message: str):
+        self.client.publish(self.__node_key(node), message)
+
+    def subscribe(self, node: str) -> Subscription:
+        pubsub = self.client.pubsub()
+        pubsub.subscribe(self.__node_key(node))
+        return _RedisSubscription(pubsub)
+
+    def __entries_key(self, namespace: str) -> str:
+        return f"{self.PREFIX}:{namespace}"
+
+    def __counts_key(self, namespace: str) -> str:
+        return f"{self.PREFIX}:count:{namespace}"
+
+    def __node_key(self, node: str) -> str:
+        return f"{self.PREFIX}:node:{node}"
+
+
+def create_backend(config: configuration.ServerConfig) -> RouterBackend:
+    """Create the router backend selected in the server configuration"""
+    if config.connection_registry == configuration.CONNECTION_REGISTRY_REDIS:
+        import redis
+
+        return RedisBackend(redis.Redis.from_url(config.redis_url))
+    return InMemoryBackend()
+
+
+class RemoteCallError(Exception):
+    """Raised when a call handled by another node failed unexpectedly"""
+
+
+_handlers: dict[str, Callable[..., Any]] = {}
+
+
+def handler(name: str):
+    """Register a function that can be called on the node holding a connection
+
+    The arguments and return value of the function must be serializable
+    to JSON, as the call may be made from a different node.
+    """
+    def decorator(f):
+        _handlers[name] = f
+        return f
+    return decorator
+
+
+class RoutedSocket:
+    """A stream between two nodes, used in place of a WebSocket
+
+    Implements the subset of the `simple_websocket.Client` interface that
+    is required for relaying data with `device_mgmt.helpers.ShellRelay`.
+    """
+
+    def __init__(self, router: "MessageRouter", stream_id: str, peer: str):
+        self.router = router
+        self.stream_id = stream_id
+        self.peer = peer
+        self.connected = True
+        self.event = NotifyingEvent()
+        self._frames: collections.deque = collections.deque()
+
+    def send(self, data: str | bytes):
+        if not self.connected:
+            raise ConnectionClosed()
+        self.router._send_frame(self, data)
+
+    def receive(self, timeout: Optional[float] = None) -> Optional[str | bytes]:
+        while self.connected and not self._frames:
+            if not self.event.wait(timeout=timeout):
+                return None
+            self.event.clear()
+        if self._frames:
+            data = self._frames.popleft()
+            if data is not None:
+                return data
+            self.connected = False
+        raise ConnectionClosed()
+
+    def close(self):
+        if self.connected:
+            self.connected = False
+            self.router._send_frame(self, None)
+        self.router._close_stream(self)
+
+    def _deliver(self, data: Optional[str | bytes]):
+        """Queue data received from the peer, None closes the stream"""
+        self._frames.append(data)
+        self.event.set()
+
+
+class MessageRouter:
+    """Routes operations to the server node holding a connection
+
+    Every server process is a separate node. Connections held by a node
+    (device management WebSockets, shell sessions) are registered in the
+    backend, so that any node can look up their owner. Calls to functions
+    registered using `handler` are then executed on the owning node, and
+    the result is sent back to the calling node.
+    """
+
+    def __init__(self, backend: RouterBackend, node_id: Optional[str] = None):
+        self.backend = backend
+        self.node_id = node_id if node_id else str(uuid.uuid4())
+        self.app: Optional[Flask] = None
+        self._lock = threading.Lock()
+        self._pending: dict[str, queue.Queue] = {}
+        self._streams: dict[str, RoutedSocket] = {}
+        self._stopped = threading.Event()
+        self._subscription: Optional[Subscription] = None
+
+    def start(self):
+        """Start handling messages from other nodes
+
+        Calls from other nodes are executed within the context of `app`,
+        if it was set.
+        """
+        self.backend.heartbeat(self.node_id)
+        self._subscription = self.backend.subscribe(self.node_id)
+        threading.Thread(target=self._listen_loop,
+                         args=(self._subscription, ),
+                         daemon=True).start()
+        threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+
+    def stop(self):
+        """Stop handling messages, the node is considered dead afterwards"""
+        self._stopped.set()
+        self.backend.remove_node(self.node_id)
+        if self._subscription is not None:
+            self._subscription.close()
+
+    def register(self, namespace: str, key: str) -> bool:
+        """Register a connection held by this node
+
+        Returns:
+            False, if the connection is already held by a live node
+        """
+        return self.backend.register(namespace, key, self.node_id)
+
+    def unregister(self, namespace: str, key: str):
+        self.backend.unregister(namespace, key, self.node_id)
+
+    def owner(self, namespace: str, key: str) -> Optional[str]:
+        """Get the node holding a connection, None if not connected"""
+        return self.backend.owner(namespace, key)
+
+    def entries(self, namespace: str) -> dict[str, str]:
+        """Get all connections in the namespace, along with their owners"""
+        return self.backend.entries(namespace)
+
+    def owners(self, namespace: str, keys: list[str]) -> dict[str, str]:
+        """Get the owners of the given connections, skipping those that
+        are not connected"""
+        return self.backend.owners(namespace, keys)
+
+    def count(self, namespace: str) -> int:
+        """Get the amount of connections in the namespace held by any node"""
+        return self.backend.count(namespace)
+
+    def is_local(self, node: Optional[str]) -> bool:
+        return node == self.node_id
+
+    def call(self, node: str, name: str, *args,
+             timeout: Optional[float] = None) -> Any:
+        """Execute a registered handler on the specified node
+
+        Exceptions raised by the handler are re-raised in the caller. Apart
+        from the optional timeout, the call fails if the node dies.
+        """
+        if self.is_local(node):
+            return _handlers[name](*args)
+
+        call_id = str(uuid.uuid4())
+        replies: queue.Queue = queue.Queue()
+        with self._lock:
+            self._pending[call_id] = replies
+        try:
+            self.backend.publish(node, json.dumps({
+                "type": "call",
+                "id": call_id,
+                "node": self.node_id,
+                "name": name,
+                "args": list(args),
+            }))
+            reply = self.__wait_for_reply(replies, node, name, timeout)
+        finally:
+            with self._lock:
+                self._pending.pop(call_id)
+
+        if "error" not in reply:
+            return reply["result"]
+        if reply.get("status_code") is not None:
+            raise WebSocketException(reply["error"], reply["status_code"])
+        raise RemoteCallError(reply["error"])
+
+    def call_device(self, mac_address: str, name: str, *args,
+                    timeout: Optional[float] = None) -> Any:
+        """Execute a registered handler on the node the device is connected to"""
+        node = self.owner(DEVICES, mac_address)
+        if node is None:
+            msg = f"Device '{mac_address}' not connected to the management WS."
+            raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
+        return self.call(node, name, *args, timeout=timeout)
+
+    def open_stream(self, stream_id: str, peer: str) -> RoutedSocket:
+        """Open a stream to the peer node
+
+        Both nodes must open the stream using the same identifier.
+        """
+        stream = RoutedSocket(self, stream_id, peer)
+        with self._lock:
+            self._streams[stream_id] = stream
+        return stream
+
+    def _send_frame(self, stream: RoutedSocket, data: Optional[str | bytes]):
+        frame: dict[str, Any] = {"type": "frame", "stream": stream.stream_id}
+        if isinstance(data, bytes):
+            frame["binary"] = base64.b64encode(data).decode()
+        elif data is not None:
+            frame["text"] = data
+        self.backend.publish(stream.peer, json.dumps(frame))
+
+    def _close_stream(self, stream: RoutedSocket):
+        with self._lock:
+            if self._streams.get(stream.stream_id) is stream:
+                del self._streams[stream.stream_id]
+
+    def _listen_loop(self, subscription: Subscription):
+        while not self._stopped.is_set():
+            try:
+                raw = subscription.get(HEARTBEAT_INTERVAL)
+                if raw is not None:
+                    self.__dispatch(json.loads(raw))
+            except Exception as e:
+                if self._stopped.is_set():
+                    return
+                print("Router message handling failed:", repr(e), flush=True)
+                time.sleep(1)
+
+    def _heartbeat_loop(self):
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.backend.heartbeat(self.node_id)
+            except Exception as e:
+                print("Router heartbeat failed:", repr(e), flush=True)
+
+    def __dispatch(self, message: dict[str, Any]):
+        match message["type"]:
+            case "call":
+                threading.Thread(target=self.__handle_call,
+                                 args=(message, ),
+                                 daemon=True).start()
+            case "reply":
+                with self._lock:
+                    replies = self._pending.get(message["id"])
+                if replies is not None:
+                    replies.put(message)
+            case "frame":
+                with self._lock:
+                    stream = self._streams.get(message["stream"])
+                if stream is None:
+                    return
+                if "binary" in message:
+                    stream._deliver(base64.b64decode(message["binary"]))
+                else:
+                    stream._deliver(message.get("text"))
+
+    def __handle_call(self, message: dict[str, Any]):
+        reply: dict[str, Any] = {"type": "reply", "id": message["id"]}
+        try:
+            context = (self.app.app_context() if self.app is not None
+                       else contextlib.nullcontext())
+            with context:
+                reply["result"] = _handlers[message["name"]](*message["args"])
+        except WebSocketException as e:
+            reply["error"] = e.message
+            reply["status_code"] = e.status_code
+        except Exception as e:
+            traceback.print_exc()
+            reply["error"] = f"{message['name']} failed: {repr(e)}"
+        self.backend.publish(message["node"], json.dumps(reply))
+
+    def __wait_for_reply(self, replies: queue.Queue, node: str, name: str,
+                         timeout: Optional[float]) -> dict[str, Any]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = HEARTBEAT_INTERVAL
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    msg = f"Call '{name}' to node {node} timed out."
+                    raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
+            try:
+                return replies.get(timeout=wait)
+            except queue.Empty:
+                if not self.backend.alive(node):
+                    msg = f"Server node {node} handling call '{name}' is gone."
+                    raise WebSocketException(msg, RDFM_WS_INVALID_REQUEST)
@@ -1,8 +1,11 @@
+import threading
+from typing import Any, Callable, Optional
 from uuid import UUID
 from device_mgmt.models.reverse_shell import ReverseShell
 import simple_websocket
+import rdfm.ws
 from rdfm.ws import RDFM_WS_INVALID_REQUEST
-import device_mgmt.helpers
+import device_mgmt.router
 from rdfm.ws import WebSocketException
 from request_models import DeviceAttachToManager
 import server
@@ -17,8 +20,27 @@ def attach_device_to_manager(
     has spawned a shell executable and is now trying to connect to a remote
     manager to send the shell STDOUT and receive user input.
     """
+    relay_to_manager(ws, mac_address, uuid).wait()
+
+
+def relay_to_manager(
+    ws: Any, mac_address: str, uuid: str,
+    on_finished: Optional[Callable[[], None]] = None,
+) -> threading.Event:
+    """Start relaying data between a device shell socket and the manager
+
+    The device shell socket is either a device shell WebSocket, or a shell
+    session multiplexed over the management WebSocket (see: `ShellChannel`).
+
+    Args:
+        on_finished: optional callback, called once the relaying has finished
+
+    Returns:
+        event, which is set when the relaying has finished
+    """
+    node = server.instance.shell_sessions.owner(mac_address, UUID(uuid))
     shell = server.instance.shell_sessions.get(mac_address, UUID(uuid))
-    if shell is None:
+    if node is None or (shell is None and server.instance.router.is_local(node)):
         print(
             "Attaching device shell failed: shell session with UUID",
             uuid,
@@ -31,16 +53,88 @@ def attach_device_to_manager(
             "invalid shell session identifier", RDFM_WS_INVALID_REQUEST
         )
 
+    if shell is None:
+        # The manager is connected to a different server process, relay
+        # the shell data through the router
+        stream = server.instance.router.open_stream(f"{mac_address}_{uuid}", node)
+        try:
+            server.instance.router.call(
+                node, "relay_shell", mac_address, uuid,
+                server.instance.router.node_id
+            )
+        except Exception:
+            stream.close()
+            raise
+
+        def _on_stream_finished():
+            stream.close()
+            if on_finished is not None:
+                on_finished()
+
+        return server.instance.shell_relay.relay(ws, stream, _on_stream_finished)
+
     # Signal that a device has connected to the shell
     shell.device_connected.set()
 
-    # Run the copy loop - copy from the device shell socket to the
-    # manager socket
-    device_mgmt.helpers.bidirectional_copy(ws, shell.manager_socket)
+    def _on_session_finished():
+        # Signal the manager websocket to close
+        # Otherwise, we could end up leaking connections
+        shell.device_connection_closed.set()
+        if on_finished is not None:
+            on_finished()
 
-    # Signal the manager websocket to close
-    # Otherwise, we could end up leaking connections
-    shell.device_connection_closed.set()
+    # Relay the data between the device shell socket and the manager
+    # socket, until either of them disconnects
+    return server.instance.shell_relay.relay(ws, shell.manager_socket,
+                                             _on_session_finished)
+
+
+@device_mgmt.router.handler("relay_shell")
+def relay_shell(mac_address: str, uuid: str, node: str):
+    """Attach a device connected to another server process to the shell session
+
+    Shell data is relayed between the manager WebSocket and the stream
+    opened by the process holding the device shell WebSocket.
+    """
+    shell = server.instance.shell_sessions.get(mac_address, UUID(uuid))
+    if shell is None:
+        raise WebSocketException(
+            "invalid shell session identifier", RDFM_WS_INVALID_REQUEST
+        )
+
+    stream = server.instance.router.open_stream(f"{mac_address}_{uuid}", node)
+    shell.device_connected.set()
+
+    def _on_finished():
+        stream.close()
+        shell.device_connection_closed.set()
+
+    server.instance.shell_relay.relay(stream, shell.manager_socket, _on_finished)
+
+
+@device_mgmt.router.handler("request_shell")
+def request_shell(mac_address: str, uuid: str):
+    """Request a device connected to this server process to attach to a shell"""
+    remote_device = server.instance.remote_devices.get(mac_address)
+    if remote_device is None:
+        raise WebSocketException(
+            f"device {mac_address} not connected to the management WS",
+            RDFM_WS_INVALID_REQUEST,
+        )
+    if not rdfm.ws.can_handle_request(remote_device.capabilities, "shell_open"):
+        remote_device.send_message(
+            DeviceAttachToManager(mac_addr=mac_address, uuid=uuid)
+        )
+        return
+
+    # The device carries the session over its management WebSocket, which
+    # saves connecting a separate WebSocket for each session
+    channel = remote_device.open_shell_channel(uuid)
+    try:
+        relay_to_manager(channel, mac_address, uuid, channel.close)
+    except Exception:
+        channel.close()
+        raise
 
 
 def attach_manager_to_shell(ws: simple_websocket.Client, mac_address: str):
@@ -50,8 +144,7 @@ def attach_manager_to_shell(ws: simple_websocket.Client, mac_address: str):
     A new shell session is created, and a management message is sent to
     the device telling it to connect to the newly created session.
     """
-    remote_device = server.instance.remote_devices.get(mac_address)
-    if remote_device is None:
+    if not server.instance.remote_devices.is_connected(mac_address):
         raise WebSocketException(
             f"device {mac_address} not connected to the management WS",
             RDFM_WS_INVALID_REQUEST,
@@ -73,10 +166,8 @@ def attach_manager_to_shell(ws: simple_websocket.Client, mac_address: str):
         # Send a message to the device indicating which shell it should
         # connect to
         try:
-            remote_device.send_message(
-                DeviceAttachToManager(
-                    mac_addr=mac_address, uuid=str(shell.uuid)
-                )
+            server.instance.router.call_device(
+                mac_address, "request_shell", mac_address, str(shell.uuid)
             )
         except WebSocketException as e:
             print(
@@ -101,18 +192,11 @@ def attach_manager_to_shell(ws: simple_websocket.Client, mac_address: str):
                 "device did not connect within 5s", RDFM_WS_INVALID_REQUEST
             )
 
-        # Once the device has connected, the thread that handles the WS
-        # connection handles the process of copying to and from the manager.
+        # Once the device has connected, the shell relay handles the process
+        # of copying to and from the manager, and finishes as soon as either
+        # the device or the manager closes the connection.
         # See above function, `attach_device_to_manager`.
-        # In here, we only need to check if the device or the manager
-        # have closed the connection.
-        while True:
-            # Check if the device has closed the connection
-            if shell.device_connection_closed.wait(5.0):
-                break
-            # Check if the manager has closed the connection
-            if not shell.manager_socket.connected:
-                break
+        shell.device_connection_closed.wait()
     finally:
         print("Reverse shell session", shell.uuid, "terminated", flush=True)
         server.instance.shell_sessions.remove(shell)
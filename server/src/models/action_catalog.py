@@ -0,0 +1,21 @@
+import datetime
+from typing import Any, Optional
+from models.base import Base
+from sqlalchemy import JSON, DateTime, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+class ActionCatalog(Base):
+    """Actions last reported by a device
+
+    The version is reported by the device together with its capabilities,
+    and identifies the reported actions, so that they can be reused
+    by later connections of the device.
+    """
+
+    __tablename__ = "action_catalogs"
+
+    mac_address: Mapped[str] = mapped_column(Text, primary_key=True)
+    version: Mapped[Optional[str]] = mapped_column(Text)
+    actions: Mapped[list[dict[str, Any]]] = mapped_column(JSON)
+    updated: Mapped[datetime.datetime] = mapped_column(DateTime)
@@ -14,3 +14,17 @@ class ActionLog(Base):
     created: Mapped[datetime.datetime] = mapped_column(DateTime)
     status: Mapped[str] = mapped_column(Text)
     download_url: Mapped[Optional[str]] = mapped_column(Text)
+    broadcast_id: Mapped[Optional[str]] = mapped_column(Text, index=True)
+    priority: Mapped[int] = mapped_column(default=0, server_default="0")
+
+
+class ActionBroadcast(Base):
+    """Execution of an action on all devices of a group or with a tag"""
+
+    __tablename__ = "action_broadcasts"
+
+    id: Mapped[str] = mapped_column(primary_key=True)
+    action_id: Mapped[str] = mapped_column(Text)
+    created: Mapped[datetime.datetime] = mapped_column(DateTime)
+    group: Mapped[Optional[int]] = mapped_column()
+    tag: Mapped[Optional[str]] = mapped_column(Text)
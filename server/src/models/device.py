@@ -1,6 +1,6 @@
-from typing import Optional
+from typing import Any, Optional
 from sqlalchemy import ForeignKey
-from sqlalchemy import Text, DateTime
+from sqlalchemy import Text, DateTime, JSON
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
 import datetime
@@ -14,13 +14,17 @@ class Device(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     last_access: Mapped[datetime.datetime] = mapped_column(
-        DateTime, nullable=True
+        DateTime, nullable=True, index=True
     )
-    name: Mapped[str] = mapped_column(Text)
-    mac_address: Mapped[str] = mapped_column(Text)
-    capabilities: Mapped[str] = mapped_column(Text)
-    device_metadata: Mapped[str] = mapped_column(Text)
+    name: Mapped[str] = mapped_column(Text, index=True)
+    mac_address: Mapped[str] = mapped_column(Text, index=True)
+    capabilities: Mapped[dict[str, Any]] = mapped_column(JSON)
+    device_metadata: Mapped[dict[str, Any]] = mapped_column(JSON)
     public_key: Mapped[Optional[str]] = mapped_column(Text)
+    # Frequently queried metadata values, kept in sync with `device_metadata`
+    # by `DevicesDB`, so that they can be indexed
+    devtype: Mapped[Optional[str]] = mapped_column(Text, index=True)
+    software_version: Mapped[Optional[str]] = mapped_column(Text, index=True)
 
 
 class DeviceGroupAssignment(Base):
@@ -31,7 +35,8 @@ class DeviceGroupAssignment(Base):
     )
     group_id: Mapped[int] = mapped_column(
             ForeignKey(models.group.Group.id, ondelete="RESTRICT"),
-            primary_key=True
+            primary_key=True,
+            index=True
     )
 
 
@@ -41,4 +46,4 @@ class DeviceTag(Base):
             ForeignKey(Device.id, ondelete="RESTRICT"),
             primary_key=True
     )
-    tag: Mapped[int] = mapped_column(Text, primary_key=True)
+    tag: Mapped[int] = mapped_column(Text, primary_key=True, index=True)
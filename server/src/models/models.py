@@ -5,5 +5,6 @@ from models.device import Device
 from models.registration import Registration
 from models.log import Log
 from models.permission import Permission
-from models.action_log import ActionLog
+from models.action_log import ActionLog, ActionBroadcast
 from models.device_update import DeviceUpdate
+from models.action_catalog import ActionCatalog
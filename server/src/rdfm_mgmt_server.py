@@ -58,6 +58,11 @@ def create_server_instance(
         if srv.db is None:
             raise RuntimeError("Database connection failed")
 
+        srv.router.start()
+        srv.statistics.reconcile()
+        srv.statistics.start_reconciliation(
+            config.statistics_reconcile_interval
+        )
         return srv
     except Exception as e:
         raise RuntimeError(f"Failed to connect to the database: {e}")
@@ -84,6 +89,7 @@ def create_app(config: configuration.ServerConfig) -> Flask:
         app.register_blueprint(api.static.create_routes())
     else:
         app = Flask(__name__)
+    app.request_class = api.v1.middleware.RdfmRequest
 
     if hasattr(config, "redis_url"):
         app.config["REDIS_URL"] = config.redis_url
@@ -133,7 +139,9 @@ def setup(config: configuration.ServerConfig) -> Flask:
     """
     server.instance = create_server_instance(config)
     server.instance.sse = sse
-    return create_app(config)
+    app = create_app(config)
+    server.instance.router.app = app
+    return app
 
 
 def setup_with_config_from_env() -> Flask:
@@ -269,6 +277,12 @@ def parse_config_from_cli() -> configuration.ServerConfig:
         dest="enable_pubsub",
         help="enables Kafka integration",
     )
+    parser.add_argument(
+        "--device-gateway-port",
+        type=int,
+        default=None,
+        help="port of the asyncio-based device management WebSocket gateway",
+    )
     parser.add_argument(
         "--debug", action="store_true", help="launch server in debug mode"
     )
@@ -293,6 +307,12 @@ if __name__ == "__main__":
         print("RDFM server setup failed:", e)
         exit(1)
 
+    if config.device_gateway_port is not None:
+        import device_mgmt.gateway
+
+        print("Starting the RDFM device gateway...")
+        device_mgmt.gateway.DeviceGateway(config, app).start()
+
     print("Starting the RDFM HTTP API...")
     if config.encrypted:
         app.run(
@@ -9,28 +9,71 @@ import configuration
 from device_mgmt.containers import (
     RemoteDevices, ShellSessions, ActionExecutions, FilesystemOperations
 )
+from device_mgmt.router import MessageRouter, create_backend
+from device_mgmt.helpers import ShellRelay
+from device_mgmt.broadcast import ActionBroadcasts
+from device_mgmt.action_scheduler import ActionScheduler
+from device_mgmt.progress import UpdateProgressAggregator
+from device_mgmt.logs import LogIngestion
+from device_mgmt.admission import AdmissionControl
+from device_mgmt.outbound import OutboundQueues
+from device_mgmt.expiry import TimerWheel
+from device_mgmt.action import EXECUTION_TOTAL_TIMEOUT, QUEUE_RESPONSE_TIMEOUT
+from device_mgmt.fs import PROBE_TIMEOUT
 import datetime
 from models.device import Device
 from database.permissions import PermissionsDB
 from database.action_logs import ActionLogsDB
+from database.action_catalogs import ActionCatalogsDB
 from database.device_updates import DeviceUpdatesDB
+from database.statistics import FleetStatistics
 
 
 class Server:
     def __init__(self, config: configuration.ServerConfig):
         self.db = database.db.create(config.db_conn)
-        self._devices_db: DevicesDB = DevicesDB(self.db)
+        self.statistics = FleetStatistics(
+            self.db, lambda: self.remote_devices.count()
+        )
+        self._devices_db: DevicesDB = DevicesDB(self.db, self.statistics)
         self._packages_db: PackagesDB = PackagesDB(self.db)
-        self._groups_db: GroupsDB = GroupsDB(self.db)
-        self._registrations_db: RegistrationsDB = RegistrationsDB(self.db)
+        self._groups_db: GroupsDB = GroupsDB(self.db, self.statistics)
+        self._registrations_db: RegistrationsDB = RegistrationsDB(
+            self.db, self.statistics
+        )
         self._logs_db: LogsDB = LogsDB(self.db)
-        self.remote_devices = RemoteDevices()
-        self.shell_sessions = ShellSessions()
-        self.action_executions = ActionExecutions()
-        self.filesystem_operations = FilesystemOperations()
+        self.router = MessageRouter(create_backend(config))
+        self.remote_devices = RemoteDevices(self.router)
+        self.outbound = OutboundQueues(
+            config.device_send_workers,
+            config.device_send_queue_size,
+            config.device_send_timeout,
+            config.device_write_timeout,
+        )
+        self.shell_sessions = ShellSessions(self.router)
+        self.shell_relay = ShellRelay()
+        self.timer_wheel = TimerWheel()
+        self.action_executions = ActionExecutions(
+            self.timer_wheel, QUEUE_RESPONSE_TIMEOUT + EXECUTION_TOTAL_TIMEOUT
+        )
+        self.action_scheduler = ActionScheduler()
+        self.filesystem_operations = FilesystemOperations(
+            self.timer_wheel, PROBE_TIMEOUT
+        )
         self._permissions_db = PermissionsDB(self.db)
         self._action_logs_db = ActionLogsDB(self.db)
-        self._device_updates_db = DeviceUpdatesDB(self.db)
+        self._action_catalogs_db = ActionCatalogsDB(self.db)
+        self.action_broadcasts = ActionBroadcasts(config.action_broadcast_concurrency)
+        self._device_updates_db = DeviceUpdatesDB(self.db, self.statistics)
+        self.update_progress = UpdateProgressAggregator(
+            config.update_progress_flush_interval
+        )
+        self.log_ingestion = LogIngestion(config.log_queue_size)
+        self.admission = AdmissionControl(
+            config.device_connect_rate,
+            config.device_connect_burst,
+            config.device_post_connect_workers,
+        )
 
     def create_mock_data(self):
         """Creates mock data
@@ -47,8 +90,8 @@ class Server:
                 name=mac,
                 mac_address=mac,
                 last_access=datetime.datetime.utcnow(),
-                capabilities="{}",
-                device_metadata="{}",
+                capabilities={},
+                device_metadata={},
                 public_key=None,
             )
 
@@ -0,0 +1,158 @@
+import contextlib
+import hashlib
+import io
+import json
+import os
+import tarfile
+import tempfile
+from typing import Optional
+
+
+""" Name of the archive containing the header of an RDFM artifact
+"""
+ARTIFACT_HEADER = "header.tar"
+
+""" Maximum size of an artifact header that is extracted from an upload
+"""
+MAX_ARTIFACT_HEADER_SIZE = 1024 * 1024
+
+""" Artifact type of packages that are not RDFM artifacts
+"""
+ARTIFACT_NONSTANDARD = "nonstandard"
+
+
+class PackageIngest:
+    """Stream receiving an uploaded package
+
+    The request body is parsed by Werkzeug, which writes the contents of
+    the uploaded file to this stream. In that single pass over the data
+    the package is written to a spool file, its SHA256 digest is calculated
+    and the header of the RDFM artifact is extracted, so that the package
+    does not have to be read again. The storage driver then takes over the
+    spool file, which is removed once the stream is closed.
+    """
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        """
+        Args:
+            directory: directory in which the spool file is created,
+                       by default the system temporary directory
+        """
+        self._file = tempfile.NamedTemporaryFile(
+            "wb+", dir=directory, prefix=".upload-", delete=False
+        )
+        self.name = self._file.name
+        self._sha256 = hashlib.sha256()
+        self._header = _ArtifactHeaderReader()
+
+    def write(self, data: bytes) -> int:
+        self._file.write(data)
+        self._sha256.update(data)
+        self._header.feed(data)
+        return len(data)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def readline(self, size: int = -1) -> bytes:
+        return self._file.readline(size)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        """Close the stream, removing the spool file unless it was moved"""
+        self._file.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.name)
+
+    def sha256(self) -> str:
+        """Get the SHA256 digest of the written data"""
+        return self._sha256.hexdigest()
+
+    def artifact_types(self) -> list[str]:
+        """Get the payload types listed in the header of the RDFM artifact
+
+        Packages that are not RDFM artifacts are of the
+        `ARTIFACT_NONSTANDARD` type.
+        """
+        # The artifact is a .tar file containing a 'header.tar' file,
+        # which is also a .tar file that contains a 'header-info' JSON.
+        artifact_types = []
+        try:
+            if self._header.header is None:
+                raise KeyError(ARTIFACT_HEADER)
+            header_tar = tarfile.open(fileobj=io.BytesIO(self._header.header))
+            header_info_io = header_tar.extractfile("header-info")
+            header_info_json = json.load(header_info_io)
+            for payload in header_info_json["payloads"]:
+                artifact_types.append(payload["type"])
+        except (tarfile.ReadError, KeyError):
+            artifact_types.append(ARTIFACT_NONSTANDARD)
+        return artifact_types
+
+
+class _ArtifactHeaderReader:
+    """Extracts the artifact header from a tar archive as it is written
+
+    Only the member headers of the archive are parsed, the contents of
+    other members are skipped without being buffered.
+    """
+
+    def __init__(self) -> None:
+        self.header: Optional[bytes] = None
+        self._done = False
+        self._block = bytearray()
+        # Amount of bytes to skip until the next member header
+        self._skip = 0
+        self._member: Optional[bytearray] = None
+        self._remaining = 0
+
+    def feed(self, data: bytes):
+        view = memoryview(data)
+        while view and not self._done:
+            if self._skip > 0:
+                size = min(self._skip, len(view))
+                self._skip -= size
+            elif self._member is not None:
+                size = min(self._remaining, len(view))
+                self._member += view[:size]
+                self._remaining -= size
+                if self._remaining == 0:
+                    self.__extracted()
+            else:
+                size = min(tarfile.BLOCKSIZE - len(self._block), len(view))
+                self._block += view[:size]
+                if len(self._block) == tarfile.BLOCKSIZE:
+                    self.__parse_member(bytes(self._block))
+                    self._block.clear()
+            view = view[size:]
+
+    def __parse_member(self, block: bytes):
+        try:
+            info = tarfile.TarInfo.frombuf(block, tarfile.ENCODING,
+                                           "surrogateescape")
+        except tarfile.HeaderError:
+            # End of the archive, or not a tar archive at all
+            self._done = True
+            return
+
+        if info.name == ARTIFACT_HEADER and info.isfile() and \
+                info.size <= MAX_ARTIFACT_HEADER_SIZE:
+            self._member = bytearray()
+            self._remaining = info.size
+            if info.size == 0:
+                self.__extracted()
+        else:
+            # Member contents are padded to a whole amount of blocks
+            self._skip = info.size + -info.size % tarfile.BLOCKSIZE
+
+    def __extracted(self):
+        self.header = bytes(self._member)
+        self._done = True
@@ -26,6 +26,8 @@ class LocalStorage:
     The metadata of the package is updated. All storage drivers shall use:
          rdfm.storage.<storage-driver-name>.<key>
     metadata keys.
+    When `move` is set, the package file is moved into the storage instead
+    of being copied.
     """
 
     def upsert(
@@ -33,6 +35,7 @@ class LocalStorage:
         metadata: dict[str, str],
         package_path: str,
         storage_directory: str | None = None,
+        move: bool = False,
     ) -> bool:
         print("Local storage update package:", metadata, "path:", package_path)
         if storage_directory is None:
@@ -51,7 +54,12 @@ class LocalStorage:
             return False
         # Create the storage directory
         destination_path.parent.mkdir(exist_ok=True, parents=True)
-        shutil.copy(package_path, destination_path)
+        if move:
+            # Spool files are placed within the storage, which makes
+            # the move an atomic rename
+            os.replace(package_path, destination_path)
+        else:
+            shutil.copy(package_path, destination_path)
 
         metadata["rdfm.storage.local.uuid"] = store_name
         metadata["rdfm.storage.local.length"] = os.path.getsize(
@@ -62,6 +70,16 @@ class LocalStorage:
         )
         return True
 
+    """
+    Returns the directory in which uploaded packages are spooled, so that
+    they can be moved into the storage without copying them
+    """
+
+    def spool_directory(self) -> str | None:
+        directory = Path(self.config.package_dir)
+        directory.mkdir(exist_ok=True, parents=True)
+        return str(directory)
+
     """
     Makes a direct HTTP URL to the specified package with given expiration time
     Expiration is in seconds.
@@ -50,6 +50,11 @@ class S3Storage:
 
         self.client = boto3.client("s3", **kwargs)
 
+    def spool_directory(self) -> str | None:
+        """Directory in which uploaded packages are spooled before being
+        uploaded to the bucket, None for the system temporary directory"""
+        return None
+
     @staticmethod
     def get_object_path(bucket_directory: str | None, object_id: str) -> str:
         if bucket_directory is None or bucket_directory == "":
@@ -62,8 +67,12 @@ class S3Storage:
         metadata: dict[str, str],
         package_path: str,
         bucket_directory: str | None = None,
+        move: bool = False,
     ) -> bool:
-        """Updates the contents of the package specified by `metadata`"""
+        """Updates the contents of the package specified by `metadata`
+
+        When `move` is set, the package file is removed once it was uploaded.
+        """
         try:
             # Generate a unique object identifier
             object_id = str(uuid.uuid4())
@@ -87,6 +96,8 @@ class S3Storage:
                 metadata[META_S3_DIRECTORY] = str(bucket_directory)
             else:
                 metadata[META_S3_DIRECTORY] = ""
+            if move:
+                os.unlink(package_path)
             return True
         except ClientError as e:
             print(
@@ -21,6 +21,9 @@ from common import (
     KAFKA_TOPIC,
 )
 from device_mgmt.pubsub import RdfmKafkaAdminClient
+import configuration
+import rdfm_mgmt_server
+import server
 
 
 def pytest_addoption(parser):
@@ -165,6 +168,40 @@ def process(db, process_config: ProcessConfig, request):
     log_file.close()
 
 
+@pytest.fixture()
+def app_config():
+    """Configuration overrides of the in-process server, empty unless
+        test is parameterized like so:
+
+        **Example usage**
+
+        .. sourcecode:: python
+            @pytest.mark.parametrize("app_config", [{"log_queue_size": 2}])
+            test_dummy(app):
+                pass
+    """
+    return {}
+
+
+@pytest.fixture()
+def app(tmp_path, app_config: dict):
+    """In-process RDFM server, with API authentication disabled
+
+    The server uses a fresh SQLite database and local storage, both
+    placed in the temporary directory of the test.
+    """
+    config = configuration.ServerConfig()
+    config.db_conn = f"sqlite:///{tmp_path / 'rdfm.db'}"
+    config.package_dir = str(tmp_path / "packages")
+    config.storage_driver = "local"
+    config.disable_api_auth = True
+    for key, value in app_config.items():
+        setattr(config, key, value)
+    app = rdfm_mgmt_server.setup(config)
+    yield app
+    server.instance.db.dispose()
+
+
 @pytest.fixture(scope="function")
 def process_gunicorn(db, request):
     """Fixture to start the RDFM server with Gunicorn"""
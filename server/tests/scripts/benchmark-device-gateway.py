@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import jwt
+from wsproto import ConnectionType, WSConnection
+from wsproto.events import AcceptConnection, Ping, Request
+from auth.device import DeviceToken, DEVICE_JWT_ALGO
+
+
+# Measures the server-side cost of idle device connections to the device
+# management WebSocket, served either by the asyncio-based device gateway
+# or by the WSGI app (one thread per connection).
+# Run this script in the server venv, for example:
+#   poetry run python tests/scripts/benchmark-device-gateway.py --devices 10000
+#   poetry run python tests/scripts/benchmark-device-gateway.py --devices 10000 --wsgi
+# Each connection requires a file descriptor in both the server and this
+# script, raise the limit accordingly (ulimit -n). Connections are spread
+# over multiple loopback addresses to avoid exhausting the ephemeral ports.
+
+HTTP_PORT = 5000
+GATEWAY_PORT = 5002
+CONNECTIONS_PER_ADDRESS = 20000
+JWT_SECRET = os.environ.setdefault("JWT_SECRET", "foobarbaz")
+
+
+def create_token(n: int) -> str:
+    token_data = DeviceToken()
+    token_data.device_id = ":".join(f"{n:012x}"[i:i + 2] for i in range(0, 12, 2))
+    token_data.created_at = int(time.time())
+    token_data.expires = 999999999
+    return jwt.encode(token_data.to_dict(), JWT_SECRET, algorithm=DEVICE_JWT_ALGO)
+
+
+def rss_kib(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    raise RuntimeError("VmRSS not found")
+
+
+def threads(pid: int) -> int:
+    return len(os.listdir(f"/proc/{pid}/task"))
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime and stime, fields 14 and 15 of /proc/<pid>/stat
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class IdleDevice:
+    """Device that connects to the management WebSocket and stays idle,
+    only responding to pings"""
+
+    def __init__(self, n: int, port: int):
+        self.n = n
+        self.port = port
+
+    async def connect(self):
+        address = f"127.0.0.{2 + self.n // CONNECTIONS_PER_ADDRESS}"
+        self.reader, self.writer = await asyncio.open_connection(
+            "127.0.0.1", self.port, local_addr=(address, 0)
+        )
+        self.ws = WSConnection(ConnectionType.CLIENT)
+        self.writer.write(self.ws.send(Request(
+            host="127.0.0.1",
+            target="/api/v1/devices/ws",
+            extra_headers=[(b"authorization",
+                            f"Bearer token={create_token(self.n)}".encode())],
+        )))
+        while True:
+            data = await self.reader.read(4096)
+            if not data:
+                raise ConnectionError("connection closed during the handshake")
+            self.ws.receive_data(data)
+            if any(isinstance(e, AcceptConnection) for e in self.ws.events()):
+                return
+
+    async def idle(self):
+        while data := await self.reader.read(4096):
+            self.ws.receive_data(data)
+            for event in self.ws.events():
+                if isinstance(event, Ping):
+                    self.writer.write(self.ws.send(event.response()))
+
+
+async def run_clients(devices: int, port: int, rate: int) -> list[asyncio.Task]:
+    clients = [IdleDevice(n, port) for n in range(devices)]
+    tasks = []
+    for i in range(0, devices, rate):
+        batch = clients[i:i + rate]
+        await asyncio.gather(*(c.connect() for c in batch))
+        tasks.extend(asyncio.ensure_future(c.idle()) for c in batch)
+        print(f"\rConnected {i + len(batch)}/{devices}", end="", flush=True)
+    print()
+    return tasks
+
+
+def start_server(wsgi: bool, database: str) -> subprocess.Popen:
+    args = [sys.executable, "-m", "rdfm_mgmt_server", "--no-ssl", "--no-api-auth",
+            "--database", database, "--http-port", str(HTTP_PORT)]
+    if not wsgi:
+        args += ["--device-gateway-port", str(GATEWAY_PORT)]
+    process = subprocess.Popen(args, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(
+                    ("127.0.0.1", HTTP_PORT if wsgi else GATEWAY_PORT), 1):
+                return process
+        except OSError:
+            time.sleep(0.5)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+async def benchmark(args):
+    with tempfile.TemporaryDirectory() as directory:
+        process = start_server(args.wsgi, f"sqlite:///{directory}/devices.db")
+        try:
+            # Let the server settle before taking the baseline
+            await asyncio.sleep(5)
+            base_rss, base_threads = rss_kib(process.pid), threads(process.pid)
+
+            start = time.time()
+            tasks = await run_clients(args.devices, HTTP_PORT if args.wsgi else GATEWAY_PORT,
+                              args.rate)
+            connect_time = time.time() - start
+
+            # Wait for the per-connection setup (action queue etc.) to finish
+            await asyncio.sleep(args.settle)
+            rss, server_threads = rss_kib(process.pid), threads(process.pid)
+            cpu = cpu_seconds(process.pid)
+            await asyncio.sleep(args.idle)
+            idle_cpu = cpu_seconds(process.pid) - cpu
+            disconnected = sum(task.done() for task in tasks)
+        finally:
+            process.kill()
+
+    print(f"Server:                  {'WSGI' if args.wsgi else 'device gateway'}")
+    print(f"Connected devices:       {args.devices} in {connect_time:.1f}s")
+    print(f"Disconnected devices:    {disconnected}")
+    print(f"Server threads:          {base_threads} -> {server_threads}")
+    print(f"Server RSS:              {base_rss} KiB -> {rss} KiB")
+    print(f"RSS per connection:      {(rss - base_rss) / args.devices:.2f} KiB")
+    print(f"Idle CPU over {args.idle}s:      {idle_cpu:.2f}s "
+          f"({100 * idle_cpu / args.idle:.2f}% of a core)")
+    print(f"Idle CPU per connection: "
+          f"{1e6 * idle_cpu / args.idle / args.devices:.2f} us/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark idle device connections to the RDFM server."
+    )
+    parser.add_argument("--devices", type=int, default=10000,
+                        help="amount of simulated devices")
+    parser.add_argument("--rate", type=int, default=500,
+                        help="amount of devices connecting simultaneously")
+    parser.add_argument("--settle", type=int, default=35,
+                        help="time to wait after connecting, in seconds")
+    parser.add_argument("--idle", type=int, default=60,
+                        help="time to measure the idle CPU usage, in seconds")
+    parser.add_argument("--wsgi", action="store_true",
+                        help="connect to the WSGI app instead of the device gateway")
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if args.devices + 100 > hard:
+        print(f"Warning: the file descriptor limit ({hard}) is too low "
+              f"for {args.devices} devices")
+
+    asyncio.run(benchmark(args))
@@ -0,0 +1,77 @@
+import argparse
+import base64
+import json
+import time
+import uuid
+from rdfm_mgmt_communication import decode_json
+from request_models import (
+    ActionExecResult,
+    CapabilityReport,
+    Container,
+    Request,
+    UpdateProgress,
+)
+
+
+# Measures the CPU cost of decoding the most common device messages,
+# comparing `decode_json` with validating the parsed JSON against
+# the `Container` union, which tries each of the message models in turn.
+# Run this script in the server venv:
+#   poetry run python tests/scripts/benchmark-message-decoding.py
+
+
+OUTPUT = "\n".join(
+    f"[{i:05d}] rdfm-client: checking for updates, current version v1.{i}.0"
+    for i in range(32)
+)
+MESSAGES: list[Request] = [
+    CapabilityReport(capabilities={
+        "shell": True,
+        "action": True,
+        "filesystem": True,
+        "update_progress": True,
+    }),
+    UpdateProgress(progress=42),
+    ActionExecResult(
+        execution_id=str(uuid.uuid4()),
+        status_code=0,
+        output=base64.b64encode(OUTPUT.encode()).decode(),
+    ),
+]
+
+
+def decode_container(to_decode: bytes) -> Request | int:
+    """Decoding through the `Container` union"""
+    decoded = to_decode.decode('utf-8').strip()
+    if decoded.isnumeric():
+        return int(decoded)
+    return Container.model_validate({'data': json.loads(to_decode)}).data
+
+
+def measure(decode, data: bytes, iterations: int) -> float:
+    """Measure the CPU time of a single decoding, in microseconds"""
+    start = time.process_time()
+    for _ in range(iterations):
+        decode(data)
+    return 1e6 * (time.process_time() - start) / iterations
+
+
+def benchmark(iterations: int):
+    print(f"{'message':<24} {'size':>7} {'container':>11} {'decode_json':>11}")
+    for message in MESSAGES:
+        data = message.model_dump_json().encode()
+        assert decode_container(data) == decode_json(data) == message
+        container = measure(decode_container, data, iterations)
+        adapter = measure(decode_json, data, iterations)
+        print(f"{message.method:<24} {len(data):>5} B {container:>9.2f}us "
+              f"{adapter:>9.2f}us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the decoding of management messages."
+    )
+    parser.add_argument("--iterations", type=int, default=50000,
+                        help="amount of messages to decode for each measurement")
+    args = parser.parse_args()
+    benchmark(args.iterations)
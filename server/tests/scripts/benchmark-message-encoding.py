@@ -0,0 +1,165 @@
+import argparse
+import base64
+import time
+import uuid
+import zlib
+from typing import Callable, Optional
+from auth.token import DeviceToken
+import server  # noqa: F401 (must be imported before RemoteDevice)
+from device_mgmt.models.remote_device import RemoteDevice
+from device_mgmt.outbound import OutboundQueues
+from rdfm.ws import COMPRESSION_CAPABILITY, encode_message
+from request_models import (
+    Action,
+    ActionExec,
+    ActionExecResult,
+    ActionListUpdate,
+    CapabilityReport,
+    DeviceAttachToManager,
+    FsFileDownload,
+    FsFileDownloadReply,
+    Request,
+    UpdateProgress,
+)
+
+
+# Measures the size and CPU cost of management messages exchanged with
+# a device, for each of the encodings supported by the management WebSocket:
+#     - text: plain JSON in text-mode messages
+#     - compressed: zlib-compressed JSON with the preset dictionary, used by
+#                   devices reporting the `compression` capability
+# For reference, the size of the messages compressed using the
+# permessage-deflate WebSocket extension is included. Subsequent messages
+# may compress better with the extension, at the cost of keeping the
+# compression state of each connection.
+# Sent messages are encoded as by `RemoteDevice.send_message`, which then
+# only queues them. Received messages are decoded through `RemoteDevice`.
+# Run this script in the server venv:
+#   poetry run python tests/scripts/benchmark-message-encoding.py
+
+
+EXECUTION_ID = str(uuid.uuid4())
+OUTPUT = "\n".join(
+    f"[{i:05d}] rdfm-client: checking for updates, current version v1.{i}.0"
+    for i in range(32)
+)
+SENT_MESSAGES: list[Request] = [
+    DeviceAttachToManager(mac_addr="00:11:22:33:44:55", uuid=str(uuid.uuid4())),
+    ActionExec(execution_id=EXECUTION_ID, action_id="reboot"),
+    FsFileDownload(
+        id=str(uuid.uuid4()),
+        file="/var/log/syslog",
+        upload_urls=[
+            f"https://s3.example.com/rdfm/fs/{uuid.uuid4()}?partNumber={i}"
+            f"&uploadId={uuid.uuid4().hex}&X-Amz-Algorithm=AWS4-HMAC-SHA256"
+            f"&X-Amz-Signature={uuid.uuid4().hex}{uuid.uuid4().hex}"
+            for i in range(8)
+        ],
+        part_size=5 * 1024 * 1024,
+    ),
+]
+RECEIVED_MESSAGES: list[Request] = [
+    CapabilityReport(capabilities={
+        "shell": True,
+        "action": True,
+        "filesystem": True,
+        "update_progress": True,
+        COMPRESSION_CAPABILITY: True,
+    }),
+    UpdateProgress(progress=42),
+    ActionExecResult(
+        execution_id=EXECUTION_ID,
+        status_code=0,
+        output=base64.b64encode(OUTPUT.encode()).decode(),
+    ),
+    ActionListUpdate(actions=[
+        Action(action_id=f"action{i}",
+               action_name=f"Action {i}",
+               description=f"Runs the predefined action number {i}",
+               command=["/usr/bin/rdfm-action", f"{i}"],
+               timeout=10.0)
+        for i in range(10)
+    ]),
+    FsFileDownloadReply(id=str(uuid.uuid4()), status=0,
+                        etags=[uuid.uuid4().hex for _ in range(8)]),
+]
+
+
+class RecordingSocket:
+    """Socket that records the sent data, and returns a fixed message"""
+
+    def __init__(self) -> None:
+        self.sent: Optional[str | bytes] = None
+        self.received: Optional[str | bytes] = None
+
+    def send(self, data: str | bytes):
+        self.sent = data
+
+    def receive(self, timeout: Optional[float] = None) -> Optional[str | bytes]:
+        return self.received
+
+
+def create_device(compression: bool) -> RemoteDevice:
+    socket = RecordingSocket()
+    outbox = OutboundQueues(workers=1, capacity=1, timeout=1.0).open(socket)
+    device = RemoteDevice(socket, DeviceToken(device_id="00:11:22:33:44:55"), outbox)
+    device.capabilities = {
+        "shell": True,
+        "action": True,
+        "filesystem": True,
+        COMPRESSION_CAPABILITY: compression,
+    }
+    return device
+
+
+def measure(f: Callable[[], None], iterations: int) -> float:
+    """Measure the CPU time of a single call, in microseconds"""
+    start = time.process_time()
+    for _ in range(iterations):
+        f()
+    return 1e6 * (time.process_time() - start) / iterations
+
+
+def permessage_deflate_size(message: Request) -> int:
+    """Size of the message compressed with permessage-deflate, when it is
+    the first message sent over the connection"""
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    data = compressor.compress(message.json().encode())
+    data += compressor.flush(zlib.Z_SYNC_FLUSH)
+    # The trailing 0x00 0x00 0xff 0xff is removed from the message
+    return len(data) - 4
+
+
+def benchmark(iterations: int):
+    devices = {"text": create_device(False), "compressed": create_device(True)}
+
+    print(f"{'message':<24} {'direction':<10} {'text':>13} {'compressed':>13} "
+          f"{'deflate ext.':>13}")
+    for direction, messages in [("sent", SENT_MESSAGES),
+                                ("received", RECEIVED_MESSAGES)]:
+        for message in messages:
+            results = []
+            for name, device in devices.items():
+                socket: RecordingSocket = device.ws
+                if direction == "sent":
+                    # Only the encoding is measured, sending is asynchronous
+                    cpu = measure(lambda: encode_message(message, device.compression),
+                                  iterations)
+                    size = len(encode_message(message, device.compression))
+                else:
+                    socket.received = encode_message(message, device.compression)
+                    cpu = measure(device.receive_message, iterations)
+                    size = len(socket.received)
+                results.append(f"{size:>5} B {cpu:>5.1f}us")
+            print(f"{message.method:<24} {direction:<10} {results[0]:>13} "
+                  f"{results[1]:>13} {permessage_deflate_size(message):>11} B")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the encodings of management messages."
+    )
+    parser.add_argument("--iterations", type=int, default=5000,
+                        help="amount of messages to encode/decode for each measurement")
+    args = parser.parse_args()
+    benchmark(args.iterations)
@@ -16,6 +16,7 @@ DEVICE_ACTION_LOG_ENDPOINT = f"{SERVER}/api/v2/devices/00:00:00:00:00:00/action/
 DEVICE_PENDING_ACTIONS_ENDPOINT = f"{SERVER}/api/v2/devices/00:00:00:00:00:00/action/pending"
 DEVICE_REMOVE_ACTIONS_ENDPOINT = f"{SERVER}/api/v2/devices/00:00:00:00:00:00/action/remove"
 DOWNLOAD_URL_PREFIX = f"{SERVER}local_storage_multipart/multipart/rdfm.actions"
+ACTION_BROADCAST_ENDPOINT = f"{SERVER}/api/v2/actions/broadcast"
 
 ACTIONS = [
     {
@@ -34,6 +35,7 @@ ACTIONS = [
     }
 ]
 DEVICE_CONNECTED = threading.Event()
+EXECUTED = []
 
 def client_ws(dev, DEVICE_CONNECTED):
     ws = simple_websocket.Client.connect(f"{SERVER}/api/v1/devices/ws", headers={"Authorization": f"Bearer token={dev.token}"})
@@ -60,6 +62,7 @@ def client_ws(dev, DEVICE_CONNECTED):
                 }
                 ws.send(json.dumps(resp))
             case "action_exec":
+                EXECUTED.append(data["execution_id"])
                 control = {
                     "method": "action_exec_control",
                     "status": "ok",
@@ -298,3 +301,225 @@ async def test_unsupported_actions(process):
     assert actions[0]["status"] == "error"
     assert actions[1]["action"] == "valid"
     assert actions[1]["status"] == "0"
+
+
+def wait_for_execution(url: str) -> dict:
+    for _ in range(10):
+        resp = requests.get(url)
+        assert resp.status_code == 200
+        execution = resp.json()
+        if execution["status"] not in ["pending", "sent"]:
+            break
+        time.sleep(0.5)
+    return execution
+
+
+@pytest.mark.asyncio
+async def test_submit_action(process):
+    # Submit action before device connects
+    resp = requests.post(DEVICE_ACTIONS_VALID_EXEC_ENDPOINT)
+    assert resp.status_code == 202
+    queued_url = f"{SERVER}{resp.headers['Location']}"
+    resp = requests.get(queued_url)
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "pending"
+
+    # Connect device, the queued execution is sent after connecting
+    dev = MockedDevice("00:00:00:00:00:00", "v0", "dummy")
+    await client(dev)
+    connected = wait_for_device_connection()
+    assert connected == True
+    assert wait_for_execution(queued_url)["status"] == "0"
+
+    # Submit actions to the connected device
+    resp = requests.post(DEVICE_ACTIONS_VALID_EXEC_ENDPOINT)
+    assert resp.status_code == 202, "submitting returns without waiting for the result"
+    execution_id = resp.json()["execution_id"]
+    valid_url = f"{SERVER}{resp.headers['Location']}"
+    resp = requests.post(DEVICE_ACTIONS_INVALID_EXEC_ENDPOINT)
+    assert resp.status_code == 202
+    invalid_url = f"{SERVER}{resp.headers['Location']}"
+
+    execution = wait_for_execution(valid_url)
+    assert execution["id"] == execution_id
+    assert execution["action"] == "valid"
+    assert execution["status"] == "0"
+    assert execution["download_url"].startswith(DOWNLOAD_URL_PREFIX)
+    assert wait_for_execution(invalid_url)["status"] == "-1"
+
+    resp = requests.post(DEVICE_ACTIONS_UNSUPPORTED_EXEC_ENDPOINT)
+    assert resp.status_code == 404, "actions not supported by the device are rejected"
+    resp = requests.get(f"{DEVICE_ACTION_LOG_ENDPOINT}/nonexistent")
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_pending_actions_priority(process):
+    EXECUTED.clear()
+
+    # Submit actions with different priorities before device connects
+    submitted = {}
+    for endpoint, priority in [(DEVICE_ACTIONS_VALID_EXEC_ENDPOINT, 0),
+                               (DEVICE_ACTIONS_INVALID_EXEC_ENDPOINT, 5),
+                               (DEVICE_ACTIONS_VALID_EXEC_ENDPOINT, 1),
+                               (DEVICE_ACTIONS_INVALID_EXEC_ENDPOINT, 1)]:
+        resp = requests.post(endpoint, params={"priority": priority})
+        assert resp.status_code == 202
+        submitted[resp.json()["execution_id"]] = f"{SERVER}{resp.headers['Location']}"
+    resp = requests.post(DEVICE_ACTIONS_VALID_EXEC_ENDPOINT, params={"priority": "high"})
+    assert resp.status_code == 400
+
+    dev = MockedDevice("00:00:00:00:00:00", "v0", "dummy")
+    await client(dev)
+    connected = wait_for_device_connection()
+    assert connected == True
+    for url in submitted.values():
+        assert wait_for_execution(url)["status"] in ["0", "-1"]
+
+    ids = list(submitted.keys())
+    assert EXECUTED == [ids[1], ids[2], ids[3], ids[0]], \
+        "pending actions are sent by priority, then in the order of submission"
+
+
+def catalog_client_ws(ws, connected: threading.Event, queries: list):
+    """Device reporting the version of its actions"""
+    while True:
+        try:
+            data = json.loads(ws.receive())
+        except:
+            return
+        match data["method"]:
+            case "alert":
+                connected.set()
+            case "action_list_query":
+                queries.append(data)
+                ws.send(json.dumps({
+                    "method": "action_list_update",
+                    "actions": ACTIONS,
+                }))
+
+
+def connect_catalog_device(dev, version: str, queries: list) -> simple_websocket.Client:
+    ws = simple_websocket.Client.connect(f"{SERVER}/api/v1/devices/ws", headers={"Authorization": f"Bearer token={dev.token}"})
+    ws.send(json.dumps({
+        "method": "capability_report",
+        "capabilities": {
+            "action": True
+        },
+        "actions_version": version,
+    }))
+    connected = threading.Event()
+    threading.Thread(target=catalog_client_ws, args=(ws, connected, queries)).start()
+    assert connected.wait(5)
+    return ws
+
+
+def wait_for_disconnection():
+    for _ in range(10):
+        resp = requests.get(f"{SERVER}/api/v2/statistics/summary")
+        if resp.json()["connected"] == 0:
+            return
+        time.sleep(0.5)
+    assert False, "device did not disconnect"
+
+
+@pytest.mark.asyncio
+async def test_action_catalog(process):
+    dev = MockedDevice("00:00:00:00:00:00", "v0", "dummy")
+    dev.auth()
+    async with httpx.AsyncClient(timeout=None) as session:
+        await dev.register(session)
+    dev.auth()
+
+    # Actions are queried from the device once, and stored
+    queries = []
+    ws = connect_catalog_device(dev, "catalog-1", queries)
+    for _ in range(2):
+        resp = requests.get(DEVICE_ACTIONS_ENDPOINT)
+        assert resp.status_code == 200
+        assert [a["action_id"] for a in resp.json()] == ["valid", "invalid"]
+    assert len(queries) == 1
+    ws.close()
+    wait_for_disconnection()
+
+    # Stored actions are served while the device is offline
+    resp = requests.get(DEVICE_ACTIONS_ENDPOINT)
+    assert resp.status_code == 200
+    assert [a["action_id"] for a in resp.json()] == ["valid", "invalid"]
+    resp = requests.post(DEVICE_ACTIONS_UNSUPPORTED_EXEC_ENDPOINT)
+    assert resp.status_code == 404, "actions are validated against the stored actions"
+
+    # Reconnecting with the same version reuses the stored actions
+    ws = connect_catalog_device(dev, "catalog-1", queries)
+    resp = requests.get(DEVICE_ACTIONS_ENDPOINT)
+    assert resp.status_code == 200
+    assert len(queries) == 1, "actions are not queried again"
+    ws.close()
+    wait_for_disconnection()
+
+    # A different version is queried again
+    ws = connect_catalog_device(dev, "catalog-2", queries)
+    resp = requests.get(DEVICE_ACTIONS_ENDPOINT)
+    assert resp.status_code == 200
+    assert len(queries) == 2
+    ws.close()
+
+
+@pytest.mark.asyncio
+async def test_action_broadcast(process):
+    # Tag the connected device and an offline device
+    for identifier in [1, 2]:
+        resp = requests.post(f"{SERVER}/api/v2/devices/{identifier}/tag/broadcast")
+        assert resp.status_code == 200
+
+    dev = MockedDevice("00:00:00:00:00:00", "v0", "dummy")
+    await client(dev)
+    connected = wait_for_device_connection()
+    assert connected == True
+
+    # Exactly one target must be specified
+    resp = requests.post(ACTION_BROADCAST_ENDPOINT, json={"action_id": "valid"})
+    assert resp.status_code == 400
+    resp = requests.post(ACTION_BROADCAST_ENDPOINT,
+                         json={"action_id": "valid", "group": 1337})
+    assert resp.status_code == 404
+
+    resp = requests.post(ACTION_BROADCAST_ENDPOINT,
+                         json={"action_id": "valid", "tag": "broadcast"})
+    assert resp.status_code == 202, "broadcast returns without waiting for the devices"
+    broadcast = resp.json()
+    assert broadcast["action"] == "valid"
+    assert broadcast["tag"] == "broadcast"
+    assert broadcast["devices"] == 2
+    status_url = f"{SERVER}{resp.headers['Location']}"
+
+    # Wait until the action is executed on the connected device
+    for _ in range(10):
+        resp = requests.get(status_url)
+        assert resp.status_code == 200
+        if resp.json()["statuses"].get("0") == 1:
+            break
+        time.sleep(0.5)
+    assert resp.json()["statuses"] == {"0": 1, "pending": 1}, \
+        "the action is executed on the connected device and queued for the offline one"
+
+    # Fetch the results page by page
+    resp = requests.get(f"{status_url}/results", params={"limit": 1})
+    assert resp.status_code == 200
+    results = resp.json()
+    assert "next" in resp.links
+    resp = requests.get(f"{SERVER}{resp.links['next']['url']}")
+    assert resp.status_code == 200
+    results += resp.json()
+    assert "next" not in resp.links
+    assert {r["mac_address"]: r["status"] for r in results} == {
+        "00:00:00:00:00:00": "0",
+        "11:11:11:11:11:11": "pending",
+    }
+
+    # Pending broadcast executions are part of the device action log
+    resp = requests.get(DEVICE_ACTION_LOG_ENDPOINT)
+    assert resp.status_code == 200
+    assert [a["id"] for a in resp.json()] == [
+        r["id"] for r in results if r["mac_address"] == "00:00:00:00:00:00"
+    ]
@@ -0,0 +1,30 @@
+from database.devices import ActiveGroupCache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_cached_groups_expire():
+    clock = Clock()
+    cache = ActiveGroupCache(ttl=5.0, clock=clock)
+    loads = []
+
+    def loader(identifier: int) -> int:
+        loads.append(identifier)
+        return len(loads)
+
+    assert cache.get(1, loader) == 1
+    clock.now = 4.0
+    assert cache.get(1, loader) == 1, "cached group is reused"
+    clock.now = 5.0
+    assert cache.get(1, loader) == 2, \
+        "group is loaded again once the cached entry expired"
+
+    cache.invalidate([1])
+    assert cache.get(1, loader) == 3, "invalidated group is loaded again"
+    assert loads == [1, 1, 1]
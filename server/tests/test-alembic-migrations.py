@@ -47,3 +47,28 @@ def test_migration_8(alembic_engine, alembic_runner):
         rows = conn.execute(text("SELECT value FROM permissions WHERE id = 1")).fetchall()
 
     assert "dummy_name" == rows[0][0], "Value should be a coalescence of resource_id and resource_name"
+
+
+def test_migration_11(alembic_engine, alembic_runner):
+    """
+    Migration no. 11 converts the device metadata to JSON, and fills in
+    the indexed metadata columns from the existing metadata.
+    """
+    alembic_runner.migrate_up_before("11")
+
+    alembic_runner.insert_into("devices", dict(id=1,
+                                               last_access=None,
+                                               name="dummy_device",
+                                               mac_address="00:00:00:00:00:00",
+                                               capabilities='{"shell": false}',
+                                               device_metadata='{"rdfm.hardware.devtype": "dummy", '
+                                                               '"rdfm.software.version": "v1"}',
+                                               public_key=None))
+    alembic_runner.migrate_up_one()
+
+    with alembic_engine.connect() as conn:
+        rows = conn.execute(text("SELECT devtype, software_version FROM devices")).fetchall()
+
+    assert 1 == len(rows), "There should only be one entry in the test database"
+    assert "dummy" == rows[0][0], "Device type should be filled in from the metadata"
+    assert "v1" == rows[0][1], "Software version should be filled in from the metadata"
@@ -0,0 +1,60 @@
+import threading
+from device_mgmt.admission import MIN_RETRY_AFTER, AdmissionControl
+
+
+WAIT_TIMEOUT = 5.0
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_connections_are_admitted_at_rate():
+    clock = Clock()
+    admission = AdmissionControl(rate=10, burst=5, workers=1, clock=clock)
+
+    assert all(admission.admit() for _ in range(5)), "a burst is admitted at once"
+    assert not admission.under_load()
+    assert not admission.admit(), "connections exceeding the burst are rejected"
+    assert admission.under_load()
+
+    clock.now += 0.1
+    assert admission.admit(), "the bucket is refilled at the given rate"
+    assert not admission.admit()
+
+    clock.now += 1.0
+    assert not admission.under_load(), \
+        "the server is no longer under load once the rejected devices could reconnect"
+
+
+def test_retry_hints_are_spread_over_backlog():
+    clock = Clock()
+    admission = AdmissionControl(rate=10, burst=1, workers=1, clock=clock)
+    assert admission.admit()
+
+    for _ in range(100):
+        assert not admission.admit()
+    delays = [admission.retry_after() for _ in range(100)]
+    assert all(MIN_RETRY_AFTER <= x <= MIN_RETRY_AFTER + 10 for x in delays), \
+        "devices are told to reconnect once they can be admitted"
+    assert len(set(delays)) > 1, "the delays are randomized"
+
+    clock.now += 10
+    assert admission.retry_after() == MIN_RETRY_AFTER
+
+
+def test_unlimited_rate():
+    admission = AdmissionControl(rate=0, burst=1, workers=1)
+    assert all(admission.admit() for _ in range(10))
+    assert not admission.under_load()
+
+
+def test_staged_work_runs_in_background():
+    admission = AdmissionControl(rate=10, burst=1, workers=1)
+    done = threading.Event()
+    admission.stage(lambda x: done.set() if x == "device" else None, "device")
+    assert done.wait(WAIT_TIMEOUT), "staged work runs when not under load"
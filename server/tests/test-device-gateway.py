@@ -0,0 +1,217 @@
+import json
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+import pytest
+import requests
+import simple_websocket
+from common import (
+    SERVER,
+    SERVER_WAIT_TIMEOUT,
+    DEVICES_ENDPOINT,
+    DEVICES_WS,
+    wait_for_api,
+    create_fake_device_token,
+)
+from rdfm.ws import (
+    COMPRESSION_CAPABILITY,
+    RDFM_WS_DUPLICATE_CONNECTION,
+    RDFM_WS_INVALID_REQUEST,
+    RDFM_WS_TRY_AGAIN_LATER,
+    RETRY_AFTER_PREFIX,
+    WS_UNSUPPORTED_DATA,
+    encode_message,
+)
+from request_models import CapabilityReport, UpdateVersion
+
+
+GATEWAY_PORT = 5002
+GATEWAY_WS = f"ws://127.0.0.1:{GATEWAY_PORT}/api/v1/devices/ws"
+FAKE_DEVICE_MAC = "00:00:00:00:00:00"
+MESSAGE_WAIT_TIMEOUT = 10.0
+ACTIONS = [
+    {
+        "action_id": "echo",
+        "action_name": "Echo",
+        "description": "Echo action",
+        "command": ["echo", "echo"],
+        "timeout": 1.0
+    },
+]
+
+
+@pytest.fixture()
+def gateway_env():
+    """Additional environment of the server, unless the test is
+    parameterized with a different one"""
+    return {}
+
+
+@pytest.fixture()
+def gateway(db_sqlite, gateway_env):
+    """RDFM server with the device gateway enabled"""
+    log_file = (Path(__file__).parent / "server.log").open("a")
+    process = subprocess.Popen(
+        ["poetry", "run", "python3", "-m", "rdfm_mgmt_server",
+         "--database", db_sqlite, "--no-ssl", "--no-api-auth", "--test-mocks",
+         "--device-gateway-port", str(GATEWAY_PORT)],
+        env={**os.environ, **gateway_env},
+        stdout=log_file,
+        stderr=log_file,
+    )
+    assert wait_for_api(SERVER_WAIT_TIMEOUT, SERVER), \
+        "server has started successfully"
+
+    yield process
+
+    process.kill()
+    log_file.close()
+
+
+def connect_device(headers: dict[str, str] | None = None) -> simple_websocket.Client:
+    if headers is None:
+        headers = {"Authorization": f"Bearer token={create_fake_device_token()}"}
+    return simple_websocket.Client.connect(GATEWAY_WS, headers=headers)
+
+
+def device_connected() -> bool:
+    resp = requests.get(DEVICES_ENDPOINT)
+    assert resp.status_code == 200, "fetching works"
+    return {d["mac_address"]: d["connected"] for d in resp.json()}[FAKE_DEVICE_MAC]
+
+
+def serve_actions(ws: simple_websocket.Client):
+    """Respond to action requests as the device"""
+    while True:
+        try:
+            data = json.loads(ws.receive())
+        except Exception:
+            return
+        match data["method"]:
+            case "action_list_query":
+                ws.send(json.dumps({
+                    "method": "action_list_update",
+                    "actions": ACTIONS,
+                }))
+            case "action_exec":
+                ws.send(json.dumps({
+                    "method": "action_exec_control",
+                    "status": "ok",
+                    "execution_id": data["execution_id"],
+                }))
+                ws.send(json.dumps({
+                    "method": "action_exec_result",
+                    "status_code": 0,
+                    "output": "ZWNobwo=",
+                    "execution_id": data["execution_id"],
+                }))
+
+
+def test_connection(gateway):
+    device = connect_device()
+    try:
+        hello = json.loads(device.receive(MESSAGE_WAIT_TIMEOUT))
+        assert hello == {"method": "alert", "alert": {"message": "connected"}}, \
+            "the gateway should have sent a welcome message"
+        assert device_connected(), "device connected to the gateway is tracked"
+
+        duplicate = connect_device()
+        with pytest.raises(simple_websocket.ConnectionClosed):
+            duplicate.receive(MESSAGE_WAIT_TIMEOUT)
+        assert duplicate.close_reason == RDFM_WS_DUPLICATE_CONNECTION, \
+            "duplicate connections are rejected"
+    finally:
+        device.close()
+
+    deadline = time.time() + MESSAGE_WAIT_TIMEOUT
+    while device_connected() and time.time() < deadline:
+        time.sleep(0.1)
+    assert not device_connected(), "disconnected devices are no longer tracked"
+
+
+def test_unauthorized(gateway):
+    with pytest.raises(simple_websocket.ConnectionError) as e:
+        connect_device({"Authorization": "Bearer token=invalid"})
+    assert e.value.status_code == 401, "invalid tokens are rejected"
+
+    with pytest.raises(simple_websocket.ConnectionError) as e:
+        connect_device({})
+    assert e.value.status_code == 401, "missing tokens are rejected"
+
+
+@pytest.mark.parametrize("message,status", [
+    ("not json", RDFM_WS_INVALID_REQUEST),
+    (json.dumps({"method": "unknown"}), RDFM_WS_INVALID_REQUEST),
+    (b"binary", WS_UNSUPPORTED_DATA),
+])
+def test_invalid_request(gateway, message, status):
+    device = connect_device()
+    device.receive(MESSAGE_WAIT_TIMEOUT)
+    device.send(message)
+    with pytest.raises(simple_websocket.ConnectionClosed):
+        device.receive(MESSAGE_WAIT_TIMEOUT)
+    assert device.close_reason == status, "invalid requests close the connection"
+
+
+def test_compressed_messages(gateway):
+    device = connect_device()
+    device.receive(MESSAGE_WAIT_TIMEOUT)
+    device.send(encode_message(
+        CapabilityReport(capabilities={COMPRESSION_CAPABILITY: True})
+    ))
+    # Hacky sleep to ensure the capability report was processed
+    time.sleep(1.0)
+    device.send(encode_message(UpdateVersion(version="v2"), compression=True))
+    try:
+        assert device.receive(1.0) is None, \
+            "compressed messages are accepted after negotiating compression"
+    finally:
+        device.close()
+
+
+def test_action(gateway):
+    device = connect_device()
+    device.receive(MESSAGE_WAIT_TIMEOUT)
+    device.send(json.dumps({
+        "method": "capability_report",
+        "capabilities": {"action": True},
+    }))
+    threading.Thread(target=serve_actions, args=(device, ), daemon=True).start()
+    # Hacky sleep to ensure the action queue was processed after
+    # the capability report
+    time.sleep(1.0)
+    try:
+        resp = requests.get(f"{DEVICES_ENDPOINT}/{FAKE_DEVICE_MAC}/action/exec/echo")
+        assert resp.status_code == 200, "executing actions works"
+        assert resp.json() == {"status_code": 0, "output": "ZWNobwo="}, \
+            "action result is returned from the device connected to the gateway"
+    finally:
+        device.close()
+
+
+@pytest.mark.parametrize("gateway_env", [{
+    "RDFM_DEVICE_CONNECT_RATE": "0.01",
+    "RDFM_DEVICE_CONNECT_BURST": "1",
+}])
+def test_connections_exceeding_rate_are_rejected(gateway):
+    device = connect_device()
+    try:
+        hello = json.loads(device.receive(MESSAGE_WAIT_TIMEOUT))
+        assert hello["method"] == "alert", "the first connection is admitted"
+
+        headers = {"Authorization": f"Bearer token={create_fake_device_token()}"}
+        for rejected in (
+            connect_device(),
+            simple_websocket.Client.connect(DEVICES_WS, headers=headers),
+        ):
+            with pytest.raises(simple_websocket.ConnectionClosed):
+                rejected.receive(MESSAGE_WAIT_TIMEOUT)
+            assert rejected.close_reason == RDFM_WS_TRY_AGAIN_LATER, \
+                "connections exceeding the rate are rejected"
+            assert rejected.close_message.startswith(RETRY_AFTER_PREFIX)
+            delay = float(rejected.close_message[len(RETRY_AFTER_PREFIX):])
+            assert delay >= 1.0, "the device is told when to reconnect"
+    finally:
+        device.close()
@@ -0,0 +1,234 @@
+import datetime
+import pytest
+import server
+import api.v1.middleware
+from database.devices import metadata_columns
+from device_mgmt.router import DEVICES
+from models.device import Device, DeviceGroupAssignment, DeviceTag
+from models.group import Group
+from models.permission import Permission
+from rdfm.permissions import DEVICE_RESOURCE, READ_PERMISSION
+from sqlalchemy.orm import Session
+
+
+DEVICE_COUNT = 50
+NOW = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture()
+def fleet(app):
+    """Create a fleet of devices with differing metadata
+
+    Device N:
+        - has the device type `x86_64` if N is odd, `arm64` otherwise
+        - runs software version `v{N % 3}`
+        - has the `board` metadata key set to `rev{N % 2}`
+        - is assigned to group 1 if N <= 10
+        - is tagged with `even` if N is even
+        - was last accessed N hours ago
+    """
+    with Session(server.instance.db) as session:
+        session.add(Group(id=1,
+                          created=NOW,
+                          info={},
+                          policy="no_update,",
+                          priority=1))
+        session.add_all([
+            Device(id=d,
+                   name=f"device-{d}",
+                   mac_address=f"00:00:00:00:00:{d:02x}",
+                   last_access=NOW - datetime.timedelta(hours=d),
+                   capabilities={},
+                   public_key=None,
+                   **metadata_columns({
+                       "rdfm.hardware.devtype":
+                           "x86_64" if d % 2 else "arm64",
+                       "rdfm.software.version": f"v{d % 3}",
+                       "board": f"rev{d % 2}",
+                   }))
+            for d in range(1, DEVICE_COUNT + 1)
+        ])
+        session.flush()
+        session.add_all([
+            DeviceGroupAssignment(device_id=d, group_id=1)
+            for d in range(1, 11)
+        ])
+        session.add_all([
+            DeviceTag(device_id=d, tag="even")
+            for d in range(2, DEVICE_COUNT + 1, 2)
+        ])
+        session.commit()
+    return app
+
+
+def fetch_ids(app, query: str) -> list[int]:
+    resp = app.test_client().get(f"/api/v2/devices?{query}")
+    assert resp.status_code == 200, "fetching works"
+    return [device["id"] for device in resp.json]
+
+
+def test_unfiltered_listing(fleet):
+    resp = fleet.test_client().get("/api/v2/devices")
+    assert resp.status_code == 200, "fetching works"
+    assert len(resp.json) == DEVICE_COUNT, "all devices are listed"
+    assert "Link" not in resp.headers, "listing is not paginated"
+
+
+@pytest.mark.parametrize("query,expected", [
+    ("devtype=x86_64", range(1, DEVICE_COUNT + 1, 2)),
+    ("software_version=v0", range(3, DEVICE_COUNT + 1, 3)),
+    ("devtype=arm64&software_version=v0", range(6, DEVICE_COUNT + 1, 6)),
+    ("metadata_key=board&metadata_value=rev0", range(2, DEVICE_COUNT + 1, 2)),
+    ("metadata_key=rdfm.software.version&metadata_value=v1",
+     range(1, DEVICE_COUNT + 1, 3)),
+    ("metadata_key=missing&metadata_value=rev0", []),
+    ("group=1", range(1, 11)),
+    ("group=1&tag=even", range(2, 11, 2)),
+    ("tag=missing", []),
+    ("connected=false", range(1, DEVICE_COUNT + 1)),
+    ("connected=true", []),
+    ("name_prefix=device-1", [1] + list(range(10, 20))),
+    ("mac_prefix=00:00:00:00:00:0", range(1, 16)),
+    ("last_access_since=Thu, 01 Jan 2026 09:00:00 -0000", range(1, 4)),
+    ("last_access_to=Wed, 31 Dec 2025 12:00:00 -0000",
+     range(24, DEVICE_COUNT + 1)),
+])
+def test_filters(fleet, query, expected):
+    assert fetch_ids(fleet, query) == list(expected), \
+        "only devices matching the filters are listed"
+
+
+def test_prefix_filter_escaping(fleet):
+    assert fetch_ids(fleet, "name_prefix=device_") == [], \
+        "wildcard characters in the prefix are matched literally"
+
+
+def test_pagination(fleet):
+    client = fleet.test_client()
+    url = "/api/v2/devices?limit=15&devtype=x86_64"
+    ids = []
+    pages = 0
+    while url is not None:
+        resp = client.get(url)
+        assert resp.status_code == 200, "fetching works"
+        assert len(resp.json) <= 15, "page size is limited"
+        ids.extend(device["id"] for device in resp.json)
+        pages += 1
+        url = None
+        if "Link" in resp.headers:
+            link, rel = resp.headers["Link"].split("; ")
+            assert rel == 'rel="next"', "link points to the next page"
+            url = link.strip("<>")
+            assert "devtype=x86_64" in url, "filters are preserved"
+
+    assert pages == 2, "all devices are listed in two pages"
+    assert ids == list(range(1, DEVICE_COUNT + 1, 2)), \
+        "all matching devices are listed exactly once"
+
+
+def test_pagination_connected(fleet):
+    for d in range(1, DEVICE_COUNT + 1, 5):
+        server.instance.router.register(DEVICES, f"00:00:00:00:00:{d:02x}")
+    client = fleet.test_client()
+
+    resp = client.get("/api/v2/devices?connected=true&limit=4")
+    assert [device["id"] for device in resp.json] == [1, 6, 11, 16], \
+        "page is filled with connected devices"
+    assert "cursor=16" in resp.headers["Link"], "next page starts after the page"
+
+    resp = client.get("/api/v2/devices?connected=true&limit=4&cursor=16")
+    assert [device["id"] for device in resp.json] == [21, 26, 31, 36], \
+        "page starts after the cursor"
+
+    resp = client.get("/api/v2/devices?connected=false&limit=5&cursor=40")
+    assert [device["id"] for device in resp.json] == [42, 43, 44, 45, 47], \
+        "connected devices are skipped"
+
+
+def test_pagination_groups(fleet):
+    resp = fleet.test_client().get("/api/v2/devices?limit=5&cursor=5")
+    assert [device["id"] for device in resp.json] == list(range(6, 11)), \
+        "page starts after the cursor"
+    for device in resp.json:
+        assert device["groups"] == [1], "group assignments are loaded"
+
+
+def test_pagination_permissions(fleet, monkeypatch):
+    class Introspection:
+        status_code = 200
+
+        def json(self):
+            return {"sub": "user", "scope": ""}
+
+    class OAuth2Session:
+        def __init__(self, *args):
+            pass
+
+        def introspect_token(self, *args, **kwargs):
+            return Introspection()
+
+    monkeypatch.setattr(api.v1.middleware, "OAuth2Session", OAuth2Session)
+    config = fleet.config["RDFM_CONFIG"]
+    monkeypatch.setattr(config, "disable_api_auth", False)
+    for key in ("client_id", "client_secret", "url"):
+        monkeypatch.setattr(config, f"token_introspection_{key}", "",
+                            raising=False)
+    with Session(server.instance.db) as session:
+        session.add_all([
+            Permission(resource=DEVICE_RESOURCE,
+                       user_id="user",
+                       resource_id=d,
+                       permission=READ_PERMISSION,
+                       created=NOW)
+            for d in range(7, DEVICE_COUNT + 1, 7)
+        ])
+        session.commit()
+
+    client = fleet.test_client()
+    headers = {"Authorization": "Bearer token=token"}
+    resp = client.get("/api/v2/devices?limit=3", headers=headers)
+    assert [device["id"] for device in resp.json] == [7, 14, 21], \
+        "page is filled with devices the user may access"
+    assert "cursor=21" in resp.headers["Link"], "next page starts after the page"
+
+    resp = client.get("/api/v2/devices?limit=3&cursor=42", headers=headers)
+    assert [device["id"] for device in resp.json] == [49]
+    assert "Link" not in resp.headers, "last page has no next page"
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=1001", "limit=abc",
+                                   "connected=maybe", "group=first",
+                                   "metadata_key=board"])
+def test_invalid_parameters(fleet, query):
+    resp = fleet.test_client().get(f"/api/v2/devices?{query}")
+    assert resp.status_code == 400, "invalid parameters are rejected"
+
+
+def test_metadata_distribution(fleet):
+    devices_db = server.instance._devices_db
+    assert devices_db.count_by_metadata("rdfm.software.version") == {
+        "v0": 16, "v1": 17, "v2": 17
+    }, "devices are counted per software version"
+    assert devices_db.count_by_metadata("board") == {
+        "rev0": 25, "rev1": 25
+    }, "devices are counted per value of non-indexed keys"
+    assert devices_db.count_by_metadata("missing") == {None: DEVICE_COUNT}, \
+        "devices without the key are counted under None"
+
+
+def test_metadata_update(fleet):
+    devices_db = server.instance._devices_db
+    devices_db.update_metadata("00:00:00:00:00:01", {
+        "rdfm.hardware.devtype": "riscv64",
+        "rdfm.software.version": "v3",
+    })
+
+    device = devices_db.fetch_one(1)
+    assert device.device_metadata["rdfm.hardware.devtype"] == "riscv64", \
+        "metadata is stored as JSON"
+    assert device.devtype == "riscv64", "indexed columns are updated"
+    assert device.software_version == "v3", "indexed columns are updated"
+    assert fetch_ids(fleet, "devtype=riscv64&software_version=v3") == [1], \
+        "updated device is found using the new metadata"
+    assert 1 not in fetch_ids(fleet, "devtype=x86_64"), \
+        "updated device is no longer found using the old metadata"
@@ -0,0 +1,169 @@
+import threading
+import time
+import pytest
+from rdfm.ws import WebSocketException
+from device_mgmt.outbound import LANE_BULK, LANE_CONTROL, OutboundQueues
+
+
+class BlockingSocket:
+    """Socket that records the sent data, blocking until released"""
+
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+        self.released = threading.Event()
+        self.aborted = False
+        self.done = threading.Condition()
+
+    def send(self, data: str):
+        self.released.wait()
+        if self.aborted:
+            raise ConnectionError("connection aborted")
+        with self.done:
+            self.sent.append(data)
+            self.done.notify_all()
+
+    def abort(self):
+        self.aborted = True
+        self.released.set()
+
+    def wait_sent(self, count: int, timeout: float = 5.0):
+        with self.done:
+            assert self.done.wait_for(lambda: len(self.sent) >= count, timeout)
+
+
+@pytest.fixture()
+def queues():
+    return OutboundQueues(workers=2, capacity=2, timeout=0.5, write_timeout=5.0)
+
+
+def test_control_lane_is_sent_first(queues):
+    socket = BlockingSocket()
+    outbox = queues.open(socket, socket.abort)
+
+    # The first message occupies the writer, the rest is queued
+    outbox.put("first", LANE_BULK)
+    time.sleep(0.1)
+    outbox.put("bulk-1", LANE_BULK)
+    outbox.put("bulk-2", LANE_BULK)
+    outbox.put("control-1", LANE_CONTROL)
+    outbox.put("control-2", LANE_CONTROL)
+    assert outbox.depth() == {LANE_CONTROL: 2, LANE_BULK: 2}
+    assert queues.metrics.snapshot()[LANE_CONTROL]["queued"] == 2
+
+    socket.released.set()
+    socket.wait_sent(5)
+    assert socket.sent == ["first", "control-1", "control-2", "bulk-1", "bulk-2"], \
+        "control messages are sent before bulk messages, each lane in order"
+
+    metrics = queues.metrics.snapshot()
+    assert metrics[LANE_CONTROL]["queued"] == 0
+    assert metrics[LANE_CONTROL]["sent"] == 2
+    assert metrics[LANE_BULK]["sent"] == 3
+    assert metrics[LANE_BULK]["latency_max"] >= 0.1, \
+        "time spent waiting for the writer is included in the latency"
+
+
+def test_full_lane_rejects_after_timeout(queues):
+    socket = BlockingSocket()
+    outbox = queues.open(socket, socket.abort)
+
+    outbox.put("first", LANE_CONTROL)
+    time.sleep(0.1)
+    outbox.put("control-1", LANE_CONTROL)
+    outbox.put("control-2", LANE_CONTROL)
+
+    start = time.monotonic()
+    with pytest.raises(WebSocketException, match="queue is full"):
+        outbox.put("control-3", LANE_CONTROL)
+    assert time.monotonic() - start >= queues.timeout, \
+        "sender waits for free space before the message is rejected"
+    outbox.put("bulk-1", LANE_BULK)
+    assert queues.metrics.snapshot()[LANE_CONTROL]["dropped"] == 1
+
+    # Messages that waited in the queue past the timeout are not sent
+    time.sleep(queues.timeout + 0.1)
+    socket.released.set()
+    socket.wait_sent(1)
+    time.sleep(0.2)
+    assert socket.sent == ["first"]
+    assert queues.metrics.snapshot()[LANE_CONTROL]["dropped"] == 3
+    assert queues.metrics.snapshot()[LANE_BULK]["dropped"] == 1
+
+
+def test_full_lane_rejects_without_blocking(queues):
+    socket = BlockingSocket()
+    outbox = queues.open(socket, socket.abort)
+
+    outbox.put("first", LANE_CONTROL)
+    time.sleep(0.1)
+    outbox.put("control-1", LANE_CONTROL)
+    outbox.put("control-2", LANE_CONTROL)
+
+    start = time.monotonic()
+    with pytest.raises(WebSocketException, match="queue is full"):
+        outbox.put("control-3", LANE_CONTROL, block=False)
+    assert time.monotonic() - start < queues.timeout, \
+        "non-blocking sender does not wait for free space"
+    assert queues.metrics.snapshot()[LANE_CONTROL]["dropped"] == 1
+    socket.released.set()
+
+
+def test_sender_waits_for_free_space(queues):
+    socket = BlockingSocket()
+    outbox = queues.open(socket, socket.abort)
+
+    outbox.put("first", LANE_CONTROL)
+    time.sleep(0.1)
+    outbox.put("control-1", LANE_CONTROL)
+    outbox.put("control-2", LANE_CONTROL)
+    threading.Timer(0.1, socket.released.set).start()
+    outbox.put("control-3", LANE_CONTROL)
+
+    socket.wait_sent(4)
+    assert socket.sent == ["first", "control-1", "control-2", "control-3"]
+
+
+def test_closed_outbox_drops_messages(queues):
+    socket = BlockingSocket()
+    outbox = queues.open(socket, socket.abort)
+
+    outbox.put("first", LANE_CONTROL)
+    time.sleep(0.1)
+    outbox.put("bulk-1", LANE_BULK)
+    outbox.close()
+    with pytest.raises(WebSocketException, match="disconnected"):
+        outbox.put("control-1", LANE_CONTROL)
+
+    socket.released.set()
+    socket.wait_sent(1)
+    time.sleep(0.1)
+    assert socket.sent == ["first"]
+    assert queues.metrics.snapshot()[LANE_BULK] == {
+        "queued": 0,
+        "sent": 0,
+        "dropped": 1,
+        "latency_avg": 0.0,
+        "latency_max": 0.0,
+    }
+
+
+def test_stalled_write_disconnects_device():
+    queues = OutboundQueues(workers=1, capacity=2, timeout=5.0, write_timeout=0.3)
+    stalled = BlockingSocket()
+    stalled_outbox = queues.open(stalled, stalled.abort)
+    healthy = BlockingSocket()
+    healthy.released.set()
+    healthy_outbox = queues.open(healthy, healthy.abort)
+
+    # The only worker is blocked writing to the stalled device
+    stalled_outbox.put("stalled", LANE_CONTROL)
+    time.sleep(0.1)
+    healthy_outbox.put("healthy", LANE_CONTROL)
+
+    healthy.wait_sent(1, timeout=2.0)
+    assert healthy.sent == ["healthy"], \
+        "stalled writes do not hold up sending to other devices"
+    assert stalled.aborted, "device whose write stalled is disconnected"
+    with pytest.raises(WebSocketException, match="disconnected"):
+        stalled_outbox.put("control-1", LANE_CONTROL)
+    assert stalled.sent == []
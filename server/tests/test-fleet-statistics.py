@@ -0,0 +1,194 @@
+import datetime
+import pytest
+import server
+from device_mgmt.router import DEVICES
+from models.device import Device
+from models.device_update import DeviceUpdate
+from models.group import Group
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+
+def add_device(mac: str, devtype: str, version: str) -> Device:
+    device = Device(name=mac,
+                    mac_address=mac,
+                    last_access=datetime.datetime.utcnow(),
+                    capabilities={},
+                    device_metadata={
+                        "rdfm.hardware.devtype": devtype,
+                        "rdfm.software.version": version,
+                    },
+                    public_key=None)
+    server.instance._devices_db.insert(device)
+    return device
+
+
+def add_group() -> int:
+    group = Group(created=datetime.datetime.utcnow(),
+                  info={},
+                  policy="no_update,",
+                  priority=len(server.instance._groups_db.fetch_all()) + 1)
+    server.instance._groups_db.create(group)
+    return group.id
+
+
+def add_update(mac: str):
+    server.instance._device_updates_db.insert(
+        DeviceUpdate(mac_address=mac,
+                     created=datetime.datetime.utcnow(),
+                     version="v2",
+                     progress=0))
+
+
+def reconciled() -> dict:
+    """Summary recomputed from the database"""
+    server.instance.statistics.reconcile()
+    return server.instance.statistics.summary()
+
+
+def test_summary_endpoint(app):
+    add_device("00:00:00:00:00:01", "x86_64", "v1")
+    server.instance._registrations_db.create_registration(
+        "00:00:00:00:00:02", "key", {}
+    )
+
+    resp = app.test_client().get("/api/v2/statistics/summary")
+    assert resp.status_code == 200, "fetching works"
+    assert resp.json == {
+        "devices": 1,
+        "connected": 0,
+        "offline": 1,
+        "pending_registrations": 1,
+        "updates_pending": 0,
+        "updates_in_progress": 0,
+        "versions": {"v1": 1},
+        "devtypes": {"x86_64": 1},
+        "groups": {},
+    }, "summary contains the current statistics"
+
+
+def test_connected_devices(app):
+    statistics = server.instance.statistics
+    backend = server.instance.router.backend
+    add_device("00:00:00:00:00:01", "x86_64", "v1")
+    add_device("00:00:00:00:00:02", "x86_64", "v1")
+
+    # Device connected to another server process
+    backend.heartbeat("other-node")
+    backend.register(DEVICES, "00:00:00:00:00:01", "other-node")
+    summary = statistics.summary()
+    assert summary["connected"] == 1, \
+        "devices connected to other server processes are counted"
+    assert summary["offline"] == 1, "remaining devices are offline"
+
+    backend.remove_node("other-node")
+    assert statistics.summary()["connected"] == 0, \
+        "devices of removed server processes are no longer counted"
+
+
+def test_incremental_counters(app):
+    statistics = server.instance.statistics
+    devices = [
+        add_device("00:00:00:00:00:01", "x86_64", "v1"),
+        add_device("00:00:00:00:00:02", "x86_64", "v1"),
+        add_device("00:00:00:00:00:03", "arm64", "v2"),
+    ]
+    summary = statistics.summary()
+    assert summary["devices"] == 3, "devices are counted"
+    assert summary["versions"] == {"v1": 2, "v2": 1}, \
+        "devices are counted per software version"
+    assert summary["devtypes"] == {"x86_64": 2, "arm64": 1}, \
+        "devices are counted per device type"
+
+    server.instance._devices_db.update_metadata("00:00:00:00:00:01", {
+        "rdfm.hardware.devtype": "x86_64",
+        "rdfm.software.version": "v2",
+    })
+    assert statistics.summary()["versions"] == {"v1": 1, "v2": 2}, \
+        "metadata changes are counted"
+
+    first, second = add_group(), add_group()
+    groups_db = server.instance._groups_db
+    assert groups_db.modify_assignment(
+        first, [d.id for d in devices], []) is None
+    assert groups_db.modify_assignment(first, [], [devices[0].id]) is None
+    assert statistics.summary()["groups"] == {first: 2}, \
+        "group assignments are counted"
+    assert groups_db.move_assignment(first, second, [devices[1].id]) is None
+    assert statistics.summary()["groups"] == {first: 1, second: 1}, \
+        "moved devices are counted"
+    assert groups_db.move_assignment(first, second, None) is None
+    assert statistics.summary()["groups"] == {second: 2}, \
+        "moved devices are counted"
+
+    server.instance._devices_db.delete(devices[2].id)
+    summary = statistics.summary()
+    assert summary["devices"] == 2, "removed devices are no longer counted"
+    assert summary["groups"] == {second: 1}, \
+        "assignments of removed devices are no longer counted"
+
+    assert summary == reconciled(), \
+        "incremental counters match the database"
+
+
+def test_registration_counters(app):
+    statistics = server.instance.statistics
+    registrations_db = server.instance._registrations_db
+    registrations_db.create_registration("00:00:00:00:00:01", "key", {})
+    registrations_db.create_registration("00:00:00:00:00:01", "key", {})
+    registrations_db.create_registration("00:00:00:00:00:02", "key", {})
+    assert statistics.summary()["pending_registrations"] == 2, \
+        "repeated registrations are counted once"
+
+    registrations_db.delete_registration("00:00:00:00:00:01", "key")
+    registrations_db.delete_registration("00:00:00:00:00:01", "key")
+    assert statistics.summary()["pending_registrations"] == 1, \
+        "removed registrations are no longer counted"
+
+    assert statistics.summary() == reconciled(), \
+        "incremental counters match the database"
+
+
+def test_update_counters(app):
+    statistics = server.instance.statistics
+    updates_db = server.instance._device_updates_db
+
+    add_update("00:00:00:00:00:01")
+    add_update("00:00:00:00:00:01")
+    add_update("00:00:00:00:00:02")
+    summary = statistics.summary()
+    assert summary["updates_pending"] == 2, \
+        "repeated update checks are counted once"
+    assert summary["updates_in_progress"] == 0, "no update was started yet"
+
+    updates_db.update_progress("00:00:00:00:00:01", 50)
+    updates_db.update_progress("00:00:00:00:00:01", 75)
+    summary = statistics.summary()
+    assert summary["updates_pending"] == 1, "started updates are not pending"
+    assert summary["updates_in_progress"] == 1, "started updates are counted"
+    assert summary == reconciled(), "incremental counters match the database"
+
+    updates_db.delete("00:00:00:00:00:01")
+    summary = statistics.summary()
+    assert summary["updates_in_progress"] == 0, \
+        "completed updates are no longer counted"
+    assert summary == reconciled(), "incremental counters match the database"
+
+
+def test_reconciliation(app):
+    statistics = server.instance.statistics
+    add_device("00:00:00:00:00:01", "x86_64", "v1")
+    add_device("00:00:00:00:00:02", "x86_64", "v1")
+
+    # Modify the database without going through the database wrappers
+    with Session(server.instance.db) as session:
+        session.execute(
+            delete(Device).where(Device.mac_address == "00:00:00:00:00:01")
+        )
+        session.commit()
+    assert statistics.summary()["devices"] == 2, "counters drifted"
+
+    summary = reconciled()
+    assert summary["devices"] == 1, "reconciliation corrects the drift"
+    assert summary["versions"] == {"v1": 1}, \
+        "reconciliation corrects the drift"
@@ -121,3 +121,67 @@ def test_groups(process):
     # Deleting a group
     resp = requests.delete(f"{GROUPS_ENDPOINT}/{test_group_default_priority_1['id']}")
     assert resp.status_code == 200, "deleting a group with no devices works"
+
+
+def test_groups_move_devices(process):
+    def create_group(priority: int) -> int:
+        resp = requests.post(GROUPS_ENDPOINT, json={"metadata": {}, "priority": priority})
+        assert resp.status_code == 200, "creating a group works"
+        return resp.json()["id"]
+
+    def assigned(group: int) -> list[int]:
+        return sorted(requests.get(f"{GROUPS_ENDPOINT}/{group}").json()["devices"])
+
+    source = create_group(1)
+    destination = create_group(2)
+    conflicting = create_group(2)
+
+    resp = requests.patch(f"{GROUPS_ENDPOINT}/{source}/devices", json={
+        "add": [1, 2, 3],
+        "remove": []
+    })
+    assert resp.status_code == 200, "modified device assignment successfully"
+
+    resp = requests.post(f"{GROUPS_ENDPOINT}/{source}/devices/move/{destination}", json={
+        "devices": [1]
+    })
+    assert resp.status_code == 200, "moving selected devices works"
+    assert assigned(source) == [2, 3], "moved device was removed from the source group"
+    assert assigned(destination) == [1], "moved device was assigned to the destination group"
+
+    resp = requests.post(f"{GROUPS_ENDPOINT}/{source}/devices/move/{destination}", json={
+        "devices": [1]
+    })
+    assert resp.status_code == 409, "signal trying to move a device not assigned to the source group"
+
+    resp = requests.post(f"{GROUPS_ENDPOINT}/{source}/devices/move/{destination}", json={
+        "devices": []
+    })
+    assert resp.status_code == 200, "moving an empty list of devices works"
+    assert assigned(source) == [2, 3], "moving no devices does not modify the source group"
+    assert assigned(destination) == [1], "moving no devices does not modify the destination group"
+
+    resp = requests.post(f"{GROUPS_ENDPOINT}/{source}/devices/move/{conflicting}", json={})
+    assert resp.status_code == 200, "moving all devices works"
+    assert assigned(source) == [], "all devices were removed from the source group"
+    assert assigned(conflicting) == [2, 3], "all devices were assigned to the destination group"
+
+    resp = requests.post(f"{GROUPS_ENDPOINT}/{conflicting}/devices/move/{destination}", json={})
+    assert resp.status_code == 200, "moving all devices works"
+    assert assigned(destination) == [1, 2, 3], "all devices were assigned to the destination group"
+
+    resp = requests.patch(f"{GROUPS_ENDPOINT}/{source}/devices", json={
+        "add": [2],
+        "remove": []
+    })
+    assert resp.status_code == 200, "modified device assignment successfully"
+    resp = requests.post(f"{GROUPS_ENDPOINT}/{source}/devices/move/{conflicting}", json={})
+    assert resp.status_code == 409, \
+        "signal moving a device to a group with the same priority as another group of the device"
+    assert assigned(source) == [2], "failed move does not modify the source group"
+    assert assigned(conflicting) == [], "failed move does not modify the destination group"
+
+    resp = requests.post(f"{GROUPS_ENDPOINT}/{source}/devices/move/{source}", json={})
+    assert resp.status_code == 409, "signal moving devices to the same group"
+    resp = requests.post(f"{GROUPS_ENDPOINT}/{source}/devices/move/1000", json={})
+    assert resp.status_code == 404, "signal moving devices to a group that does not exist"
@@ -0,0 +1,118 @@
+import datetime
+import threading
+import pytest
+import server
+from device_mgmt.logs import LOG_BATCH_FAILED, LOG_BATCH_STORED, LogIngestion
+from models.device import Device
+from request_models import LogEntry
+
+
+WAIT_TIMEOUT = 5.0
+
+
+class BlockingLogsDB:
+    """Records the written logs, blocking each write until released"""
+
+    def __init__(self, logs_db):
+        self.logs_db = logs_db
+        self.writes = []
+        self.failing = set()
+        self.writing = threading.Event()
+        self.released = threading.Event()
+
+    def create(self, logs) -> bool:
+        self.writing.set()
+        assert self.released.wait(WAIT_TIMEOUT)
+        logs = list(logs)
+        self.writes.append([log.entry for log in logs])
+        if any(log.entry in self.failing for log in logs):
+            return False
+        return self.logs_db.create(logs)
+
+
+@pytest.fixture()
+def app(app):
+    """In-process RDFM server, with log writes blocked until released"""
+    for mac in ("00:00:00:00:00:01", "00:00:00:00:00:02"):
+        server.instance._devices_db.insert(Device(
+            name=mac,
+            mac_address=mac,
+            last_access=datetime.datetime.utcnow(),
+            capabilities={},
+            device_metadata={},
+            public_key=None,
+        ))
+    server.instance._logs_db = BlockingLogsDB(server.instance._logs_db)
+    yield app
+
+
+def batch(*entries: str) -> list[LogEntry]:
+    return [LogEntry(device_timestamp=datetime.datetime.utcnow(), name="CPU", entry=x)
+            for x in entries]
+
+
+def test_batches_are_written_together(app):
+    ingestion = LogIngestion(capacity=2)
+    acks = {}
+    acked = threading.Semaphore(0)
+
+    def ack(name: str):
+        def _ack(status: int):
+            acks[name] = status
+            acked.release()
+        return _ack
+
+    logs_db = server.instance._logs_db
+    assert ingestion.submit(1, batch("a"), ack("first"))
+    assert logs_db.writing.wait(WAIT_TIMEOUT)
+
+    # The first batch is being written, the following ones are queued
+    assert ingestion.submit(1, batch("b"), ack("second"))
+    assert ingestion.submit(2, batch("c"), ack("third"))
+    assert not ingestion.submit(2, batch("d"), ack("rejected")), \
+        "batches exceeding the capacity of the queue are rejected"
+
+    logs_db.released.set()
+    for _ in range(3):
+        assert acked.acquire(timeout=WAIT_TIMEOUT)
+    assert acks == {
+        "first": LOG_BATCH_STORED,
+        "second": LOG_BATCH_STORED,
+        "third": LOG_BATCH_STORED,
+    }, "batches are acknowledged once they were written"
+    assert logs_db.writes == [["a"], ["b", "c"]], \
+        "queued batches are written in a single transaction"
+    assert ingestion.submit(2, batch("d"), ack("fourth")), \
+        "batches are accepted again once the queue was written"
+
+
+def test_failed_batch_is_isolated(app):
+    ingestion = LogIngestion(capacity=10)
+    acks = {}
+    acked = threading.Semaphore(0)
+
+    def ack(name: str):
+        def _ack(status: int):
+            acks[name] = status
+            acked.release()
+        return _ack
+
+    logs_db = server.instance._logs_db
+    logs_db.failing.add("bad")
+    assert ingestion.submit(1, batch("a"), ack("first"))
+    assert logs_db.writing.wait(WAIT_TIMEOUT)
+    assert ingestion.submit(1, batch("b"), ack("second"))
+    assert ingestion.submit(2, batch("bad"), ack("third"))
+    assert ingestion.submit(2, batch("c"), ack("fourth"))
+
+    logs_db.released.set()
+    for _ in range(4):
+        assert acked.acquire(timeout=WAIT_TIMEOUT)
+    assert acks == {
+        "first": LOG_BATCH_STORED,
+        "second": LOG_BATCH_STORED,
+        "third": LOG_BATCH_FAILED,
+        "fourth": LOG_BATCH_STORED,
+    }, "only the batch that could not be stored fails"
+    assert logs_db.writes == [["a"], ["b", "bad", "c"], ["b"], ["bad"], ["c"]], \
+        "batches are written one at a time after a failed transaction"
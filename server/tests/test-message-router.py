@@ -0,0 +1,187 @@
+import threading
+import fakeredis
+import pytest
+import simple_websocket
+import device_mgmt.router
+from device_mgmt.router import (
+    DEVICES,
+    InMemoryBackend,
+    MessageRouter,
+    RedisBackend,
+    RemoteCallError,
+    RouterBackend,
+)
+from rdfm.ws import RDFM_WS_INVALID_REQUEST, WebSocketException
+
+
+DEVICE_MAC = "00:00:00:00:00:01"
+
+
+@device_mgmt.router.handler("test_echo")
+def echo(*args):
+    return list(args)
+
+
+@device_mgmt.router.handler("test_ws_error")
+def ws_error():
+    raise WebSocketException("device rejected the request", 4003)
+
+
+@device_mgmt.router.handler("test_error")
+def error():
+    raise ValueError("unexpected")
+
+
+BLOCKED = threading.Event()
+
+
+@device_mgmt.router.handler("test_block")
+def block():
+    BLOCKED.wait(10)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def make_backend(request):
+    """Factory of backends sharing the same state, one for each node"""
+    if request.param == "memory":
+        backend = InMemoryBackend()
+        return lambda: backend
+
+    redis_server = fakeredis.FakeServer()
+    return lambda: RedisBackend(fakeredis.FakeRedis(server=redis_server))
+
+
+@pytest.fixture()
+def nodes(make_backend, monkeypatch):
+    """Two running router nodes"""
+    monkeypatch.setattr(device_mgmt.router, "HEARTBEAT_INTERVAL", 0.1)
+    first = MessageRouter(make_backend())
+    second = MessageRouter(make_backend())
+    first.start()
+    second.start()
+    yield first, second
+    first.stop()
+    second.stop()
+
+
+def test_incomplete_backend():
+    class Backend(RouterBackend):
+        def register(self, namespace: str, key: str, node: str) -> bool:
+            return True
+
+    with pytest.raises(TypeError):
+        Backend()
+
+
+def test_registry(nodes):
+    first, second = nodes
+    assert first.register(DEVICES, DEVICE_MAC), "registering works"
+    assert second.owner(DEVICES, DEVICE_MAC) == first.node_id, \
+        "owner is visible from other nodes"
+    assert second.entries(DEVICES) == {DEVICE_MAC: first.node_id}, \
+        "connections are listed on other nodes"
+    assert not second.register(DEVICES, DEVICE_MAC), \
+        "connections held by another live node cannot be registered"
+    assert second.owners(DEVICES, [DEVICE_MAC, "00:00:00:00:00:02"]) == \
+        {DEVICE_MAC: first.node_id}, "owners are looked up together"
+    assert second.owners(DEVICES, []) == {}
+    assert second.count(DEVICES) == 1, \
+        "connections of other nodes are counted"
+
+    second.unregister(DEVICES, DEVICE_MAC)
+    assert first.owner(DEVICES, DEVICE_MAC) == first.node_id, \
+        "connections can only be unregistered by their owner"
+    assert second.count(DEVICES) == 1
+
+    first.unregister(DEVICES, DEVICE_MAC)
+    assert second.owner(DEVICES, DEVICE_MAC) is None, "unregistering works"
+    assert second.count(DEVICES) == 0, "unregistered connections are not counted"
+
+
+def test_dead_node_takeover(nodes):
+    first, second = nodes
+    first.register(DEVICES, DEVICE_MAC)
+    first.stop()
+    assert second.owner(DEVICES, DEVICE_MAC) is None, \
+        "connections of dead nodes are not visible"
+    assert second.owners(DEVICES, [DEVICE_MAC]) == {}
+    assert second.count(DEVICES) == 0, \
+        "connections of dead nodes are not counted"
+    assert second.register(DEVICES, DEVICE_MAC), \
+        "connections of dead nodes can be taken over"
+    assert not first.backend.register(DEVICES, DEVICE_MAC, "third"), \
+        "connections that were taken over cannot be taken over again"
+    assert second.owner(DEVICES, DEVICE_MAC) == second.node_id
+    assert second.count(DEVICES) == 1, \
+        "connections that were taken over are counted once"
+
+    first.backend.heartbeat(first.node_id)
+    assert second.count(DEVICES) == 1, \
+        "connections that were taken over are no longer counted for their " \
+        "previous owner"
+
+
+def test_remote_call(nodes):
+    first, second = nodes
+    first.register(DEVICES, DEVICE_MAC)
+    assert second.call_device(DEVICE_MAC, "test_echo", 1, "two") == [1, "two"], \
+        "call is executed on the owning node"
+    assert first.call_device(DEVICE_MAC, "test_echo", 1) == [1], \
+        "local calls work"
+
+
+def test_remote_call_errors(nodes):
+    first, second = nodes
+    first.register(DEVICES, DEVICE_MAC)
+
+    with pytest.raises(WebSocketException) as e:
+        second.call_device(DEVICE_MAC, "test_ws_error")
+    assert e.value.status_code == 4003, "status code is preserved"
+    assert e.value.message == "device rejected the request", \
+        "message is preserved"
+
+    with pytest.raises(RemoteCallError):
+        second.call_device(DEVICE_MAC, "test_error")
+
+    with pytest.raises(WebSocketException) as e:
+        second.call_device("00:00:00:00:00:02", "test_echo")
+    assert "not connected to the management WS" in e.value.message, \
+        "calls to disconnected devices fail"
+    assert e.value.status_code == RDFM_WS_INVALID_REQUEST
+
+
+def test_call_timeout(nodes):
+    first, second = nodes
+    BLOCKED.clear()
+    try:
+        with pytest.raises(WebSocketException) as e:
+            second.call(first.node_id, "test_block", timeout=0.5)
+        assert "timed out" in e.value.message, "call times out"
+    finally:
+        BLOCKED.set()
+
+
+def test_call_to_dead_node(nodes):
+    first, second = nodes
+    node = first.node_id
+    first.stop()
+    with pytest.raises(WebSocketException) as e:
+        second.call(node, "test_echo")
+    assert "is gone" in e.value.message, "calls fail when the node dies"
+
+
+def test_streams(nodes):
+    first, second = nodes
+    a = first.open_stream("stream", second.node_id)
+    b = second.open_stream("stream", first.node_id)
+
+    a.send("text")
+    assert b.receive(5) == "text", "text frames are relayed"
+    b.send(b"\x00\xff")
+    assert a.receive(5) == b"\x00\xff", "binary frames are relayed"
+    assert a.receive(0.1) is None, "receiving times out"
+
+    a.close()
+    with pytest.raises(simple_websocket.ConnectionClosed):
+        b.receive(5)
+    assert not b.connected, "closing is propagated to the peer"
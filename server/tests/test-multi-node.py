@@ -0,0 +1,259 @@
+import base64
+import fakeredis
+import json
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+import pytest
+import requests
+import simple_websocket
+from common import (
+    SERVER,
+    SERVER_WAIT_TIMEOUT,
+    wait_for_api,
+    create_fake_device_token,
+)
+from rdfm.ws import RDFM_WS_DUPLICATE_CONNECTION
+
+
+REDIS_PORT = 6390
+SECOND_NODE = "http://127.0.0.1:5001/"
+FAKE_DEVICE_MAC = "00:00:00:00:00:00"
+MESSAGE_WAIT_TIMEOUT = 10.0
+ACTIONS = [
+    {
+        "action_id": "echo",
+        "action_name": "Echo",
+        "description": "Echo action",
+        "command": ["echo", "echo"],
+        "timeout": 1.0
+    },
+]
+
+
+@pytest.fixture()
+def redis_server():
+    """Redis-compatible server shared by the nodes"""
+    server = fakeredis.TcpFakeServer(("127.0.0.1", REDIS_PORT))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture()
+def nodes(db_sqlite, redis_server):
+    """Two RDFM server processes sharing the database and Redis
+
+    Devices connect to the first node, while the API is accessed through
+    the second one.
+    """
+    log_file = (Path(__file__).parent / "server.log").open("a")
+    env = {
+        **os.environ,
+        "REDIS_HOST": "127.0.0.1",
+        "REDIS_PORT": str(REDIS_PORT),
+        "RDFM_CONNECTION_REGISTRY": "redis",
+    }
+    processes = []
+    for port, url, extra in [(5000, SERVER, ["--test-mocks"]),
+                             (5001, SECOND_NODE, [])]:
+        processes.append(subprocess.Popen(
+            ["poetry", "run", "python3", "-m", "rdfm_mgmt_server",
+             "--database", db_sqlite, "--no-ssl", "--no-api-auth",
+             "--http-port", str(port), *extra],
+            env=env,
+            stdout=log_file,
+            stderr=log_file,
+        ))
+        assert wait_for_api(SERVER_WAIT_TIMEOUT, url), \
+            "server has started successfully"
+
+    yield processes
+
+    for process in processes:
+        process.kill()
+    log_file.close()
+
+
+def connect_device(url: str, capabilities: dict[str, bool]) -> simple_websocket.Client:
+    client = simple_websocket.Client.connect(f"{url}api/v1/devices/ws", headers={
+        "Authorization": f"Bearer token={create_fake_device_token()}",
+    })
+    hello = client.receive(MESSAGE_WAIT_TIMEOUT)
+    assert hello is not None, "the server should have sent a welcome message"
+    client.send(json.dumps({
+        "method": "capability_report",
+        "capabilities": capabilities,
+    }))
+    return client
+
+
+def serve_actions(ws: simple_websocket.Client):
+    """Respond to action requests as the device"""
+    while True:
+        try:
+            data = json.loads(ws.receive())
+        except Exception:
+            return
+        match data["method"]:
+            case "action_list_query":
+                ws.send(json.dumps({
+                    "method": "action_list_update",
+                    "actions": ACTIONS,
+                }))
+            case "action_exec":
+                ws.send(json.dumps({
+                    "method": "action_exec_control",
+                    "status": "ok",
+                    "execution_id": data["execution_id"],
+                }))
+                ws.send(json.dumps({
+                    "method": "action_exec_result",
+                    "status_code": 0,
+                    "output": "ZWNobwo=",
+                    "execution_id": data["execution_id"],
+                }))
+
+
+def test_device_state_on_other_node(nodes):
+    device = connect_device(SERVER, {})
+    try:
+        resp = requests.get(f"{SECOND_NODE}api/v2/devices")
+        assert resp.status_code == 200, "fetching works"
+        connected = {d["mac_address"]: d["connected"] for d in resp.json()}
+        assert connected[FAKE_DEVICE_MAC], \
+            "device connected to another node is shown as connected"
+
+        duplicate = simple_websocket.Client.connect(
+            f"{SECOND_NODE}api/v1/devices/ws",
+            headers={"Authorization": f"Bearer token={create_fake_device_token()}"}
+        )
+        with pytest.raises(simple_websocket.ConnectionClosed):
+            duplicate.receive(MESSAGE_WAIT_TIMEOUT)
+        assert duplicate.close_reason == RDFM_WS_DUPLICATE_CONNECTION, \
+            "duplicate connections to other nodes are rejected"
+    finally:
+        device.close()
+
+
+def test_action_on_other_node(nodes):
+    device = connect_device(SERVER, {"action": True})
+    threading.Thread(target=serve_actions, args=(device, ), daemon=True).start()
+    try:
+        resp = requests.get(
+            f"{SECOND_NODE}api/v2/devices/{FAKE_DEVICE_MAC}/action/list"
+        )
+        assert resp.status_code == 200, "listing actions works"
+        assert [a["action_id"] for a in resp.json()] == ["echo"], \
+            "actions are fetched from the device connected to another node"
+
+        resp = requests.get(
+            f"{SECOND_NODE}api/v2/devices/{FAKE_DEVICE_MAC}/action/exec/echo"
+        )
+        assert resp.status_code == 200, "executing actions works"
+        assert resp.json() == {"status_code": 0, "output": "ZWNobwo="}, \
+            "action result is returned from the other node"
+    finally:
+        device.close()
+
+
+def test_shell_on_other_node(nodes):
+    device = connect_device(SERVER, {"shell": True})
+    try:
+        # Hacky sleep to ensure the capability report was processed
+        time.sleep(1.0)
+        manager = simple_websocket.Client.connect(
+            f"{SECOND_NODE}api/v1/devices/{FAKE_DEVICE_MAC}/shell"
+        )
+
+        attach = json.loads(device.receive(MESSAGE_WAIT_TIMEOUT))
+        assert attach["method"] == "shell_attach", \
+            "device connected to another node is asked to attach"
+        device_shell = simple_websocket.Client.connect(
+            f"{SERVER}api/v1/devices/{FAKE_DEVICE_MAC}/shell/attach/{attach['uuid']}",
+            headers={"Authorization": f"Bearer token={create_fake_device_token()}"}
+        )
+
+        device_shell.send(b"prompt$ ")
+        assert manager.receive(MESSAGE_WAIT_TIMEOUT) == b"prompt$ ", \
+            "shell output is relayed to the manager"
+        manager.send(b"ls\n")
+        assert device_shell.receive(MESSAGE_WAIT_TIMEOUT) == b"ls\n", \
+            "manager input is relayed to the device"
+
+        device_shell.close()
+        with pytest.raises(simple_websocket.ConnectionClosed):
+            for _ in range(3):
+                manager.receive(MESSAGE_WAIT_TIMEOUT)
+    finally:
+        device.close()
+
+
+def test_multiplexed_shell_on_other_node(nodes):
+    device = connect_device(SERVER, {"shell": True, "shell_mux": True})
+    try:
+        # Hacky sleep to ensure the capability report was processed
+        time.sleep(1.0)
+        manager = simple_websocket.Client.connect(
+            f"{SECOND_NODE}api/v1/devices/{FAKE_DEVICE_MAC}/shell"
+        )
+
+        opened = json.loads(device.receive(MESSAGE_WAIT_TIMEOUT))
+        assert opened["method"] == "shell_open", \
+            "the session is opened over the management WebSocket"
+        device.send(json.dumps({
+            "method": "shell_data",
+            "uuid": opened["uuid"],
+            "data": base64.b64encode(b"prompt$ ").decode(),
+        }))
+        assert manager.receive(MESSAGE_WAIT_TIMEOUT) == b"prompt$ ", \
+            "shell output is relayed to the manager"
+        manager.send(b"ls\n")
+        data = json.loads(device.receive(MESSAGE_WAIT_TIMEOUT))
+        assert data["method"] == "shell_data"
+        assert base64.b64decode(data["data"]) == b"ls\n", \
+            "manager input is relayed to the device"
+
+        device.send(json.dumps({"method": "shell_close", "uuid": opened["uuid"]}))
+        with pytest.raises(simple_websocket.ConnectionClosed):
+            for _ in range(3):
+                manager.receive(MESSAGE_WAIT_TIMEOUT)
+    finally:
+        device.close()
+
+
+def test_file_content_on_other_node(nodes):
+    device = connect_device(SERVER, {"filesystem": True, "filesystem_stream": True})
+    try:
+        time.sleep(1.0)
+        result = {}
+
+        def _download():
+            result["response"] = requests.post(
+                f"{SECOND_NODE}api/v2/devices/1/fs/file/content",
+                json={"file": "/etc/hostname"},
+            )
+
+        thread = threading.Thread(target=_download)
+        thread.start()
+        read = json.loads(device.receive(MESSAGE_WAIT_TIMEOUT))
+        assert read["method"] == "fs_file_read"
+        device.send(json.dumps({
+            "method": "fs_file_read_reply", "id": read["id"], "status": 0, "size": 7,
+        }))
+        for part in (b"dev", b"ice\n"):
+            device.send(json.dumps({
+                "method": "fs_file_read_data", "id": read["id"],
+                "data": base64.b64encode(part).decode(),
+            }))
+        thread.join(MESSAGE_WAIT_TIMEOUT)
+
+        assert result["response"].status_code == 200
+        assert result["response"].content == b"device\n", \
+            "file contents are streamed from the other node"
+    finally:
+        device.close()
@@ -0,0 +1,76 @@
+import threading
+import time
+import server  # noqa: F401 (must be imported before the containers)
+from device_mgmt.containers import ActionExecutions, FilesystemOperations
+from device_mgmt.expiry import TimerWheel
+from device_mgmt.models.action_execution import ActionExecution
+from device_mgmt.models.filesystem_operation import FilesystemOperation
+from request_models import Action
+
+
+TICK = 0.05
+ACTION = Action(action_id="echo", action_name="Echo", command=["echo"],
+                description="", timeout=1.0)
+
+
+def test_timer_wheel():
+    # Timeouts span multiple turns of the wheel
+    wheel = TimerWheel(tick=TICK, slots=4)
+    fired: dict[str, float] = {}
+    lock = threading.Lock()
+
+    def timer(name: str):
+        def _fire():
+            with lock:
+                fired[name] = time.monotonic() - start
+        return _fire
+
+    start = time.monotonic()
+    wheel.schedule(0.1, timer("short"))
+    wheel.schedule(0.5, timer("long"))
+    cancelled = wheel.schedule(0.2, timer("cancelled"))
+    wheel.cancel(cancelled)
+
+    time.sleep(0.8)
+    assert fired.keys() == {"short", "long"}
+    assert 0.1 <= fired["short"] < 0.1 + 2 * TICK
+    assert 0.5 <= fired["long"] < 0.5 + 2 * TICK, \
+        "timers further than a full turn wait for the remaining turns"
+
+
+def test_expired_operations_are_failed():
+    operations = FilesystemOperations(TimerWheel(tick=TICK), timeout=0.1)
+    expiring = FilesystemOperation()
+    answered = FilesystemOperation()
+    operations.add(expiring)
+    operations.add(answered, timeout=10)
+    assert operations.counts() == {"in_flight": 2, "expired": 0}
+
+    assert expiring.completed.wait(1.0), "waiting threads are woken up"
+    assert expiring.response is None
+    assert operations.get(expiring.id) is None, "expired operations are removed"
+    assert operations.get(answered.id) is answered
+    assert operations.counts() == {"in_flight": 1, "expired": 1}
+
+    operations.remove(answered)
+    operations.remove(expiring)
+    assert operations.counts() == {"in_flight": 0, "expired": 1}
+
+
+def test_refreshed_executions_do_not_expire():
+    executions = ActionExecutions(TimerWheel(tick=TICK), timeout=0.3)
+    execution = ActionExecution(ACTION)
+    notified = threading.Event()
+    execution.notify = notified.set
+    executions.add(execution)
+
+    for _ in range(4):
+        time.sleep(0.15)
+        executions.refresh(execution)
+    assert not execution.execution_completed.is_set()
+    assert executions.get(execution.execution_id) is execution
+
+    assert execution.execution_completed.wait(1.0)
+    assert execution.status_code is None
+    assert notified.is_set(), "executions driven by the scheduler are notified"
+    assert executions.counts() == {"in_flight": 0, "expired": 1}
@@ -0,0 +1,67 @@
+import hashlib
+import io
+import json
+import os
+import tarfile
+from storage.ingest import ARTIFACT_NONSTANDARD, PackageIngest
+
+
+def make_tar(members: dict[str, bytes]) -> bytes:
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode="w") as tar:
+        for name, contents in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(contents)
+            tar.addfile(info, io.BytesIO(contents))
+    return data.getvalue()
+
+
+def make_artifact(payload_types: list[str]) -> bytes:
+    header_info = json.dumps({"payloads": [{"type": x} for x in payload_types]})
+    return make_tar({
+        "version": b"{}",
+        "manifest": b"\x00" * 1000,
+        "header.tar": make_tar({"header-info": header_info.encode()}),
+        "data/0000.tar": os.urandom(100_000),
+    })
+
+
+def ingest(data: bytes, chunk_size: int, directory: str) -> PackageIngest:
+    upload = PackageIngest(directory)
+    for offset in range(0, len(data), chunk_size):
+        upload.write(data[offset:offset + chunk_size])
+    upload.flush()
+    return upload
+
+
+def test_artifact_is_ingested_in_single_pass(tmp_path):
+    artifact = make_artifact(["rootfs-image", "single-file"])
+    for chunk_size in (1, 511, 4096, len(artifact)):
+        upload = ingest(artifact, chunk_size, str(tmp_path))
+        assert upload.artifact_types() == ["rootfs-image", "single-file"], \
+            "the artifact header is extracted regardless of the write sizes"
+        assert upload.sha256() == hashlib.sha256(artifact).hexdigest()
+        with open(upload.name, "rb") as f:
+            assert f.read() == artifact, "the package is written to the spool file"
+        upload.close()
+        assert not os.path.exists(upload.name), "the spool file is removed on close"
+
+
+def test_nonstandard_packages(tmp_path):
+    for package in (
+        b"\xff" * 10_000,
+        make_tar({"rootfs.img": b"\x00" * 10_000}),
+        make_tar({"header.tar": b"not a tar archive"}),
+    ):
+        upload = ingest(package, 4096, str(tmp_path))
+        assert upload.artifact_types() == [ARTIFACT_NONSTANDARD]
+        upload.close()
+
+
+def test_moved_spool_file(tmp_path):
+    upload = ingest(b"package", 4096, str(tmp_path))
+    destination = tmp_path / "stored"
+    os.replace(upload.name, destination)
+    upload.close()
+    assert destination.read_bytes() == b"package", \
+        "spool files taken over by the storage are not removed"
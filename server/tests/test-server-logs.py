@@ -1,12 +1,15 @@
+import json
 import os
 import time
 import pytest
 import requests
+import simple_websocket
 import subprocess
 from common import (
     DEVICES_ENDPOINT,
     LOGS_ENDPOINT,
     GROUPS_ENDPOINT,
+    SERVER_WS,
     create_fake_device_token
 )
 
@@ -208,3 +211,38 @@ def test_fetch_after_removal_from_group(process, create_group_with_every_device,
 
 def test_delete_logs_group(process, delete_logs_from_group, list_logs):
     assert not any(list_logs), "the log db should be empty"
+
+
+def test_logs_over_websocket(process, list_devices):
+    ws = simple_websocket.Client.connect(f"{SERVER_WS}/api/v1/devices/ws", headers={
+        "Authorization": f"Bearer token={create_fake_device_token()}",
+    })
+    try:
+        assert ws.receive(5.0) is not None, "the server should have sent a welcome message"
+        ws.send(json.dumps({
+            "method": "capability_report",
+            "capabilities": {"logs": True},
+        }))
+        for i in range(2):
+            ws.send(json.dumps({
+                "method": "log_batch",
+                "id": f"batch{i}",
+                "batch": [
+                    {
+                        "device_timestamp": "2002-10-02T15:00:00+00:00",
+                        "name": "CPU",
+                        "entry": str(i),
+                    },
+                ],
+            }))
+        acks = [json.loads(ws.receive(5.0)) for _ in range(2)]
+        assert sorted(acks, key=lambda x: x["id"]) == [
+            {"method": "log_batch_ack", "id": "batch0", "status": 0},
+            {"method": "log_batch_ack", "id": "batch1", "status": 0},
+        ], "batches are acknowledged once they were stored"
+    finally:
+        ws.close()
+
+    device = [d for d in list_devices.json() if d["mac_address"] == "00:00:00:00:00:00"][0]
+    response = requests.get(f"{LOGS_ENDPOINT}/device/{device['id']}")
+    assert sorted(x["entry"] for x in response.json()) == ["0", "1"]
@@ -0,0 +1,225 @@
+import datetime
+import pytest
+import sqlalchemy
+import server
+from models.device import Device, DeviceGroupAssignment, DeviceTag
+from models.group import Group
+from sqlalchemy.orm import Session
+
+
+DEVICE_COUNT = 100
+GROUP_COUNT = 5
+
+
+class QueryCounter:
+    """Counts the SQL statements executed on an engine"""
+
+    def __init__(self, engine: sqlalchemy.engine.Engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        sqlalchemy.event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *args):
+        sqlalchemy.event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def populate(engine: sqlalchemy.engine.Engine, devices: int, groups: int):
+    """Create a fleet of devices spread across the given amount of groups
+
+    Device N is assigned to group `group_of(N)`, and every even device
+    is tagged with the `even` tag.
+    """
+    with Session(engine) as session:
+        session.add_all([
+            Group(id=g,
+                  created=datetime.datetime.utcnow(),
+                  info={},
+                  policy="no_update,",
+                  priority=g)
+            for g in range(1, groups + 1)
+        ])
+        session.add_all([
+            Device(id=d,
+                   name=f"device-{d}",
+                   mac_address=f"{d:012x}",
+                   last_access=datetime.datetime.utcnow(),
+                   capabilities={},
+                   device_metadata={},
+                   public_key=None)
+            for d in range(1, devices + 1)
+        ])
+        session.flush()
+        session.add_all([
+            DeviceGroupAssignment(device_id=d, group_id=group_of(d, groups))
+            for d in range(1, devices + 1)
+        ])
+        session.add_all([
+            DeviceTag(device_id=d, tag="even")
+            for d in range(2, devices + 1, 2)
+        ])
+        session.commit()
+
+
+def clear(engine: sqlalchemy.engine.Engine):
+    """Remove all devices and groups created by `populate`"""
+    with Session(engine) as session:
+        for model in [DeviceTag, DeviceGroupAssignment, Device, Group]:
+            session.execute(sqlalchemy.delete(model))
+        session.commit()
+
+
+def group_of(device: int, groups: int) -> int:
+    return (device - 1) % groups + 1
+
+
+def count_queries(app, url: str) -> tuple[int, list]:
+    """Fetch the given URL and count the queries executed by the server"""
+    with QueryCounter(server.instance.db) as counter:
+        resp = app.test_client().get(url)
+    assert resp.status_code == 200, "fetching works"
+    return counter.count, resp.json
+
+
+def test_device_listing_query_count(app):
+    queries_empty, devices = count_queries(app, "/api/v2/devices")
+    assert devices == [], "no devices were created yet"
+
+    populate(server.instance.db, DEVICE_COUNT, GROUP_COUNT)
+
+    queries, devices = count_queries(app, "/api/v2/devices")
+    assert len(devices) == DEVICE_COUNT, "all devices are listed"
+    assert queries <= queries_empty + 1, \
+        "group assignments of all devices are fetched in one extra query"
+    for device in devices:
+        assert device["groups"] == [group_of(device["id"], GROUP_COUNT)], \
+            "group assignments are loaded"
+
+
+def test_tag_listing_query_count(app):
+    populate(server.instance.db, DEVICE_COUNT, GROUP_COUNT)
+
+    queries, devices = count_queries(app, "/api/v2/tags/even")
+    assert len(devices) == DEVICE_COUNT // 2, "only tagged devices are listed"
+    assert queries == 2, \
+        "tagged devices and their group assignments are fetched in two queries"
+    for device in devices:
+        assert device["groups"] == [group_of(device["id"], GROUP_COUNT)], \
+            "group assignments are loaded"
+
+
+@pytest.mark.parametrize("endpoint", ["/api/v1/groups", "/api/v2/groups"])
+def test_group_listing_query_count(app, endpoint):
+    populate(server.instance.db, 1, 1)
+    queries_small, _ = count_queries(app, endpoint)
+
+    clear(server.instance.db)
+    populate(server.instance.db, DEVICE_COUNT, GROUP_COUNT)
+
+    queries, groups = count_queries(app, endpoint)
+    assert len(groups) == GROUP_COUNT, "all groups are listed"
+    assert queries == queries_small, \
+        "listing groups costs a constant amount of queries regardless of group count and fleet size"
+    for group in groups:
+        assert sorted(group["devices"]) == [
+            d for d in range(1, DEVICE_COUNT + 1) if group_of(d, GROUP_COUNT) == group["id"]
+        ], "device assignments are loaded"
+        assert group["packages"] == [], "package assignments are loaded"
+
+
+def test_group_priority_change_query_count(app):
+    populate(server.instance.db, 1, 1)
+    client = app.test_client()
+    with QueryCounter(server.instance.db) as counter:
+        resp = client.post("/api/v2/groups/1/priority", json={"priority": 100})
+    assert resp.status_code == 200, "changing priority works"
+    queries_small = counter.count
+
+    clear(server.instance.db)
+    populate(server.instance.db, DEVICE_COUNT, 1)
+    with QueryCounter(server.instance.db) as counter:
+        resp = client.post("/api/v2/groups/1/priority", json={"priority": 100})
+    assert resp.status_code == 200, "changing priority works"
+    assert counter.count == queries_small, \
+        "priority conflicts are checked using a constant amount of queries"
+
+
+def test_group_assignment_query_count(app):
+    populate(server.instance.db, DEVICE_COUNT, 2)
+    client = app.test_client()
+    with QueryCounter(server.instance.db) as counter:
+        resp = client.post("/api/v2/groups/1/devices/move/2", json={})
+    assert resp.status_code == 200, "moving all devices works"
+    assert counter.count <= 10, "moving all devices costs a constant amount of queries"
+
+    devices = list(range(1, DEVICE_COUNT + 1))
+    with QueryCounter(server.instance.db) as counter:
+        resp = client.patch("/api/v2/groups/2/devices", json={"add": [], "remove": devices})
+    assert resp.status_code == 200, "removing all devices works"
+    assert counter.count <= 10, "removing devices costs a constant amount of queries"
+    with QueryCounter(server.instance.db) as counter:
+        resp = client.patch("/api/v2/groups/1/devices", json={"add": devices, "remove": []})
+    assert resp.status_code == 200, "adding all devices works"
+    assert counter.count <= 10, "adding devices costs a constant amount of queries"
+
+    _, groups = count_queries(app, "/api/v2/groups")
+    assert sorted(groups[0]["devices"]) == devices, "all devices were assigned"
+    assert groups[1]["devices"] == [], "all devices were removed"
+
+
+def test_group_bulk_move(app):
+    """Bulk moves are done in a single transaction, even for large fleets"""
+    count = 20000
+    populate(server.instance.db, count, 1)
+    client = app.test_client()
+    client.post("/api/v2/groups", json={"metadata": {}, "priority": 100})
+
+    devices = list(range(1, count + 1, 2))
+    resp = client.post("/api/v2/groups/1/devices/move/2", json={"devices": devices})
+    assert resp.status_code == 200, "moving selected devices works"
+    resp = client.post("/api/v2/groups/1/devices/move/2", json={})
+    assert resp.status_code == 200, "moving all remaining devices works"
+
+    _, groups = count_queries(app, "/api/v2/groups")
+    assert groups[0]["devices"] == [], "all devices were moved"
+    assert len(groups[1]["devices"]) == count, "all devices were assigned to the destination"
+
+
+def test_active_group_cache(app):
+    populate(server.instance.db, 2, 2)
+    devices_db = server.instance._devices_db
+    client = app.test_client()
+
+    assert devices_db.fetch_active_group(1) == 1, "active group is resolved"
+    assert devices_db.fetch_active_group(2) == 2, "active group is resolved"
+    with QueryCounter(server.instance.db) as counter:
+        assert devices_db.fetch_active_group(1) == 1, "active group is cached"
+        assert devices_db.fetch_active_group(2) == 2, "active group is cached"
+    assert counter.count == 0, "cached active groups do not hit the database"
+
+    resp = client.patch("/api/v2/groups/1/devices", json={"add": [2], "remove": []})
+    assert resp.status_code == 200, "modified device assignment successfully"
+    assert devices_db.fetch_active_group(2) == 1, \
+        "assignment change invalidates the active group"
+
+    resp = client.post("/api/v2/groups/1/priority", json={"priority": 10})
+    assert resp.status_code == 200, "changing priority works"
+    assert devices_db.fetch_active_group(2) == 2, \
+        "priority change invalidates the active group"
+
+    resp = client.post("/api/v2/groups/2/devices/move/1", json={"devices": [2]})
+    assert resp.status_code == 409, "device is already assigned to the destination group"
+    resp = client.patch("/api/v2/groups/1/devices", json={"add": [], "remove": [1, 2]})
+    assert resp.status_code == 200, "modified device assignment successfully"
+    assert devices_db.fetch_active_group(1) is None, "device without groups has no active group"
+    assert devices_db.fetch_active_group(2) == 2, "active group is resolved"
+
+    resp = client.post("/api/v2/groups/2/devices/move/1", json={})
+    assert resp.status_code == 200, "moving all devices works"
+    assert devices_db.fetch_active_group(2) == 1, "moving devices invalidates the active group"
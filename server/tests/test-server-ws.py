@@ -5,8 +5,10 @@ from common import (DEVICES_WS,
                     create_fake_device_token)
 import simple_websocket
 import pytest
-from rdfm.ws import receive_message, send_message, decode_json, RDFM_WS_DUPLICATE_CONNECTION
-from rdfm_mgmt_communication import CapabilityReport, DeviceAttachToManager
+from rdfm.ws import (receive_message, send_message, decode_json, decode_message,
+                     RDFM_WS_DUPLICATE_CONNECTION, COMPRESSION_CAPABILITY)
+from rdfm_mgmt_communication import (CapabilityReport, DeviceAttachToManager,
+                                     UpdateProgress)
 import subprocess
 import signal
 from api.v1.middleware import WS_PING_INTERVAL
@@ -169,6 +171,42 @@ def test_ws_shell_bidirectional_communication(process,
     assert received == TEST_MESSAGE, "manager to device data transfer should work"
 
 
+def test_ws_device_compressed_messages(process, connect_mock_device):
+    """ This tests if devices supporting compression exchange compressed messages
+    """
+    send_message(connect_mock_device,
+                 CapabilityReport(capabilities={
+                     "shell": True,
+                     COMPRESSION_CAPABILITY: True,
+                 }))
+
+    # Hacky sleep to ensure delivery
+    time.sleep(1.0)
+    manager = simple_websocket.Client.connect(manager_shell_ws(FAKE_DEVICE_MAC))
+    try:
+        data = receive(connect_mock_device)
+        assert isinstance(data, bytes), "compressed messages are sent in binary mode"
+        msg = decode_message(data, compression=True)
+        assert isinstance(msg, DeviceAttachToManager), \
+            "the device should have received a compressed shell_attach message"
+    finally:
+        manager.close()
+
+
+def test_ws_message_decoding():
+    """ This tests if messages are decoded into the model matching their method
+    """
+    assert decode_json(b'{"method": "update_progress", "progress": 42}') == \
+        UpdateProgress(progress=42), "messages are dispatched by their method"
+    assert decode_json('{"method": "capability_report", "capabilities": {}}') == \
+        CapabilityReport(capabilities={}), "text messages are decoded"
+    assert decode_json(b" 128\n") == 128, "message length headers are decoded"
+    for invalid in [b'{"method": "unknown"}', b'{"progress": 42}',
+                    b'{"method": "update_progress"}', b"not json"]:
+        with pytest.raises(ValueError):
+            decode_json(invalid)
+
+
 def test_ws_shell_spawn_on_nonexistent_device(process):
     """ This tests if trying to spawn a shell on a nonexistent device fails properly.
     """
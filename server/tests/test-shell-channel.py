@@ -0,0 +1,116 @@
+import base64
+import pytest
+from simple_websocket.errors import ConnectionClosed
+from device_mgmt.models.shell_channel import ShellChannel
+from rdfm.ws import RDFM_WS_INVALID_REQUEST, WebSocketException
+from request_models import ShellData, ShellWindow
+
+
+WINDOW = 8
+
+
+class Device:
+    """Records the messages sent to the device"""
+
+    def __init__(self) -> None:
+        self.messages = []
+        self.closed = []
+
+    def channel(self) -> ShellChannel:
+        return ShellChannel("session", self.messages.append, WINDOW,
+                            self.closed.append)
+
+    def data(self) -> list[str | bytes]:
+        return [base64.b64decode(x.data) if x.binary else x.data
+                for x in self.messages if x.method == "shell_data"]
+
+    def methods(self) -> list[str]:
+        return [x.method for x in self.messages]
+
+
+def shell_data(data: bytes) -> ShellData:
+    return ShellData(uuid="session", data=base64.b64encode(data).decode())
+
+
+def test_sent_data_is_limited_by_window():
+    device = Device()
+    channel = device.channel()
+
+    channel.send(b"12345")
+    channel.send("resize 24 80")
+    channel.send(b"678")
+    assert device.data() == [b"12345", "resize 24 80"], \
+        "data past the window is held back"
+
+    channel._grant(10)
+    assert device.data() == [b"12345", "resize 24 80", b"678"], \
+        "held back data is sent once the device extends the window"
+
+    channel._grant(1)
+    channel.send(b"12345678")
+    with pytest.raises(ConnectionClosed):
+        channel.send(b"9")
+    assert device.methods()[-1] == "shell_close", \
+        "the channel is closed once the held back data exceeds the window"
+    assert device.closed == [channel]
+
+
+def test_received_data_is_acknowledged():
+    device = Device()
+    channel = device.channel()
+
+    channel._deliver(shell_data(b"123"))
+    channel._deliver(ShellData(uuid="session", data="text", binary=False))
+    assert channel.event.is_set()
+    assert channel.receive(0) == b"123"
+    assert device.messages == [], "small reads are acknowledged in batches"
+    assert channel.receive(0) == "text"
+    assert device.messages == [ShellWindow(uuid="session", size=7)]
+    assert channel.receive(0) is None
+
+    channel._deliver(shell_data(b"12345678"))
+    channel._deliver(shell_data(b"9"))
+    assert device.methods()[-1] == "shell_close", \
+        "the channel is closed once the device exceeds the window"
+    assert channel.receive(0) == b"12345678", "received data is not lost"
+    with pytest.raises(ConnectionClosed):
+        channel.receive(0)
+
+
+def test_closed_by_device():
+    device = Device()
+    channel = device.channel()
+
+    channel._deliver(shell_data(b"exit"))
+    channel._closed_by_device()
+    assert device.closed == [channel]
+    assert channel.receive(0) == b"exit"
+    with pytest.raises(ConnectionClosed):
+        channel.receive(0)
+    with pytest.raises(ConnectionClosed):
+        channel.send(b"ls\n")
+
+    channel.close()
+    assert "shell_close" not in device.methods(), \
+        "sessions closed by the device are not closed again"
+
+
+def test_full_send_queue_closes_channel():
+    sent = []
+    closed = []
+
+    def send_message(message):
+        assert not channel._lock.locked(), \
+            "messages are sent without holding the lock of the channel"
+        if message.method == "shell_data" and message.data == "full":
+            raise WebSocketException("device send queue is full",
+                                     RDFM_WS_INVALID_REQUEST)
+        sent.append(message)
+
+    channel = ShellChannel("session", send_message, WINDOW, closed.append)
+    channel.send("ls")
+    with pytest.raises(ConnectionClosed):
+        channel.send("full")
+    assert [x.method for x in sent] == ["shell_data"], \
+        "the device is not sent any further messages"
+    assert closed == [channel], "the channel is closed"
@@ -0,0 +1,120 @@
+import threading
+from typing import Optional
+import pytest
+from device_mgmt.helpers import NotifyingEvent, ShellRelay
+from device_mgmt.router import InMemoryBackend, MessageRouter
+
+
+MESSAGE_WAIT_TIMEOUT = 5.0
+
+
+@pytest.fixture()
+def nodes():
+    """Two running router nodes, used for creating pairs of connected sockets"""
+    backend = InMemoryBackend()
+    first, second = MessageRouter(backend), MessageRouter(backend)
+    first.start()
+    second.start()
+    yield first, second
+    first.stop()
+    second.stop()
+
+
+class BlockingSocket:
+    """Socket that never returns from sending, or fails to send"""
+
+    def __init__(self, error: Optional[Exception] = None) -> None:
+        self.event = NotifyingEvent()
+        self.error = error
+        self.sending = threading.Event()
+        self.released = threading.Event()
+
+    def send(self, data: str | bytes):
+        self.sending.set()
+        if self.error is not None:
+            raise self.error
+        self.released.wait()
+
+    def receive(self, timeout: Optional[float] = None) -> Optional[str | bytes]:
+        return None
+
+
+def socket_pair(nodes, name: str):
+    first, second = nodes
+    return (first.open_stream(name, second.node_id),
+            second.open_stream(name, first.node_id))
+
+
+def test_relay(nodes):
+    """Relay between the manager and device sockets of two sessions"""
+    relay = ShellRelay()
+    sessions = []
+    for i in range(2):
+        manager, manager_server_side = socket_pair(nodes, f"manager{i}")
+        device, device_server_side = socket_pair(nodes, f"device{i}")
+        finished = relay.relay(device_server_side, manager_server_side)
+        sessions.append((manager, device, finished))
+
+    for i, (manager, device, _) in enumerate(sessions):
+        device.send(f"prompt{i}$ ")
+        assert manager.receive(MESSAGE_WAIT_TIMEOUT) == f"prompt{i}$ ", \
+            "device output is relayed to the manager"
+        manager.send(b"ls\n")
+        assert device.receive(MESSAGE_WAIT_TIMEOUT) == b"ls\n", \
+            "manager input is relayed to the device"
+
+    manager, device, finished = sessions[0]
+    device.close()
+    assert finished.wait(MESSAGE_WAIT_TIMEOUT), \
+        "relaying finishes once the device disconnects"
+    assert not sessions[1][2].is_set(), "other sessions are not affected"
+
+    manager, device, finished = sessions[1]
+    manager.close()
+    assert finished.wait(MESSAGE_WAIT_TIMEOUT), \
+        "relaying finishes once the manager disconnects"
+
+
+def test_data_received_before_relaying(nodes):
+    relay = ShellRelay()
+    manager, manager_server_side = socket_pair(nodes, "manager")
+    device, device_server_side = socket_pair(nodes, "device")
+    device.send("early")
+    device.send("data")
+    # Wait until the data is delivered to the server side of the socket
+    assert device_server_side.event.wait(MESSAGE_WAIT_TIMEOUT)
+
+    closed = threading.Event()
+    relay.relay(device_server_side, manager_server_side, closed.set)
+    assert manager.receive(MESSAGE_WAIT_TIMEOUT) == "early", \
+        "data received before relaying is not lost"
+    assert manager.receive(MESSAGE_WAIT_TIMEOUT) == "data", \
+        "data received before relaying is not lost"
+
+    device.close()
+    assert closed.wait(MESSAGE_WAIT_TIMEOUT), \
+        "the completion callback is called once relaying finishes"
+
+
+@pytest.mark.parametrize("blocked", [
+    BlockingSocket(),
+    BlockingSocket(RuntimeError("connection to the message broker lost")),
+])
+def test_failing_session_does_not_affect_others(nodes, blocked):
+    relay = ShellRelay()
+    device, device_server_side = socket_pair(nodes, "blocked")
+    finished = relay.relay(device_server_side, blocked)
+    device.send("output")
+    assert blocked.sending.wait(MESSAGE_WAIT_TIMEOUT)
+
+    manager, manager_server_side = socket_pair(nodes, "manager")
+    other_device, other_device_server_side = socket_pair(nodes, "device")
+    relay.relay(other_device_server_side, manager_server_side)
+    other_device.send("prompt$ ")
+    assert manager.receive(MESSAGE_WAIT_TIMEOUT) == "prompt$ ", \
+        "other sessions are relayed while a socket is blocked or failed"
+
+    if blocked.error is not None:
+        assert finished.wait(MESSAGE_WAIT_TIMEOUT), \
+            "relaying finishes once sending to a socket fails"
+    blocked.released.set()
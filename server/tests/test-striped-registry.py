@@ -0,0 +1,36 @@
+import threading
+from device_mgmt.registry import StripedRegistry
+
+
+def test_registry():
+    registry = StripedRegistry(stripes=4)
+    first, second = object(), object()
+    assert registry.add("a", first)
+    assert not registry.add("a", second), "keys are registered only once"
+    assert registry.get("a") is first
+    assert registry.get("b") is None
+
+    assert registry.remove("a", second) is None, \
+        "a different item registered under the key is not removed"
+    assert registry.remove("a") is first
+    assert registry.remove("a") is None
+    assert registry.values() == []
+
+
+def test_concurrent_registrations():
+    registry = StripedRegistry()
+    barrier = threading.Barrier(8)
+
+    def register(thread: int):
+        barrier.wait()
+        for i in range(1000):
+            registry.add(f"{thread}-{i}", i)
+        for i in range(0, 1000, 2):
+            registry.remove(f"{thread}-{i}")
+
+    threads = [threading.Thread(target=register, args=(x,)) for x in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(registry.values()) == sorted(list(range(1, 1000, 2)) * 8)
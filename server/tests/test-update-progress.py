@@ -0,0 +1,79 @@
+import datetime
+import json
+import time
+import pytest
+import server
+from models.device_update import DeviceUpdate
+
+
+FLUSH_INTERVAL = 0.5
+DEVICE_MAC = "00:00:00:00:00:01"
+
+
+class RecordingSSE:
+    """Records the published server-side events"""
+
+    def __init__(self):
+        self.events = []
+
+    def publish(self, data: str, type: str):
+        self.events.append((type, json.loads(data)))
+
+
+@pytest.fixture()
+def app_config():
+    return {"update_progress_flush_interval": FLUSH_INTERVAL}
+
+
+@pytest.fixture()
+def app(app):
+    """In-process RDFM server, recording the published server-side events"""
+    server.instance.sse = RecordingSSE()
+    server.instance._device_updates_db.insert(
+        DeviceUpdate(mac_address=DEVICE_MAC,
+                     created=datetime.datetime.utcnow(),
+                     version="v2",
+                     progress=0))
+    with app.app_context():
+        yield app
+
+
+def stored_progress() -> list[int]:
+    return [update.progress for update in server.instance._device_updates_db.fetch_all()]
+
+
+def test_progress_is_coalesced(app):
+    aggregator = server.instance.update_progress
+    for progress in range(1, 51):
+        aggregator.report(DEVICE_MAC, progress, "v2")
+    assert stored_progress() == [0], "progress is not written on every report"
+    assert server.instance.sse.events == [], "progress is not published on every report"
+
+    time.sleep(FLUSH_INTERVAL * 3)
+    assert stored_progress() == [50], "latest progress is written periodically"
+    assert server.instance.sse.events == [
+        ("update", {"device": DEVICE_MAC, "progress": 50, "version": "v2"}),
+    ], "only the latest progress is published"
+
+
+def test_completion_is_flushed_immediately(app):
+    aggregator = server.instance.update_progress
+    aggregator.report(DEVICE_MAC, 75, "v2")
+    aggregator.report(DEVICE_MAC, 100, "v2")
+    assert stored_progress() == [], "completed updates are removed immediately"
+    assert server.instance.sse.events == [
+        ("update", {"device": DEVICE_MAC, "progress": 100, "version": "v2"}),
+    ], "completion is published immediately"
+
+    time.sleep(FLUSH_INTERVAL * 3)
+    assert len(server.instance.sse.events) == 1, \
+        "progress reported before the completion is discarded"
+
+
+def test_flush_on_disconnect(app):
+    aggregator = server.instance.update_progress
+    aggregator.report(DEVICE_MAC, 30, "v2")
+    aggregator.flush(DEVICE_MAC)
+    assert stored_progress() == [30], \
+        "pending progress of a disconnected device is written immediately"
+    assert server.instance.statistics.summary()["updates_in_progress"] == 1